@@ -13,6 +13,8 @@ from routers_v1.common_openai_functions_v1 import create_async_azure_openai_clie
 from hardcoded_config import CRAWLER_HARDCODED_CONFIG
 from routers_v1 import crawler, inventory, domains
 from routers_v2 import demorouter1, demorouter2, jobs, domains as domains_v2, sites as sites_v2, reports, crawler as crawler_v2
+from routers_v2.common_job_retention_functions_v2 import start_job_retention
+from routers_v2.common_job_runner_functions_v2 import get_job_runner
 from routers_static import openai_proxy, sharepoint_search
 from routers_static.sharepoint_search import build_domains_and_metadata_cache
 from common_utility_functions import ZipExtractionMode, acquire_startup_lock, convert_to_flat_html_table, extract_zip_files, format_config_for_displaying, format_filesize, clear_folder
@@ -379,16 +381,10 @@ def create_app() -> FastAPI:
       else:
         log_function_output(log_data, "Zip extraction already completed by another worker, skipping")
     
-  # Build domains and metadata cache
-  domains_cache, metadata_cache = build_domains_and_metadata_cache(config, system_info, initialization_errors)
-  app.state.domains = domains_cache
+  # Build domains and metadata cache (reloads changed domains while the app runs, see start_metadata_index_watch)
+  metadata_cache = build_domains_and_metadata_cache(config, system_info, initialization_errors)
   app.state.metadata_cache = metadata_cache
-  try:
-    domains_count = len(domains_cache) if hasattr(domains_cache, "__len__") else "unknown"
-    metadata_count = len(metadata_cache) if hasattr(metadata_cache, "__len__") else "unknown"
-    log_function_output(log_data, f"Domains and metadata cache built. Domains={domains_count}, MetadataEntries={metadata_count}")
-  except Exception:
-    pass
+  log_function_output(log_data, f"Domains and metadata cache built. Domains={len(metadata_cache.domains)}, MetadataEntries={len(metadata_cache)}")
   
   # Add CORS middleware to handle preflight OPTIONS requests
   app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
@@ -550,6 +546,24 @@ def create_app() -> FastAPI:
 # Initialize the FastAPI application
 app = create_app()
 
+@app.on_event("startup")
+async def start_job_runner():
+  """Start the V2 job runner of this worker process (takes over jobs queued by stopped or restarted worker processes) and the scheduled job retention."""
+  storage_path = getattr(app.state.system_info, 'PERSISTENT_STORAGE_PATH', None)
+  if storage_path:
+    get_job_runner(storage_path, app.state)
+    start_job_retention(storage_path)
+
+@app.on_event("startup")
+async def start_metadata_index_watch():
+  """Reload the metadata index of /query and /query2 when files_metadata.json or domain.json of a domain changes."""
+  app.state.metadata_cache.start_watching()
+
+@app.on_event("shutdown")
+async def close_openai_proxy_connections():
+  """Close the pooled connections of the OpenAI proxy to the OpenAI / Azure OpenAI endpoint."""
+  await openai_proxy.close_openai_proxy_http_client()
+
 @app.get("/alive", response_class=PlainTextResponse)
 async def health():
   """Health check endpoint for monitoring."""
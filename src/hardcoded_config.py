@@ -15,20 +15,53 @@ class CrawlerHardcodedConfig:
   PERSISTENT_STORAGE_PATH_EMBEDDED_SUBFOLDER: str
   PERSISTENT_STORAGE_PATH_FAILED_SUBFOLDER: str
   PERSISTENT_STORAGE_LOG_EVENTS_PER_WRITE: int
+  JOB_CATALOG_SQLITE: str
+  JOB_RUNNER_MAX_CONCURRENT_JOBS: Dict[str, int]
+  JOB_RUNNER_PROCESS_POOL_WORKERS: int
+  JOB_RETENTION_MAX_AGE_DAYS: int
+  JOB_RETENTION_MAX_JOBS_PER_ROUTER: int
+  JOB_RETENTION_MAX_TOTAL_MB: int
+  JOB_RETENTION_COMPRESS_AFTER_MINUTES: int
+  JOB_RETENTION_INTERVAL_MINUTES: int
   FILES_METADATA_JSON: str
   DOMAIN_JSON: str
   SITE_JSON: str
   SHAREPOINT_MAP_CSV: str
+  SHAREPOINT_CHANGE_TOKEN_JSON: str
   SHAREPOINT_ERROR_MAP_CSV: str
   FILE_MAP_CSV: str
   FILE_FAILED_MAP_CSV: str
   VECTOR_STORE_MAP_CSV: str
+  MAP_STORE_SQLITE: str
   UNZIP_TO_PERSISTENT_STORAGE_IF_NEWER: str
   UNZIP_TO_PERSISTENT_STORAGE_OVERWRITE: str
   UNZIP_TO_PERSISTENT_STORAGE_CLEAR_BEFORE: str
   LOCALSTORAGE_ZIP_FILENAME_PREFIX: str
   DEFAULT_FILETYPES_ACCEPTED_BY_VECTOR_STORES: List[str]
-  APPEND_TO_MAP_FILES_EVERY_X_LINES: int
+  APPEND_TO_MAP_FILES_EVERY_X_BYTES: int
+  CRAWLER_MAP_STORE_BACKEND: str
+  CRAWLER_MAX_PARALLEL_DOWNLOADS_PER_DOMAIN: int
+  CRAWLER_MAX_PARALLEL_DOWNLOADS_GLOBAL: int
+  CRAWLER_EMBED_MAX_PARALLEL_UPLOADS: int
+  CRAWLER_EMBED_ATTACH_BATCH_SIZE: int
+  CRAWLER_EMBED_MAX_BATCHES_IN_FLIGHT: int
+  CRAWLER_EMBED_RATE_LIMIT_MAX_RETRIES: int
+  CRAWLER_MAX_PARALLEL_SOURCES: int
+  SHAREPOINT_HTTP_MAX_CONNECTIONS: int
+  SHAREPOINT_HTTP_MAX_KEEPALIVE_CONNECTIONS: int
+  SHAREPOINT_HTTP_TIMEOUT_SECONDS: int
+  OPENAI_PROXY_HTTP_MAX_CONNECTIONS: int
+  OPENAI_PROXY_HTTP_MAX_KEEPALIVE_CONNECTIONS: int
+  OPENAI_PROXY_HTTP_KEEPALIVE_EXPIRY_SECONDS: int
+  OPENAI_PROXY_BODY_PEEK_BYTES: int
+  SEARCH_METADATA_RELOAD_CHECK_SECONDS: int
+  SEARCH_QUERY_CACHE_TTL_SECONDS: int
+  SEARCH_QUERY_CACHE_MAX_ENTRIES: int
+  SECURITY_SCAN_ROLE_ASSIGNMENTS_BATCH_SIZE: int
+  SECURITY_SCAN_MAX_PARALLEL_WEBS: int
+  SECURITY_SCAN_ENTRA_GROUP_CACHE_TTL_SECONDS: int
+  SECURITY_SCAN_ENTRA_GROUP_CACHE_MAX_ENTRIES: int
+  SECURITY_SCAN_ENTRA_GROUP_MAX_PARALLEL: int
   SECURITY_SCAN_SETTINGS_FILENAME: str
   DEFAULT_SECURITY_SCAN_SETTINGS: Dict[str, Any]
 
@@ -47,21 +80,73 @@ CRAWLER_HARDCODED_CONFIG = CrawlerHardcodedConfig(
   ,PERSISTENT_STORAGE_PATH_EMBEDDED_SUBFOLDER="02_embedded"
   ,PERSISTENT_STORAGE_PATH_FAILED_SUBFOLDER="03_failed"
   ,PERSISTENT_STORAGE_LOG_EVENTS_PER_WRITE=5
+  # Job catalog in PERSISTENT_STORAGE_PATH_JOBS_SUBFOLDER (index of all job files, see common_job_catalog_functions_v2.py)
+  ,JOB_CATALOG_SQLITE="job_catalog.sqlite"
+  # Job runner (common_job_runner_functions_v2.py): jobs running at the same time per router and app worker process (routers not listed: no limit), further jobs are queued
+  ,JOB_RUNNER_MAX_CONCURRENT_JOBS={"crawler": 2, "sites": 2}
+  # Processes for CPU-heavy job steps (run_cpu_bound), 0 = run them in a thread of the app worker process
+  ,JOB_RUNNER_PROCESS_POOL_WORKERS=0
+  # Job retention (common_job_retention_functions_v2.py), applies to completed and cancelled jobs only, 0 = no limit
+  ,JOB_RETENTION_MAX_AGE_DAYS=90
+  ,JOB_RETENTION_MAX_JOBS_PER_ROUTER=1000
+  ,JOB_RETENTION_MAX_TOTAL_MB=1024
+  # Completed and cancelled job files are gzip-compressed this long after they finished, 0 = never compress
+  ,JOB_RETENTION_COMPRESS_AFTER_MINUTES=60
+  # Minutes between retention runs (one worker process runs it), 0 = no scheduled runs
+  ,JOB_RETENTION_INTERVAL_MINUTES=60
   ,DOMAIN_JSON="domain.json"
   ,SITE_JSON="site.json"
   ,FILES_METADATA_JSON="files_metadata.json"
   ,SHAREPOINT_MAP_CSV="sharepoint_map.csv"
+  ,SHAREPOINT_CHANGE_TOKEN_JSON="sharepoint_change_token.json"
   ,SHAREPOINT_ERROR_MAP_CSV="sharepoint_error_map.csv"
   ,FILE_MAP_CSV="files_map.csv"
   ,FILE_FAILED_MAP_CSV="files_failed_map.csv"
   ,VECTOR_STORE_MAP_CSV="vectorstore_map.csv"
+  ,MAP_STORE_SQLITE="map_store.sqlite"
   ,UNZIP_TO_PERSISTENT_STORAGE_IF_NEWER=".unzip_to_persistant_storage_if_newer"
   ,UNZIP_TO_PERSISTENT_STORAGE_OVERWRITE=".unzip_to_persistant_storage_overwrite"
   ,UNZIP_TO_PERSISTENT_STORAGE_CLEAR_BEFORE=".unzip_to_persistant_storage_clear_before"
   ,LOCALSTORAGE_ZIP_FILENAME_PREFIX="download_"
   # https://platform.openai.com/docs/assistants/tools/file-search/supported-files#supported-files
   ,DEFAULT_FILETYPES_ACCEPTED_BY_VECTOR_STORES=["c", "cpp", "cs", "css", "doc", "docx", "go", "html", "java", "js", "json", "md", "pdf", "php", "pptx", "py", "rb", "sh", "tex", "ts", "txt"]
-  ,APPEND_TO_MAP_FILES_EVERY_X_LINES=10
+  # MapFileWriter writes buffered rows to the map file once the buffer holds this many characters (about 300 files_map rows)
+  ,APPEND_TO_MAP_FILES_EVERY_X_BYTES=64 * 1024
+  # Map store backend: "csv" = map CSV files only, "sqlite" = indexed SQLite store per source folder (MAP_STORE_SQLITE) holding the map rows; crawls write only changed rows, map CSV files are exported on demand (crawl reports, selftest)
+  ,CRAWLER_MAP_STORE_BACKEND="csv"
+  # Parallel downloads: per crawler domain (default worker count per download step) and across all jobs in one app worker process
+  ,CRAWLER_MAX_PARALLEL_DOWNLOADS_PER_DOMAIN=4
+  ,CRAWLER_MAX_PARALLEL_DOWNLOADS_GLOBAL=16
+  # Embedding pipeline: concurrent uploads, files per vector store file batch (API max 500), batches being processed at once, retries on HTTP 429
+  ,CRAWLER_EMBED_MAX_PARALLEL_UPLOADS=16
+  ,CRAWLER_EMBED_ATTACH_BATCH_SIZE=100
+  ,CRAWLER_EMBED_MAX_BATCHES_IN_FLIGHT=4
+  ,CRAWLER_EMBED_RATE_LIMIT_MAX_RETRIES=6
+  # Sources crawled at the same time by crawl_domain (1 = sequential)
+  ,CRAWLER_MAX_PARALLEL_SOURCES=4
+  # SharePoint REST client: one connection pool per app worker process (HTTP/2 when the h2 package is installed), seconds per request
+  ,SHAREPOINT_HTTP_MAX_CONNECTIONS=32
+  ,SHAREPOINT_HTTP_MAX_KEEPALIVE_CONNECTIONS=16
+  ,SHAREPOINT_HTTP_TIMEOUT_SECONDS=120
+  # OpenAI proxy (/openai/*): one connection pool per app worker process to the OpenAI / Azure OpenAI endpoint (HTTP/2 when the h2 package is installed), seconds an idle connection is kept
+  ,OPENAI_PROXY_HTTP_MAX_CONNECTIONS=100
+  ,OPENAI_PROXY_HTTP_MAX_KEEPALIVE_CONNECTIONS=20
+  ,OPENAI_PROXY_HTTP_KEEPALIVE_EXPIRY_SECONDS=60
+  # Bytes of a proxied request body read before forwarding (model for Azure deployment URLs, logging), the rest is streamed through
+  ,OPENAI_PROXY_BODY_PEEK_BYTES=65536
+  # /query metadata index (sharepoint_search_metadata_index.py): seconds between checks for changed files_metadata.json / domain.json (inotify reloads at once on Linux)
+  ,SEARCH_METADATA_RELOAD_CHECK_SECONDS=30
+  # /query result cache (sharepoint_search_query_cache.py): seconds a search result is reused for the same normalized query, max cached queries per app worker process (0 = no cache)
+  ,SEARCH_QUERY_CACHE_TTL_SECONDS=300
+  ,SEARCH_QUERY_CACHE_MAX_ENTRIES=1000
+  # Security scan: role assignments of broken-inheritance items fetched per OData $batch request (SharePoint max 100, 1 = one request per item)
+  ,SECURITY_SCAN_ROLE_ASSIGNMENTS_BATCH_SIZE=20
+  # Security scan: sites and subsites scanned at the same time by one scan job (1 = sequential)
+  ,SECURITY_SCAN_MAX_PARALLEL_WEBS=4
+  # Security scan Entra ID group members (common_entra_group_functions_v2.py): seconds resolved members are reused, groups kept in memory per app worker process (the on-disk store keeps all), Graph API group fetches at the same time
+  ,SECURITY_SCAN_ENTRA_GROUP_CACHE_TTL_SECONDS=86400
+  ,SECURITY_SCAN_ENTRA_GROUP_CACHE_MAX_ENTRIES=1000
+  ,SECURITY_SCAN_ENTRA_GROUP_MAX_PARALLEL=4
   ,SECURITY_SCAN_SETTINGS_FILENAME="security_scan_settings.json"
   ,DEFAULT_SECURITY_SCAN_SETTINGS={
     "do_not_resolve_these_groups": ["Everyone except external users"],
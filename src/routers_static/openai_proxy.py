@@ -1,5 +1,5 @@
-import asyncio, datetime, json, uuid
-from typing import Any, Dict, Optional
+import asyncio, datetime, json, re, uuid
+from typing import Any, AsyncIterator, Dict, Optional
 
 from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 from fastapi import APIRouter, File, Form, Header, HTTPException, Request, UploadFile
@@ -8,7 +8,9 @@ from fastapi.responses import HTMLResponse, Response, StreamingResponse
 import httpx
 
 from common_utility_functions import clean_response, convert_to_flat_html_table, format_config_for_displaying
+from hardcoded_config import CRAWLER_HARDCODED_CONFIG
 from routers_v1.common_logging_functions_v1 import format_milliseconds, log_function_footer, log_function_header, log_function_output, truncate_string
+from routers_v2.common_sharepoint_client_v2 import is_http2_available
 router = APIRouter()
 
 # Configuration will be injected from app.py
@@ -29,6 +31,58 @@ def set_config(app_config):
       # Note: No log_data available in set_config, error will be caught during first request
       token_provider = None
 
+# One httpx.AsyncClient per app worker process for all proxied requests (keep-alive connections to the OpenAI / Azure OpenAI
+# endpoint). Its connection pool is bound to the event loop that created it, so it is recreated if the loop changes.
+_http_client: Optional[httpx.AsyncClient] = None
+_http_client_loop = None
+
+def get_openai_proxy_http_client() -> httpx.AsyncClient:
+  global _http_client, _http_client_loop
+  loop = asyncio.get_running_loop()
+  if _http_client is None or _http_client_loop is not loop or _http_client.is_closed:
+    limits = httpx.Limits(max_connections=CRAWLER_HARDCODED_CONFIG.OPENAI_PROXY_HTTP_MAX_CONNECTIONS, max_keepalive_connections=CRAWLER_HARDCODED_CONFIG.OPENAI_PROXY_HTTP_MAX_KEEPALIVE_CONNECTIONS, keepalive_expiry=CRAWLER_HARDCODED_CONFIG.OPENAI_PROXY_HTTP_KEEPALIVE_EXPIRY_SECONDS)
+    _http_client = httpx.AsyncClient(http2=is_http2_available(), limits=limits, timeout=httpx.Timeout(300.0))
+    _http_client_loop = loop
+  return _http_client
+
+async def close_openai_proxy_http_client() -> None:
+  global _http_client, _http_client_loop
+  if _http_client is not None and _http_client_loop is asyncio.get_running_loop(): await _http_client.aclose()
+  _http_client, _http_client_loop = None, None
+
+async def _iterate_and_close(response: httpx.Response):
+  """Body of a streamed upstream response. Returns the connection to the pool when the stream ends or the client disconnects."""
+  try:
+    async for chunk in response.aiter_bytes(): yield chunk
+  finally:
+    await response.aclose()
+
+async def _peek_request_body(request: Request, peek_bytes: int) -> tuple[bytes, Optional[AsyncIterator[bytes]]]:
+  """First peek_bytes (or more) of the request body and the stream with the rest, None if the whole body was read."""
+  stream = request.stream()
+  chunks, size = [], 0
+  async for chunk in stream:
+    chunks.append(chunk)
+    size += len(chunk)
+    if size >= peek_bytes: return b"".join(chunks), stream
+  return b"".join(chunks), None
+
+async def _chain_request_body(prefix: bytes, rest: AsyncIterator[bytes]):
+  yield prefix
+  async for chunk in rest: yield chunk
+
+# Top-level "model" of a JSON body that was not read completely (it comes before 'messages' / 'input' in practice)
+_MODEL_IN_JSON_PATTERN = re.compile(rb'"model"\s*:\s*"([^"\\]+)"')
+
+def _get_model_from_request_body(body: bytes, complete: bool) -> Optional[str]:
+  if not body: return None
+  if not complete:
+    match = _MODEL_IN_JSON_PATTERN.search(body)
+    return match.group(1).decode('utf-8', errors='replace') if match else None
+  try: request_data = json.loads(body.decode('utf-8'))
+  except (json.JSONDecodeError, UnicodeDecodeError): return None  # Continue with original path
+  return request_data.get('model') if isinstance(request_data, dict) else None
+
 def sanitize_headers_for_logging(headers: Dict[str, str]) -> Dict[str, str]:
   """Sanitize sensitive header values for logging by showing only first 12 and last 5 characters."""
   sanitized = {}
@@ -53,8 +107,13 @@ def sanitize_headers_for_logging(headers: Dict[str, str]) -> Dict[str, str]:
   
   return sanitized
 
-async def proxy_request(request: Request, target_path: str, method: str = "POST", files: Optional[Dict[str, Any]] = None, timeout_seconds: Optional[float] = None) -> Any:
-  """Proxy requests to OpenAI/Azure OpenAI Service while maintaining 1:1 API compatibility."""
+async def proxy_request(request: Request, target_path: str, method: str = "POST", files: Optional[Dict[str, Any]] = None, timeout_seconds: Optional[float] = None, stream_body: Optional[bool] = None) -> Any:
+  """
+  Proxy requests to OpenAI/Azure OpenAI Service while maintaining 1:1 API compatibility.
+  stream_body=True forwards request and response bodies chunk by chunk (only OPENAI_PROXY_BODY_PEEK_BYTES of the request body
+  are held for model extraction and logging). Default: True for incoming requests, False for internal callers that read response.body.
+  """
+  if stream_body is None: stream_body = isinstance(request, Request)
   log_data = log_function_header("proxy_request")
   # Per-call HTTP timeout (defaults to httpx's default if None)
   http_timeout = httpx.Timeout(timeout_seconds) if timeout_seconds else httpx.Timeout(300.0)
@@ -73,29 +132,27 @@ async def proxy_request(request: Request, target_path: str, method: str = "POST"
   # Azure deployment endpoints that require model-based URL transformation
   _deployments_endpoints = {"completions", "chat/completions", "embeddings", "audio/transcriptions", "audio/translations", "audio/speech", "images/generations", "images/edits"}
   
+  # Request body: streamed after a peeked prefix, or read completely (request_body_rest is None)
+  request_body, request_body_rest = b"", None
+  if not files:
+    if stream_body: request_body, request_body_rest = await _peek_request_body(request, CRAWLER_HARDCODED_CONFIG.OPENAI_PROXY_BODY_PEEK_BYTES)
+    else: request_body = await request.body()
+
   # For Azure OpenAI deployment endpoints, check if we need to transform the URL
   transformed_target_path = target_path
-  request_body = None
   if config.OPENAI_SERVICE_TYPE == "azure_openai":
     # Extract the base path without query parameters for comparison
     base_path = target_path.split('?')[0]
     if base_path in _deployments_endpoints and not files:
-      # Read request body to extract model name for deployment URL transformation
-      try:
-        request_body = await request.body()
-        if request_body:
-          request_data = json.loads(request_body.decode('utf-8'))
-          model = request_data.get('model')
-          if model and "/deployments" not in target_path:
-            # Transform URL to deployment format: /deployments/{model}/chat/completions
-            if '?' in target_path:
-              query_part = target_path.split('?', 1)[1]
-              transformed_target_path = f"deployments/{model}/{base_path}?{query_part}"
-            else:
-              transformed_target_path = f"deployments/{model}/{base_path}"
-      except (json.JSONDecodeError, UnicodeDecodeError):
-        # If we can't parse the body, continue with original path
-        pass
+      # Extract model name from the request body for deployment URL transformation
+      model = _get_model_from_request_body(request_body, request_body_rest is None)
+      if model and "/deployments" not in target_path:
+        # Transform URL to deployment format: /deployments/{model}/chat/completions
+        if '?' in target_path:
+          query_part = target_path.split('?', 1)[1]
+          transformed_target_path = f"deployments/{model}/{base_path}?{query_part}"
+        else:
+          transformed_target_path = f"deployments/{model}/{base_path}"
   
   # Construct target URL
   if config.OPENAI_SERVICE_TYPE == "azure_openai":
@@ -158,25 +215,36 @@ async def proxy_request(request: Request, target_path: str, method: str = "POST"
         # Log outgoing headers to diagnose issues (sanitize sensitive values)
         log_function_output(log_data, f"Outgoing headers: {sanitize_headers_for_logging(headers)}")
         
-        body_preview = (request_body if request_body is not None else await request.body())
-        if len(body_preview) > 0:
-          body_text = body_preview.decode('utf-8', errors='replace')
-          if len(body_text) > 1000:
-            log_function_output(log_data, f"Request body (first 1000 chars): {body_text[:1000]}... [total: {len(body_preview)} bytes]")
+        if len(request_body) > 0:
+          body_text = request_body[:4000].decode('utf-8', errors='replace')
+          total_bytes = len(request_body) if request_body_rest is None else request.headers.get("content-length", "unknown, streamed")
+          if len(body_text) > 1000 or request_body_rest is not None:
+            log_function_output(log_data, f"Request body (first 1000 chars): {body_text[:1000]}... [total: {total_bytes} bytes]")
           else:
             log_function_output(log_data, f"Request body: {body_text}")
       except:
         pass
-    # Configure client to automatically decompress responses (default behavior)
-    async with httpx.AsyncClient(timeout=http_timeout) as client:
-      _start = log_data.get("start_time", datetime.datetime.now())
-      if files:
-        # Handle multipart/form-data for file uploads
-        response = await client.request(method=method, url=target_url, files=files, headers=headers)
-      else:
-        # Pass through body and content-type as-is
-        body = request_body if request_body is not None else await request.body()
-        response = await client.request(method=method, url=target_url, content=body, headers=headers)
+    # Shared client, automatically decompresses responses (default behavior)
+    client = get_openai_proxy_http_client()
+    _start = log_data.get("start_time", datetime.datetime.now())
+    if files:
+      # Handle multipart/form-data for file uploads
+      upstream_request = client.build_request(method=method, url=target_url, files=files, headers=headers, timeout=http_timeout)
+    elif request_body_rest is not None:
+      # Pass through peeked prefix and the rest of the body chunk by chunk (Content-Length of the client if it sent one)
+      content_length = request.headers.get("content-length")
+      if content_length: headers["Content-Length"] = content_length
+      upstream_request = client.build_request(method=method, url=target_url, content=_chain_request_body(request_body, request_body_rest), headers=headers, timeout=http_timeout)
+    else:
+      # Pass through body and content-type as-is
+      upstream_request = client.build_request(method=method, url=target_url, content=request_body, headers=headers, timeout=http_timeout)
+    response = await client.send(upstream_request, stream=True)
+    # Streamed responses are closed by _iterate_and_close(), all other responses are read and closed here
+    # Error responses are always read (logged below), event streams are always streamed
+    is_event_stream = response.headers.get("content-type", "").startswith("text/event-stream")
+    stream_response = is_event_stream or (stream_body and response.status_code < 400)
+    try:
+      if not stream_response: await response.aread()
       _elapsed_milliseconds = int((datetime.datetime.now() - _start).total_seconds() * 1000)
       service_type = "Azure OpenAI" if config.OPENAI_SERVICE_TYPE == "azure_openai" else "OpenAI"
       if config.OPENAI_SERVICE_TYPE == "azure_openai":
@@ -196,10 +264,10 @@ async def proxy_request(request: Request, target_path: str, method: str = "POST"
           # For messages endpoint errors, log the full request body
           if "messages" in target_path and not files:
             try:
-              full_body = (request_body if request_body is not None else body)
-              if full_body:
-                full_body_text = full_body.decode('utf-8', errors='replace') if isinstance(full_body, bytes) else str(full_body)
-                log_function_output(log_data, f"FULL request body that caused error: {full_body_text}")
+              if request_body:
+                full_body_text = request_body.decode('utf-8', errors='replace')
+                if request_body_rest is None: log_function_output(log_data, f"FULL request body that caused error: {full_body_text}")
+                else: log_function_output(log_data, f"Request body that caused error (first {len(request_body)} bytes, rest streamed): {full_body_text}")
             except:
               pass          
         except:
@@ -212,14 +280,20 @@ async def proxy_request(request: Request, target_path: str, method: str = "POST"
         response_headers.pop(header, None)
       
       # Handle streaming responses
-      if response.headers.get("content-type", "").startswith("text/event-stream"):
-        retVal = StreamingResponse(content=response.aiter_bytes(), status_code=response.status_code, headers=response_headers, media_type="text/event-stream")
+      if is_event_stream:
+        retVal = StreamingResponse(content=_iterate_and_close(response), status_code=response.status_code, headers=response_headers, media_type="text/event-stream")
+        return (retVal, _elapsed_milliseconds)
+      if stream_response:
+        retVal = StreamingResponse(content=_iterate_and_close(response), status_code=response.status_code, headers=response_headers, media_type=response.headers.get("content-type"))
         return (retVal, _elapsed_milliseconds)
       
       # Pass through uncompressed content for non-streaming
       media_type = response.headers.get("content-type")
       retVal = Response(content=response.content, status_code=response.status_code, headers=response_headers, media_type=media_type)
       return (retVal, _elapsed_milliseconds)
+    except BaseException:
+      await response.aclose()
+      raise
       
   except httpx.RequestError as e:
     log_function_output(log_data, f"ERROR: Request error when proxying to OpenAI: {e}")
@@ -302,7 +376,8 @@ async def upload_file(file: UploadFile = File(...), purpose: str = Form(...), ap
   """Proxy for OpenAI Files API - Upload File. Mirrors: POST /files"""
   log_data = log_function_header("upload_file")
   try:
-    files = {"file": (file.filename, await file.read(), file.content_type), "purpose": (None, purpose)}
+    # Spooled upload file (on disk above 1 MB) is streamed to the upstream, not read into memory
+    files = {"file": (file.filename, file.file, file.content_type), "purpose": (None, purpose)}
     
     # Create a dummy request for the proxy function
     class DummyRequest:
@@ -768,7 +843,8 @@ async def self_test(request: Request):
     # Always use standard OpenAI format - the proxy will transform for Azure if needed
     return base_path
   
-  # Helpers for dummy requests (defined before first use)
+  # Helpers for dummy requests (defined before first use). Calls that pass the incoming request set stream_body=False:
+  # a streamed response holds its upstream connection until its body is consumed, and the results read response.body.
   class DummyRequest:
     async def body(self): return b""
     @property
@@ -885,7 +961,7 @@ async def self_test(request: Request):
       # If created, immediately try GET by id
       try:
         if resp_id:
-          get_resp, _milliseconds = await proxy_request(request, build_openai_endpoint_path(f"responses/{resp_id}"), "GET", timeout_seconds=timeout_seconds)
+          get_resp, _milliseconds = await proxy_request(request, build_openai_endpoint_path(f"responses/{resp_id}"), "GET", timeout_seconds=timeout_seconds, stream_body=False)
           ok = get_resp.status_code < 400
           emoji = "✅" if ok else "❌"
           main = ("OK" if ok else f"HTTP {get_resp.status_code}") + f" ({format_milliseconds(_milliseconds)})"
@@ -926,7 +1002,7 @@ async def self_test(request: Request):
   # Get file
   try:
     if uploaded_file_id:
-      get_file_resp, _milliseconds = await proxy_request(request, build_openai_endpoint_path(f"files/{uploaded_file_id}"), "GET", timeout_seconds=timeout_seconds)
+      get_file_resp, _milliseconds = await proxy_request(request, build_openai_endpoint_path(f"files/{uploaded_file_id}"), "GET", timeout_seconds=timeout_seconds, stream_body=False)
       try:
         get_file_data = json.loads(get_file_resp.body.decode("utf-8", errors="replace")) if get_file_resp.body else {}
         has_decode_error = False
@@ -1102,7 +1178,7 @@ async def self_test(request: Request):
 
   # List assistants
   try:
-    list_resp, _milliseconds = await proxy_request(request, build_openai_endpoint_path("assistants"), "GET", timeout_seconds=timeout_seconds)
+    list_resp, _milliseconds = await proxy_request(request, build_openai_endpoint_path("assistants"), "GET", timeout_seconds=timeout_seconds, stream_body=False)
     try:
       list_data = json.loads(list_resp.body.decode("utf-8", errors="replace")) if list_resp.body else {}
       assistants_count = len(list_data.get("data", [])) if isinstance(list_data, dict) else 0
@@ -1150,7 +1226,7 @@ async def self_test(request: Request):
   # Get thread
   try:
     if thread_id:
-      get_thread_resp, _milliseconds = await proxy_request(request, build_openai_endpoint_path(f"threads/{thread_id}"), "GET", timeout_seconds=timeout_seconds)
+      get_thread_resp, _milliseconds = await proxy_request(request, build_openai_endpoint_path(f"threads/{thread_id}"), "GET", timeout_seconds=timeout_seconds, stream_body=False)
       try:
         get_thread_data = json.loads(get_thread_resp.body.decode("utf-8", errors="replace")) if get_thread_resp.body else {}
         has_decode_error = False
@@ -1199,7 +1275,7 @@ async def self_test(request: Request):
   # List thread messages
   try:
     if thread_id:
-      list_messages_resp, _milliseconds = await proxy_request(request, build_openai_endpoint_path(f"threads/{thread_id}/messages"), "GET", timeout_seconds=timeout_seconds)
+      list_messages_resp, _milliseconds = await proxy_request(request, build_openai_endpoint_path(f"threads/{thread_id}/messages"), "GET", timeout_seconds=timeout_seconds, stream_body=False)
       try:
         list_messages_data = json.loads(list_messages_resp.body.decode("utf-8", errors="replace")) if list_messages_resp.body else {}
         messages_count = len(list_messages_data.get("data", [])) if isinstance(list_messages_data, dict) else 0
@@ -1224,7 +1300,7 @@ async def self_test(request: Request):
   # Get thread message
   try:
     if thread_id and message_id:
-      get_message_resp, _milliseconds = await proxy_request(request, build_openai_endpoint_path(f"threads/{thread_id}/messages/{message_id}"), "GET", timeout_seconds=timeout_seconds)
+      get_message_resp, _milliseconds = await proxy_request(request, build_openai_endpoint_path(f"threads/{thread_id}/messages/{message_id}"), "GET", timeout_seconds=timeout_seconds, stream_body=False)
       try:
         get_message_data = json.loads(get_message_resp.body.decode("utf-8", errors="replace")) if get_message_resp.body else {}
         has_decode_error = False
@@ -1274,7 +1350,7 @@ async def self_test(request: Request):
   # List thread runs
   try:
     if thread_id:
-      list_runs_resp, _milliseconds = await proxy_request(request, build_openai_endpoint_path(f"threads/{thread_id}/runs"), "GET", timeout_seconds=timeout_seconds)
+      list_runs_resp, _milliseconds = await proxy_request(request, build_openai_endpoint_path(f"threads/{thread_id}/runs"), "GET", timeout_seconds=timeout_seconds, stream_body=False)
       try:
         list_runs_data = json.loads(list_runs_resp.body.decode("utf-8", errors="replace")) if list_runs_resp.body else {}
         runs_count = len(list_runs_data.get("data", [])) if isinstance(list_runs_data, dict) else 0
@@ -1306,7 +1382,7 @@ async def self_test(request: Request):
       # Poll run status until completion or timeout
       while elapsed_seconds < max_wait_seconds:
         try:
-          get_run_resp, _ms = await proxy_request(request, build_openai_endpoint_path(f"threads/{thread_id}/runs/{run_id}"), "GET", timeout_seconds=5)
+          get_run_resp, _ms = await proxy_request(request, build_openai_endpoint_path(f"threads/{thread_id}/runs/{run_id}"), "GET", timeout_seconds=5, stream_body=False)
           if get_run_resp.status_code < 400:
             try:
               get_run_data = json.loads(get_run_resp.body.decode("utf-8", errors="replace")) if get_run_resp.body else {}
@@ -1324,7 +1400,7 @@ async def self_test(request: Request):
           break
       
       # Final status check
-      get_run_resp, _milliseconds = await proxy_request(request, build_openai_endpoint_path(f"threads/{thread_id}/runs/{run_id}"), "GET", timeout_seconds=timeout_seconds)
+      get_run_resp, _milliseconds = await proxy_request(request, build_openai_endpoint_path(f"threads/{thread_id}/runs/{run_id}"), "GET", timeout_seconds=timeout_seconds, stream_body=False)
       try:
         get_run_data = json.loads(get_run_resp.body.decode("utf-8", errors="replace")) if get_run_resp.body else {}
         has_decode_error = False
@@ -1351,7 +1427,7 @@ async def self_test(request: Request):
   try:
     if thread_id and run_completed and final_status == "completed":
       # Get updated messages to see assistant's response
-      list_messages_after_resp, _milliseconds = await proxy_request(request, build_openai_endpoint_path(f"threads/{thread_id}/messages"), "GET", timeout_seconds=timeout_seconds)
+      list_messages_after_resp, _milliseconds = await proxy_request(request, build_openai_endpoint_path(f"threads/{thread_id}/messages"), "GET", timeout_seconds=timeout_seconds, stream_body=False)
       try:
         list_messages_after_data = json.loads(list_messages_after_resp.body.decode("utf-8", errors="replace")) if list_messages_after_resp.body else {}
         messages = list_messages_after_data.get("data", []) if isinstance(list_messages_after_data, dict) else []
@@ -1384,7 +1460,7 @@ async def self_test(request: Request):
   # List run steps
   try:
     if thread_id and run_id:
-      list_steps_resp, _milliseconds = await proxy_request(request, build_openai_endpoint_path(f"threads/{thread_id}/runs/{run_id}/steps"), "GET", timeout_seconds=timeout_seconds)
+      list_steps_resp, _milliseconds = await proxy_request(request, build_openai_endpoint_path(f"threads/{thread_id}/runs/{run_id}/steps"), "GET", timeout_seconds=timeout_seconds, stream_body=False)
       try:
         list_steps_data = json.loads(list_steps_resp.body.decode("utf-8", errors="replace")) if list_steps_resp.body else {}
         steps_count = len(list_steps_data.get("data", [])) if isinstance(list_steps_data, dict) else 0
@@ -1,13 +1,14 @@
-import json, logging, os, re
+import asyncio, logging, os
 from typing import Any, Dict, List, Optional, Tuple
 from fastapi import APIRouter, HTTPException, Query, Request
 from fastapi.responses import HTMLResponse, JSONResponse, Response
 
 from routers_v1.common_openai_functions_v1 import CoaiSearchParams, format_openai_connection_error, get_search_results_using_responses_api, get_search_results_using_search_api, try_get_vector_store_by_id
-from routers_v1.router_crawler_functions_v1 import is_files_metadata_v2_format, convert_file_metadata_item_from_v2_to_v3
 from hardcoded_config import CRAWLER_HARDCODED_CONFIG
 from common_utility_functions import convert_to_nested_html_table, remove_linebreaks
 from routers_v1.common_logging_functions_v1 import log_function_footer, log_function_header, log_function_output, log_function_footer_sync, sanitize_queries_and_responses, truncate_string
+from routers_static.sharepoint_search_metadata_index import SearchMetadataIndex
+from routers_static.sharepoint_search_query_cache import QueryResultCache, get_query_cache_key
 
 router = APIRouter()
 
@@ -24,154 +25,25 @@ logger = logging.getLogger(__name__)
 # Cache for vector store IDs
 found_vector_store_ids = {}
 
-def build_domains_and_metadata_cache(config, system_info, initialization_errors):
+# Cache for search results of repeated queries (invalidated by the metadata index when a crawl changes a domain)
+query_result_cache = QueryResultCache(CRAWLER_HARDCODED_CONFIG.SEARCH_QUERY_CACHE_MAX_ENTRIES, CRAWLER_HARDCODED_CONFIG.SEARCH_QUERY_CACHE_TTL_SECONDS)
+
+def build_domains_and_metadata_cache(config, system_info, initialization_errors) -> SearchMetadataIndex:
+  """Load the metadata index of all domains (app.state.metadata_cache). Call start_watching() in the event loop to keep it current."""
   log_data = log_function_header("build_domains_and_metadata_cache")
-  metadata_cache = {}; domains = []
-  
+  domains_folder_path = os.path.join(system_info.PERSISTENT_STORAGE_PATH, CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_PATH_DOMAINS_SUBFOLDER)
+  log_function_output(log_data, f"Domains folder path: {domains_folder_path}")
+  metadata_index = SearchMetadataIndex(domains_folder_path, config.SEARCH_DEFAULT_GLOBAL_VECTOR_STORE_ID)
+  metadata_index.add_reload_listener(query_result_cache.invalidate)
   try:
-    domains_folder_path = os.path.join(system_info.PERSISTENT_STORAGE_PATH, CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_PATH_DOMAINS_SUBFOLDER)
-    log_function_output(log_data, f"Domains folder path: {domains_folder_path}")
-    
-    if not os.path.exists(domains_folder_path):
-      error_msg = f"Domains folder not found: {domains_folder_path}"
-      log_function_output(log_data, f"ERROR: {error_msg}")
-      initialization_errors.append({"component": "SharePoint Data Loading", "error": error_msg})
-      log_function_footer_sync(log_data)
-      return domains, metadata_cache
-    
-    # Iterate through each domain folder (VMS, HOIT, etc.)
-    try:
-      domain_folder_names = os.listdir(domains_folder_path)
-      log_function_output(log_data, f"Found {len(domain_folder_names)} items in domains folder")
-    except Exception as e:
-      error_msg = f"Failed to list domains folder: {str(e)}"
-      log_function_output(log_data, f"ERROR: {error_msg}")
-      initialization_errors.append({"component": "SharePoint Data Loading", "error": error_msg})
-      log_function_footer_sync(log_data)
-      return domains, metadata_cache
-    
-    for domain_folder_name in domain_folder_names:
-      domain_folder_path = os.path.join(domains_folder_path, domain_folder_name)
-      
-      # Skip folders that start with an underscore (_)
-      if not os.path.isdir(domain_folder_path) or domain_folder_name.startswith('_'):
-        log_function_output(log_data, f"Skipping: {domain_folder_name}")
-        continue
-      
-      log_function_output(log_data, f"Processing domain folder: {domain_folder_name}")
-      
-      # Load domain.json
-      domain_json_path = os.path.join(domain_folder_path, CRAWLER_HARDCODED_CONFIG.DOMAIN_JSON)
-      if os.path.exists(domain_json_path):
-        file_content = None
-        try:
-          for encoding in ['utf-8', 'utf-16', 'utf-16-le', 'utf-16-be']:
-            try:
-              with open(domain_json_path, 'r', encoding=encoding) as f:
-                file_content = f.read()
-                break
-            except (UnicodeDecodeError, UnicodeError):
-              continue
-          
-          if file_content is None:
-            error_msg = f"domain.json for {domain_folder_name} has unsupported encoding"
-            log_function_output(log_data, f"ERROR: {error_msg}")
-            initialization_errors.append({"component": "SharePoint Data Loading", "error": error_msg})
-            continue
-          
-          if not file_content.strip():
-            error_msg = f"domain.json for {domain_folder_name} is empty (file size: {os.path.getsize(domain_json_path)} bytes)"
-            log_function_output(log_data, f"ERROR: {error_msg}")
-            initialization_errors.append({"component": "SharePoint Data Loading", "error": error_msg})
-            continue
-          
-          domain_data = json.loads(file_content)
-          if domain_data.get('vector_store_id') != config.SEARCH_DEFAULT_GLOBAL_VECTOR_STORE_ID:
-            domain_name = domain_data.get('name', domain_folder_name)
-            domain_description = domain_data.get('description', '')
-            domains[:] = [d for d in domains if d['name'] != domain_name]
-            domains.append({"name": domain_name, "description": domain_description})
-            log_function_output(log_data, f"Added domain: {domain_name}")
-          else:
-            log_function_output(log_data, f"Skipping global vector store domain: {domain_folder_name}")
-        except json.JSONDecodeError as e:
-          error_msg = f"Invalid JSON in domain.json for {domain_folder_name}: {str(e)} (file size: {os.path.getsize(domain_json_path)} bytes, first 100 chars: {file_content[:100]!r})"
-          log_function_output(log_data, f"ERROR: {error_msg}")
-          initialization_errors.append({"component": "SharePoint Data Loading", "error": error_msg})
-        except Exception as e:
-          error_msg = f"Failed to load domain.json for {domain_folder_name}: {str(e)}"
-          log_function_output(log_data, f"ERROR: {error_msg}")
-          initialization_errors.append({"component": "SharePoint Data Loading", "error": error_msg})
-      
-      # Load files_metadata.json
-      files_metadata_json_path = os.path.join(domain_folder_path, CRAWLER_HARDCODED_CONFIG.FILES_METADATA_JSON)
-      if os.path.exists(files_metadata_json_path):
-        file_content = None
-        try:
-          for encoding in ['utf-8', 'utf-16', 'utf-16-le', 'utf-16-be']:
-            try:
-              with open(files_metadata_json_path, 'r', encoding=encoding) as f:
-                file_content = f.read()
-                break
-            except (UnicodeDecodeError, UnicodeError):
-              continue
-          
-          if file_content is None:
-            error_msg = f"files_metadata.json for {domain_folder_name} has unsupported encoding"
-            log_function_output(log_data, f"ERROR: {error_msg}")
-            initialization_errors.append({"component": "SharePoint Data Loading", "error": error_msg})
-            continue
-          
-          if not file_content.strip():
-            error_msg = f"files_metadata.json for {domain_folder_name} is empty (file size: {os.path.getsize(files_metadata_json_path)} bytes)"
-            log_function_output(log_data, f"ERROR: {error_msg}")
-            initialization_errors.append({"component": "SharePoint Data Loading", "error": error_msg})
-            continue
-          
-          # Clean invalid control characters (tabs, etc.) from JSON string values
-          # This handles cases where openai_file_id or other fields have embedded tabs
-          file_content = re.sub(r':\s*"([^"]*)\t([^"]*)"', r': "\1\2"', file_content)
-          
-          files_metadata = json.loads(file_content)
-          
-          # Detect format using first item and convert if needed
-          if files_metadata and len(files_metadata) > 0:
-            first_item = files_metadata[0]
-            is_v2 = is_files_metadata_v2_format(first_item)
-            
-            if is_v2:
-              log_function_output(log_data, f"Detected V2 format for {domain_folder_name}, converting to V3...")
-              files_metadata = [convert_file_metadata_item_from_v2_to_v3(item) for item in files_metadata]
-            
-            # Add all items to cache (now all in V3 format)
-            files_added = 0
-            for file_data in files_metadata:
-              file_id = file_data.get('openai_file_id', '').strip()
-              if file_id:
-                metadata_cache[file_id] = file_data
-                files_added += 1
-            
-            log_function_output(log_data, f"Added {files_added} file metadata entries from {domain_folder_name}")
-          else:
-            log_function_output(log_data, f"No file metadata entries found in {domain_folder_name}")
-        except json.JSONDecodeError as e:
-          error_msg = f"Invalid JSON in files_metadata.json for {domain_folder_name}: {str(e)} (file size: {os.path.getsize(files_metadata_json_path)} bytes, first 100 chars: {file_content[:100]!r})"
-          log_function_output(log_data, f"ERROR: {error_msg}")
-          initialization_errors.append({"component": "SharePoint Data Loading", "error": error_msg})
-        except Exception as e:
-          error_msg = f"Failed to load files_metadata.json for {domain_folder_name}: {str(e)}"
-          log_function_output(log_data, f"ERROR: {error_msg}")
-          initialization_errors.append({"component": "SharePoint Data Loading", "error": error_msg})
-    
-    log_function_output(log_data, f"Total domains loaded: {len(domains)}, Total metadata entries: {len(metadata_cache)}")
-              
+    metadata_index.reload(log_data)
+    for error in metadata_index.errors: initialization_errors.append({"component": "SharePoint Data Loading", "error": error})
   except Exception as e:
     error_msg = f"Unexpected error in build_domains_and_metadata_cache: {str(e)}"
     log_function_output(log_data, f"ERROR: {error_msg}")
     initialization_errors.append({"component": "SharePoint Data Loading", "error": error_msg})
-  
   log_function_footer_sync(log_data)
-  return domains, metadata_cache
+  return metadata_index
 
 
 # Convert search_results to data object as required by /query endpoint with array of sources { "data": "<text>", "source": "<url>", "metadata": { <attributes> } }
@@ -179,8 +51,7 @@ def build_data_object(query, search_results, response, metadata_cache):
   sources = []
   for result in search_results:
     file_id = result.file_id
-    metadata = metadata_cache.get(file_id)
-    if metadata : metadata = metadata.copy()
+    metadata = metadata_cache.get(file_id)  # New dict per lookup, no copy needed
     # Get URL from V3 format metadata and remove it before adding to metadata dict
     # V3 format uses 'url' field, which maps to the output 'source' field
     if metadata:
@@ -250,10 +121,13 @@ async def _internal_request_to_llm(request: Request, request_params: dict, reque
     try:
       # The OpenAI client automatically retries on 429 Rate Limit errors with 2 retries
       search_params = CoaiSearchParams(query=query, max_num_results=max_num_results)
-      if config.OPENAI_SERVICE_TYPE.lower() == "azure_openai":
-        search_results, openai_response = await get_search_results_using_responses_api(request.app.state.openai_client, search_params, vsid, model_name, config.SEARCH_DEFAULT_INSTRUCTIONS)
-      else:
-        search_results, openai_response = await get_search_results_using_search_api(request.app.state.openai_client, search_params, vsid)
+      async def search():
+        if config.OPENAI_SERVICE_TYPE.lower() == "azure_openai":
+          return await get_search_results_using_responses_api(request.app.state.openai_client, search_params, vsid, model_name, config.SEARCH_DEFAULT_INSTRUCTIONS)
+        return await get_search_results_using_search_api(request.app.state.openai_client, search_params, vsid)
+      cache_key = get_query_cache_key(query, vsid, max_num_results, search_params.filters, config.OPENAI_SERVICE_TYPE.lower(), model_name, config.SEARCH_DEFAULT_INSTRUCTIONS)
+      (search_results, openai_response), cache_status = await query_result_cache.get_or_fetch(cache_key, vsid, search)
+      if cache_status != "miss": log_function_output(request_data, f"QueryCache - Reused search results ({cache_status})")
     except Exception as e:
       # If the search fails, try to refresh the vector store cache
       log_function_output(request_data, f"{str(e)}")
@@ -372,7 +246,7 @@ async def describe(request: Request):
   response = {
     'data': {
       'description': 'This tool can search the content of SharePoint documents.',
-      'domains': request.app.state.domains,
+      'domains': request.app.state.metadata_cache.domains,
       'content_root': config.SEARCH_DEFAULT_SHAREPOINT_ROOT_URL
       # 'favicon': 'AAABAAAIACoJQAANgA...APgfAAA='  # base64, optional
     }
@@ -413,7 +287,7 @@ async def describe2(request: Request):
   response_data = {
     'data': {
       'description': 'This tool can search the content of SharePoint documents.',
-      'domains': request.app.state.domains,
+      'domains': request.app.state.metadata_cache.domains,
       'content_root': config.SEARCH_DEFAULT_SHAREPOINT_ROOT_URL
     }
   }
@@ -454,3 +328,90 @@ async def query2(request: Request):
   await log_function_footer(request_data)
   return retVal
 
+# ----------------------------------------------------- /metadata2 ---------------------------------------------------
+@router.get('/metadata2')
+async def metadata2(request: Request):
+  """
+  Metadata Index Endpoint: Returns the state of the file metadata index used by /query and /query2 (domains, entries, reloads, errors)
+  The index reloads changed files_metadata.json / domain.json files automatically, reload=true checks for changes now.
+
+  Parameters:
+  - format: The response format (json or html). Default: html
+  - reload: true = check all domain folders for changes before returning the state. Default: false
+
+  Examples:
+  /metadata2
+  /metadata2?format=json
+  /metadata2?reload=true&format=json
+  """
+  function_name = 'metadata2()'
+  request_data = log_function_header(function_name)
+  request_params = dict(request.query_params)
+
+  endpoint = '/' + function_name.replace('()','')
+  documentation_HTML = f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{endpoint} - Documentation</title></head><body><pre>{metadata2.__doc__}</pre></body></html>"
+
+  # Display documentation if no params are provided
+  if len(request_params) == 0:
+    await log_function_footer(request_data)
+    return HTMLResponse(documentation_HTML)
+
+  metadata_index = request.app.state.metadata_cache
+  if request_params.get('reload', 'false').lower() == 'true':
+    reloaded = await asyncio.to_thread(metadata_index.reload)
+    log_function_output(request_data, f"Reloaded {len(reloaded)} domain folders")
+  stats = metadata_index.get_stats()
+  await log_function_footer(request_data)
+
+  if request_params.get('format', 'html') == 'json':
+    return JSONResponse(content={'data': stats}, status_code=200)
+  table_html = convert_to_nested_html_table(stats)
+  return HTMLResponse(f"""<!DOCTYPE html>
+<html><head><meta charset='utf-8'><title>SharePoint Search Metadata Index</title>
+  <link rel='stylesheet' href='/html_javascript_static_files/css/styles.css'>
+  <script src='/html_javascript_static_files/js/htmx.js'></script>
+</head><body>{table_html}</body></html>""")
+
+# ----------------------------------------------------- /querycache2 -------------------------------------------------
+@router.get('/querycache2')
+async def querycache2(request: Request):
+  """
+  Query Cache Endpoint: Returns the state of the search result cache used by /query and /query2 (entries, hits, misses, invalidations)
+  Repeated queries (same normalized query, vsid and results) reuse the search results for SEARCH_QUERY_CACHE_TTL_SECONDS.
+  Cached results of a vector store are dropped when the metadata index reloads a domain of it.
+
+  Parameters:
+  - format: The response format (json or html). Default: html
+  - clear: true = drop all cached search results before returning the state. Default: false
+
+  Examples:
+  /querycache2
+  /querycache2?format=json
+  /querycache2?clear=true&format=json
+  """
+  function_name = 'querycache2()'
+  request_data = log_function_header(function_name)
+  request_params = dict(request.query_params)
+
+  endpoint = '/' + function_name.replace('()','')
+  documentation_HTML = f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{endpoint} - Documentation</title></head><body><pre>{querycache2.__doc__}</pre></body></html>"
+
+  # Display documentation if no params are provided
+  if len(request_params) == 0:
+    await log_function_footer(request_data)
+    return HTMLResponse(documentation_HTML)
+
+  if request_params.get('clear', 'false').lower() == 'true':
+    cleared = query_result_cache.invalidate()
+    log_function_output(request_data, f"Cleared {cleared} cached search results")
+  stats = query_result_cache.get_stats()
+  await log_function_footer(request_data)
+
+  if request_params.get('format', 'html') == 'json':
+    return JSONResponse(content={'data': stats}, status_code=200)
+  table_html = convert_to_nested_html_table(stats)
+  return HTMLResponse(f"""<!DOCTYPE html>
+<html><head><meta charset='utf-8'><title>SharePoint Search Query Cache</title>
+  <link rel='stylesheet' href='/html_javascript_static_files/css/styles.css'>
+  <script src='/html_javascript_static_files/js/htmx.js'></script>
+</head><body>{table_html}</body></html>""")
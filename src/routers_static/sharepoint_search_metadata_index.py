@@ -0,0 +1,419 @@
+# SharePoint Search Metadata Index - file metadata of all domains (files_metadata.json) by openai_file_id for /query and /query2
+# Loaded once at startup, then kept current without restart (e.g. after a V2 crawl):
+#   - domain folders are checked for changed domain.json / files_metadata.json (mtime + size) on inotify events (Linux,
+#     see common_inotify_watcher_v2) and every SEARCH_METADATA_RELOAD_CHECK_SECONDS (other OS, network shares)
+#   - only changed files are read again, unchanged domains keep their entries
+#   - the new state is swapped in with one assignment: queries never wait for a reload and never see a partial reload
+#   - reload listeners get the vector store ids of changed domains (e.g. to invalidate the /query result cache)
+# The metadata of each domain is held in a CompactMetadataStore (columns instead of one dict per file).
+
+import asyncio, datetime, json, os, re, threading, time
+from array import array
+from itertools import accumulate
+from dataclasses import dataclass, field
+from operator import itemgetter
+from typing import Any, Iterable, Iterator, Optional
+
+from hardcoded_config import CRAWLER_HARDCODED_CONFIG
+from routers_v1.common_logging_functions_v1 import log_function_footer_sync, log_function_header, log_function_output
+from routers_v1.router_crawler_functions_v1 import convert_file_metadata_item_from_v2_to_v3, is_files_metadata_v2_format
+from routers_v2.common_inotify_watcher_v2 import get_inotify_watcher
+
+_FILE_ENCODINGS = ['utf-8', 'utf-16', 'utf-16-le', 'utf-16-be']
+# Tabs inside JSON string values (e.g. embedded in openai_file_id) make files_metadata.json invalid JSON
+_TAB_IN_JSON_STRING_PATTERN = re.compile(r':\s*"([^"]*)\t([^"]*)"')
+
+
+# ----------------------------------------- START: Compact Metadata Store ---------------------------------------------
+
+_MISSING = object()  # Field not set for this file
+_INT64_MIN, _INT64_MAX = -2**63, 2**63 - 1
+_INTERNABLE_TYPES = {str, type(None), type(_MISSING)}  # Not numbers: 1, 1.0 and True are the same dict key
+
+class CompactMetadataStore:
+  """
+  Read-only file metadata of one domain by openai_file_id, stored as one column per field instead of one dict per file:
+    - a string that occurs several times in a column (file_type, source_id, embedded_utc, ...) is stored once
+    - columns of mostly distinct strings (url, file_relative_path, ...) are one UTF-8 buffer with offsets
+    - integer columns (file_size, sharepoint_listitem_id, ...) are int64 arrays
+  get() builds a new dict of the fields set for the file, in the order of first appearance in files_metadata.json.
+
+  Usage:
+    store = CompactMetadataStore(files_metadata)   # list of V3 format dicts, the last entry of a file_id wins
+    metadata = store.get(file_id)
+  """
+  __slots__ = ("_rows", "_names", "_columns", "_sparse")
+
+  def __init__(self, entries: Iterable[dict] = ()):
+    rows: dict[str, int] = {}
+    records: list[tuple[tuple, tuple]] = []   # (field names, values) per row
+    shapes: dict[tuple, tuple] = {}           # field names of the entries, shared
+    first_keys, uniform = None, True
+    for entry in entries:
+      file_id = entry.get('openai_file_id', '').strip()
+      if not file_id: continue
+      keys = tuple(entry)
+      if keys == first_keys: keys = first_keys  # One tuple of field names for all files
+      else:
+        if first_keys is None: first_keys = keys
+        else: uniform = False
+        keys = shapes.setdefault(keys, keys)
+      record = (keys, tuple(entry.values()))
+      row = rows.get(file_id)
+      if row is None:
+        rows[file_id] = len(records)
+        records.append(record)
+      else: records[row] = record
+    names = list(dict.fromkeys(name for keys in shapes for name in keys))
+    if uniform:
+      # All files have the same fields in the same order (files_metadata.json written by the crawler)
+      columns = list(zip(*(values for _, values in records))) or [()] * len(names)
+      sparse = False
+    else:
+      positions = {name: i for i, name in enumerate(names)}
+      columns = [[_MISSING] * len(records) for _ in names]
+      for row, (keys, values) in enumerate(records):
+        for name, value in zip(keys, values): columns[positions[name]][row] = value
+      sparse = True
+    self._rows = rows
+    self._names = tuple(names)
+    self._columns = tuple(_compact_column(column) for column in columns)
+    self._sparse = sparse
+
+  def __len__(self) -> int:
+    return len(self._rows)
+
+  def __contains__(self, file_id: str) -> bool:
+    return file_id in self._rows
+
+  def get(self, file_id: str, default: Any = None) -> Any:
+    row = self._rows.get(file_id)
+    if row is None: return default
+    values = map(itemgetter(row), self._columns)
+    if not self._sparse: return dict(zip(self._names, values))
+    return {name: value for name, value in zip(self._names, values) if value is not _MISSING}
+
+  def items(self) -> Iterator[tuple[str, dict]]:
+    for file_id in self._rows: yield file_id, self.get(file_id)
+
+class _PackedStrings:
+  """Column of mostly distinct strings (urls, paths) in one UTF-8 buffer with offsets: no object per string."""
+  __slots__ = ("_data", "_offsets")
+
+  def __init__(self, values):
+    joined = "".join(values)
+    if joined.isascii(): encoded, data = values, joined.encode('ascii')  # Byte length = string length
+    else:
+      encoded = [value.encode('utf-8', 'surrogatepass') for value in values]
+      data = b"".join(encoded)
+    self._offsets = array('q', accumulate(map(len, encoded), initial=0))
+    self._data = data
+
+  def __getitem__(self, row: int) -> str:
+    return str(self._data[self._offsets[row]:self._offsets[row + 1]], 'utf-8', 'surrogatepass')
+
+def _compact_column(column) -> tuple | array | _PackedStrings:
+  """
+  int64 array if every file has an integer in this field. String columns: mostly distinct values packed in one buffer,
+  else a tuple with one object per distinct value. Other columns (missing fields, lists, ...) as tuple.
+  """
+  types = set(map(type, column))
+  if types == {int} and _INT64_MIN <= min(column) and max(column) <= _INT64_MAX: return array('q', column)
+  if types <= _INTERNABLE_TYPES:
+    distinct = {}
+    column = tuple(map(distinct.setdefault, column, column))
+    if types == {str} and len(distinct) > len(column) // 2: return _PackedStrings(column)
+    return column
+  return tuple(column)
+
+# ----------------------------------------- END: Compact Metadata Store -----------------------------------------------
+
+
+# ----------------------------------------- START: Domain Loading -----------------------------------------------------
+
+@dataclass(frozen=True)
+class _DomainState:
+  folder_name: str
+  domain_signature: Optional[tuple]      # (mtime_ns, size) of domain.json, None if missing
+  metadata_signature: Optional[tuple]    # (mtime_ns, size) of files_metadata.json, None if missing
+  domain: Optional[dict]                 # {"name", "description"} for /describe, None for the global vector store domain
+  vector_store_id: Optional[str]         # From domain.json, None if missing or invalid
+  entries: CompactMetadataStore          # openai_file_id -> file metadata (V3 format)
+  domain_error: Optional[str] = None
+  metadata_error: Optional[str] = None
+
+def _get_file_signature(path: str) -> Optional[tuple]:
+  try: stat = os.stat(path)
+  except OSError: return None
+  return (stat.st_mtime_ns, stat.st_size)
+
+def _read_text_file(path: str, file_label: str, folder_name: str) -> str:
+  """File content in the first encoding that works. Raises ValueError with the error message for unsupported or empty files."""
+  for encoding in _FILE_ENCODINGS:
+    try:
+      with open(path, 'r', encoding=encoding) as f: content = f.read()
+      break
+    except (UnicodeDecodeError, UnicodeError): continue
+  else: raise ValueError(f"{file_label} for {folder_name} has unsupported encoding")
+  if not content.strip(): raise ValueError(f"{file_label} for {folder_name} is empty (file size: {os.path.getsize(path)} bytes)")
+  return content
+
+def _load_domain_json(path: str, folder_name: str, global_vector_store_id: str, log) -> tuple[Optional[dict], Optional[str]]:
+  """(domain entry for /describe, vector store id) from domain.json, domain entry None for the global vector store domain. Raises ValueError on errors."""
+  file_label = CRAWLER_HARDCODED_CONFIG.DOMAIN_JSON
+  content = _read_text_file(path, file_label, folder_name)
+  try: domain_data = json.loads(content)
+  except json.JSONDecodeError as e: raise ValueError(f"Invalid JSON in {file_label} for {folder_name}: {str(e)} (file size: {os.path.getsize(path)} bytes, first 100 chars: {content[:100]!r})")
+  if domain_data.get('vector_store_id') == global_vector_store_id:
+    log(f"Skipping global vector store domain: {folder_name}")
+    return None, global_vector_store_id
+  domain = {"name": domain_data.get('name', folder_name), "description": domain_data.get('description', '')}
+  log(f"Added domain: {domain['name']}")
+  return domain, domain_data.get('vector_store_id')
+
+def _load_files_metadata_json(path: str, folder_name: str, log) -> CompactMetadataStore:
+  """openai_file_id -> file metadata (V3 format) from files_metadata.json. Raises ValueError on errors."""
+  file_label = CRAWLER_HARDCODED_CONFIG.FILES_METADATA_JSON
+  content = _TAB_IN_JSON_STRING_PATTERN.sub(r': "\1\2"', _read_text_file(path, file_label, folder_name))
+  try: files_metadata = json.loads(content)
+  except json.JSONDecodeError as e: raise ValueError(f"Invalid JSON in {file_label} for {folder_name}: {str(e)} (file size: {os.path.getsize(path)} bytes, first 100 chars: {content[:100]!r})")
+  if not files_metadata:
+    log(f"No file metadata entries found in {folder_name}")
+    return CompactMetadataStore()
+  if is_files_metadata_v2_format(files_metadata[0]):
+    log(f"Detected V2 format for {folder_name}, converting to V3...")
+    files_metadata = [convert_file_metadata_item_from_v2_to_v3(item) for item in files_metadata]
+  entries = CompactMetadataStore(files_metadata)
+  log(f"Added {len(entries)} file metadata entries from {folder_name}")
+  return entries
+
+def _load_domain_state(domain_folder_path: str, previous: Optional[_DomainState], global_vector_store_id: str, log) -> _DomainState:
+  """Read the changed files of a domain folder. Keeps what was loaded from a file that can not be read now (e.g. invalid JSON)."""
+  folder_name = os.path.basename(domain_folder_path)
+  domain_json_path = os.path.join(domain_folder_path, CRAWLER_HARDCODED_CONFIG.DOMAIN_JSON)
+  files_metadata_json_path = os.path.join(domain_folder_path, CRAWLER_HARDCODED_CONFIG.FILES_METADATA_JSON)
+  domain_signature, metadata_signature = _get_file_signature(domain_json_path), _get_file_signature(files_metadata_json_path)
+  domain, vector_store_id, domain_error = (previous.domain, previous.vector_store_id, previous.domain_error) if previous else (None, None, None)
+  entries, metadata_error = (previous.entries, previous.metadata_error) if previous else (CompactMetadataStore(), None)
+  if previous is None or domain_signature != previous.domain_signature:
+    domain_error = None
+    if domain_signature is None: domain, vector_store_id = None, None
+    else:
+      try: domain, vector_store_id = _load_domain_json(domain_json_path, folder_name, global_vector_store_id, log)
+      except ValueError as e: domain_error = str(e)
+      except Exception as e: domain_error = f"Failed to load {CRAWLER_HARDCODED_CONFIG.DOMAIN_JSON} for {folder_name}: {str(e)}"
+      if domain_error: log(f"ERROR: {domain_error}")
+  if previous is None or metadata_signature != previous.metadata_signature:
+    metadata_error = None
+    if metadata_signature is None: entries = CompactMetadataStore()
+    else:
+      try: entries = _load_files_metadata_json(files_metadata_json_path, folder_name, log)
+      except ValueError as e: metadata_error = str(e)
+      except Exception as e: metadata_error = f"Failed to load {CRAWLER_HARDCODED_CONFIG.FILES_METADATA_JSON} for {folder_name}: {str(e)}"
+      if metadata_error: log(f"ERROR: {metadata_error}")
+  return _DomainState(folder_name, domain_signature, metadata_signature, domain, vector_store_id, entries, domain_error, metadata_error)
+
+# ----------------------------------------- END: Domain Loading -------------------------------------------------------
+
+
+# ----------------------------------------- START: SearchMetadataIndex Class ------------------------------------------
+
+@dataclass(frozen=True)
+class _Snapshot:
+  states: tuple = ()                     # _DomainState per domain folder, sorted by folder name
+  entry_maps: tuple = ()                 # entries of the domain folders, last folder first (a later folder wins)
+  domains: list = field(default_factory=list)
+  entry_count: int = 0
+  folder_error: Optional[str] = None
+
+class SearchMetadataIndex:
+  """
+  File metadata by openai_file_id and domains for /describe. Lookups read the current snapshot without locking.
+
+  Usage:
+    index = SearchMetadataIndex(domains_folder_path, global_vector_store_id)
+    index.reload(log_data)                # blocking, first load
+    index.start_watching()                # in the running event loop
+    index.add_reload_listener(callback)   # callback(vector_store_ids) after changed domains were swapped in
+    metadata = index.get(file_id)
+  """
+
+  def __init__(self, domains_folder_path: str, global_vector_store_id: Optional[str] = None):
+    self.domains_folder_path = domains_folder_path
+    self.global_vector_store_id = global_vector_store_id
+    self._snapshot = _Snapshot()
+    self._reload_lock = threading.Lock()
+    self._stats = {"checks": 0, "reloads": 0, "domains_reloaded": 0, "last_check_utc": None, "last_reload_utc": None, "last_reload_secs": None, "last_reloaded_domains": []}
+    self._watch_loop: Optional[asyncio.AbstractEventLoop] = None
+    self._watcher = None
+    self._watched_folders: set[str] = set()
+    self._changed: Optional[asyncio.Event] = None
+    self._reload_listeners: list = []
+
+  def get(self, file_id: str, default: Any = None) -> Any:
+    """New dict with the metadata of the file (the caller may change it), default if no domain has the file."""
+    for entries in self._snapshot.entry_maps:
+      metadata = entries.get(file_id)
+      if metadata is not None: return metadata
+    return default
+
+  def __contains__(self, file_id: str) -> bool:
+    return any(file_id in entries for entries in self._snapshot.entry_maps)
+
+  def __len__(self) -> int:
+    return self._snapshot.entry_count
+
+  @property
+  def domains(self) -> list:
+    return self._snapshot.domains
+
+  @property
+  def errors(self) -> list[str]:
+    """Errors of the domain files currently in the index (entries of a file that failed to reload are kept)."""
+    snapshot = self._snapshot
+    errors = [snapshot.folder_error] if snapshot.folder_error else []
+    return errors + [error for state in snapshot.states for error in (state.domain_error, state.metadata_error) if error]
+
+  def reload(self, log_data: Optional[dict] = None) -> list[str]:
+    """
+    Read changed domain folders and swap in the new snapshot. Blocking, run in a thread.
+    Logs to log_data if given, else only if something changed. Returns the folder names of the reloaded domains.
+    Reload listeners are called with the vector store ids of the reloaded and removed domains (None = unknown, all).
+    """
+    with self._reload_lock:
+      start_time = time.perf_counter()
+      messages, folder_error = [], None
+      previous_snapshot = self._snapshot
+      previous_states = {state.folder_name: state for state in previous_snapshot.states}
+      try: folder_names = sorted(entry.name for entry in os.scandir(self.domains_folder_path) if entry.is_dir())
+      except FileNotFoundError: folder_names, folder_error = [], f"Domains folder not found: {self.domains_folder_path}"
+      except OSError as e: folder_names, folder_error = list(previous_states), f"Failed to list domains folder: {str(e)}"
+      if folder_error: messages.append(f"ERROR: {folder_error}")
+      states, reloaded = [], []
+      for folder_name in folder_names:
+        if folder_name.startswith('_'): continue
+        domain_folder_path = os.path.join(self.domains_folder_path, folder_name)
+        previous = previous_states.get(folder_name)
+        if previous and previous.domain_signature == _get_file_signature(os.path.join(domain_folder_path, CRAWLER_HARDCODED_CONFIG.DOMAIN_JSON)) and previous.metadata_signature == _get_file_signature(os.path.join(domain_folder_path, CRAWLER_HARDCODED_CONFIG.FILES_METADATA_JSON)):
+          states.append(previous)
+          continue
+        messages.append(f"Processing domain folder: {folder_name}")
+        states.append(_load_domain_state(domain_folder_path, previous, self.global_vector_store_id, messages.append))
+        reloaded.append(folder_name)
+      removed = [name for name in previous_states if name not in folder_names]
+      for name in removed: messages.append(f"Removed domain folder: {name}")
+      now_utc = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+      self._stats["checks"] += 1
+      self._stats["last_check_utc"] = now_utc
+      if reloaded or removed or folder_error != previous_snapshot.folder_error or not self._stats["reloads"]:
+        self._snapshot = self._build_snapshot(states, folder_error)
+        self._stats["reloads"] += 1
+        self._stats["domains_reloaded"] += len(reloaded)
+        self._stats["last_reload_utc"] = now_utc
+        self._stats["last_reload_secs"] = round(time.perf_counter() - start_time, 3)
+        self._stats["last_reloaded_domains"] = reloaded + removed
+        messages.append(f"Total domains loaded: {len(self._snapshot.domains)}, Total metadata entries: {self._snapshot.entry_count} ({len(reloaded)} domain folders read, {len(removed)} removed in {self._stats['last_reload_secs']} secs)")
+      changed_vector_store_ids = self._get_changed_vector_store_ids(previous_states, states, reloaded + removed)
+    if reloaded or removed:
+      for listener in self._reload_listeners:
+        try: listener(changed_vector_store_ids)
+        except Exception as e: messages.append(f"ERROR: Reload listener failed: {str(e)}")
+    if log_data is not None:
+      for message in messages: log_function_output(log_data, message)
+    elif reloaded or removed:
+      reload_log_data = log_function_header("SearchMetadataIndex.reload")
+      for message in messages: log_function_output(reload_log_data, message)
+      log_function_footer_sync(reload_log_data)
+    return reloaded + removed
+
+  def add_reload_listener(self, listener) -> None:
+    """Call listener(vector_store_ids) after reload() swapped in changed domains. Called in the reloading thread."""
+    self._reload_listeners.append(listener)
+
+  def _get_changed_vector_store_ids(self, previous_states: dict, states: list[_DomainState], folder_names: list[str]) -> Optional[set[str]]:
+    """Vector stores of the changed domain folders (before and after) and the global vector store (replicated from all domains). None if unknown."""
+    current_states = {state.folder_name: state for state in states}
+    vector_store_ids = {self.global_vector_store_id} if self.global_vector_store_id else set()
+    for folder_name in folder_names:
+      for state in (previous_states.get(folder_name), current_states.get(folder_name)):
+        if state is None: continue
+        if state.vector_store_id is None: return None
+        vector_store_ids.add(state.vector_store_id)
+    return vector_store_ids
+
+  def _build_snapshot(self, states: list[_DomainState], folder_error: Optional[str]) -> _Snapshot:
+    domains = []
+    for state in states:
+      if state.domain is None: continue
+      # Same domain name in several folders: the last folder wins
+      domains[:] = [d for d in domains if d['name'] != state.domain['name']]
+      domains.append(state.domain)
+    entry_maps = tuple(state.entries for state in reversed(states) if state.entries)
+    return _Snapshot(tuple(states), entry_maps, domains, sum(len(entries) for entries in entry_maps), folder_error)
+
+  def get_stats(self) -> dict:
+    """Size of the index, reload counters and errors of the current domain files."""
+    snapshot = self._snapshot
+    return {
+      "domains": len(snapshot.domains),
+      "domain_folders": len(snapshot.states),
+      "entries": snapshot.entry_count,
+      "watching": None if self._watch_loop is None else ("inotify" if self._watcher else "polling"),
+      "check_interval_secs": CRAWLER_HARDCODED_CONFIG.SEARCH_METADATA_RELOAD_CHECK_SECONDS,
+      **self._stats,
+      "last_reloaded_domains": list(self._stats["last_reloaded_domains"]),
+      "errors": self.errors
+    }
+
+  # ---------------------------------------- Watching ----------------------------------------
+
+  def start_watching(self) -> None:
+    """Reload changed domains in the background of the running event loop (once per event loop)."""
+    loop = asyncio.get_running_loop()
+    if self._watch_loop is loop: return
+    self._watch_loop = loop
+    self._changed = asyncio.Event()
+    self._watcher = get_inotify_watcher()
+    self._watched_folders = set()
+    self._update_folder_watches()
+    loop.create_task(self._watch())
+
+  def _on_domains_folder_event(self, name: Optional[str]) -> None:
+    if name is None or not name.startswith('_'): self._changed.set()
+
+  def _on_domain_folder_event(self, name: Optional[str]) -> None:
+    if name is None or name in (CRAWLER_HARDCODED_CONFIG.FILES_METADATA_JSON, CRAWLER_HARDCODED_CONFIG.DOMAIN_JSON): self._changed.set()
+
+  def _update_folder_watches(self) -> None:
+    """Watch the domains folder and every domain folder of the current snapshot."""
+    if self._watcher is None: return
+    folders = {self.domains_folder_path: self._on_domains_folder_event}
+    for state in self._snapshot.states: folders[os.path.join(self.domains_folder_path, state.folder_name)] = self._on_domain_folder_event
+    for folder in self._watched_folders - set(folders):
+      self._watcher.remove(folder, self._on_domain_folder_event)
+    for folder, callback in folders.items():
+      if folder in self._watched_folders: continue
+      try: self._watcher.add(folder, callback)
+      except OSError: continue  # Missing folder, next reload
+      self._watched_folders.add(folder)
+    self._watched_folders &= set(folders)
+
+  async def _watch(self) -> None:
+    while True:
+      try: await asyncio.wait_for(self._changed.wait(), CRAWLER_HARDCODED_CONFIG.SEARCH_METADATA_RELOAD_CHECK_SECONDS)
+      except asyncio.TimeoutError: pass
+      self._changed.clear()
+      try: await asyncio.to_thread(self.reload)
+      except Exception as e: self._log_watch_error(f"Reload failed, next check in {CRAWLER_HARDCODED_CONFIG.SEARCH_METADATA_RELOAD_CHECK_SECONDS} secs", e)
+      try: self._update_folder_watches()
+      except Exception as e:
+        # Poll every SEARCH_METADATA_RELOAD_CHECK_SECONDS from now on. Events of watches already added only trigger extra checks.
+        self._watcher = None
+        self._log_watch_error("Updating inotify watches failed, falling back to polling", e)
+
+  def _log_watch_error(self, message: str, e: Exception) -> None:
+    log_data = log_function_header("SearchMetadataIndex._watch")
+    log_function_output(log_data, f"ERROR: {message} -> {type(e).__name__}: {str(e)}")
+    log_function_footer_sync(log_data)
+
+# ----------------------------------------- END: SearchMetadataIndex Class --------------------------------------------
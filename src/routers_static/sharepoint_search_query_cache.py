@@ -0,0 +1,121 @@
+# SharePoint Search Query Cache - reuses search results of /query and /query2 for repeated questions
+# - LRU + TTL: at most SEARCH_QUERY_CACHE_MAX_ENTRIES results, each reused for SEARCH_QUERY_CACHE_TTL_SECONDS
+# - Key: normalized query (Unicode NFKC, case, whitespace, trailing punctuation), vector store id, max results, filters
+#   and the settings that change the answer (service type, model, instructions)
+# - Concurrent identical queries share one upstream call (responses.create / vector_stores.search)
+# - Invalidated per vector store when the metadata index reloads a domain (crawl changed files_metadata.json)
+# Failed upstream calls are not cached. One cache per app worker process.
+
+import asyncio, json, re, threading, time, unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+_TRAILING_PUNCTUATION = " ?!.,;:"
+
+def normalize_query(query: str) -> str:
+  """'  What is  HMS? ' and 'what is hms' -> 'what is hms'."""
+  return _WHITESPACE_PATTERN.sub(' ', unicodedata.normalize('NFKC', query).casefold()).strip(_TRAILING_PUNCTUATION)
+
+def get_query_cache_key(query: str, vector_store_id: str, max_num_results: int, filters: Optional[dict] = None, *settings: Any) -> tuple:
+  return (normalize_query(query), vector_store_id, max_num_results, json.dumps(filters, sort_keys=True) if filters else None, *settings)
+
+
+# ----------------------------------------- START: QueryResultCache Class ---------------------------------------------
+
+class QueryResultCache:
+  """
+  Search results by query cache key. Lookups and fetches run in the event loop, invalidate() may be called from any thread.
+
+  Usage:
+    cache = QueryResultCache(max_entries, ttl_seconds)
+    result, cache_status = await cache.get_or_fetch(key, vector_store_id, fetch)     # cache_status: "hit", "shared" or "miss"
+    cache.invalidate([vector_store_id])
+  """
+
+  def __init__(self, max_entries: int, ttl_seconds: float):
+    self.max_entries = max_entries
+    self.ttl_seconds = ttl_seconds
+    self._entries: OrderedDict[tuple, tuple] = OrderedDict()   # key -> (expires, vector_store_id, result), least recently used first
+    self._in_flight: dict[tuple, asyncio.Task] = {}
+    self._generations: dict[str, int] = {}                     # vector_store_id -> number of invalidations
+    self._generation = 0                                       # number of invalidations of all vector stores
+    self._lock = threading.Lock()
+    self._stats = {"hits": 0, "misses": 0, "shared": 0, "errors": 0, "evictions": 0, "expirations": 0, "invalidations": 0, "entries_invalidated": 0}
+
+  @property
+  def enabled(self) -> bool:
+    return self.max_entries > 0 and self.ttl_seconds > 0
+
+  async def get_or_fetch(self, key: tuple, vector_store_id: str, fetch: Callable[[], Awaitable[Any]]) -> tuple[Any, str]:
+    """Cached result for key, else the result of fetch() (one call for concurrent identical keys). Returns (result, cache status)."""
+    if not self.enabled:
+      self._stats["misses"] += 1
+      return await fetch(), "miss"
+    with self._lock:
+      cached = self._entries.get(key)
+      if cached is not None:
+        if cached[0] > time.monotonic():
+          self._entries.move_to_end(key)
+          self._stats["hits"] += 1
+          return cached[2], "hit"
+        del self._entries[key]
+        self._stats["expirations"] += 1
+    task = self._in_flight.get(key)
+    if task is not None:
+      self._stats["shared"] += 1
+      return await asyncio.shield(task), "shared"
+    self._stats["misses"] += 1
+    # Own task: the upstream call continues for the other waiters if this request is cancelled
+    task = asyncio.ensure_future(self._fetch(key, vector_store_id, fetch, self._get_generation(vector_store_id)))
+    self._in_flight[key] = task
+    return await asyncio.shield(task), "miss"
+
+  async def _fetch(self, key: tuple, vector_store_id: str, fetch: Callable[[], Awaitable[Any]], generation: int) -> Any:
+    try: result = await fetch()
+    except BaseException:
+      self._stats["errors"] += 1
+      raise
+    finally: self._in_flight.pop(key, None)
+    with self._lock:
+      # Invalidated while fetching: the result may be from before the crawl
+      if self._generation + self._generations.get(vector_store_id, 0) != generation: return result
+      self._entries[key] = (time.monotonic() + self.ttl_seconds, vector_store_id, result)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+        self._stats["evictions"] += 1
+    return result
+
+  def _get_generation(self, vector_store_id: str) -> int:
+    with self._lock: return self._generation + self._generations.get(vector_store_id, 0)
+
+  def invalidate(self, vector_store_ids: Optional[Iterable[str]] = None) -> int:
+    """Drop the cached results of the vector stores (None = all). In-flight fetches are not cached. Returns the number of dropped results."""
+    with self._lock:
+      if vector_store_ids is None:
+        self._generation += 1
+        keys = list(self._entries)
+      else:
+        vector_store_ids = set(vector_store_ids)
+        for vector_store_id in vector_store_ids: self._generations[vector_store_id] = self._generations.get(vector_store_id, 0) + 1
+        keys = [key for key, (_, vector_store_id, _) in self._entries.items() if vector_store_id in vector_store_ids]
+      for key in keys: del self._entries[key]
+      self._stats["invalidations"] += 1
+      self._stats["entries_invalidated"] += len(keys)
+    return len(keys)
+
+  def get_stats(self) -> dict:
+    """Settings, size and hit/miss counters."""
+    lookups = self._stats["hits"] + self._stats["shared"] + self._stats["misses"]
+    return {
+      "enabled": self.enabled,
+      "max_entries": self.max_entries,
+      "ttl_secs": self.ttl_seconds,
+      "entries": len(self._entries),
+      "in_flight": len(self._in_flight),
+      **self._stats,
+      "hit_ratio": round((self._stats["hits"] + self._stats["shared"]) / lookups, 3) if lookups else None
+    }
+
+# ----------------------------------------- END: QueryResultCache Class -----------------------------------------------
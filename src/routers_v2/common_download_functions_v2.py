@@ -0,0 +1,119 @@
+# Common Download Functions V2 - Bounded-parallel SharePoint file downloads
+# Used by crawler.py step_download_source; downloads stream through the pooled SharePointRestClient connections
+
+import asyncio, datetime
+from dataclasses import dataclass
+from typing import AsyncGenerator, Optional
+
+from hardcoded_config import CRAWLER_HARDCODED_CONFIG
+from routers_v2.common_job_functions_v2 import ControlAction
+from routers_v2.common_map_file_functions_v2 import SharePointMapRow
+from routers_v2.common_sharepoint_client_v2 import SharePointRestClient, download_file_from_sharepoint_async
+
+
+# ----------------------------------------- START: Dataclasses --------------------------------------------------------
+
+@dataclass
+class DownloadTask:
+  """Single file to download. index = position in the to_download list (used to keep files_map.csv rows in order)."""
+  index: int
+  sp_item: SharePointMapRow
+  target_path: str
+  file_relative_path: str
+
+@dataclass
+class DownloadOutcome:
+  """Result of a DownloadTask. downloaded_utc is taken when the worker starts the download."""
+  task: DownloadTask
+  success: bool
+  error: str
+  downloaded_utc: str
+  downloaded_timestamp: int
+
+# ----------------------------------------- END: Dataclasses ----------------------------------------------------------
+
+
+# ----------------------------------------- START: Limits -------------------------------------------------------------
+
+# Shared across all jobs in this worker process: one global semaphore and one semaphore per crawler domain.
+# Semaphores are bound to the event loop that first uses them, so they are recreated if the loop changes (e.g. scripts calling asyncio.run() repeatedly).
+_semaphores_loop = None
+_global_download_semaphore: Optional[asyncio.Semaphore] = None
+_domain_download_semaphores: dict[str, asyncio.Semaphore] = {}
+
+def _get_download_semaphores(domain_id: str) -> tuple[asyncio.Semaphore, asyncio.Semaphore]:
+  """Return (global_semaphore, domain_semaphore) for the running event loop."""
+  global _semaphores_loop, _global_download_semaphore, _domain_download_semaphores
+  loop = asyncio.get_running_loop()
+  if _semaphores_loop is not loop:
+    _semaphores_loop = loop
+    _global_download_semaphore = asyncio.Semaphore(max(1, CRAWLER_HARDCODED_CONFIG.CRAWLER_MAX_PARALLEL_DOWNLOADS_GLOBAL))
+    _domain_download_semaphores = {}
+  if domain_id not in _domain_download_semaphores:
+    _domain_download_semaphores[domain_id] = asyncio.Semaphore(max(1, CRAWLER_HARDCODED_CONFIG.CRAWLER_MAX_PARALLEL_DOWNLOADS_PER_DOMAIN))
+  return _global_download_semaphore, _domain_download_semaphores[domain_id]
+
+def get_max_parallel_downloads(requested: Optional[int] = None) -> int:
+  """Clamp requested worker count to [1, CRAWLER_MAX_PARALLEL_DOWNLOADS_PER_DOMAIN]. None = use per-domain limit."""
+  limit = max(1, CRAWLER_HARDCODED_CONFIG.CRAWLER_MAX_PARALLEL_DOWNLOADS_PER_DOMAIN)
+  if not requested: return limit
+  return max(1, min(int(requested), limit))
+
+# ----------------------------------------- END: Limits ---------------------------------------------------------------
+
+
+# ----------------------------------------- START: Parallel Download --------------------------------------------------
+
+async def _run_download_task(sp_client: SharePointRestClient, task: DownloadTask, domain_id: str, dry_run: bool) -> DownloadOutcome:
+  global_semaphore, domain_semaphore = _get_download_semaphores(domain_id)
+  async with domain_semaphore:
+    async with global_semaphore:
+      now = datetime.datetime.now(datetime.timezone.utc)
+      utc_now, ts_now = now.strftime('%Y-%m-%dT%H:%M:%S.%fZ'), int(now.timestamp())
+      success, error = await download_file_from_sharepoint_async(sp_client, task.sp_item.server_relative_url, task.target_path, True, task.sp_item.last_modified_timestamp, dry_run, task.sp_item.file_size)
+      return DownloadOutcome(task=task, success=success, error=error, downloaded_utc=utc_now, downloaded_timestamp=ts_now)
+
+class ParallelDownloader:
+  """
+  Downloads DownloadTasks with bounded concurrency on the event loop. Each download streams over the shared
+  SharePointRestClient connection pool; concurrency is limited per step (max_workers), per crawler domain and globally (CRAWLER_HARDCODED_CONFIG).
+
+  Pause/cancel: writer.check_control() runs before each new task is submitted. While paused, in-flight downloads
+  finish in the background. On cancel, no new tasks are submitted and in-flight downloads are awaited,
+  so every submitted task yields exactly one outcome and submitted indices are always 0..n-1 without gaps.
+
+  Usage:
+    downloader = ParallelDownloader(sp_client, domain_id, max_workers=4, dry_run=False)
+    async for outcome in downloader.run(tasks, writer):
+      ...
+    if downloader.cancelled: ...
+  """
+
+  def __init__(self, sp_client: SharePointRestClient, domain_id: str, max_workers: int, dry_run: bool = False):
+    self._sp_client = sp_client
+    self._domain_id = domain_id
+    self._max_workers = max(1, max_workers)
+    self._dry_run = dry_run
+    self.cancelled = False
+
+  async def run(self, tasks: list[DownloadTask], writer) -> AsyncGenerator[DownloadOutcome, None]:
+    """Async generator yielding DownloadOutcome in completion order."""
+    in_flight = set()
+    next_index = 0
+    try:
+      while next_index < len(tasks) or in_flight:
+        while not self.cancelled and next_index < len(tasks) and len(in_flight) < self._max_workers:
+          if writer is not None:
+            async for control in writer.check_control():
+              if control == ControlAction.CANCEL: self.cancelled = True
+            if self.cancelled: break
+          in_flight.add(asyncio.ensure_future(_run_download_task(self._sp_client, tasks[next_index], self._domain_id, self._dry_run)))
+          next_index += 1
+        if not in_flight: break
+        done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        for future in done: yield future.result()
+    finally:
+      # Generator closed early (client disconnect): cancel running downloads (.partial files are removed by download_file_from_sharepoint_async)
+      for future in in_flight: future.cancel()
+
+# ----------------------------------------- END: Parallel Download ----------------------------------------------------
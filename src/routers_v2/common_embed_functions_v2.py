@@ -1,9 +1,12 @@
 # Common Embed Functions V2 - OpenAI file upload and vector store operations
 # Used by crawler.py for embedding files into vector stores
 
-import asyncio, time
-from typing import Optional
+import asyncio, datetime, time
+from dataclasses import dataclass
+from typing import AsyncGenerator, Optional
 
+from hardcoded_config import CRAWLER_HARDCODED_CONFIG
+from routers_v2.common_job_functions_v2 import ControlAction
 from routers_v2.common_logging_functions_v2 import MiddlewareLogger, UNKNOWN
 
 
@@ -230,3 +233,303 @@ async def remove_and_delete_file(client, vector_store_id: str, file_id: str, log
   return True, ""
 
 # ----------------------------------------- END: Batch Operations -----------------------------------------------------
+
+
+# ----------------------------------------- START: Rate Limit Backoff -------------------------------------------------
+
+def _is_rate_limit_error(e: Exception) -> bool:
+  return getattr(e, 'status_code', None) == 429
+
+def _get_retry_after_seconds(e: Exception) -> Optional[float]:
+  """Read retry-after-ms / retry-after headers from an OpenAI APIStatusError. None if missing or not numeric."""
+  headers = getattr(getattr(e, 'response', None), 'headers', None)
+  if not headers: return None
+  try:
+    if headers.get('retry-after-ms'): return float(headers.get('retry-after-ms')) / 1000.0
+    if headers.get('retry-after'): return float(headers.get('retry-after'))
+  except (TypeError, ValueError): pass
+  return None
+
+class RateLimitBackoff:
+  """
+  Shared backoff gate for concurrent OpenAI calls. When any call gets HTTP 429, all calls going through
+  this gate wait until the retry-after time (or exponential backoff) has passed, then the failed call is retried.
+  Non-429 errors are raised immediately. After max_retries 429s for the same call, the error is raised.
+
+  Usage:
+    backoff = RateLimitBackoff()
+    file_obj = await backoff.call(client.files.create, file=f, purpose="assistants")
+  """
+
+  def __init__(self, max_retries: Optional[int] = None, base_delay_seconds: float = 1.0, max_delay_seconds: float = 60.0):
+    self._max_retries = CRAWLER_HARDCODED_CONFIG.CRAWLER_EMBED_RATE_LIMIT_MAX_RETRIES if max_retries is None else max_retries
+    self._base_delay_seconds = base_delay_seconds
+    self._max_delay_seconds = max_delay_seconds
+    self._resume_at = 0.0
+    self.rate_limit_hits = 0
+
+  async def call(self, func, *args, **kwargs):
+    attempt = 0
+    while True:
+      wait_seconds = self._resume_at - time.monotonic()
+      if wait_seconds > 0: await asyncio.sleep(wait_seconds)
+      try:
+        return await func(*args, **kwargs)
+      except Exception as e:
+        if not _is_rate_limit_error(e) or attempt >= self._max_retries: raise
+        self.rate_limit_hits += 1
+        delay = _get_retry_after_seconds(e)
+        if delay is None: delay = self._base_delay_seconds * (2 ** attempt)
+        self._resume_at = max(self._resume_at, time.monotonic() + min(delay, self._max_delay_seconds))
+        attempt += 1
+
+# ----------------------------------------- END: Rate Limit Backoff ---------------------------------------------------
+
+
+# ----------------------------------------- START: Embedding Pipeline -------------------------------------------------
+
+@dataclass
+class EmbedTask:
+  """Single file to upload and attach. index = position in the embeddable list, replaces_file_id = previous OpenAI file to remove first."""
+  index: int
+  filepath: str
+  replaces_file_id: str = ""
+
+@dataclass
+class EmbedOutcome:
+  """Result of an EmbedTask. uploaded_utc is taken before the upload, embedded_utc after the file was attached to the vector store."""
+  task: EmbedTask
+  file_id: str
+  error: str
+  uploaded_utc: str
+  uploaded_timestamp: int
+  embedded_utc: str = ""
+  embedded_timestamp: int = 0
+
+@dataclass
+class _PendingAttach:
+  task: EmbedTask
+  file_id: str
+  uploaded_utc: str
+  uploaded_timestamp: int
+
+def _get_utc_now() -> tuple[str, int]:
+  now = datetime.datetime.now(datetime.timezone.utc)
+  return now.strftime('%Y-%m-%dT%H:%M:%S.%fZ'), int(now.timestamp())
+
+async def _iterate_tasks(tasks):
+  if hasattr(tasks, '__aiter__'):
+    async for task in tasks: yield task
+  else:
+    for task in tasks: yield task
+
+class EmbeddingPipeline:
+  """
+  Uploads files to OpenAI and attaches them to a vector store in three bounded stages:
+    1. Upload: max_uploads concurrent uploads (old file versions are removed first)
+    2. Attach: uploaded files are collected into vector store file batches of up to attach_batch_size files.
+       If a batch cannot be created, its files are attached one by one so each file gets its own error.
+    3. Poll: each batch is polled until processing finished. At most max_batches_in_flight batches are processed at once,
+       which throttles the attach stage (and through the attach queue, the upload stage) to what the vector store can ingest.
+  All OpenAI calls go through one RateLimitBackoff gate, so HTTP 429 slows down every stage.
+
+  Outcomes are yielded as soon as a file is attached (same point in time as upload_and_embed_file returns).
+  Files that fail during vector store processing are collected in processing_failed_file_ids after run() completes.
+
+  tasks can be a list or an async iterable (e.g. files queued while they are being downloaded).
+
+  Pause/cancel: writer.check_control() runs before each new task enters the upload stage. On cancel, no new uploads
+  are started and files already uploaded are still attached, so every started task yields exactly one outcome.
+  If the generator is closed early (client disconnect), files that were uploaded but not yet reported are deleted
+  from OpenAI, including uploads that were still in flight, so no orphan files are left behind.
+  Cleanup errors (removing replaced files, deleting orphans, listing failed files) are logged as warnings to logger.
+
+  Usage:
+    pipeline = EmbeddingPipeline(openai_client, vector_store_id, logger=logger)
+    async for outcome in pipeline.run(tasks, writer):
+      ...
+    if pipeline.cancelled: ...
+  """
+
+  def __init__(self, client, vector_store_id: str, max_uploads: Optional[int] = None, attach_batch_size: Optional[int] = None, max_batches_in_flight: Optional[int] = None, poll_interval_seconds: float = 2.0, poll_timeout_seconds: int = 300, attach_linger_seconds: float = 0.5, logger: Optional[MiddlewareLogger] = None):
+    self._client = client
+    self._logger = logger
+    self._vector_store_id = vector_store_id
+    self._max_uploads = max(1, max_uploads or CRAWLER_HARDCODED_CONFIG.CRAWLER_EMBED_MAX_PARALLEL_UPLOADS)
+    self._attach_batch_size = max(1, attach_batch_size or CRAWLER_HARDCODED_CONFIG.CRAWLER_EMBED_ATTACH_BATCH_SIZE)
+    self._max_batches_in_flight = max(1, max_batches_in_flight or CRAWLER_HARDCODED_CONFIG.CRAWLER_EMBED_MAX_BATCHES_IN_FLIGHT)
+    self._poll_interval_seconds = poll_interval_seconds
+    self._poll_timeout_seconds = poll_timeout_seconds
+    self._attach_linger_seconds = attach_linger_seconds
+    self.backoff = RateLimitBackoff()
+    self.cancelled = False
+    self.batches_created = 0
+    self.processing_failed_file_ids: list[str] = []
+    # Uploaded files without a reported outcome yet; deleted again if the pipeline is stopped early
+    self._pending_file_ids: set[str] = set()
+
+  async def run(self, tasks, writer) -> AsyncGenerator[EmbedOutcome, None]:
+    """Async generator yielding EmbedOutcome in completion order."""
+    upload_queue = asyncio.Queue(maxsize=self._max_uploads)
+    attach_queue = asyncio.Queue(maxsize=self._attach_batch_size)
+    outcome_queue = asyncio.Queue()
+    stages = asyncio.ensure_future(self._run_stages(tasks, writer, upload_queue, attach_queue, outcome_queue))
+    try:
+      while True:
+        outcome = await outcome_queue.get()
+        if outcome is None: break
+        yield outcome
+      await stages
+    finally:
+      # Generator closed early (client disconnect): stop all stages and delete files nobody will record
+      if not stages.done():
+        stages.cancel()
+        for file_id in list(self._pending_file_ids): asyncio.ensure_future(self._delete_quietly(file_id))
+        self._pending_file_ids.clear()
+
+  async def _run_stages(self, tasks, writer, upload_queue: asyncio.Queue, attach_queue: asyncio.Queue, outcome_queue: asyncio.Queue) -> None:
+    try:
+      uploaders = [asyncio.ensure_future(self._upload_worker(upload_queue, attach_queue, outcome_queue)) for _ in range(self._max_uploads)]
+      attacher = asyncio.ensure_future(self._attach_worker(attach_queue, outcome_queue))
+      try:
+        await self._feed(tasks, writer, upload_queue)
+        await asyncio.gather(*uploaders)
+        await attach_queue.put(None)
+        await attacher
+      finally:
+        for worker in uploaders + [attacher]:
+          if not worker.done(): worker.cancel()
+    finally:
+      outcome_queue.put_nowait(None)
+
+  async def _feed(self, tasks, writer, upload_queue: asyncio.Queue) -> None:
+    async for task in _iterate_tasks(tasks):
+      if writer is not None:
+        async for control in writer.check_control():
+          if control == ControlAction.CANCEL: self.cancelled = True
+        if self.cancelled: break
+      await upload_queue.put(task)
+    for _ in range(self._max_uploads): await upload_queue.put(None)
+
+  async def _upload_worker(self, upload_queue: asyncio.Queue, attach_queue: asyncio.Queue, outcome_queue: asyncio.Queue) -> None:
+    while True:
+      task = await upload_queue.get()
+      if task is None: return
+      if task.replaces_file_id:
+        await self._remove_and_delete(task.replaces_file_id)
+      uploaded_utc, uploaded_ts = _get_utc_now()
+      try:
+        file_obj = await self._upload(task.filepath)
+      except asyncio.CancelledError:
+        raise
+      except Exception as e:
+        outcome_queue.put_nowait(EmbedOutcome(task=task, file_id="", error=f"Upload failed: {str(e)}", uploaded_utc=uploaded_utc, uploaded_timestamp=uploaded_ts))
+        continue
+      self._pending_file_ids.add(file_obj.id)
+      await attach_queue.put(_PendingAttach(task=task, file_id=file_obj.id, uploaded_utc=uploaded_utc, uploaded_timestamp=uploaded_ts))
+
+  async def _upload(self, filepath: str):
+    """Upload through the backoff gate. If the worker is cancelled mid-upload, the upload completes in the background and the file is deleted again."""
+    f = open(filepath, 'rb')
+    upload = asyncio.ensure_future(self.backoff.call(self._client.files.create, file=f, purpose="assistants"))
+    upload.add_done_callback(lambda _: f.close())
+    try:
+      return await asyncio.shield(upload)
+    except asyncio.CancelledError:
+      upload.add_done_callback(self._delete_if_uploaded)
+      raise
+
+  def _delete_if_uploaded(self, upload: asyncio.Future) -> None:
+    if upload.cancelled() or upload.exception() is not None: return
+    asyncio.ensure_future(self._delete_quietly(upload.result().id))
+
+  def _log_warning(self, message: str) -> None:
+    if self._logger: self._logger.log_function_output(f"  WARNING: {message}")
+
+  async def _delete_quietly(self, file_id: str) -> None:
+    try: await self.backoff.call(self._client.files.delete, file_id)
+    except Exception as e: self._log_warning(f"Could not delete file '{file_id}': {e}")
+
+  async def _remove_and_delete(self, file_id: str) -> None:
+    # Same as remove_and_delete_file() but through the backoff gate; errors are logged and do not stop the upload
+    try: await self.backoff.call(self._client.vector_stores.files.delete, vector_store_id=self._vector_store_id, file_id=file_id)
+    except Exception as e: self._log_warning(f"Could not remove file '{file_id}' from vector store: {e}")
+    try: await self.backoff.call(self._client.files.delete, file_id)
+    except Exception as e: self._log_warning(f"Could not delete file '{file_id}': {e}")
+
+  async def _attach_worker(self, attach_queue: asyncio.Queue, outcome_queue: asyncio.Queue) -> None:
+    batch_slots = asyncio.Semaphore(self._max_batches_in_flight)
+    pollers = []
+    try:
+      finished = False
+      while not finished:
+        first = await attach_queue.get()
+        if first is None: break
+        batch = [first]
+        # Linger briefly so files uploaded at about the same time end up in one batch
+        deadline = time.monotonic() + self._attach_linger_seconds
+        while len(batch) < self._attach_batch_size:
+          timeout = deadline - time.monotonic()
+          if timeout <= 0: break
+          try: item = await asyncio.wait_for(attach_queue.get(), timeout)
+          except asyncio.TimeoutError: break
+          if item is None:
+            finished = True
+            break
+          batch.append(item)
+        await batch_slots.acquire()
+        batch_id = await self._attach_batch(batch, outcome_queue)
+        if batch_id: pollers.append(asyncio.ensure_future(self._poll_batch(batch_id, batch_slots)))
+        else: batch_slots.release()
+      if pollers: await asyncio.gather(*pollers)
+    finally:
+      for poller in pollers:
+        if not poller.done(): poller.cancel()
+
+  async def _attach_batch(self, batch: list[_PendingAttach], outcome_queue: asyncio.Queue) -> str:
+    """Attach files as one vector store file batch. Falls back to single-file attach. Returns batch ID or empty string."""
+    try:
+      file_batch = await self.backoff.call(self._client.vector_stores.file_batches.create, vector_store_id=self._vector_store_id, file_ids=[item.file_id for item in batch])
+    except Exception:
+      file_batch = None
+    if file_batch is not None:
+      self.batches_created += 1
+      embedded_utc, embedded_ts = _get_utc_now()
+      for item in batch:
+        self._pending_file_ids.discard(item.file_id)
+        outcome_queue.put_nowait(EmbedOutcome(task=item.task, file_id=item.file_id, error="", uploaded_utc=item.uploaded_utc, uploaded_timestamp=item.uploaded_timestamp, embedded_utc=embedded_utc, embedded_timestamp=embedded_ts))
+      return file_batch.id
+    for item in batch:
+      try:
+        await self.backoff.call(self._client.vector_stores.files.create, vector_store_id=self._vector_store_id, file_id=item.file_id)
+      except Exception as e:
+        # Cleanup: delete the uploaded file (same as upload_and_embed_file)
+        await self._delete_quietly(item.file_id)
+        self._pending_file_ids.discard(item.file_id)
+        outcome_queue.put_nowait(EmbedOutcome(task=item.task, file_id="", error=f"Add to vector store failed: {str(e)}", uploaded_utc=item.uploaded_utc, uploaded_timestamp=item.uploaded_timestamp))
+        continue
+      embedded_utc, embedded_ts = _get_utc_now()
+      self._pending_file_ids.discard(item.file_id)
+      outcome_queue.put_nowait(EmbedOutcome(task=item.task, file_id=item.file_id, error="", uploaded_utc=item.uploaded_utc, uploaded_timestamp=item.uploaded_timestamp, embedded_utc=embedded_utc, embedded_timestamp=embedded_ts))
+    return ""
+
+  async def _poll_batch(self, batch_id: str, batch_slots: asyncio.Semaphore) -> None:
+    """Poll a file batch until it leaves 'in_progress' (or timeout), collect failed file IDs, then free the batch slot."""
+    try:
+      start_time = time.monotonic()
+      file_batch = None
+      while time.monotonic() - start_time < self._poll_timeout_seconds:
+        try: file_batch = await self.backoff.call(self._client.vector_stores.file_batches.retrieve, batch_id, vector_store_id=self._vector_store_id)
+        except Exception: file_batch = None
+        if file_batch is not None and getattr(file_batch, 'status', '') != 'in_progress': break
+        await asyncio.sleep(self._poll_interval_seconds)
+      failed_count = getattr(getattr(file_batch, 'file_counts', None), 'failed', 0) or 0
+      if failed_count > 0:
+        try:
+          async for file in self._client.vector_stores.file_batches.list_files(batch_id, vector_store_id=self._vector_store_id, filter="failed"):
+            self.processing_failed_file_ids.append(getattr(file, 'id', ''))
+        except Exception as e: self._log_warning(f"Could not list {failed_count} failed files of file batch '{batch_id}': {e}")
+    finally:
+      batch_slots.release()
+
+# ----------------------------------------- END: Embedding Pipeline ---------------------------------------------------
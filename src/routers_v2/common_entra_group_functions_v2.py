@@ -0,0 +1,260 @@
+# Entra Group Functions V2 - resolves the transitive user members of Entra ID groups for the security scanner
+# - Follows @odata.nextLink paging of groups/{id}/transitiveMembers (GRAPH_PAGE_SIZE members per page)
+# - Two-tier cache: in-memory LRU (SECURITY_SCAN_ENTRA_GROUP_CACHE_MAX_ENTRIES groups) over one indexed SQLite store per
+#   storage path (sites/_entra_group_cache/entra_groups.sqlite). Entries expire after SECURITY_SCAN_ENTRA_GROUP_CACHE_TTL_SECONDS.
+# - Concurrent lookups of the same group share one Graph API fetch, at most SECURITY_SCAN_ENTRA_GROUP_MAX_PARALLEL fetches at once
+# - invalidate() drops given groups or all groups from both tiers in one statement (scan option delete_caches)
+# Failed fetches are not cached. One resolver per storage path and app worker process (get_entra_group_resolver).
+
+import asyncio, datetime, json, os, sqlite3, threading, time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from kiota_abstractions.base_request_configuration import RequestConfiguration
+from msgraph import GraphServiceClient
+
+from hardcoded_config import CRAWLER_HARDCODED_CONFIG
+
+ENTRA_GROUP_CACHE_SUBFOLDER = "_entra_group_cache"
+ENTRA_GROUP_STORE_FILENAME = "entra_groups.sqlite"
+# Max page size of transitiveMembers
+GRAPH_PAGE_SIZE = 999
+
+
+# ----------------------------------------- START: Graph Functions ----------------------------------------------------
+
+def get_entra_group_user(member) -> Optional[dict]:
+  """User member of a transitiveMembers page as {LoginName, DisplayName, Email, IsGuest}. None for groups, devices, service principals."""
+  if getattr(member, "odata_type", None) != "#microsoft.graph.user": return None
+  upn = member.user_principal_name or ""
+  return {"LoginName": upn, "DisplayName": member.display_name or "", "Email": member.mail or "", "IsGuest": "true" if "#ext#" in upn.lower() else "false"}
+
+async def fetch_entra_group_users(graph_client: GraphServiceClient, group_id: str) -> list[dict]:
+  """All transitive user members of the group, page by page."""
+  request_builder = graph_client.groups.by_group_id(group_id).transitive_members
+  query_parameters = request_builder.TransitiveMembersRequestBuilderGetQueryParameters(top=GRAPH_PAGE_SIZE)
+  response = await request_builder.get(RequestConfiguration(query_parameters=query_parameters))
+  users = []
+  while response is not None:
+    for member in response.value or []:
+      user = get_entra_group_user(member)
+      if user: users.append(user)
+    if not response.odata_next_link: break
+    response = await request_builder.with_url(response.odata_next_link).get()
+  return users
+
+# ----------------------------------------- END: Graph Functions ------------------------------------------------------
+
+
+# ----------------------------------------- START: EntraGroupStore Class ----------------------------------------------
+
+class EntraGroupStore:
+  """
+  SQLite store of resolved groups. Table entra_groups: group_id (primary key), group_name, cached_utc, expires (unix time, indexed),
+  member_count, members (JSON list of users). One connection per operation, so job threads and the event loop can share a store.
+  Rollback journal instead of WAL: the store lives in the persistent storage, which can be a network share (Azure App Service /home).
+  """
+
+  def __init__(self, db_path: str):
+    self.db_path = db_path
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = self._connect()
+    try:
+      # Stores created with WAL switch back to the rollback journal
+      conn.execute("PRAGMA journal_mode=DELETE")
+      with conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS entra_groups (group_id TEXT PRIMARY KEY, group_name TEXT NOT NULL, cached_utc TEXT NOT NULL, expires REAL NOT NULL, member_count INTEGER NOT NULL, members TEXT NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS entra_groups_expires ON entra_groups (expires)")
+    finally: conn.close()
+
+  def _connect(self) -> sqlite3.Connection:
+    return sqlite3.connect(self.db_path, timeout=30)
+
+  def get(self, group_id: str) -> Optional[tuple[float, dict]]:
+    """(expires, entry) of the group or None. Entry: {group_id, group_name, cached_utc, member_count, members}."""
+    conn = self._connect()
+    try: row = conn.execute("SELECT group_id, group_name, cached_utc, expires, member_count, members FROM entra_groups WHERE group_id = ?", (group_id,)).fetchone()
+    finally: conn.close()
+    if row is None: return None
+    return row[3], {"group_id": row[0], "group_name": row[1], "cached_utc": row[2], "member_count": row[4], "members": json.loads(row[5])}
+
+  def put(self, entry: dict, expires: float) -> None:
+    conn = self._connect()
+    try:
+      with conn: conn.execute("INSERT OR REPLACE INTO entra_groups (group_id, group_name, cached_utc, expires, member_count, members) VALUES (?, ?, ?, ?, ?, ?)", (entry["group_id"], entry["group_name"], entry["cached_utc"], expires, entry["member_count"], json.dumps(entry["members"])))
+    finally: conn.close()
+
+  def delete(self, group_ids: Optional[Iterable[str]] = None, expired_before: Optional[float] = None) -> int:
+    """Delete the groups (None = all) or the groups that expired before the given time. Returns the number of deleted groups."""
+    conn = self._connect()
+    try:
+      with conn:
+        if expired_before is not None: cursor = conn.execute("DELETE FROM entra_groups WHERE expires < ?", (expired_before,))
+        elif group_ids is None: cursor = conn.execute("DELETE FROM entra_groups")
+        else: cursor = conn.executemany("DELETE FROM entra_groups WHERE group_id = ?", [(group_id,) for group_id in group_ids])
+      return cursor.rowcount
+    finally: conn.close()
+
+  def count(self) -> int:
+    conn = self._connect()
+    try: return conn.execute("SELECT COUNT(*) FROM entra_groups").fetchone()[0]
+    finally: conn.close()
+
+# ----------------------------------------- END: EntraGroupStore Class ------------------------------------------------
+
+
+# ----------------------------------------- START: EntraGroupResolver Class -------------------------------------------
+
+class EntraGroupResolver:
+  """
+  Entra ID group users by group id, cached in memory (LRU) and in an EntraGroupStore. Lookups and fetches run in the event loop,
+  invalidate() may be called from any thread.
+
+  Usage:
+    resolver = get_entra_group_resolver(storage_path)
+    users, cache_status = await resolver.get_users(graph_client, group_id, group_name)     # cache_status: "memory", "disk", "shared" or "fetched"
+    results = await resolver.resolve_many(graph_client, {group_id: group_name})           # {group_id: users or exception}, fetched concurrently
+    resolver.invalidate()                                                                 # all groups, or invalidate([group_id, ...])
+  """
+
+  def __init__(self, store: EntraGroupStore, max_entries: int, ttl_seconds: float, max_parallel: int):
+    self.store = store
+    self.max_entries = max_entries
+    self.ttl_seconds = ttl_seconds
+    self.max_parallel = max(1, max_parallel)
+    self._entries: OrderedDict[str, tuple] = OrderedDict()   # group_id -> (expires, entry), least recently used first
+    self._in_flight: dict[str, asyncio.Task] = {}
+    self._fetch_slots: Optional[asyncio.Semaphore] = None
+    self._loop = None
+    self._generation = 0                                     # number of invalidations
+    self._lock = threading.Lock()
+    self._stats = {"memory_hits": 0, "disk_hits": 0, "shared": 0, "fetches": 0, "errors": 0, "expirations": 0, "evictions": 0, "invalidations": 0}
+
+  def get_cached(self, group_id: str) -> Optional[tuple[list[dict], str]]:
+    """(users, "memory" or "disk") of an unexpired cached group, else None. Disk hits are promoted to memory."""
+    now = time.time()
+    with self._lock:
+      cached = self._entries.get(group_id)
+      if cached is not None:
+        if cached[0] > now:
+          self._entries.move_to_end(group_id)
+          self._stats["memory_hits"] += 1
+          return cached[1]["members"], "memory"
+        del self._entries[group_id]
+        self._stats["expirations"] += 1
+    stored = self.store.get(group_id)
+    if stored is None: return None
+    if stored[0] <= now:
+      self._stats["expirations"] += 1
+      return None
+    self._stats["disk_hits"] += 1
+    self._remember(group_id, stored[0], stored[1])
+    return stored[1]["members"], "disk"
+
+  async def get_users(self, graph_client: GraphServiceClient, group_id: str, group_name: str = "") -> tuple[list[dict], str]:
+    """Cached users of the group, else fetched from Graph API (one fetch for concurrent lookups of the group). Returns (users, cache status)."""
+    cached = self.get_cached(group_id)
+    if cached is not None: return cached
+    self._bind_loop()
+    task = self._in_flight.get(group_id)
+    if task is not None:
+      self._stats["shared"] += 1
+      return await asyncio.shield(task), "shared"
+    # Own task: the fetch continues for the other waiters if this lookup is cancelled
+    task = asyncio.ensure_future(self._fetch(graph_client, group_id, group_name, self._generation))
+    self._in_flight[group_id] = task
+    return await asyncio.shield(task), "fetched"
+
+  async def resolve_many(self, graph_client: GraphServiceClient, groups: dict[str, str]) -> dict:
+    """Users of all groups ({group_id: group_name}), fetched concurrently. Returns {group_id: users or the exception of a failed fetch}."""
+    group_ids = list(groups)
+    results = await asyncio.gather(*(self.get_users(graph_client, group_id, groups[group_id]) for group_id in group_ids), return_exceptions=True)
+    return {group_id: result if isinstance(result, BaseException) else result[0] for group_id, result in zip(group_ids, results)}
+
+  async def _fetch(self, graph_client: GraphServiceClient, group_id: str, group_name: str, generation: int) -> list[dict]:
+    try:
+      async with self._fetch_slots:
+        self._stats["fetches"] += 1
+        users = await fetch_entra_group_users(graph_client, group_id)
+    except BaseException:
+      self._stats["errors"] += 1
+      raise
+    finally: self._in_flight.pop(group_id, None)
+    # Invalidated while fetching: the members may be from before the invalidation
+    if self._generation != generation: return users
+    expires = time.time() + self.ttl_seconds
+    entry = {"group_id": group_id, "group_name": group_name, "cached_utc": datetime.datetime.now(datetime.timezone.utc).isoformat(), "member_count": len(users), "members": users}
+    self.store.put(entry, expires)
+    self._remember(group_id, expires, entry)
+    return users
+
+  def _remember(self, group_id: str, expires: float, entry: dict) -> None:
+    if self.max_entries <= 0: return
+    with self._lock:
+      self._entries[group_id] = (expires, entry)
+      self._entries.move_to_end(group_id)
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+        self._stats["evictions"] += 1
+
+  def _bind_loop(self) -> None:
+    """Fetch slots and in-flight fetches belong to one event loop (benchmarks and tests run several)."""
+    loop = asyncio.get_running_loop()
+    if self._loop is not loop:
+      self._loop, self._fetch_slots, self._in_flight = loop, asyncio.Semaphore(self.max_parallel), {}
+
+  def invalidate(self, group_ids: Optional[Iterable[str]] = None) -> int:
+    """Drop the groups (None = all) from memory and disk. In-flight fetches are not cached. Returns the number of groups deleted from disk."""
+    group_ids = None if group_ids is None else list(group_ids)
+    with self._lock:
+      self._generation += 1
+      if group_ids is None: self._entries.clear()
+      else:
+        for group_id in group_ids: self._entries.pop(group_id, None)
+      self._stats["invalidations"] += 1
+    return self.store.delete(group_ids)
+
+  def delete_expired(self) -> int:
+    """Drop expired groups from memory and disk. Returns the number of groups deleted from disk."""
+    now = time.time()
+    with self._lock:
+      for group_id in [group_id for group_id, (expires, _) in self._entries.items() if expires <= now]: del self._entries[group_id]
+    return self.store.delete(expired_before=now)
+
+  def get_stats(self) -> dict:
+    """Settings, size and hit/fetch counters."""
+    lookups = self._stats["memory_hits"] + self._stats["disk_hits"] + self._stats["shared"] + self._stats["fetches"]
+    return {
+      "max_entries": self.max_entries,
+      "ttl_secs": self.ttl_seconds,
+      "max_parallel": self.max_parallel,
+      "entries": len(self._entries),
+      "stored": self.store.count(),
+      "in_flight": len(self._in_flight),
+      **self._stats,
+      "hit_ratio": round((lookups - self._stats["fetches"]) / lookups, 3) if lookups else None
+    }
+
+# ----------------------------------------- END: EntraGroupResolver Class ---------------------------------------------
+
+
+# ----------------------------------------- START: Resolver Registry --------------------------------------------------
+
+_resolvers: dict[str, EntraGroupResolver] = {}
+_resolvers_lock = threading.Lock()
+
+def get_entra_group_cache_folder(storage_path: str) -> str:
+  return os.path.join(storage_path, CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_PATH_SITES_SUBFOLDER, ENTRA_GROUP_CACHE_SUBFOLDER)
+
+def get_entra_group_resolver(storage_path: str) -> EntraGroupResolver:
+  """Resolver of the storage path (created on first use with the SECURITY_SCAN_ENTRA_GROUP_* settings)."""
+  key = os.path.abspath(storage_path)
+  with _resolvers_lock:
+    resolver = _resolvers.get(key)
+    if resolver is None:
+      store = EntraGroupStore(os.path.join(get_entra_group_cache_folder(storage_path), ENTRA_GROUP_STORE_FILENAME))
+      resolver = EntraGroupResolver(store, CRAWLER_HARDCODED_CONFIG.SECURITY_SCAN_ENTRA_GROUP_CACHE_MAX_ENTRIES, CRAWLER_HARDCODED_CONFIG.SECURITY_SCAN_ENTRA_GROUP_CACHE_TTL_SECONDS, CRAWLER_HARDCODED_CONFIG.SECURITY_SCAN_ENTRA_GROUP_MAX_PARALLEL)
+      _resolvers[key] = resolver
+    return resolver
+
+# ----------------------------------------- END: Resolver Registry ----------------------------------------------------
@@ -0,0 +1,87 @@
+# Inotify Watcher V2 - Directory change notifications on Linux without extra dependencies (libc via ctypes)
+# Used by the job monitor (tail-follow of job files) and job control (control files) to wake on changes of a jobs
+# folder instead of polling it. Callers fall back to polling if get_inotify_watcher() returns None.
+
+import asyncio, ctypes, ctypes.util, os, struct, sys
+from typing import Callable, Optional
+
+
+# ----------------------------------------- START: Inotify Watcher ----------------------------------------------------
+
+_IN_MODIFY, _IN_MOVED_FROM, _IN_MOVED_TO, _IN_CREATE, _IN_DELETE, _IN_Q_OVERFLOW = 0x2, 0x40, 0x80, 0x100, 0x200, 0x4000
+_IN_WATCH_MASK = _IN_MODIFY | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+_INOTIFY_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len (name follows, NUL padded)
+
+class InotifyWatcher:
+  """
+  One inotify instance per event loop with one directory watch per folder, shared by all callbacks of that folder.
+  Callbacks receive the file name of each event (None on queue overflow = anything may have changed).
+  """
+
+  def __init__(self, loop: asyncio.AbstractEventLoop):
+    self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    if self._fd < 0: raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+    self._loop = loop
+    self._folders: dict[str, int] = {}                  # folder -> watch descriptor
+    self._callbacks: dict[int, set[Callable]] = {}      # watch descriptor -> callbacks
+    try: loop.add_reader(self._fd, self._on_readable)
+    except Exception:
+      os.close(self._fd)
+      raise
+
+  def add(self, folder: str, callback: Callable[[Optional[str]], None]) -> None:
+    wd = self._folders.get(folder)
+    if wd is None:
+      wd = self._libc.inotify_add_watch(self._fd, os.fsencode(folder), _IN_WATCH_MASK)
+      if wd < 0: raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for '{folder}'")
+      self._folders[folder] = wd
+    self._callbacks.setdefault(wd, set()).add(callback)
+
+  def remove(self, folder: str, callback: Callable[[Optional[str]], None]) -> None:
+    wd = self._folders.get(folder)
+    if wd is None: return
+    callbacks = self._callbacks.get(wd, set())
+    callbacks.discard(callback)
+    if not callbacks:
+      self._callbacks.pop(wd, None)
+      del self._folders[folder]
+      self._libc.inotify_rm_watch(self._fd, wd)
+
+  def close(self) -> None:
+    try: os.close(self._fd)
+    except OSError: pass
+
+  def _on_readable(self) -> None:
+    try: data = os.read(self._fd, 65536)
+    except BlockingIOError: return
+    position = 0
+    while position + _INOTIFY_EVENT_HEADER.size <= len(data):
+      wd, mask, _, name_length = _INOTIFY_EVENT_HEADER.unpack_from(data, position)
+      position += _INOTIFY_EVENT_HEADER.size
+      name = os.fsdecode(data[position:position + name_length].rstrip(b"\0"))
+      position += name_length
+      if mask & _IN_Q_OVERFLOW:
+        for callbacks in self._callbacks.values():
+          for callback in list(callbacks): callback(None)
+        continue
+      for callback in list(self._callbacks.get(wd, ())): callback(name)
+
+_watcher_loop = None
+_watcher: Optional[InotifyWatcher] = None
+
+def get_inotify_watcher() -> Optional[InotifyWatcher]:
+  """Inotify watcher of the running event loop, None if inotify is not available (non-Linux, instance limit reached)."""
+  global _watcher_loop, _watcher
+  loop = asyncio.get_running_loop()
+  if _watcher_loop is not loop:
+    _watcher_loop = loop
+    # The previous loop is closed (e.g. scripts calling asyncio.run() repeatedly)
+    if _watcher is not None: _watcher.close()
+    _watcher = None
+    if sys.platform.startswith("linux"):
+      try: _watcher = InotifyWatcher(loop)
+      except Exception: _watcher = None
+  return _watcher
+
+# ----------------------------------------- END: Inotify Watcher ------------------------------------------------------
@@ -0,0 +1,306 @@
+# Job Catalog Functions V2 - SQLite index of the job files in PERSISTENT_STORAGE_PATH/jobs
+# Replaces globbing and parsing job files in generate_job_number, find_job_file and list_jobs. Job files stay the source
+# of truth: StreamingJobWriter updates the catalog on create, state change and finalize, job files changed outside the
+# catalog (manual deletes, restores, other app versions) are picked up by sync_job_catalog() in common_job_functions_v2.
+
+import json, os, sqlite3
+from typing import Iterable, Optional
+
+# Columns of the jobs table, JobMetadata fields plus job_number, router (jobs subfolder), file_name and the log summary:
+# last_log = last data line of the job file, log_bytes = size of the uncompressed job file (see common_job_retention_functions_v2)
+JOB_CATALOG_COLUMNS = ["job_id", "job_number", "router", "file_name", "state", "source_url", "monitor_url", "started_utc", "finished_utc", "last_modified_utc", "result", "last_log", "log_bytes"]
+# Columns added after the first release of the catalog: added to existing databases on open
+_ADDED_JOB_CATALOG_COLUMNS = {"last_log": "TEXT", "log_bytes": "INTEGER"}
+# Columns of the job_queue table (jobs waiting for the job runner, see common_job_runner_functions_v2), 'params' is stored as JSON
+JOB_QUEUE_COLUMNS = ["job_id", "job_number", "router", "job_type", "priority", "params", "object_id", "source_url", "router_prefix", "file_name", "owner", "heartbeat"]
+
+
+# ----------------------------------------- START: JobCatalog Class ---------------------------------------------------
+
+class JobCatalog:
+  """
+  SQLite job catalog for one jobs folder. One row per job file (key job_id), 'result' is stored as JSON.
+  Records are dicts with the JOB_CATALOG_COLUMNS keys. Every operation uses its own connection and transaction,
+  so the catalog can be shared by all worker processes. Rollback journal instead of WAL: the persistent storage
+  can be a network share (Azure App Service /home), where WAL shared memory is not supported.
+
+  Usage:
+    catalog = JobCatalog(os.path.join(jobs_folder, CRAWLER_HARDCODED_CONFIG.JOB_CATALOG_SQLITE))
+    job_number = catalog.allocate_job_number()
+    catalog.upsert_job({"job_id": f"jb_{job_number}", "job_number": job_number, "router": "crawler", ...})
+    catalog.update_job("jb_42", state="paused", file_name="..._[jb_42].paused")
+    records = catalog.list_jobs(router="crawler", state="running", offset=0, limit=50)
+  """
+
+  def __init__(self, db_path: str):
+    self.db_path = db_path
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = self._connect()
+    try:
+      with conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, job_number INTEGER NOT NULL, router TEXT NOT NULL, file_name TEXT NOT NULL, state TEXT NOT NULL, source_url TEXT, monitor_url TEXT, started_utc TEXT, finished_utc TEXT, last_modified_utc TEXT, result TEXT, last_log TEXT, log_bytes INTEGER)")
+        existing_columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for name, column_type in _ADDED_JOB_CATALOG_COLUMNS.items():
+          if name not in existing_columns: conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {column_type}")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_number ON jobs (job_number)")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_router_state ON jobs (router, state, job_number)")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, job_number)")
+        # next_job_number survives deleted jobs, so job ids are never reused. Also holds counters and schedules (see add_counters, claim_scheduled_run)
+        conn.execute("CREATE TABLE IF NOT EXISTS catalog_state (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        # mtime of each router folder when it was last synced with the catalog (see sync_job_catalog)
+        conn.execute("CREATE TABLE IF NOT EXISTS folder_state (router TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL)")
+        # Queued jobs: owner = job runner holding the job, heartbeat = unix time of the owner's last sign of life
+        conn.execute("CREATE TABLE IF NOT EXISTS job_queue (job_id TEXT PRIMARY KEY, job_number INTEGER NOT NULL, router TEXT NOT NULL, job_type TEXT NOT NULL, priority INTEGER NOT NULL, params TEXT, object_id TEXT, source_url TEXT, router_prefix TEXT, file_name TEXT NOT NULL, owner TEXT NOT NULL, heartbeat REAL NOT NULL)")
+    finally:
+      conn.close()
+
+  def _connect(self) -> sqlite3.Connection:
+    conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+  # ---------- Job numbers ----------
+
+  def allocate_job_number(self) -> int:
+    """Next job number (O(1)): higher than any number allocated before or present in the catalog."""
+    conn = self._connect()
+    try:
+      conn.execute("BEGIN IMMEDIATE")
+      try:
+        row = conn.execute("SELECT value FROM catalog_state WHERE key = 'next_job_number'").fetchone()
+        max_number = conn.execute("SELECT MAX(job_number) FROM jobs").fetchone()[0] or 0
+        job_number = max(row[0] if row else 1, max_number + 1)
+        conn.execute("INSERT INTO catalog_state (key, value) VALUES ('next_job_number', ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value", (job_number + 1,))
+        conn.execute("COMMIT")
+      except Exception:
+        conn.execute("ROLLBACK")
+        raise
+      return job_number
+    finally:
+      conn.close()
+
+  # ---------- Records ----------
+
+  def upsert_job(self, record: dict) -> None:
+    self.upsert_jobs([record])
+
+  def upsert_jobs(self, records: Iterable[dict]) -> None:
+    values = [_record_to_values(record) for record in records]
+    if not values: return
+    update_columns = ", ".join(f"{name} = excluded.{name}" for name in JOB_CATALOG_COLUMNS if name != "job_id")
+    conn = self._connect()
+    try:
+      with conn:
+        conn.execute("BEGIN")
+        conn.executemany(f"INSERT INTO jobs ({', '.join(JOB_CATALOG_COLUMNS)}) VALUES ({', '.join('?' * len(JOB_CATALOG_COLUMNS))}) ON CONFLICT (job_id) DO UPDATE SET {update_columns}", values)
+    finally:
+      conn.close()
+
+  def update_job(self, job_id: str, **changes) -> bool:
+    """Update some columns of a job. Returns False if the job is not in the catalog."""
+    unknown = [name for name in changes if name not in JOB_CATALOG_COLUMNS or name == "job_id"]
+    if unknown: raise ValueError(f"Unknown job catalog column(s): {', '.join(unknown)}")
+    if "result" in changes and changes["result"] is not None: changes["result"] = json.dumps(changes["result"])
+    conn = self._connect()
+    try:
+      with conn:
+        cursor = conn.execute(f"UPDATE jobs SET {', '.join(f'{name} = ?' for name in changes)} WHERE job_id = ?", (*changes.values(), job_id))
+      return cursor.rowcount > 0
+    finally:
+      conn.close()
+
+  def delete_jobs(self, job_ids: Iterable[str]) -> int:
+    job_ids = list(job_ids)
+    conn = self._connect()
+    try:
+      with conn:
+        conn.execute("BEGIN")
+        return sum(conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,)).rowcount for job_id in job_ids)
+    finally:
+      conn.close()
+
+  def get_job(self, job_id: str) -> Optional[dict]:
+    """Record by job_id (primary key lookup) or None."""
+    conn = self._connect()
+    try:
+      row = conn.execute(f"SELECT {', '.join(JOB_CATALOG_COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+      return _values_to_record(row) if row else None
+    finally:
+      conn.close()
+
+  def list_jobs(self, router: Optional[str] = None, state: Optional[str] = None, offset: int = 0, limit: Optional[int] = None) -> list[dict]:
+    """Records newest first (by job number), optionally filtered by router and state and paginated."""
+    where, params = _get_filter(router, state)
+    sql = f"SELECT {', '.join(JOB_CATALOG_COLUMNS)} FROM jobs{where} ORDER BY job_number DESC"
+    if limit is not None or offset:
+      sql += " LIMIT ? OFFSET ?"
+      params += [limit if limit is not None else -1, max(0, offset)]
+    conn = self._connect()
+    try: return [_values_to_record(row) for row in conn.execute(sql, params)]
+    finally: conn.close()
+
+  def count_jobs(self, router: Optional[str] = None, state: Optional[str] = None) -> int:
+    where, params = _get_filter(router, state)
+    conn = self._connect()
+    try: return conn.execute(f"SELECT COUNT(*) FROM jobs{where}", params).fetchone()[0]
+    finally: conn.close()
+
+  def get_router_file_names(self, router: str) -> dict[str, str]:
+    """{job_id: file_name} of all jobs of a router folder."""
+    conn = self._connect()
+    try: return dict(conn.execute("SELECT job_id, file_name FROM jobs WHERE router = ?", (router,)))
+    finally: conn.close()
+
+  # ---------- Folder sync state ----------
+
+  def get_folder_states(self) -> dict[str, int]:
+    """{router: mtime_ns} of the router folders at their last sync."""
+    conn = self._connect()
+    try: return dict(conn.execute("SELECT router, mtime_ns FROM folder_state"))
+    finally: conn.close()
+
+  def apply_folder_sync(self, router: str, mtime_ns: Optional[int], upserts: list[dict], deleted_job_ids: list[str]) -> None:
+    """Apply the result of scanning a router folder in one transaction. mtime_ns=None removes the router (folder deleted)."""
+    update_columns = ", ".join(f"{name} = excluded.{name}" for name in JOB_CATALOG_COLUMNS if name != "job_id")
+    conn = self._connect()
+    try:
+      with conn:
+        conn.execute("BEGIN")
+        conn.executemany("DELETE FROM jobs WHERE job_id = ?", [(job_id,) for job_id in deleted_job_ids])
+        conn.executemany(f"INSERT INTO jobs ({', '.join(JOB_CATALOG_COLUMNS)}) VALUES ({', '.join('?' * len(JOB_CATALOG_COLUMNS))}) ON CONFLICT (job_id) DO UPDATE SET {update_columns}", [_record_to_values(record) for record in upserts])
+        if mtime_ns is None: conn.execute("DELETE FROM folder_state WHERE router = ?", (router,))
+        else: conn.execute("INSERT INTO folder_state (router, mtime_ns) VALUES (?, ?) ON CONFLICT (router) DO UPDATE SET mtime_ns = excluded.mtime_ns", (router, mtime_ns))
+    finally:
+      conn.close()
+
+  # ---------- Job queue ----------
+
+  def enqueue_job(self, record: dict) -> None:
+    """Add a queued job (dict with the JOB_QUEUE_COLUMNS keys)."""
+    values = tuple(json.dumps(record.get(name)) if name == "params" else record.get(name) for name in JOB_QUEUE_COLUMNS)
+    conn = self._connect()
+    try:
+      with conn: conn.execute(f"INSERT OR REPLACE INTO job_queue ({', '.join(JOB_QUEUE_COLUMNS)}) VALUES ({', '.join('?' * len(JOB_QUEUE_COLUMNS))})", values)
+    finally:
+      conn.close()
+
+  def dequeue_job(self, job_id: str, owner: Optional[str] = None) -> bool:
+    """Remove a queued job (started or cancelled). With owner: only if still held by owner. Returns False if not removed."""
+    sql, params = "DELETE FROM job_queue WHERE job_id = ?", [job_id]
+    if owner is not None:
+      sql += " AND owner = ?"
+      params.append(owner)
+    conn = self._connect()
+    try:
+      with conn: return conn.execute(sql, params).rowcount > 0
+    finally:
+      conn.close()
+
+  def touch_queued_jobs(self, owner: str, heartbeat: float) -> None:
+    conn = self._connect()
+    try:
+      with conn: conn.execute("UPDATE job_queue SET heartbeat = ? WHERE owner = ?", (heartbeat, owner))
+    finally:
+      conn.close()
+
+  def adopt_queued_jobs(self, owner: str, heartbeat: float, stale_before: float) -> list[dict]:
+    """Take over queued jobs whose owner has not updated its heartbeat since stale_before (worker process stopped or restarted)."""
+    conn = self._connect()
+    try:
+      conn.execute("BEGIN IMMEDIATE")
+      try:
+        rows = conn.execute(f"SELECT {', '.join(JOB_QUEUE_COLUMNS)} FROM job_queue WHERE heartbeat < ? AND owner != ?", (stale_before, owner)).fetchall()
+        conn.executemany("UPDATE job_queue SET owner = ?, heartbeat = ? WHERE job_id = ?", [(owner, heartbeat, row[0]) for row in rows])
+        conn.execute("COMMIT")
+      except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+      conn.close()
+    records = [_values_to_queue_record(row) for row in rows]
+    for record in records: record.update(owner=owner, heartbeat=heartbeat)
+    return records
+
+  def list_queued_jobs(self, router: Optional[str] = None) -> list[dict]:
+    """Queued jobs in start order (highest priority first, then oldest first)."""
+    where, params = _get_filter(router, None)
+    conn = self._connect()
+    try: return [_values_to_queue_record(row) for row in conn.execute(f"SELECT {', '.join(JOB_QUEUE_COLUMNS)} FROM job_queue{where} ORDER BY priority DESC, job_number", params)]
+    finally: conn.close()
+
+  # ---------- Counters and schedules ----------
+
+  def add_counters(self, deltas: dict[str, int]) -> None:
+    """Add to integer counters in catalog_state (e.g. bytes reclaimed by job retention), missing counters start at 0."""
+    conn = self._connect()
+    try:
+      with conn:
+        conn.execute("BEGIN")
+        conn.executemany("INSERT INTO catalog_state (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = value + excluded.value", list(deltas.items()))
+    finally:
+      conn.close()
+
+  def get_counters(self, prefix: str) -> dict[str, int]:
+    """{key: value} of the catalog_state entries whose key starts with prefix."""
+    conn = self._connect()
+    try: return dict(conn.execute("SELECT key, value FROM catalog_state WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)))
+    finally: conn.close()
+
+  def claim_scheduled_run(self, key: str, now: int, interval_seconds: int) -> bool:
+    """True for exactly one caller per interval across all worker processes: the caller runs the scheduled task."""
+    conn = self._connect()
+    try:
+      conn.execute("BEGIN IMMEDIATE")
+      try:
+        row = conn.execute("SELECT value FROM catalog_state WHERE key = ?", (key,)).fetchone()
+        claimed = row is None or row[0] <= now
+        if claimed: conn.execute("INSERT INTO catalog_state (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value", (key, now + interval_seconds))
+        conn.execute("COMMIT")
+      except Exception:
+        conn.execute("ROLLBACK")
+        raise
+      return claimed
+    finally:
+      conn.close()
+
+  # ---------- Routers ----------
+
+  def get_routers(self) -> list[str]:
+    """Routers (jobs subfolders) with jobs or a sync state in the catalog."""
+    conn = self._connect()
+    try: return [row[0] for row in conn.execute("SELECT router FROM folder_state UNION SELECT DISTINCT router FROM jobs")]
+    finally: conn.close()
+
+# ----------------------------------------- END: JobCatalog Class -----------------------------------------------------
+
+
+# ----------------------------------------- START: Helper Functions ---------------------------------------------------
+
+def _record_to_values(record: dict) -> tuple:
+  result = record.get("result")
+  return tuple(json.dumps(result) if name == "result" and result is not None else record.get(name) for name in JOB_CATALOG_COLUMNS)
+
+def _values_to_record(values: tuple) -> dict:
+  record = dict(zip(JOB_CATALOG_COLUMNS, values))
+  if record["result"] is not None:
+    try: record["result"] = json.loads(record["result"])
+    except json.JSONDecodeError: record["result"] = None
+  return record
+
+def _values_to_queue_record(values: tuple) -> dict:
+  record = dict(zip(JOB_QUEUE_COLUMNS, values))
+  try: record["params"] = json.loads(record["params"]) if record["params"] else {}
+  except json.JSONDecodeError: record["params"] = {}
+  return record
+
+def _get_filter(router: Optional[str], state: Optional[str]) -> tuple[str, list]:
+  conditions, params = [], []
+  if router:
+    conditions.append("router = ?")
+    params.append(router)
+  if state:
+    conditions.append("state = ?")
+    params.append(state)
+  return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+# ----------------------------------------- END: Helper Functions -----------------------------------------------------
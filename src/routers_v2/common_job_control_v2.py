@@ -0,0 +1,179 @@
+# Job Control V2 - Pause/resume/cancel requests of running jobs without polling the jobs folder
+# Control files ([jb_N].pause_requested, ...) stay the source of truth. StreamingJobWriter registers a JobControl for
+# its job_id, which holds the control requests that were seen for the job:
+#   - create_control_file() in the same worker process signals the JobControl directly (API control, no delay)
+#   - control files created by other worker processes are picked up per jobs folder in the event loop of the writer:
+#     inotify events (Linux, see common_inotify_watcher_v2), else a scan of the folder every CONTROL_POLL_SECONDS.
+#     With inotify the folder is rescanned every CONTROL_RESCAN_SECONDS (network shares do not report changes made by
+#     other machines).
+# Checking for a request is a dict lookup, the control file is only touched (deleted) when a request is taken.
+
+import asyncio, os, re, threading
+from typing import Callable, Optional
+
+from routers_v2.common_inotify_watcher_v2 import InotifyWatcher, get_inotify_watcher
+
+# Seconds between scans of a jobs folder without inotify
+CONTROL_POLL_SECONDS = 1.0
+# Seconds between scans of a jobs folder with inotify (catches control files created on other machines)
+CONTROL_RESCAN_SECONDS = 10.0
+
+# [jb_42].cancel_requested (create_control_file) or any file name containing [jb_42] with a control extension
+_control_file_pattern = re.compile(r'\[(jb_\d+)\].*\.(pause|resume|cancel)_requested$')
+
+
+# ----------------------------------------- START: JobControl Class ---------------------------------------------------
+
+class JobControl:
+  """
+  Control requests of one job in this worker process. Requests can be signalled from any thread, listeners run in
+  the event loop they were added from.
+
+  Usage (writer):
+    control = register_job_control(job_id, jobs_folder)
+    if control.has_requests() and control.take("cancel"): ...
+    await control.wait("resume", "cancel")
+    unregister_job_control(control)
+  """
+
+  def __init__(self, job_id: str, jobs_folder: str):
+    self.job_id = job_id
+    self.jobs_folder = jobs_folder
+    self._requests: dict[str, str] = {}  # action -> control file path
+    self._listeners: list[tuple[asyncio.AbstractEventLoop, Callable[[], None]]] = []
+    self._lock = threading.Lock()
+
+  def has_requests(self, *actions: str) -> bool:
+    """True if a request for any of the actions (any action if none given) is pending."""
+    if not actions: return bool(self._requests)
+    return any(action in self._requests for action in actions)
+
+  def request(self, action: str, control_file_path: str) -> None:
+    with self._lock:
+      if self._requests.get(action) == control_file_path: return
+      self._requests[action] = control_file_path
+      listeners = list(self._listeners)
+    for loop, callback in listeners: _call_in_loop(loop, callback)
+
+  def take(self, action: str) -> bool:
+    """Consume a pending request by deleting its control file. False if none is pending or another process took it."""
+    with self._lock: control_file_path = self._requests.pop(action, None)
+    if control_file_path is None: return False
+    try: os.unlink(control_file_path)
+    except FileNotFoundError: return False
+    except OSError: pass
+    return True
+
+  def add_listener(self, callback: Callable[[], None]) -> None:
+    """Call callback in the running event loop whenever a request arrives."""
+    with self._lock: self._listeners.append((asyncio.get_running_loop(), callback))
+
+  def remove_listener(self, callback: Callable[[], None]) -> None:
+    with self._lock: self._listeners = [(loop, cb) for loop, cb in self._listeners if cb != callback]
+
+  async def wait(self, *actions: str) -> None:
+    """Wait until a request for any of the actions is pending."""
+    wake = asyncio.Event()
+    self.add_listener(wake.set)
+    try:
+      while not self.has_requests(*actions):
+        await wake.wait()
+        wake.clear()
+    finally:
+      self.remove_listener(wake.set)
+
+def _call_in_loop(loop: asyncio.AbstractEventLoop, callback: Callable[[], None]) -> None:
+  try: running_loop = asyncio.get_running_loop()
+  except RuntimeError: running_loop = None
+  if running_loop is loop: callback()
+  else:
+    try: loop.call_soon_threadsafe(callback)
+    except RuntimeError: pass  # Listener loop closed
+
+# ----------------------------------------- END: JobControl Class -----------------------------------------------------
+
+
+# ----------------------------------------- START: Folder Watch -------------------------------------------------------
+
+class _ControlFolderWatch:
+  """Picks up control files of one jobs folder in one event loop. Stopped when no job of the folder is registered."""
+
+  def __init__(self, jobs_folder: str, loop: asyncio.AbstractEventLoop):
+    self.jobs_folder = jobs_folder
+    self.loop = loop
+    self._watcher: Optional[InotifyWatcher] = get_inotify_watcher()
+    if self._watcher is not None:
+      try: self._watcher.add(jobs_folder, self._on_folder_event)
+      except OSError: self._watcher = None
+    self._task = loop.create_task(self._rescan())
+
+  def _on_folder_event(self, name: Optional[str]) -> None:
+    if name is None: _scan_control_files(self.jobs_folder)  # Event queue overflow
+    elif name.endswith("_requested"): _signal_control_file(os.path.join(self.jobs_folder, name))
+
+  async def _rescan(self) -> None:
+    while True:
+      await asyncio.sleep(CONTROL_RESCAN_SECONDS if self._watcher else CONTROL_POLL_SECONDS)
+      await asyncio.to_thread(_scan_control_files, self.jobs_folder)
+
+  def stop(self) -> None:
+    """Call in the event loop of the watch."""
+    self._task.cancel()
+    if self._watcher is not None: self._watcher.remove(self.jobs_folder, self._on_folder_event)
+
+def _scan_control_files(jobs_folder: str) -> None:
+  try:
+    with os.scandir(jobs_folder) as entries:
+      for entry in entries:
+        if entry.name.endswith("_requested"): _signal_control_file(entry.path)
+  except OSError: pass
+
+# ----------------------------------------- END: Folder Watch ---------------------------------------------------------
+
+
+# ----------------------------------------- START: Control Registry ---------------------------------------------------
+
+# job_id -> control of the job running (or queued) in this worker process
+_controls: dict[str, JobControl] = {}
+# jobs folder -> watch in the event loop of its jobs
+_watches: dict[str, _ControlFolderWatch] = {}
+_controls_lock = threading.Lock()
+
+def register_job_control(job_id: str, jobs_folder: str) -> JobControl:
+  """
+  Register a job for control requests. Control files that already exist are picked up. Control files of other worker
+  processes are only watched if called in a running event loop (scripts without event loop: API control only).
+  """
+  control = JobControl(job_id, jobs_folder)
+  try: loop = asyncio.get_running_loop()
+  except RuntimeError: loop = None
+  with _controls_lock:
+    _controls[job_id] = control
+    watch = _watches.get(jobs_folder)
+    if loop is not None and (watch is None or watch.loop is not loop):
+      # No watch yet or watch of a previous event loop (e.g. scripts calling asyncio.run() repeatedly)
+      if watch is not None and not watch.loop.is_closed(): _call_in_loop(watch.loop, watch.stop)
+      _watches[jobs_folder] = _ControlFolderWatch(jobs_folder, loop)
+  for action in ("pause", "resume", "cancel"):
+    control_file_path = os.path.join(jobs_folder, f"[{job_id}].{action}_requested")
+    if os.path.exists(control_file_path): control.request(action, control_file_path)
+  return control
+
+def unregister_job_control(control: JobControl) -> None:
+  with _controls_lock:
+    if _controls.get(control.job_id) is control: del _controls[control.job_id]
+    if any(other.jobs_folder == control.jobs_folder for other in _controls.values()): return
+    watch = _watches.pop(control.jobs_folder, None)
+  if watch is not None and not watch.loop.is_closed(): _call_in_loop(watch.loop, watch.stop)
+
+def get_job_control(job_id: str) -> Optional[JobControl]:
+  """Control of a job registered in this worker process, None if the job runs elsewhere or is finished."""
+  with _controls_lock: return _controls.get(job_id)
+
+def _signal_control_file(control_file_path: str) -> None:
+  match = _control_file_pattern.search(os.path.basename(control_file_path))
+  if not match: return
+  control = get_job_control(match.group(1))
+  if control is not None: control.request(match.group(2), control_file_path)
+
+# ----------------------------------------- END: Control Registry -----------------------------------------------------
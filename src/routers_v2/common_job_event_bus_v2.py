@@ -0,0 +1,154 @@
+# Job Event Bus V2 - In-process broadcast of job SSE events for /v2/jobs/monitor?format=stream
+# StreamingJobWriter publishes every event it writes to its job file to the channel of its job_id. Monitors in the same
+# worker process subscribe to the channel instead of reading the job file: the job file is only read once for the
+# events written before the monitor joined. The job file stays the source of truth, jobs of other worker processes
+# are followed via the job file (see follow_job_log in common_job_monitor_functions_v2).
+
+import asyncio, collections, os, threading
+from typing import Optional
+
+# Events buffered per subscriber. A subscriber that falls behind further re-joins from the job file.
+SUBSCRIBER_RING_SIZE = 1000
+# Text mode file handles write '\n' as os.linesep
+_LINESEP_EXTRA_BYTES = len(os.linesep) - 1
+
+
+def get_file_length(text: str) -> int:
+  """Bytes text takes in a job file written in text mode (UTF-8, newline translation)."""
+  length = len(text.encode("utf-8"))
+  return length + text.count("\n") * _LINESEP_EXTRA_BYTES if _LINESEP_EXTRA_BYTES else length
+
+
+# ----------------------------------------- START: JobEventSubscription Class -----------------------------------------
+
+class JobEventSubscription:
+  """
+  Bounded ring of live events for one subscriber, bound to the event loop that created it. Events can be published
+  from any thread. On overflow the ring is cleared and the subscription is marked lagged: events are never dropped
+  silently, the subscriber re-joins with JobEventChannel.subscribe() and replays the missed events from the job file.
+  """
+
+  def __init__(self, channel: "JobEventChannel", ring_size: int):
+    self._channel = channel
+    self._ring_size = ring_size
+    self._events: collections.deque[str] = collections.deque()
+    self._loop = asyncio.get_running_loop()
+    self._wake = asyncio.Event()
+    self.lagged = False
+    self.closed = False
+
+  def _push(self, text: str) -> None:
+    """Called by the channel while holding its lock."""
+    if self.lagged: return
+    if len(self._events) >= self._ring_size:
+      self._events.clear()
+      self.lagged = True
+    else:
+      self._events.append(text)
+    self._notify()
+
+  def _close(self) -> None:
+    self.closed = True
+    self._notify()
+
+  def _notify(self) -> None:
+    try: running_loop = asyncio.get_running_loop()
+    except RuntimeError: running_loop = None
+    if running_loop is self._loop: self._wake.set()
+    else:
+      try: self._loop.call_soon_threadsafe(self._wake.set)
+      except RuntimeError: pass  # Subscriber loop closed
+
+  async def get_events(self) -> tuple[list[str], bool, bool]:
+    """Wait for events. Returns (events, lagged, closed). Remaining events are returned together with closed=True."""
+    while True:
+      self._wake.clear()
+      with self._channel._lock:
+        events = list(self._events)
+        self._events.clear()
+        lagged, closed = self.lagged, self.closed
+      if events or lagged or closed: return events, lagged, closed
+      await self._wake.wait()
+
+# ----------------------------------------- END: JobEventSubscription Class -------------------------------------------
+
+
+# ----------------------------------------- START: JobEventChannel Class ----------------------------------------------
+
+class JobEventChannel:
+  """
+  Live events of one job. The writer publishes each event when it is emitted (file order) and reports the bytes
+  written to the job file after each write. Events emitted but not yet written (writer buffer) are kept until written,
+  so subscribe() returns a consistent snapshot: job file content up to written_bytes + pending events + live events.
+
+  Usage (writer, while holding its buffer lock):
+    channel = open_job_event_channel(job_id, job_file_path)
+    channel.publish(sse)
+    channel.set_written(written_bytes)
+    channel.close()
+  """
+
+  def __init__(self, job_id: str, job_file_path: str):
+    self.job_id = job_id
+    self.job_file_path = job_file_path
+    self.written_bytes = 0
+    self.closed = False
+    self._pending: list[str] = []
+    self._subscriptions: set[JobEventSubscription] = set()
+    self._lock = threading.Lock()
+
+  def publish(self, text: str) -> None:
+    with self._lock:
+      if self.closed: return
+      self._pending.append(text)
+      for subscription in self._subscriptions: subscription._push(text)
+
+  def set_written(self, written_bytes: int) -> None:
+    """All published events are written to the job file, which is now written_bytes long."""
+    with self._lock:
+      self.written_bytes = written_bytes
+      self._pending.clear()
+
+  def set_path(self, job_file_path: str) -> None:
+    """Job file was renamed (state change)."""
+    with self._lock: self.job_file_path = job_file_path
+
+  def subscribe(self, ring_size: Optional[int] = None) -> tuple[JobEventSubscription, int, list[str]]:
+    """Register a subscriber. Returns (subscription, written_bytes, pending): job file content before written_bytes and the pending events precede the live events."""
+    subscription = JobEventSubscription(self, ring_size or SUBSCRIBER_RING_SIZE)
+    with self._lock:
+      if self.closed: subscription.closed = True
+      else: self._subscriptions.add(subscription)
+      return subscription, self.written_bytes, list(self._pending)
+
+  def unsubscribe(self, subscription: JobEventSubscription) -> None:
+    with self._lock: self._subscriptions.discard(subscription)
+
+  def close(self) -> None:
+    """Job finished and its job file is final. Subscribers receive the remaining events, then the end of the stream."""
+    with self._lock:
+      self.closed = True
+      for subscription in self._subscriptions: subscription._close()
+      self._subscriptions.clear()
+    with _channels_lock:
+      if _channels.get(self.job_id) is self: del _channels[self.job_id]
+
+# ----------------------------------------- END: JobEventChannel Class ------------------------------------------------
+
+
+# ----------------------------------------- START: Channel Registry ---------------------------------------------------
+
+# job_id -> channel of the job running in this worker process
+_channels: dict[str, JobEventChannel] = {}
+_channels_lock = threading.Lock()
+
+def open_job_event_channel(job_id: str, job_file_path: str) -> JobEventChannel:
+  channel = JobEventChannel(job_id, job_file_path)
+  with _channels_lock: _channels[job_id] = channel
+  return channel
+
+def get_job_event_channel(job_id: str) -> Optional[JobEventChannel]:
+  """Channel of a job running in this worker process, None if the job runs elsewhere or is finished."""
+  with _channels_lock: return _channels.get(job_id)
+
+# ----------------------------------------- END: Channel Registry -----------------------------------------------------
@@ -1,12 +1,15 @@
 # Streaming Jobs V2 - Buffered writer for streaming job files
 # Implements StreamingJobWriter class and job management functions per _V2_SPEC_ROUTERS.md specification
 
-import asyncio, datetime, glob, json, os, re
-from dataclasses import dataclass
+import asyncio, datetime, glob, gzip, json, os, re, threading
+from dataclasses import asdict, dataclass
 from enum import Enum
 from typing import Any, Literal, Optional
 
 from hardcoded_config import CRAWLER_HARDCODED_CONFIG
+from routers_v2.common_job_catalog_functions_v2 import JobCatalog
+from routers_v2.common_job_control_v2 import JobControl, get_job_control, register_job_control, unregister_job_control
+from routers_v2.common_job_event_bus_v2 import JobEventChannel, get_file_length, open_job_event_channel
 
 # Type definitions
 JobState = Literal["running", "paused", "completed", "cancelled"]
@@ -15,6 +18,9 @@ ControlState = Literal["pause_requested", "resume_requested", "cancel_requested"
 # Job file extensions
 JOB_STATES = ["running", "paused", "completed", "cancelled"]
 CONTROL_STATES = ["pause_requested", "resume_requested", "cancel_requested"]
+# Completed and cancelled job files can be gzip-compressed by job retention: [...].completed.gz
+COMPRESSED_JOB_FILE_EXTENSION = ".gz"
+JOB_FILE_EXTENSIONS = JOB_STATES + [f"{state}{COMPRESSED_JOB_FILE_EXTENSION}" for state in ["completed", "cancelled"]]
 
 @dataclass
 class JobMetadata:
@@ -53,13 +59,15 @@ class StreamingJobWriter:
     writer.finalize()
   """
   
-  def __init__(self, persistent_storage_path: str, router_name: str, action: str, object_id: Optional[str], source_url: str, router_prefix: str, buffer_size: int = None):
+  def __init__(self, persistent_storage_path: str, router_name: str, action: str, object_id: Optional[str], source_url: str, router_prefix: str, buffer_size: int = None, state: JobState = "running", job_file_path: Optional[str] = None):
     """
     Create job file and initialize writer (V2JB-FR-02: atomic creation).
     - router_prefix: Injected from app.py (e.g., '/v2') for constructing monitor_url
     - Generates unique job_id (jb_[NUMBER])
     - Creates job file: [TIMESTAMP]_[[ACTION]]_[[JB_ID]]_[[OBJECT_ID]].running
     - Retries with new job_id on collision
+    - state='paused': job file is created as .paused (queued job, see common_job_runner_functions_v2)
+    - job_file_path: attach to an existing job file instead (queued job taken over from another worker process)
     """
     self._persistent_storage_path = persistent_storage_path
     self._router_name = router_name
@@ -76,29 +84,41 @@ class StreamingJobWriter:
     self._sse_queue: list[str] = []  # Queue for SSE events to be yielded by outer generator
     self._crawl_results: Optional[dict] = None  # FIX-04: Store results from async generator
     self._step_result: Any = None  # Store result from async generator step functions
+    self._result: Optional[dict] = None  # result of end_json
+    self._last_data_line: Optional[str] = None  # Last data line written (job catalog summary)
+    self._job_number: int = 0
     self._job_id: str = ""
     self._job_file_path: str = ""
     self._file_handle = None
+    self._written_bytes = 0  # Bytes written to the job file
+    self._event_channel: Optional[JobEventChannel] = None  # Live events for monitors in this process
+    self._control: Optional[JobControl] = None  # Pause/resume/cancel requests
+    # Log events can be emitted from worker threads (blocking SharePoint calls run via asyncio.to_thread)
+    self._buffer_lock = threading.RLock()
+    # Shared by all SourceStepWriter views of this writer (concurrent crawl sources)
+    self._source_control_lock: Optional[asyncio.Lock] = None
+    self._source_cancel_received = False
     
     # Create job directory
     self._jobs_folder = os.path.join(persistent_storage_path, CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_PATH_JOBS_SUBFOLDER, router_name)
     os.makedirs(self._jobs_folder, exist_ok=True)
     
     # Generate job file with collision retry (V2JB-FR-02)
-    self._create_job_file()
+    if job_file_path: self._attach_job_file(job_file_path)
+    else: self._create_job_file(state)
   
-  def _create_job_file(self) -> None:
+  def _create_job_file(self, state: JobState = "running") -> None:
     """Create job file with atomic creation and collision retry."""
     max_retries = 5
     for attempt in range(max_retries):
-      job_number = generate_job_number(self._persistent_storage_path)
-      self._job_id = f"jb_{job_number}"
+      self._job_number = generate_job_number(self._persistent_storage_path)
+      self._job_id = f"jb_{self._job_number}"
       
       timestamp = self._started_utc.strftime("%Y-%m-%d_%H-%M-%S")
       if self._object_id:
-        filename = f"{timestamp}_[{self._action}]_[{self._job_id}]_[{self._object_id}].running"
+        filename = f"{timestamp}_[{self._action}]_[{self._job_id}]_[{self._object_id}].{state}"
       else:
-        filename = f"{timestamp}_[{self._action}]_[{self._job_id}].running"
+        filename = f"{timestamp}_[{self._action}]_[{self._job_id}].{state}"
       
       self._job_file_path = os.path.join(self._jobs_folder, filename)
       
@@ -106,17 +126,54 @@ class StreamingJobWriter:
         # Exclusive creation (V2JB-FR-02)
         fd = os.open(self._job_file_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
         self._file_handle = os.fdopen(fd, 'w', encoding='utf-8')
+        self._event_channel = open_job_event_channel(self._job_id, self._job_file_path)
+        self._control = register_job_control(self._job_id, self._jobs_folder)
+        self._update_catalog()
         return
       except FileExistsError:
         continue
     
     raise RuntimeError(f"Failed to create job file after {max_retries} attempts")
   
+  def _attach_job_file(self, job_file_path: str) -> None:
+    """Continue writing an existing job file (start_json already written). Raises FileNotFoundError if it does not exist."""
+    metadata = _parse_job_file(job_file_path)
+    if metadata is None: raise FileNotFoundError(f"Job file '{job_file_path}' not found or has no start_json")
+    self._job_id = metadata.job_id
+    self._job_number = int(self._job_id[3:])
+    self._started_utc = datetime.datetime.strptime(metadata.started_utc, "%Y-%m-%dT%H:%M:%S.%fZ").replace(tzinfo=datetime.timezone.utc)
+    self._job_file_path = job_file_path
+    self._file_handle = open(job_file_path, 'a', encoding='utf-8')
+    self._written_bytes = os.path.getsize(job_file_path)
+    self._event_channel = open_job_event_channel(self._job_id, job_file_path)
+    self._event_channel.set_written(self._written_bytes)
+    self._control = register_job_control(self._job_id, self._jobs_folder)
+  
   @property
   def job_id(self) -> str:
     """Returns job_id string, e.g., 'jb_42'."""
     return self._job_id
   
+  @property
+  def job_file_path(self) -> str:
+    """Current path of the job file (changes with the job state)."""
+    return self._job_file_path
+  
+  @property
+  def final_state(self) -> Optional[JobState]:
+    """'completed' or 'cancelled' once end_json was emitted, else None."""
+    return self._final_state
+  
+  @property
+  def control(self) -> JobControl:
+    """Pause/resume/cancel requests of this job (see common_job_control_v2)."""
+    return self._control
+  
+  @property
+  def source_cancel_received(self) -> bool:
+    """True once any SourceStepWriter view of this writer received ControlAction.CANCEL."""
+    return self._source_cancel_received
+  
   @property
   def monitor_url(self) -> str:
     """Returns monitor URL: {router_prefix}/jobs/monitor?job_id={job_id}&format=stream"""
@@ -125,6 +182,7 @@ class StreamingJobWriter:
   def _format_sse_event(self, event_type: str, data: str) -> str:
     """Format SSE event with event type and data lines."""
     lines = data.split('\n')
+    self._last_data_line = lines[-1]
     sse_lines = [f"event: {event_type}"]
     for line in lines:
       sse_lines.append(f"data: {line}")
@@ -149,7 +207,7 @@ class StreamingJobWriter:
     Emit start_json event. Immediate flush to file (V2JB-FR-03, V2JB-IG-01).
     Returns SSE-formatted string for HTTP response.
     """
-    metadata = self._get_job_metadata("running")
+    metadata = self._get_job_metadata(self._get_file_state())
     sse = self._format_sse_event("start_json", json.dumps(metadata))
     self._write_immediate(sse)
     return sse
@@ -162,16 +220,18 @@ class StreamingJobWriter:
     Returns SSE-formatted string for HTTP response.
     """
     sse = self._format_sse_event("log", message)
-    self._write_buffered(sse)
-    self._sse_queue.append(sse)  # Queue for outer generator
+    with self._buffer_lock:
+      self._write_buffered(sse)
+      self._sse_queue.append(sse)  # Queue for outer generator
     return sse
   
   def drain_sse_queue(self) -> list[str]:
     """
     Return and clear queued SSE events. Called by outer generator after await calls.
     """
-    events = self._sse_queue.copy()
-    self._sse_queue.clear()
+    with self._buffer_lock:
+      events = self._sse_queue.copy()
+      self._sse_queue.clear()
     return events
   
   def set_crawl_results(self, results: dict) -> None:
@@ -219,108 +279,104 @@ class StreamingJobWriter:
     
     self._flush_buffer()
     self._write_immediate(sse)
+    self._result = result
+    self._update_catalog()
     return sse
   
   def _write_immediate(self, content: str) -> None:
-    """Write content immediately to file."""
-    if self._file_handle:
-      self._file_handle.write(content)
-      self._file_handle.flush()
+    """Write content immediately to file, after the buffered content (file order = emit order)."""
+    with self._buffer_lock:
+      if self._event_channel: self._event_channel.publish(content)
+      self._buffer.append(content)
+      self._flush_buffer()
   
   def _write_buffered(self, content: str) -> None:
     """Add content to buffer, flush if buffer size reached."""
+    if self._event_channel: self._event_channel.publish(content)
     self._buffer.append(content)
     if len(self._buffer) >= self._buffer_size:
       self._flush_buffer()
   
   def _flush_buffer(self) -> None:
     """Flush buffer to file."""
-    if self._buffer and self._file_handle:
-      self._file_handle.write(''.join(self._buffer))
-      self._file_handle.flush()
-      self._buffer.clear()
+    with self._buffer_lock:
+      if self._buffer and self._file_handle:
+        content = ''.join(self._buffer)
+        self._file_handle.write(content)
+        self._file_handle.flush()
+        self._buffer.clear()
+        self._written_bytes += get_file_length(content)
+        if self._event_channel: self._event_channel.set_written(self._written_bytes)
   
   async def check_control(self):
     """
-    Async generator: check for control files and handle pause loop (V2JB-FR-04, V2JB-FR-05).
-    - Flushes buffer before checking
-    - If pause_requested: yields pause log, enters async pause loop, renames to .paused
+    Async generator: handle control requests and the pause loop (V2JB-FR-04, V2JB-FR-05).
+    - No pending request (nearly every call): returns immediately, no file system access
     - If cancel_requested: yields ControlAction.CANCEL
+    - If pause_requested: flushes buffer, yields pause log, renames to .paused and waits for resume or cancel
     - If resume_requested (while paused): yields resume log, renames to .running
     Yields: SSE-formatted strings for pause/resume, or ControlAction.CANCEL
     """
-    self._flush_buffer()
+    control = self._control
+    if not control.has_requests(): return
     
     # Check for cancel first (highest priority)
-    cancel_file = self._find_control_file("cancel_requested")
-    if cancel_file:
-      os.unlink(cancel_file)
+    if control.take("cancel"):
       yield self.emit_state("cancelled")
       yield ControlAction.CANCEL
       return
     
     # Check for pause
-    pause_file = self._find_control_file("pause_requested")
-    if pause_file:
-      os.unlink(pause_file)
+    if not control.take("pause"): return
+    
+    # Emit state event first (for UI), then log event (for humans)
+    yield self.emit_state("paused")
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    sse = self.emit_log(f"[{timestamp}] Pause requested, pausing...")
+    yield sse
+    self._flush_buffer()
+    
+    # Rename to .paused
+    self._set_file_state("paused")
+    
+    # Enter pause loop (V2JB-FR-05): sleeps until a resume or cancel request arrives
+    while True:
+      await control.wait("resume", "cancel")
       
-      # Emit state event first (for UI), then log event (for humans)
-      yield self.emit_state("paused")
-      timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-      sse = self.emit_log(f"[{timestamp}] Pause requested, pausing...")
-      yield sse
-      self._flush_buffer()
+      # Check for cancel while paused
+      if control.take("cancel"):
+        yield self.emit_state("cancelled")
+        yield ControlAction.CANCEL
+        return
       
-      # Rename to .paused
-      paused_path = self._job_file_path.replace(".running", ".paused")
+      # Check for resume
+      if control.take("resume"):
+        # Emit state event first (for UI), then log event (for humans)
+        yield self.emit_state("running")
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        sse = self.emit_log(f"[{timestamp}] Resume requested, resuming...")
+        yield sse
+        self._flush_buffer()
+        
+        # Rename to .running
+        self._set_file_state("running")
+        break
+  
+  def _get_file_state(self) -> str:
+    return os.path.splitext(self._job_file_path)[1][1:]
+  
+  def _set_file_state(self, state: JobState) -> None:
+    """Rename the job file to a new state extension (.running <-> .paused) and reopen it for appending."""
+    with self._buffer_lock:
+      self._flush_buffer()
+      new_path = re.sub(r'\.(running|paused)$', f'.{state}', self._job_file_path)
+      if new_path == self._job_file_path: return
       self._close_file()
-      os.rename(self._job_file_path, paused_path)
-      self._job_file_path = paused_path
+      os.rename(self._job_file_path, new_path)
+      self._job_file_path = new_path
       self._file_handle = open(self._job_file_path, 'a', encoding='utf-8')
-      
-      # Enter pause loop (V2JB-FR-05)
-      while True:
-        await asyncio.sleep(1.0)
-        
-        # Check for cancel while paused
-        cancel_file = self._find_control_file("cancel_requested")
-        if cancel_file:
-          os.unlink(cancel_file)
-          yield self.emit_state("cancelled")
-          yield ControlAction.CANCEL
-          return
-        
-        # Check for resume
-        resume_file = self._find_control_file("resume_requested")
-        if resume_file:
-          os.unlink(resume_file)
-          
-          # Emit state event first (for UI), then log event (for humans)
-          yield self.emit_state("running")
-          timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-          sse = self.emit_log(f"[{timestamp}] Resume requested, resuming...")
-          yield sse
-          self._flush_buffer()
-          
-          # Rename to .running
-          running_path = self._job_file_path.replace(".paused", ".running")
-          self._close_file()
-          os.rename(self._job_file_path, running_path)
-          self._job_file_path = running_path
-          self._file_handle = open(self._job_file_path, 'a', encoding='utf-8')
-          break
-  
-  def _find_control_file(self, control_type: str) -> Optional[str]:
-    """Find control file matching this job_id. Escapes brackets for glob pattern."""
-    # Escape [ and ] in glob pattern: [[] matches literal [, []] matches literal ]
-    pattern = os.path.join(self._jobs_folder, f"*[[]{self._job_id}[]]*.{control_type}")
-    files = glob.glob(pattern)
-    if files: return files[0]
-    
-    # Also check simpler pattern without object_id
-    pattern = os.path.join(self._jobs_folder, f"[[]{self._job_id}[]].{control_type}")
-    files = glob.glob(pattern)
-    return files[0] if files else None
+      if self._event_channel: self._event_channel.set_path(new_path)
+    self._update_catalog()
   
   def _close_file(self) -> None:
     """Close file handle if open."""
@@ -333,6 +389,7 @@ class StreamingJobWriter:
     Finalize job file state (V2JB-FR-06, V2JB-FR-07).
     - If end_json emitted: rename to .completed or .cancelled
     - Flushes any remaining buffer
+    - Closes the job event channel (ends the streams of monitors in this process) and unregisters job control
     Called automatically in finally block.
     """
     self._flush_buffer()
@@ -344,6 +401,68 @@ class StreamingJobWriter:
       if final_path != self._job_file_path:
         os.rename(self._job_file_path, final_path)
         self._job_file_path = final_path
+        self._update_catalog()
+    
+    # Monitors of this job end after the remaining events
+    if self._event_channel:
+      self._event_channel.set_path(self._job_file_path)
+      self._event_channel.close()
+      self._event_channel = None
+    if self._control:
+      unregister_job_control(self._control)
+
+  def _update_catalog(self) -> None:
+    """Write the current job state to the job catalog. Errors are ignored: the catalog picks up the job file on its next sync."""
+    catalog = get_job_catalog(self._persistent_storage_path)
+    if catalog is None: return
+    file_state = self._get_file_state()
+    now_utc = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    metadata = self._get_job_metadata(self._final_state or file_state, self._result)
+    try: catalog.upsert_job({**metadata, "job_number": self._job_number, "router": self._router_name, "file_name": os.path.basename(self._job_file_path), "last_modified_utc": now_utc, "last_log": self._last_data_line, "log_bytes": self._written_bytes})
+    except Exception: _drop_job_catalog(self._persistent_storage_path)
+
+
+class SourceStepWriter:
+  """
+  Per-source view of a StreamingJobWriter, used when crawl sources run concurrently.
+  Log events, SSE queue and job file are shared with the underlying writer; step results are stored per source.
+  check_control() is serialized across all views of the same writer: while one source is in the pause loop the others
+  wait for it, and once any source received ControlAction.CANCEL, every source receives it on its next check.
+  All other attributes are delegated to the underlying writer.
+
+  Usage:
+    source_writer = SourceStepWriter(writer)
+    async for sse in step_download_source(..., source_writer, ...): yield sse
+    download_result = source_writer.get_step_result()
+  """
+
+  def __init__(self, writer: StreamingJobWriter):
+    self._writer = writer
+    self._step_result: Any = None
+
+  def __getattr__(self, name: str):
+    return getattr(self._writer, name)
+
+  def set_step_result(self, result: Any) -> None:
+    self._step_result = result
+
+  def get_step_result(self) -> Any:
+    result = self._step_result
+    self._step_result = None
+    return result
+
+  async def check_control(self):
+    writer = self._writer
+    if writer._source_control_lock is None: writer._source_control_lock = asyncio.Lock()
+    # Fast path: no control request and no other source in the pause loop
+    if not writer._source_cancel_received and not writer._source_control_lock.locked() and not writer.control.has_requests(): return
+    async with writer._source_control_lock:
+      if writer._source_cancel_received:
+        yield ControlAction.CANCEL
+        return
+      async for control in writer.check_control():
+        if control == ControlAction.CANCEL: writer._source_cancel_received = True
+        yield control
 
 
 # ----------------------------------------- START: SSE Streaming Utility ------------------------------------------------
@@ -375,13 +494,24 @@ async def stream_with_flush(generator):
 # ----------------------------------------- START: Standalone functions for /v2/jobs endpoints --------------------------
 
 def generate_job_id(persistent_storage_path: str) -> str:
-  """Generate next job ID: 'jb_[NUMBER]'. Scans existing files to find max."""
+  """Generate next job ID: 'jb_[NUMBER]'. Allocated from the job catalog."""
   return f"jb_{generate_job_number(persistent_storage_path)}"
 
 def generate_job_number(persistent_storage_path: str) -> int:
   """
-  Generate next job number by scanning existing files to find max.
+  Generate next job number from the job catalog (O(1), numbers of deleted jobs are not reused).
   Returns integer for use in 'jb_[NUMBER]' format.
+  Falls back to scanning the job files if the catalog is not available.
+  """
+  catalog = get_job_catalog(persistent_storage_path)
+  if catalog is not None:
+    try: return catalog.allocate_job_number()
+    except Exception: _drop_job_catalog(persistent_storage_path)
+  return _scan_job_number(persistent_storage_path)
+
+def _scan_job_number(persistent_storage_path: str) -> int:
+  """
+  Generate next job number by scanning existing files to find max.
   Scans most recent 1000 files for performance.
   """
   jobs_folder = os.path.join(persistent_storage_path, CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_PATH_JOBS_SUBFOLDER)
@@ -389,7 +519,7 @@ def generate_job_number(persistent_storage_path: str) -> int:
   
   # Find all job files recursively
   all_files = []
-  for ext in JOB_STATES:
+  for ext in JOB_FILE_EXTENSIONS:
     all_files.extend(glob.glob(os.path.join(jobs_folder, "**", f"*.{ext}"), recursive=True))
   
   if not all_files: return 1
@@ -413,10 +543,20 @@ def generate_job_number(persistent_storage_path: str) -> int:
 
 def find_job_file(persistent_storage_path: str, job_id: str) -> Optional[str]:
   """Find job file path by job_id across all routers. Returns path or None."""
+  catalog = get_job_catalog(persistent_storage_path)
+  if catalog is not None:
+    try:
+      record = _get_catalog_job(persistent_storage_path, catalog, job_id)
+      return _get_catalog_job_path(persistent_storage_path, record) if record else None
+    except Exception: _drop_job_catalog(persistent_storage_path)
+  return _scan_job_file(persistent_storage_path, job_id)
+
+def _scan_job_file(persistent_storage_path: str, job_id: str) -> Optional[str]:
+  """Find job file path by globbing all router folders."""
   jobs_folder = os.path.join(persistent_storage_path, CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_PATH_JOBS_SUBFOLDER)
   if not os.path.exists(jobs_folder): return None
   
-  for ext in JOB_STATES:
+  for ext in JOB_FILE_EXTENSIONS:
     # Pattern: *_[{job_id}]_*.{ext} or *_[{job_id}].{ext}
     pattern = os.path.join(jobs_folder, "**", f"*[[]{job_id}[]]*.{ext}")
     files = glob.glob(pattern, recursive=True)
@@ -436,13 +576,14 @@ def _parse_job_file(filepath: str) -> Optional[JobMetadata]:
   mtime = os.path.getmtime(filepath)
   last_modified_utc = datetime.datetime.fromtimestamp(mtime, tz=datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
   
-  with open(filepath, 'r', encoding='utf-8') as f:
-    content = f.read()
+  content = read_job_file(filepath)
   
   # Extract state from file extension
-  ext = filepath.split('.')[-1]
-  state: JobState = ext if ext in JOB_STATES else "running"
-  
+  state: JobState = get_job_file_state(filepath) or "running"
+  return _parse_job_content(content, state, last_modified_utc)
+
+def _parse_job_content(content: str, state: JobState, last_modified_utc: str) -> Optional[JobMetadata]:
+  """Metadata from the start_json and end_json events of job file content."""
   # Parse start_json
   start_match = re.search(r'event: start_json\ndata: (.+?)(?=\n\n)', content, re.DOTALL)
   if not start_match: return None
@@ -474,12 +615,31 @@ def _parse_job_file(filepath: str) -> Optional[JobMetadata]:
 
 def find_job_by_id(persistent_storage_path: str, job_id: str) -> Optional[JobMetadata]:
   """Find job across all routers. Returns JobMetadata or None."""
-  filepath = find_job_file(persistent_storage_path, job_id)
+  catalog = get_job_catalog(persistent_storage_path)
+  if catalog is not None:
+    try:
+      record = _get_catalog_job(persistent_storage_path, catalog, job_id)
+      return _catalog_record_to_metadata(persistent_storage_path, record) if record else None
+    except Exception: _drop_job_catalog(persistent_storage_path)
+  filepath = _scan_job_file(persistent_storage_path, job_id)
   if not filepath: return None
   return _parse_job_file(filepath)
 
-def list_jobs(persistent_storage_path: str, router_filter: str = None, state_filter: str = None) -> list[JobMetadata]:
-  """List all jobs. Returns list of JobMetadata, newest first."""
+def list_jobs(persistent_storage_path: str, router_filter: str = None, state_filter: str = None, offset: int = 0, limit: Optional[int] = None) -> list[JobMetadata]:
+  """List jobs from the job catalog. Returns list of JobMetadata, newest first, optionally paginated (offset, limit)."""
+  if state_filter and state_filter not in JOB_STATES: state_filter = None
+  catalog = get_job_catalog(persistent_storage_path)
+  if catalog is not None:
+    try:
+      sync_job_catalog(persistent_storage_path, catalog)
+      records = catalog.list_jobs(router_filter, state_filter, offset, limit)
+      return [_catalog_record_to_metadata(persistent_storage_path, record) for record in records]
+    except Exception: _drop_job_catalog(persistent_storage_path)
+  jobs = _scan_jobs(persistent_storage_path, router_filter, state_filter)
+  return jobs[max(0, offset):][:limit] if limit is not None else jobs[max(0, offset):]
+
+def _scan_jobs(persistent_storage_path: str, router_filter: str = None, state_filter: str = None) -> list[JobMetadata]:
+  """List all jobs by globbing and parsing every job file, newest first."""
   jobs_folder = os.path.join(persistent_storage_path, CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_PATH_JOBS_SUBFOLDER)
   if not os.path.exists(jobs_folder): return []
   
@@ -492,7 +652,7 @@ def list_jobs(persistent_storage_path: str, router_filter: str = None, state_fil
   # Find all job files
   all_files = []
   states_to_search = [state_filter] if state_filter and state_filter in JOB_STATES else JOB_STATES
-  for ext in states_to_search:
+  for ext in [ext for ext in JOB_FILE_EXTENSIONS if get_job_file_state(ext) in states_to_search]:
     all_files.extend(glob.glob(os.path.join(search_path, "**", f"*.{ext}"), recursive=True))
   
   # Sort by modification time (newest first)
@@ -511,12 +671,20 @@ def get_job_metadata(persistent_storage_path: str, job_id: str) -> Optional[JobM
   return find_job_by_id(persistent_storage_path, job_id)
 
 def read_job_log(persistent_storage_path: str, job_id: str) -> str:
-  """Read full SSE content from job file for monitoring."""
+  """Read full SSE content from job file for monitoring (compressed job files are decompressed)."""
   filepath = find_job_file(persistent_storage_path, job_id)
   if not filepath: return ""
-  
-  with open(filepath, 'r', encoding='utf-8') as f:
-    return f.read()
+  return read_job_file(filepath)
+
+def read_job_last_log(persistent_storage_path: str, job_id: str) -> str:
+  """Last data line of the job log. Completed and cancelled jobs: from the job catalog summary, without reading the job file."""
+  catalog = get_job_catalog(persistent_storage_path)
+  if catalog is not None:
+    try:
+      record = _get_catalog_job(persistent_storage_path, catalog, job_id)
+      if record and record["state"] in ["completed", "cancelled"] and record["last_log"] is not None: return record["last_log"]
+    except Exception: _drop_job_catalog(persistent_storage_path)
+  return get_last_log_line(read_job_log(persistent_storage_path, job_id))
 
 def read_job_result(persistent_storage_path: str, job_id: str) -> Optional[dict]:
   """Extract result from end_json. Returns None if job not completed/cancelled."""
@@ -539,9 +707,12 @@ def create_control_file(persistent_storage_path: str, job_id: str, action: str)
   try:
     with open(control_filepath, 'w', encoding='utf-8') as f:
       f.write(f"{action}\n{datetime.datetime.now(datetime.timezone.utc).isoformat()}\n")
-    return True
   except Exception:
     return False
+  # Job running in this worker process: signal it directly (other worker processes pick up the control file)
+  control = get_job_control(job_id)
+  if control is not None: control.request(action, control_filepath)
+  return True
 
 def delete_job(persistent_storage_path: str, job_id: str) -> bool:
   """Delete job file. Returns True if deleted."""
@@ -550,9 +721,10 @@ def delete_job(persistent_storage_path: str, job_id: str) -> bool:
   
   try:
     os.unlink(filepath)
-    return True
   except Exception:
     return False
+  _update_catalog_job(persistent_storage_path, job_id, None)
+  return True
 
 def force_cancel_job(persistent_storage_path: str, job_id: str) -> bool:
   """Force cancel a stalled/paused job by directly renaming to .cancelled. Returns True if successful."""
@@ -581,8 +753,153 @@ def force_cancel_job(persistent_storage_path: str, job_id: str) -> bool:
   new_filepath = filepath[:-old_ext_len] + '.cancelled'
   try:
     os.rename(filepath, new_filepath)
-    return True
   except Exception:
     return False
+  # last_log=None: the summary of the writer is outdated, read_job_last_log() reads the job file
+  _update_catalog_job(persistent_storage_path, job_id, {"state": "cancelled", "file_name": os.path.basename(new_filepath), "last_log": None})
+  return True
 
 # ----------------------------------------- END: Standalone functions for /v2/jobs endpoints ----------------------------
+
+
+# ----------------------------------------- START: Job File Functions ---------------------------------------------------
+
+def get_job_file_state(file_name: str) -> Optional[JobState]:
+  """State of a job file from its extension ('.completed' and '.completed.gz' -> 'completed'), None if not a job file."""
+  if file_name.endswith(COMPRESSED_JOB_FILE_EXTENSION): file_name = file_name[:-len(COMPRESSED_JOB_FILE_EXTENSION)]
+  state = file_name.rsplit('.', 1)[-1]
+  return state if state in JOB_STATES else None
+
+def is_compressed_job_file(filepath: str) -> bool:
+  return filepath.endswith(COMPRESSED_JOB_FILE_EXTENSION)
+
+def read_job_file(filepath: str) -> str:
+  """Content of a job file, compressed or not."""
+  if is_compressed_job_file(filepath):
+    with gzip.open(filepath, 'rt', encoding='utf-8') as f: return f.read()
+  with open(filepath, 'r', encoding='utf-8') as f:
+    return f.read()
+
+def get_last_log_line(log_content: str) -> str:
+  """Last data line of SSE log content ('' if none)."""
+  if not log_content: return ""
+  for line in reversed(log_content.strip().split('\n')):
+    if line.startswith('data: '): return line[6:]
+  return ""
+
+# ----------------------------------------- END: Job File Functions -----------------------------------------------------
+
+
+# ----------------------------------------- START: Job Catalog ----------------------------------------------------------
+
+# Jobs folder -> JobCatalog, opened once per worker process
+_job_catalogs: dict[str, JobCatalog] = {}
+_job_file_id_pattern = re.compile(r'\[(jb_(\d+))\]')
+
+def get_job_catalog(persistent_storage_path: str) -> Optional[JobCatalog]:
+  """
+  Job catalog of the jobs folder (CRAWLER_HARDCODED_CONFIG.JOB_CATALOG_SQLITE). Synced with the job files when first
+  opened in this process (a new catalog is filled from all job files). None if it cannot be opened: callers scan the job files.
+  """
+  jobs_folder = os.path.join(persistent_storage_path, CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_PATH_JOBS_SUBFOLDER)
+  catalog = _job_catalogs.get(jobs_folder)
+  if catalog is not None: return catalog
+  try:
+    catalog = JobCatalog(os.path.join(jobs_folder, CRAWLER_HARDCODED_CONFIG.JOB_CATALOG_SQLITE))
+    sync_job_catalog(persistent_storage_path, catalog)
+  except Exception:
+    return None
+  _job_catalogs[jobs_folder] = catalog
+  return catalog
+
+def _drop_job_catalog(persistent_storage_path: str) -> None:
+  """Forget the catalog after an error (e.g. database deleted or locked), it is reopened on the next call."""
+  _job_catalogs.pop(os.path.join(persistent_storage_path, CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_PATH_JOBS_SUBFOLDER), None)
+
+def sync_job_catalog(persistent_storage_path: str, catalog: JobCatalog, force: bool = False) -> int:
+  """
+  Bring the catalog in line with the job files. Only router folders whose mtime changed since their last sync are
+  listed (renames, creates and deletes change it, appends do not); only job files whose name is not in the catalog are parsed.
+  force=True lists and parses all job files (rebuild). Returns the number of job records added, updated or removed.
+  """
+  jobs_folder = os.path.join(persistent_storage_path, CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_PATH_JOBS_SUBFOLDER)
+  if not os.path.exists(jobs_folder): return 0
+  folder_states = {} if force else catalog.get_folder_states()
+  changes = 0
+  routers_on_disk = set()
+  for entry in os.scandir(jobs_folder):
+    if not entry.is_dir(): continue
+    routers_on_disk.add(entry.name)
+    # mtime before listing: changes made while listing trigger another sync
+    mtime_ns = entry.stat().st_mtime_ns
+    if folder_states.get(entry.name) == mtime_ns: continue
+    known_file_names = catalog.get_router_file_names(entry.name)
+    upserts, seen = [], set()
+    for file_name in os.listdir(entry.path):
+      match = _job_file_id_pattern.search(file_name)
+      state = get_job_file_state(file_name)
+      if not match or state is None: continue
+      job_id = match.group(1)
+      seen.add(job_id)
+      if not force and known_file_names.get(job_id) == file_name: continue
+      record = _read_catalog_record(os.path.join(entry.path, file_name), state)
+      # No start_json yet (job file just created): the writer adds the record itself
+      if record is None: continue
+      upserts.append({**record, "job_id": job_id, "job_number": int(match.group(2)), "router": entry.name, "file_name": file_name})
+    deleted_job_ids = [job_id for job_id in known_file_names if job_id not in seen]
+    catalog.apply_folder_sync(entry.name, mtime_ns, upserts, deleted_job_ids)
+    changes += len(upserts) + len(deleted_job_ids)
+  for router in catalog.get_routers():
+    if router in routers_on_disk: continue
+    deleted_job_ids = list(catalog.get_router_file_names(router))
+    catalog.apply_folder_sync(router, None, [], deleted_job_ids)
+    changes += len(deleted_job_ids)
+  return changes
+
+def _read_catalog_record(filepath: str, state: JobState) -> Optional[dict]:
+  """Catalog record fields of a job file: metadata and log summary. None if it has no start_json or is gone."""
+  try:
+    last_modified_utc = datetime.datetime.fromtimestamp(os.path.getmtime(filepath), tz=datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    content = read_job_file(filepath)
+  except (OSError, EOFError): return None
+  metadata = _parse_job_content(content, state, last_modified_utc)
+  if metadata is None: return None
+  return {**asdict(metadata), "last_log": get_last_log_line(content), "log_bytes": len(content.encode('utf-8'))}
+
+def rebuild_job_catalog(persistent_storage_path: str) -> dict:
+  """Re-read all job files into the job catalog. Returns {"jobs": count, "changes": count}."""
+  catalog = get_job_catalog(persistent_storage_path)
+  if catalog is None: raise RuntimeError("Job catalog could not be opened.")
+  changes = sync_job_catalog(persistent_storage_path, catalog, force=True)
+  return {"jobs": catalog.count_jobs(), "changes": changes}
+
+def _get_catalog_job(persistent_storage_path: str, catalog: JobCatalog, job_id: str) -> Optional[dict]:
+  """Catalog record of a job whose job file exists. Syncs the catalog if the job or its file is not found."""
+  record = catalog.get_job(job_id)
+  if record and os.path.exists(_get_catalog_job_path(persistent_storage_path, record)): return record
+  sync_job_catalog(persistent_storage_path, catalog)
+  record = catalog.get_job(job_id)
+  if record and os.path.exists(_get_catalog_job_path(persistent_storage_path, record)): return record
+  return None
+
+def _get_catalog_job_path(persistent_storage_path: str, record: dict) -> str:
+  return os.path.join(persistent_storage_path, CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_PATH_JOBS_SUBFOLDER, record["router"], record["file_name"])
+
+def _catalog_record_to_metadata(persistent_storage_path: str, record: dict) -> JobMetadata:
+  """JobMetadata of a catalog record. Running and paused jobs get the current job file mtime (stale job detection)."""
+  last_modified_utc = record["last_modified_utc"]
+  if record["state"] in ["running", "paused"]:
+    try: last_modified_utc = datetime.datetime.fromtimestamp(os.path.getmtime(_get_catalog_job_path(persistent_storage_path, record)), tz=datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    except OSError: pass
+  return JobMetadata(job_id=record["job_id"], state=record["state"], source_url=record["source_url"] or "", monitor_url=record["monitor_url"] or "", started_utc=record["started_utc"] or "", finished_utc=record["finished_utc"], last_modified_utc=last_modified_utc, result=record["result"])
+
+def _update_catalog_job(persistent_storage_path: str, job_id: str, changes: Optional[dict]) -> None:
+  """Update (changes=None: remove) a job in the catalog after changing its job file. Errors are ignored (next sync)."""
+  catalog = get_job_catalog(persistent_storage_path)
+  if catalog is None: return
+  try:
+    if changes is None: catalog.delete_jobs([job_id])
+    else: catalog.update_job(job_id, **changes)
+  except Exception: _drop_job_catalog(persistent_storage_path)
+
+# ----------------------------------------- END: Job Catalog ------------------------------------------------------------
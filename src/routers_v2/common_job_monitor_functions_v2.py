@@ -0,0 +1,252 @@
+# Job Monitor Functions V2 - Tail-follow of job files for /v2/jobs/monitor?format=stream
+# Jobs running in this worker process are followed via their job event channel (common_job_event_bus_v2).
+# Other jobs: one JobLogFollower per job keeps the job file open at its byte offset and fans appended content out to all subscribers.
+# Wakes on inotify events of the router jobs folder (Linux), polls the file on other platforms or if inotify is unavailable.
+
+import asyncio, codecs, os, re
+from typing import AsyncGenerator, Optional
+
+from routers_v2.common_inotify_watcher_v2 import InotifyWatcher, get_inotify_watcher
+from routers_v2.common_job_event_bus_v2 import JobEventChannel, get_file_length, get_job_event_channel
+from routers_v2.common_job_functions_v2 import JOB_STATES, is_compressed_job_file, read_job_file
+
+FINAL_JOB_STATES = ["completed", "cancelled"]
+# Poll interval without inotify
+POLL_INTERVAL_SECONDS = 0.5
+# Re-check interval with inotify, covers events that are never delivered (e.g. writes by another host on a network share)
+INOTIFY_RECHECK_SECONDS = 5.0
+# Windows cannot rename files that are open in another handle: the job file is only opened while reading
+KEEP_FILE_OPEN = os.name != "nt"
+
+
+# ----------------------------------------- START: JobLogFollower Class -----------------------------------------------
+
+def _split_job_file_path(job_file_path: str) -> tuple[str, str]:
+  """'.../2025-01-15_14-20-30_[crawl]_[jb_42].running' -> ('.../2025-01-15_14-20-30_[crawl]_[jb_42]', 'running')"""
+  stem, ext = os.path.splitext(job_file_path)
+  return stem, ext[1:]
+
+def _resolve_job_file_path(stem: str) -> Optional[str]:
+  """Current path of a job file after state renames (at most one stat per state, no glob), None if deleted."""
+  for state in JOB_STATES:
+    if os.path.exists(f"{stem}.{state}"): return f"{stem}.{state}"
+  return None
+
+class JobLogFollower:
+  """
+  Follows one job file from offset 0 to the end of the job and broadcasts appended content to all subscribers.
+  Only the bytes appended since the last read are read. State changes are taken from the file name after
+  StreamingJobWriter renames the job file (.running -> .paused -> .running -> .completed/.cancelled), the file
+  content is never parsed. The follower stops once the job file has a final state and is read to the end, or is deleted.
+  Use follow_job_log() instead of creating followers directly.
+  """
+
+  def __init__(self, job_file_path: str):
+    self._stem, self.state = _split_job_file_path(job_file_path)
+    self._path: Optional[str] = job_file_path
+    self._folder = os.path.dirname(job_file_path)
+    self._stem_name = os.path.basename(self._stem)
+    self._handle = None
+    self._offset = 0  # Bytes read from the job file
+    self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    self._subscribers: set[asyncio.Queue] = set()
+    self._wake = asyncio.Event()
+    self._watcher: Optional[InotifyWatcher] = None
+    self._task: Optional[asyncio.Task] = None
+    self._read_future: Optional[asyncio.Future] = None
+
+  @property
+  def published_offset(self) -> int:
+    """Bytes of the job file already broadcast (excludes an incomplete UTF-8 sequence held by the decoder)."""
+    return self._offset - len(self._decoder.getstate()[0])
+
+  def subscribe(self) -> tuple[asyncio.Queue, int]:
+    """Register a subscriber. Returns (queue, replay_end): content before replay_end was already broadcast and must be read by the subscriber."""
+    queue: asyncio.Queue = asyncio.Queue()
+    self._subscribers.add(queue)
+    if self._task is None: self._start()
+    return queue, self.published_offset
+
+  def unsubscribe(self, queue: asyncio.Queue) -> None:
+    self._subscribers.discard(queue)
+    if not self._subscribers and self._task is not None:
+      # Subscribers arriving from now on get a new follower
+      if _followers.get(self._stem) is self: del _followers[self._stem]
+      self._task.cancel()
+
+  def read_prefix(self, end: int) -> str:
+    """Job file content before byte offset end (replay for late subscribers). Blocking, run in a thread."""
+    if end <= 0: return ""
+    for _ in range(3):
+      path = _resolve_job_file_path(self._stem)
+      if path is None: return ""
+      try:
+        with open(path, "rb") as f: return f.read(end).decode("utf-8", errors="replace")
+      except FileNotFoundError:
+        continue  # Renamed between resolve and open
+    return ""
+
+  def _start(self) -> None:
+    self._watcher = get_inotify_watcher()
+    if self._watcher is not None:
+      try: self._watcher.add(self._folder, self._on_folder_event)
+      except OSError: self._watcher = None
+    self._task = asyncio.create_task(self._run())
+
+  def _on_folder_event(self, name: Optional[str]) -> None:
+    if name is None or name.startswith(self._stem_name + "."): self._wake.set()
+
+  def _refresh_path(self) -> None:
+    """Follow state renames of the job file: one stat while the name is unchanged."""
+    if self._path is not None and os.path.exists(self._path): return
+    self._path = _resolve_job_file_path(self._stem)
+    if self._path is not None: self.state = _split_job_file_path(self._path)[1]
+
+  def _read_new(self, path: str) -> str:
+    """Read bytes appended since the last read. Blocking, run in a thread."""
+    if self._handle is None:
+      self._handle = open(path, "rb")
+      self._handle.seek(self._offset)
+    try:
+      data = self._handle.read()
+    finally:
+      if not KEEP_FILE_OPEN: self._close()
+    self._offset += len(data)
+    return self._decoder.decode(data)
+
+  def _close(self) -> None:
+    if self._handle is not None:
+      self._handle.close()
+      self._handle = None
+
+  def _close_after_read(self, future: asyncio.Future) -> None:
+    if not future.cancelled(): future.exception()  # Retrieved: errors of an abandoned read are not logged
+    self._close()
+
+  async def _run(self) -> None:
+    try:
+      while True:
+        self._wake.clear()
+        self._refresh_path()
+        # State before reading: content written before a final rename is read in this pass
+        path, state = self._path, self.state
+        if path is None: break
+        # Shielded: on cancel the thread finishes its read before the handle is closed (see _stop)
+        self._read_future = asyncio.ensure_future(asyncio.to_thread(self._read_new, path))
+        try: text = await asyncio.shield(self._read_future)
+        except FileNotFoundError:
+          continue  # Renamed between stat and open (Windows: file is reopened on every read)
+        if text:
+          for queue in self._subscribers: queue.put_nowait(text)
+        if state in FINAL_JOB_STATES: break
+        try: await asyncio.wait_for(self._wake.wait(), INOTIFY_RECHECK_SECONDS if self._watcher else POLL_INTERVAL_SECONDS)
+        except asyncio.TimeoutError: pass
+    finally:
+      self._stop()
+
+  def _stop(self) -> None:
+    if _followers.get(self._stem) is self: del _followers[self._stem]
+    if self._watcher is not None: self._watcher.remove(self._folder, self._on_folder_event)
+    if self._read_future is not None and not self._read_future.done(): self._read_future.add_done_callback(self._close_after_read)
+    else: self._close()
+    for queue in self._subscribers: queue.put_nowait(None)
+
+# ----------------------------------------- END: JobLogFollower Class -------------------------------------------------
+
+
+# ----------------------------------------- START: Follow Functions ---------------------------------------------------
+
+# Job file path without state extension -> follower, shared by all monitors of the same job in this worker process
+_followers: dict[str, JobLogFollower] = {}
+
+def _get_follower(job_file_path: str) -> JobLogFollower:
+  stem = _split_job_file_path(job_file_path)[0]
+  follower = _followers.get(stem)
+  if follower is None: follower = _followers[stem] = JobLogFollower(job_file_path)
+  return follower
+
+def _get_job_event_channel(job_file_path: str) -> Optional[JobEventChannel]:
+  """Event channel of the job if its writer runs in this worker process."""
+  match = re.search(r"\[(jb_\d+)\]", os.path.basename(job_file_path))
+  channel = get_job_event_channel(match.group(1)) if match else None
+  if channel is None or _split_job_file_path(channel.job_file_path)[0] != _split_job_file_path(job_file_path)[0]: return None
+  return channel
+
+def _read_job_file_range(channel: JobEventChannel, start: int, end: int) -> str:
+  """Job file content from byte offset start to end. Blocking, run in a thread."""
+  for _ in range(3):
+    path = channel.job_file_path
+    if not os.path.exists(path): path = _resolve_job_file_path(_split_job_file_path(path)[0])
+    if path is None: return ""
+    try:
+      with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start).decode("utf-8", errors="replace")
+    except FileNotFoundError:
+      continue  # Renamed between resolve and open
+  return ""
+
+async def _follow_job_events(channel: JobEventChannel) -> AsyncGenerator[str, None]:
+  """Job file content written before joining, then live events of the channel until the job is finalized."""
+  delivered = 0  # Bytes of the job file delivered
+  while True:
+    subscription, written_bytes, pending = channel.subscribe()
+    try:
+      if delivered < written_bytes:
+        replay = await asyncio.to_thread(_read_job_file_range, channel, delivered, written_bytes)
+        if replay: yield replay
+        delivered = written_bytes
+      # After a lag, pending can start with events already delivered live
+      skip = delivered - written_bytes
+      for text in pending:
+        length = get_file_length(text)
+        if skip >= length:
+          skip -= length
+          continue
+        yield text
+        delivered += length
+      while True:
+        events, lagged, closed = await subscription.get_events()
+        if events:
+          text = "".join(events)
+          yield text
+          delivered += get_file_length(text)
+        if lagged: break
+        if closed: return
+    finally:
+      channel.unsubscribe(subscription)
+
+async def follow_job_log(job_file_path: str) -> AsyncGenerator[str, None]:
+  """
+  Async generator: full SSE content of a job file, then appended content as it is written, until the job is
+  completed/cancelled (or the job file is deleted). Jobs running in this worker process push their events to the
+  monitor, other jobs are followed via the job file. All monitors of the same job share one follower.
+  Compressed job files (finished jobs, see common_job_retention_functions_v2) are returned in one piece.
+
+  Usage:
+    return StreamingResponse(stream_with_flush(follow_job_log(find_job_file(storage_path, job_id))), media_type="text/event-stream")
+  """
+  if is_compressed_job_file(job_file_path):
+    try: content = await asyncio.to_thread(read_job_file, job_file_path)
+    except (OSError, EOFError): content = ""  # Deleted by job retention
+    if content: yield content
+    return
+  channel = _get_job_event_channel(job_file_path)
+  stream = _follow_job_events(channel) if channel is not None else _follow_job_file(job_file_path)
+  async for text in stream: yield text
+
+async def _follow_job_file(job_file_path: str) -> AsyncGenerator[str, None]:
+  """Job file content via the shared JobLogFollower of the job."""
+  follower = _get_follower(job_file_path)
+  queue, replay_end = follower.subscribe()
+  try:
+    replay = await asyncio.to_thread(follower.read_prefix, replay_end)
+    if replay: yield replay
+    while True:
+      text = await queue.get()
+      if text is None: break
+      yield text
+  finally:
+    follower.unsubscribe(queue)
+
+# ----------------------------------------- END: Follow Functions -----------------------------------------------------
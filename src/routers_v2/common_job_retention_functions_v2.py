@@ -0,0 +1,201 @@
+# Job Retention Functions V2 - Deletes and compresses job files in PERSISTENT_STORAGE_PATH/jobs
+# Applies to completed and cancelled jobs only (CRAWLER_HARDCODED_CONFIG.JOB_RETENTION_*), in this order:
+#   1. Deletes job files older than JOB_RETENTION_MAX_AGE_DAYS and beyond JOB_RETENTION_MAX_JOBS_PER_ROUTER (oldest first)
+#   2. Compresses job files JOB_RETENTION_COMPRESS_AFTER_MINUTES after they finished: [...].completed -> [...].completed.gz
+#   3. Deletes the oldest job files until all job files together are below JOB_RETENTION_MAX_TOTAL_MB
+# The job catalog keeps a summary of each job (start_json/end_json metadata, last log line, uncompressed size), so listing
+# and monitoring finished jobs does not read their job files. read_job_log() and follow_job_log() decompress transparently.
+# Scheduled in every worker process (start_job_retention), one run per JOB_RETENTION_INTERVAL_MINUTES across all of them.
+
+import asyncio, datetime, gzip, logging, os, time
+from dataclasses import dataclass
+from typing import Optional
+
+from hardcoded_config import CRAWLER_HARDCODED_CONFIG
+from routers_v2.common_job_functions_v2 import COMPRESSED_JOB_FILE_EXTENSION, _job_file_id_pattern, get_job_catalog, get_job_file_state, get_last_log_line, is_compressed_job_file
+
+# Seconds between checks whether the scheduled retention run is due
+RETENTION_CHECK_SECONDS = 60.0
+# Keys in the catalog_state table of the job catalog
+_SCHEDULE_KEY = "retention_next_run"
+_COUNTER_PREFIX = "retention_"
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------------------- START: Retention Functions ------------------------------------------------
+
+def _log_error(message: str, e: Exception) -> None:
+  timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+  logger.exception(f"[{timestamp},process {os.getpid()}] ERROR: {message} -> {type(e).__name__}: {e}")
+
+@dataclass
+class _JobFile:
+  job_id: str
+  job_number: int
+  router: str
+  path: str
+  size: int
+  mtime: float
+
+def _scan_job_files(jobs_folder: str) -> tuple[list[_JobFile], int, int]:
+  """Completed and cancelled job files of all routers. Returns (finished job files, count and bytes of all job files)."""
+  finished, count, total_bytes = [], 0, 0
+  if not os.path.exists(jobs_folder): return finished, count, total_bytes
+  for router_entry in os.scandir(jobs_folder):
+    if not router_entry.is_dir(): continue
+    for entry in os.scandir(router_entry.path):
+      state = get_job_file_state(entry.name)
+      match = _job_file_id_pattern.search(entry.name)
+      if state is None or not match: continue
+      try: stat = entry.stat()
+      except FileNotFoundError: continue
+      count += 1
+      total_bytes += stat.st_size
+      if state in ["completed", "cancelled"]: finished.append(_JobFile(match.group(1), int(match.group(2)), router_entry.name, entry.path, stat.st_size, stat.st_mtime))
+  return finished, count, total_bytes
+
+def _compress_job_file(job_file: _JobFile) -> tuple[str, str, int]:
+  """Replace a job file with a gzip-compressed copy (same mtime). Returns (compressed path, last log line, uncompressed bytes)."""
+  with open(job_file.path, 'rb') as f: data = f.read()
+  compressed_path = job_file.path + COMPRESSED_JOB_FILE_EXTENSION
+  temp_path = compressed_path + ".tmp"
+  try:
+    with gzip.open(temp_path, 'wb') as f: f.write(data)
+    os.utime(temp_path, (job_file.mtime, job_file.mtime))
+    os.replace(temp_path, compressed_path)
+  finally:
+    if os.path.exists(temp_path): os.unlink(temp_path)
+  try: os.unlink(job_file.path)
+  except OSError:
+    # Job file still open (Windows: monitor reading it): keep the uncompressed file
+    os.unlink(compressed_path)
+    raise
+  return compressed_path, get_last_log_line(data.decode('utf-8', errors='replace').replace('\r\n', '\n')), len(data)
+
+def apply_job_retention(persistent_storage_path: str, now: Optional[float] = None) -> dict:
+  """
+  Apply the retention limits and compress finished job files once. Blocking, run in a thread.
+  Returns counts and bytes of this run, e.g. {"jobs_deleted": 12, "jobs_compressed": 40, "bytes_reclaimed": 52428800, ...}
+  """
+  start_time = time.perf_counter()
+  now = now if now is not None else time.time()
+  jobs_folder = os.path.join(persistent_storage_path, CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_PATH_JOBS_SUBFOLDER)
+  finished, _, bytes_before = _scan_job_files(jobs_folder)
+  max_age_seconds = CRAWLER_HARDCODED_CONFIG.JOB_RETENTION_MAX_AGE_DAYS * 86400
+  max_jobs_per_router = CRAWLER_HARDCODED_CONFIG.JOB_RETENTION_MAX_JOBS_PER_ROUTER
+  compress_after_seconds = CRAWLER_HARDCODED_CONFIG.JOB_RETENTION_COMPRESS_AFTER_MINUTES * 60
+  max_total_bytes = CRAWLER_HARDCODED_CONFIG.JOB_RETENTION_MAX_TOTAL_MB * 1024 * 1024
+
+  # 1. Max age and max jobs per router (newest jobs are kept)
+  delete, keep, router_counts = [], [], {}
+  for job_file in sorted(finished, key=lambda job_file: job_file.job_number, reverse=True):
+    router_counts[job_file.router] = router_counts.get(job_file.router, 0) + 1
+    too_old = max_age_seconds > 0 and now - job_file.mtime > max_age_seconds
+    too_many = max_jobs_per_router > 0 and router_counts[job_file.router] > max_jobs_per_router
+    (delete if too_old or too_many else keep).append(job_file)
+
+  # 2. Compression
+  summaries, bytes_saved_by_compression = {}, 0
+  if compress_after_seconds > 0:
+    for job_file in keep:
+      if is_compressed_job_file(job_file.path) or now - job_file.mtime < compress_after_seconds: continue
+      try: compressed_path, last_log, log_bytes = _compress_job_file(job_file)
+      except OSError: continue  # Deleted or still open, next run
+      compressed_size = os.path.getsize(compressed_path)
+      bytes_saved_by_compression += job_file.size - compressed_size
+      job_file.path, job_file.size = compressed_path, compressed_size
+      summaries[job_file.job_id] = {"file_name": os.path.basename(compressed_path), "last_log": last_log, "log_bytes": log_bytes}
+
+  # 3. Max total bytes (oldest jobs are deleted first)
+  total_bytes = bytes_before - bytes_saved_by_compression - sum(job_file.size for job_file in delete)
+  if max_total_bytes > 0:
+    for job_file in sorted(keep, key=lambda job_file: job_file.mtime):
+      if total_bytes <= max_total_bytes: break
+      delete.append(job_file)
+      total_bytes -= job_file.size
+
+  deleted, bytes_deleted = [], 0
+  for job_file in delete:
+    try: os.unlink(job_file.path)
+    except FileNotFoundError: pass
+    except OSError: continue  # Still open, next run
+    deleted.append(job_file.job_id)
+    bytes_deleted += job_file.size
+    summaries.pop(job_file.job_id, None)
+
+  result = {
+    "jobs_deleted": len(deleted),
+    "jobs_compressed": len(summaries),
+    "bytes_before": bytes_before,
+    "bytes_after": bytes_before - bytes_saved_by_compression - bytes_deleted,
+    "bytes_reclaimed": bytes_saved_by_compression + bytes_deleted,
+    "bytes_reclaimed_by_compression": bytes_saved_by_compression,
+    "bytes_reclaimed_by_deletion": bytes_deleted,
+    "duration_secs": round(time.perf_counter() - start_time, 3)
+  }
+
+  catalog = get_job_catalog(persistent_storage_path)
+  if catalog is not None:
+    # On errors the catalog picks up the changed job files on its next sync
+    try:
+      if deleted: catalog.delete_jobs(deleted)
+      for job_id, summary in summaries.items(): catalog.update_job(job_id, **summary)
+      catalog.add_counters({f"{_COUNTER_PREFIX}runs": 1, f"{_COUNTER_PREFIX}jobs_deleted": result["jobs_deleted"], f"{_COUNTER_PREFIX}jobs_compressed": result["jobs_compressed"], f"{_COUNTER_PREFIX}bytes_reclaimed": result["bytes_reclaimed"], f"{_COUNTER_PREFIX}bytes_reclaimed_by_compression": bytes_saved_by_compression, f"{_COUNTER_PREFIX}bytes_reclaimed_by_deletion": bytes_deleted})
+    except Exception as e:
+      _log_error(f"Failed to update job catalog after retention run ({len(deleted)} jobs deleted, {len(summaries)} jobs compressed)", e)
+  return result
+
+def get_job_retention_metrics(persistent_storage_path: str) -> dict:
+  """Retention settings, current size of the job files and totals of all retention runs. Blocking, run in a thread."""
+  jobs_folder = os.path.join(persistent_storage_path, CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_PATH_JOBS_SUBFOLDER)
+  finished, job_files, total_bytes = _scan_job_files(jobs_folder)
+  totals, next_run = {}, None
+  catalog = get_job_catalog(persistent_storage_path)
+  if catalog is not None:
+    counters = catalog.get_counters(_COUNTER_PREFIX)
+    next_run = counters.pop(_SCHEDULE_KEY, None)
+    totals = {key[len(_COUNTER_PREFIX):]: value for key, value in counters.items()}
+  return {
+    "settings": {name: getattr(CRAWLER_HARDCODED_CONFIG, name) for name in ["JOB_RETENTION_MAX_AGE_DAYS", "JOB_RETENTION_MAX_JOBS_PER_ROUTER", "JOB_RETENTION_MAX_TOTAL_MB", "JOB_RETENTION_COMPRESS_AFTER_MINUTES", "JOB_RETENTION_INTERVAL_MINUTES"]},
+    "job_files": job_files,
+    "job_files_compressed": sum(1 for job_file in finished if is_compressed_job_file(job_file.path)),
+    "bytes_total": total_bytes,
+    "next_run_utc": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(next_run)) if next_run else None,
+    "totals": totals
+  }
+
+# ----------------------------------------- END: Retention Functions --------------------------------------------------
+
+
+# ----------------------------------------- START: Scheduled Retention ------------------------------------------------
+
+def run_scheduled_job_retention(persistent_storage_path: str) -> Optional[dict]:
+  """Apply job retention if the scheduled run is due and no other worker process claimed it. Blocking. Returns the result or None."""
+  interval_seconds = CRAWLER_HARDCODED_CONFIG.JOB_RETENTION_INTERVAL_MINUTES * 60
+  if interval_seconds <= 0: return None
+  catalog = get_job_catalog(persistent_storage_path)
+  if catalog is None or not catalog.claim_scheduled_run(_SCHEDULE_KEY, int(time.time()), interval_seconds): return None
+  return apply_job_retention(persistent_storage_path)
+
+async def _run_scheduled_job_retention(persistent_storage_path: str) -> None:
+  while True:
+    try: await asyncio.to_thread(run_scheduled_job_retention, persistent_storage_path)
+    except Exception as e: _log_error(f"Scheduled job retention failed for '{persistent_storage_path}', next check in {RETENTION_CHECK_SECONDS:.0f} secs", e)
+    await asyncio.sleep(RETENTION_CHECK_SECONDS)
+
+# Scheduled retention tasks of the running event loop by persistent storage path
+_retention_loop = None
+_retention_tasks: dict[str, asyncio.Task] = {}
+
+def start_job_retention(persistent_storage_path: str) -> None:
+  """Start the scheduled job retention in the running event loop (once per persistent storage path)."""
+  global _retention_loop, _retention_tasks
+  loop = asyncio.get_running_loop()
+  if _retention_loop is not loop:
+    _retention_loop = loop
+    _retention_tasks = {}
+  if persistent_storage_path not in _retention_tasks:
+    _retention_tasks[persistent_storage_path] = loop.create_task(_run_scheduled_job_retention(persistent_storage_path))
+
+# ----------------------------------------- END: Scheduled Retention --------------------------------------------------
@@ -0,0 +1,292 @@
+# Job Runner Functions V2 - Background execution of streaming jobs, decoupled from the HTTP request that started them
+# Endpoints submit a registered job type with JSON params and return the job_id, or stream follow_job_log() of the job.
+# Jobs wait in a priority queue until their router has a free slot (CRAWLER_HARDCODED_CONFIG.JOB_RUNNER_MAX_CONCURRENT_JOBS).
+# Queued jobs have a .paused job file and a row in the job_queue table of the job catalog, so jobs queued by a worker
+# process that stopped are taken over by the job runner of another (or the restarted) worker process.
+# Cancel via create_control_file() works for queued and running jobs, resume starts a queued job regardless of the limit.
+
+import asyncio, concurrent.futures, datetime, heapq, logging, os, socket, time
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Callable, Optional
+
+from hardcoded_config import CRAWLER_HARDCODED_CONFIG
+from routers_v2.common_job_functions_v2 import StreamingJobWriter, get_job_catalog
+
+# Seconds between queue checks. Control requests (cancel, resume) of queued jobs wake the runner immediately.
+QUEUE_CHECK_SECONDS = 1.0
+# Seconds between heartbeats of a job runner. Queued jobs of a runner without heartbeat for STALE_AFTER_SECONDS are taken over.
+HEARTBEAT_SECONDS = 10.0
+STALE_AFTER_SECONDS = 60.0
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------------------- START: Job Types ----------------------------------------------------------
+
+@dataclass
+class JobContext:
+  """Passed to job functions: everything that is not part of the (JSON) job params."""
+  storage_path: str
+  app_state: Any  # FastAPI app.state (openai_client, config), None in scripts
+
+# Async generator function: (writer, params, context) -> yields SSE strings (ignored, the job file is the output).
+# The job file is created and start_json emitted by the runner. The function must emit end_json, the runner finalizes.
+JobFunction = Callable[[StreamingJobWriter, dict, JobContext], AsyncGenerator[Any, None]]
+
+@dataclass
+class JobType:
+  router_name: str
+  action: str
+  function: JobFunction
+
+_job_types: dict[str, JobType] = {}
+
+def register_job_type(job_type: str, router_name: str, action: str, function: JobFunction) -> None:
+  """Register a job function under a unique name, e.g. register_job_type('crawler.crawl', 'crawler', 'crawl', _crawl_job)."""
+  _job_types[job_type] = JobType(router_name, action, function)
+
+# ----------------------------------------- END: Job Types ------------------------------------------------------------
+
+
+# ----------------------------------------- START: JobRunner Class ----------------------------------------------------
+
+@dataclass
+class _RunnerJob:
+  job_type: str
+  params: dict
+  priority: int
+  writer: StreamingJobWriter
+  queued_at: float
+  task: Optional[asyncio.Task] = None
+  persisted: bool = False  # In the job_queue table
+
+def _log(writer: StreamingJobWriter, message: str) -> None:
+  timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+  writer.emit_log(f"[{timestamp}] {message}")
+  writer.drain_sse_queue()
+  writer._flush_buffer()
+
+class JobRunner:
+  """
+  Runs jobs as asyncio tasks of the event loop, independent of HTTP requests. One runner per worker process and
+  persistent storage path (see get_job_runner). Concurrency limits apply per router within the worker process.
+  Queue order: highest priority first, then oldest job first.
+
+  Usage:
+    register_job_type("crawler.crawl", "crawler", "crawl", _crawl_job)
+    writer = get_job_runner(storage_path, request.app.state).submit("crawler.crawl", {"domain_id": "DOMAIN01"}, "DOMAIN01", source_url, router_prefix, priority=0)
+    return json_result(True, "", {"job_id": writer.job_id, "monitor_url": writer.monitor_url})
+  """
+
+  def __init__(self, storage_path: str, app_state: Any = None):
+    self.storage_path = storage_path
+    self.app_state = app_state
+    self.owner = f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+    self._jobs: dict[str, _RunnerJob] = {}                       # job_id -> queued or running job
+    self._queues: dict[str, list[tuple[int, int, str]]] = {}     # router -> heap of (-priority, job_number, job_id)
+    self._running: dict[str, set[str]] = {}                      # router -> job_ids
+    self._maintenance_task: Optional[asyncio.Task] = None
+    self._wake = asyncio.Event()                                 # Set on control requests of queued jobs
+
+  def start(self) -> None:
+    """Start queue maintenance (control requests of queued jobs, heartbeat, taking over orphaned queued jobs)."""
+    if self._maintenance_task is None: self._maintenance_task = asyncio.create_task(self._maintain())
+
+  def submit(self, job_type: str, params: dict, object_id: Optional[str], source_url: str, router_prefix: str, priority: int = 0) -> StreamingJobWriter:
+    """Create the job file and start the job, or queue it if its router has no free slot. Returns the job's writer (job_id, monitor_url)."""
+    job_definition = _job_types.get(job_type)
+    if job_definition is None: raise ValueError(f"Unknown job type '{job_type}'")
+    start_now = self._has_free_slot(job_definition.router_name)
+    writer = StreamingJobWriter(self.storage_path, job_definition.router_name, job_definition.action, object_id, source_url, router_prefix, state="running" if start_now else "paused")
+    writer.emit_start()
+    writer.drain_sse_queue()
+    job = _RunnerJob(job_type, params, priority, writer, time.time())
+    self._jobs[writer.job_id] = job
+    if start_now: self._start(job)
+    else: self._enqueue(job, object_id, source_url, router_prefix)
+    self.start()
+    return writer
+
+  def get_queue_position(self, job_id: str) -> Optional[int]:
+    """1-based position of a queued job in its router queue, None if the job is not queued in this runner."""
+    job = self._jobs.get(job_id)
+    if job is None or job.task is not None: return None
+    heap = self._queues.get(_job_types[job.job_type].router_name, [])
+    key = next((entry for entry in heap if entry[2] == job_id), None)
+    return None if key is None else sum(1 for entry in heap if entry < key and entry[2] in self._jobs) + 1
+
+  def _has_free_slot(self, router: str) -> bool:
+    limit = CRAWLER_HARDCODED_CONFIG.JOB_RUNNER_MAX_CONCURRENT_JOBS.get(router)
+    return limit is None or len(self._running.get(router, ())) < limit
+
+  def _enqueue(self, job: _RunnerJob, object_id: Optional[str], source_url: str, router_prefix: str) -> None:
+    writer = job.writer
+    router = _job_types[job.job_type].router_name
+    heapq.heappush(self._queues.setdefault(router, []), (-job.priority, writer._job_number, writer.job_id))
+    writer.control.add_listener(self._wake.set)
+    catalog = get_job_catalog(self.storage_path)
+    if catalog is not None:
+      record = {"job_id": writer.job_id, "job_number": writer._job_number, "router": router, "job_type": job.job_type, "priority": job.priority, "params": job.params, "object_id": object_id, "source_url": source_url, "router_prefix": router_prefix, "file_name": os.path.basename(writer.job_file_path), "owner": self.owner, "heartbeat": time.time()}
+      try:
+        catalog.enqueue_job(record)
+        job.persisted = True
+      except Exception: pass  # Queued in this worker process only
+    _log(writer, f"Job queued (priority={job.priority}, position {self.get_queue_position(writer.job_id)}), waiting for a free '{router}' job slot...")
+
+  def _dispatch(self) -> None:
+    """Start queued jobs while their router has free slots."""
+    catalog = get_job_catalog(self.storage_path)
+    for router, heap in self._queues.items():
+      while heap and self._has_free_slot(router):
+        job_id = heapq.heappop(heap)[2]
+        job = self._jobs.get(job_id)
+        if job is None or job.task is not None: continue  # Cancelled or resumed while queued
+        if not os.path.exists(job.writer.job_file_path):
+          # Job file deleted or force-cancelled while queued
+          del self._jobs[job_id]
+          self._dequeue(job)
+          job.writer.finalize()
+          continue
+        if job.persisted and catalog is not None:
+          try: held = catalog.dequeue_job(job_id, self.owner)
+          except Exception: held = True
+          if not held:
+            # Taken over by another job runner (this worker process missed its heartbeats)
+            del self._jobs[job_id]
+            job.writer.finalize()
+            continue
+        self._start(job)
+
+  def _start(self, job: _RunnerJob) -> None:
+    writer = job.writer
+    writer.control.remove_listener(self._wake.set)
+    self._running.setdefault(_job_types[job.job_type].router_name, set()).add(writer.job_id)
+    if writer._get_file_state() == "paused":
+      writer._set_file_state("running")
+      writer.emit_state("running")
+      _log(writer, f"Starting job after {time.time() - job.queued_at:.0f} secs in queue...")
+    job.task = asyncio.create_task(self._run(job))
+
+  async def _run(self, job: _RunnerJob) -> None:
+    writer = job.writer
+    try:
+      async for _ in _job_types[job.job_type].function(writer, job.params, JobContext(self.storage_path, self.app_state)):
+        writer.drain_sse_queue()
+      if writer.final_state is None: writer.emit_end(ok=False, error="Job ended without result.", data={})
+    except Exception as e:
+      if writer.final_state is None: writer.emit_end(ok=False, error=str(e), data={})
+    finally:
+      writer.drain_sse_queue()
+      writer.finalize()
+      self._jobs.pop(writer.job_id, None)
+      self._running.get(_job_types[job.job_type].router_name, set()).discard(writer.job_id)
+      self._dispatch()
+
+  def _dequeue(self, job: _RunnerJob) -> None:
+    """Remove a queued job from the job_queue table."""
+    catalog = get_job_catalog(self.storage_path)
+    if job.persisted and catalog is not None:
+      try: catalog.dequeue_job(job.writer.job_id)
+      except Exception: pass
+
+  def _cancel_queued(self, job: _RunnerJob) -> None:
+    writer = job.writer
+    writer.control.remove_listener(self._wake.set)
+    del self._jobs[writer.job_id]
+    self._dequeue(job)
+    writer.emit_state("cancelled")
+    _log(writer, "Cancel requested, removing job from queue...")
+    writer.emit_end(ok=False, error="Cancelled by user.", data={}, cancelled=True)
+    writer.drain_sse_queue()
+    writer.finalize()
+
+  async def _maintain(self) -> None:
+    last_heartbeat = 0.0; last_error = None
+    while True:
+      try: await asyncio.wait_for(self._wake.wait(), QUEUE_CHECK_SECONDS)
+      except asyncio.TimeoutError: pass
+      self._wake.clear()
+      try:
+        for job in [job for job in self._jobs.values() if job.task is None and job.writer.control.has_requests("cancel", "resume")]:
+          if job.writer.control.take("cancel"):
+            self._cancel_queued(job)
+            continue
+          # Resume of a queued job: start it now, regardless of the job limit
+          if job.writer.control.take("resume"):
+            self._dequeue(job)
+            self._start(job)
+        now = time.time()
+        if now - last_heartbeat >= HEARTBEAT_SECONDS:
+          last_heartbeat = now
+          records = await asyncio.to_thread(self._heartbeat, now)
+          for record in records: self._adopt(record)
+        self._dispatch()
+        last_error = None
+      except Exception as e:
+        # Next check in QUEUE_CHECK_SECONDS. Log each distinct error once, not once per check.
+        error = f"{type(e).__name__}: {e}"
+        if error != last_error:
+          timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+          logger.exception(f"[{timestamp},process {os.getpid()}] ERROR: Job queue maintenance failed ({len(self._jobs)} jobs) -> {error}")
+          last_error = error
+
+  def _heartbeat(self, now: float) -> list[dict]:
+    """Blocking, run in a thread. Returns queued jobs taken over from stopped job runners."""
+    catalog = get_job_catalog(self.storage_path)
+    if catalog is None: return []
+    catalog.touch_queued_jobs(self.owner, now)
+    return catalog.adopt_queued_jobs(self.owner, now, now - STALE_AFTER_SECONDS)
+
+  def _adopt(self, record: dict) -> None:
+    catalog = get_job_catalog(self.storage_path)
+    job_file_path = os.path.join(self.storage_path, CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_PATH_JOBS_SUBFOLDER, record["router"], record["file_name"])
+    if record["job_type"] not in _job_types or record["job_id"] in self._jobs or not os.path.exists(job_file_path):
+      catalog.dequeue_job(record["job_id"], self.owner)
+      return
+    job_definition = _job_types[record["job_type"]]
+    writer = StreamingJobWriter(self.storage_path, job_definition.router_name, job_definition.action, record["object_id"], record["source_url"], record["router_prefix"], job_file_path=job_file_path)
+    job = _RunnerJob(record["job_type"], record["params"], record["priority"], writer, time.time(), persisted=True)
+    self._jobs[writer.job_id] = job
+    heapq.heappush(self._queues.setdefault(job_definition.router_name, []), (-job.priority, writer._job_number, writer.job_id))
+    writer.control.add_listener(self._wake.set)
+    _log(writer, f"Queued job taken over by worker process {os.getpid()}.")
+
+# ----------------------------------------- END: JobRunner Class ------------------------------------------------------
+
+
+# ----------------------------------------- START: Runner Functions ---------------------------------------------------
+
+# Runners of the running event loop by persistent storage path
+_runners_loop = None
+_runners: dict[str, JobRunner] = {}
+
+def get_job_runner(storage_path: str, app_state: Any = None) -> JobRunner:
+  """Job runner for a persistent storage path in the running event loop (created and started on first use)."""
+  global _runners_loop, _runners
+  loop = asyncio.get_running_loop()
+  if _runners_loop is not loop:
+    _runners_loop = loop
+    _runners = {}
+  runner = _runners.get(storage_path)
+  if runner is None:
+    runner = _runners[storage_path] = JobRunner(storage_path, app_state)
+    runner.start()
+  elif runner.app_state is None:
+    runner.app_state = app_state
+  return runner
+
+_process_pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+
+async def run_cpu_bound(function: Callable, *args) -> Any:
+  """
+  Run a blocking, CPU-heavy function (e.g. creating report zips) in a process pool of JOB_RUNNER_PROCESS_POOL_WORKERS
+  processes, so it does not hold the GIL of the worker process. With 0 workers (default) it runs in a thread.
+  function must be a module-level function, function and args must be picklable.
+  """
+  global _process_pool
+  workers = CRAWLER_HARDCODED_CONFIG.JOB_RUNNER_PROCESS_POOL_WORKERS
+  if workers <= 0: return await asyncio.to_thread(function, *args)
+  if _process_pool is None: _process_pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+  return await asyncio.get_running_loop().run_in_executor(_process_pool, function, *args)
+
+# ----------------------------------------- END: Runner Functions -----------------------------------------------------
@@ -1,7 +1,7 @@
 # Logging V2 - Unified logger for FastAPI endpoints with optional streaming support
 # Implements MiddlewareLogger class per _V2_SPEC_ROUTERS.md specification
 
-import datetime, logging, os, sys
+import dataclasses, datetime, logging, os, sys
 from dataclasses import dataclass, field
 from typing import List, Optional, Tuple, TYPE_CHECKING
 
@@ -58,6 +58,7 @@ class MiddlewareLogger:
   inner_log_indentation: int = 2
   include_line_header: bool = True
   stream_job_writer: Optional["StreamingJobWriter"] = None
+  log_prefix: str = ""  # Prepended to every line, e.g. "[SOURCE01] " for concurrent crawl sources
   
   # State (managed internally)
   _function_name: str = ""
@@ -81,6 +82,10 @@ class MiddlewareLogger:
     )
     return instance
   
+  def create_prefixed(self, log_prefix: str, stream_job_writer=None) -> "MiddlewareLogger":
+    """Copy of this logger that prepends log_prefix to every line. Keeps request number, function name and nesting depth."""
+    return dataclasses.replace(self, log_prefix=log_prefix, stream_job_writer=stream_job_writer if stream_job_writer is not None else self.stream_job_writer, _inner_stack=list(self._inner_stack))
+  
   def log_function_header(self, function_name: str) -> Optional[str]:
     """
     Log function start.
@@ -158,11 +163,11 @@ class MiddlewareLogger:
   def _apply_indentation(self, output: str) -> str:
     """Apply indentation based on nesting depth (V2LG-FR-04). When include_line_header=False, all depths get indentation."""
     if self.include_line_header:
-      if self._nesting_depth <= 1: return output
+      if self._nesting_depth <= 1: return self.log_prefix + output
       indent = " " * (self.inner_log_indentation * (self._nesting_depth - 1))
     else:
       indent = " " * (self.inner_log_indentation * self._nesting_depth)
-    return indent + output
+    return self.log_prefix + indent + output
   
   def _log_to_console(self, message: str) -> None:
     """Write to server console using standard format (V2LG-IG-02, V2LG-IG-03)."""
@@ -1,8 +1,9 @@
 # Map File Functions V2 - CSV map file I/O with buffered writes and change detection
 # Implements MapFileWriter class and change detection per _V2_SPEC_CRAWLER.md specification
 
-import csv, os, tempfile
-from dataclasses import dataclass, fields, asdict
+import csv, io, json, os, tempfile
+from dataclasses import dataclass, fields
+from operator import attrgetter
 from typing import Optional
 
 from hardcoded_config import CRAWLER_HARDCODED_CONFIG
@@ -10,7 +11,7 @@ from hardcoded_config import CRAWLER_HARDCODED_CONFIG
 
 # ----------------------------------------- START: Dataclasses --------------------------------------------------------
 
-@dataclass
+@dataclass(slots=True)
 class SharePointMapRow:
   """Row in sharepoint_map.csv - current SharePoint state (10 fields)."""
   sharepoint_listitem_id: int
@@ -24,7 +25,7 @@ class SharePointMapRow:
   last_modified_utc: str
   last_modified_timestamp: int
 
-@dataclass
+@dataclass(slots=True)
 class FilesMapRow:
   """Row in files_map.csv - local file state (13 fields)."""
   sharepoint_listitem_id: int
@@ -41,7 +42,7 @@ class FilesMapRow:
   sharepoint_error: str
   processing_error: str
 
-@dataclass
+@dataclass(slots=True)
 class VectorStoreMapRow:
   """Row in vectorstore_map.csv - embedded file state (19 fields)."""
   openai_file_id: str
@@ -75,8 +76,69 @@ class ChangeDetectionResult:
 # ----------------------------------------- END: Dataclasses ----------------------------------------------------------
 
 
+# ----------------------------------------- START: Row Codec ----------------------------------------------------------
+
+class MapRowCodec:
+  """
+  Column order and converters of a map row class, computed once per class (see get_row_codec).
+  to_values() turns a row into a tuple in column order, read_rows() parses CSV records into row objects.
+  """
+
+  def __init__(self, row_class: type):
+    self.row_class = row_class
+    self.names = tuple(f.name for f in fields(row_class))
+    self.int_indexes = tuple(i for i, f in enumerate(fields(row_class)) if f.type == int)
+    self._getter = attrgetter(*self.names)
+
+  def to_values(self, row) -> tuple:
+    """Row object (or dict with the field names) as tuple in column order."""
+    if isinstance(row, dict): return tuple(row.get(name, '') for name in self.names)
+    return self._getter(row)
+
+  def read_rows(self, records) -> list:
+    """Parse csv.reader records (header first) into row objects. Columns are matched by header name, missing ones are empty."""
+    header = next(records, None)
+    if header is None: return []
+    row_class, int_indexes, column_count = self.row_class, self.int_indexes, len(self.names)
+    result = []
+    if tuple(header) == self.names:
+      # Fast path: columns in field order, only int columns need converting
+      for values in records:
+        if not values: continue  # Blank line
+        if len(values) != column_count: values = (values + [''] * column_count)[:column_count]
+        for i in int_indexes:
+          try: values[i] = int(values[i])
+          except ValueError: values[i] = 0
+        result.append(row_class(*values))
+      return result
+    positions = {name: i for i, name in enumerate(header)}  # Duplicate column names: last one wins (as csv.DictReader)
+    columns = [positions.get(name) for name in self.names]
+    for record in records:
+      if not record: continue
+      record_count = len(record)
+      values = [record[c] if c is not None and c < record_count else '' for c in columns]
+      for i in int_indexes:
+        try: values[i] = int(values[i])
+        except ValueError: values[i] = 0
+      result.append(row_class(*values))
+    return result
+
+_ROW_CODECS: dict = {}
+
+def get_row_codec(row_class: type) -> MapRowCodec:
+  """Cached MapRowCodec of a map row class."""
+  codec = _ROW_CODECS.get(row_class)
+  if codec is None: codec = _ROW_CODECS[row_class] = MapRowCodec(row_class)
+  return codec
+
+# ----------------------------------------- END: Row Codec ------------------------------------------------------------
+
+
 # ----------------------------------------- START: MapFileWriter Class ------------------------------------------------
 
+# Rows MapFileWriter hands to the map store at once
+STORE_BUFFER_ROWS = 1000
+
 class MapFileWriter:
   """
   Buffered writer for CSV map files with graceful error handling.
@@ -88,96 +150,133 @@ class MapFileWriter:
     for item in items:
       writer.append_row(item)
     writer.finalize()
+
+  Rows are encoded into an in-memory CSV buffer on append_row and written to the file once the buffer holds
+  flush_bytes characters (default APPEND_TO_MAP_FILES_EVERY_X_BYTES).
+
+  With store (SqliteMapStore from open_map_store()), rows are written to the store instead of the CSV file: the store
+  compares them with the stored rows by row hash, finalize upserts only added/changed rows and deletes rows that were
+  not written (rows_upserted, rows_deleted). The CSV file is exported on demand (export_outdated_map_csvs). If the store
+  write cannot be started, the CSV file is written as without store. Later store errors are raised like file write errors
+  (the stored rows keep their previous state).
   """
   
-  def __init__(self, filepath: str, row_class: type, buffer_size: int = None):
+  def __init__(self, filepath: str, row_class: type, flush_bytes: int = None, store = None):
     self._filepath = filepath
     self._row_class = row_class
-    self._buffer_size = buffer_size if buffer_size is not None else CRAWLER_HARDCODED_CONFIG.APPEND_TO_MAP_FILES_EVERY_X_LINES
-    self._buffer: list = []
+    self._codec = get_row_codec(row_class)
+    self._store = store
+    self._store_map_name = os.path.basename(filepath)
+    self._store_generation = None
+    self._flush_bytes = flush_bytes if flush_bytes is not None else CRAWLER_HARDCODED_CONFIG.APPEND_TO_MAP_FILES_EVERY_X_BYTES
+    self._buffer = io.StringIO()
+    self._buffer_writer = csv.writer(self._buffer)
+    self._store_buffer: list = []  # Row value tuples for the store
     self._file_handle = None
-    self._csv_writer = None
     self._header_written = False
+    self.rows_upserted = 0
+    self.rows_deleted = 0
     os.makedirs(os.path.dirname(filepath), exist_ok=True)
   
   def write_header(self) -> None:
-    """Write CSV header atomically (temp file + rename). Opens file for subsequent appends."""
-    field_names = [f.name for f in fields(self._row_class)]
+    """Write CSV header atomically (temp file + rename). Opens file for subsequent appends. With store: starts the store write."""
+    self._header_written = True
+    if self._store is not None:
+      try:
+        self._store_generation = self._store.begin_write(self._store_map_name)
+        return
+      except Exception:
+        # The CSV file becomes the current map: stored rows must not be served instead of it
+        try: self._store.drop_map(self._store_map_name)
+        except Exception: pass
+        self._store = None
     temp_path = self._filepath + ".tmp"
     with open(temp_path, 'w', newline='', encoding='utf-8') as f:
       writer = csv.writer(f)
-      writer.writerow(field_names)
+      writer.writerow(self._codec.names)
     os.replace(temp_path, self._filepath)
     self._file_handle = open(self._filepath, 'a', newline='', encoding='utf-8')
-    self._csv_writer = csv.writer(self._file_handle)
-    self._header_written = True
   
   def append_row(self, row) -> None:
     """Add row to buffer, flush if buffer size reached."""
     if not self._header_written: self.write_header()
-    self._buffer.append(row)
-    if len(self._buffer) >= self._buffer_size: self.flush()
+    values = self._codec.to_values(row)
+    if self._store is not None:
+      self._store_buffer.append(values)
+      if len(self._store_buffer) >= STORE_BUFFER_ROWS: self.flush()
+      return
+    self._buffer_writer.writerow(values)
+    if self._buffer.tell() >= self._flush_bytes: self.flush()
   
   def flush(self) -> None:
-    """Write buffered rows to file."""
-    if not self._buffer or not self._csv_writer: return
-    for row in self._buffer:
-      row_dict = asdict(row) if hasattr(row, '__dataclass_fields__') else row
-      field_names = [f.name for f in fields(self._row_class)]
-      values = [row_dict.get(name, '') for name in field_names]
-      self._csv_writer.writerow(values)
+    """Write buffered rows to file (or store)."""
+    if self._store is not None:
+      if not self._store_buffer: return
+      try: self._store.upsert_values(self._store_map_name, self._store_buffer, self._store_generation)
+      except Exception:
+        self._store.abort_write(self._store_map_name)
+        raise
+      self._store_buffer.clear()
+      return
+    if not self._file_handle or not self._buffer.tell(): return
+    self._file_handle.write(self._buffer.getvalue())
     self._file_handle.flush()
-    self._buffer.clear()
+    self._buffer.seek(0)
+    self._buffer.truncate()
   
   def finalize(self) -> None:
-    """Flush remaining buffer and close file."""
+    """Flush remaining buffer and close file. With store: apply the differences to the stored rows."""
     self.flush()
     if self._file_handle:
       self._file_handle.close()
       self._file_handle = None
-      self._csv_writer = None
+    if self._store is not None and self._store_generation is not None:
+      generation, self._store_generation = self._store_generation, None
+      try: _, self.rows_upserted, self.rows_deleted = self._store.end_write(self._store_map_name, generation, self._filepath)
+      except Exception:
+        self._store.abort_write(self._store_map_name)
+        raise
 
 # ----------------------------------------- END: MapFileWriter Class --------------------------------------------------
 
 
 # ----------------------------------------- START: Read Functions -----------------------------------------------------
 
-def _parse_int(value: str, default: int = 0) -> int:
-  """Parse string to int, return default if empty or invalid."""
-  if not value or value.strip() == '': return default
-  try: return int(value)
-  except (ValueError, TypeError): return default
-
 def _read_map_file(filepath: str, row_class: type) -> list:
   """Generic CSV reader that returns list of dataclass instances."""
   if not os.path.exists(filepath): return []
-  result = []
-  field_info = {f.name: f.type for f in fields(row_class)}
   try:
     with open(filepath, 'r', newline='', encoding='utf-8') as f:
-      reader = csv.DictReader(f)
-      for row in reader:
-        kwargs = {}
-        for name, ftype in field_info.items():
-          value = row.get(name, '')
-          if ftype == int: kwargs[name] = _parse_int(value)
-          else: kwargs[name] = value if value is not None else ''
-        result.append(row_class(**kwargs))
+      return get_row_codec(row_class).read_rows(csv.reader(f))
   except Exception:
     return []  # Fallback to mode=full on corrupted file (B7)
-  return result
-
-def read_sharepoint_map(filepath: str) -> list:
-  """Read sharepoint_map.csv, return list of SharePointMapRow."""
-  return _read_map_file(filepath, SharePointMapRow)
 
-def read_files_map(filepath: str) -> list:
-  """Read files_map.csv, return list of FilesMapRow."""
-  return _read_map_file(filepath, FilesMapRow)
-
-def read_vectorstore_map(filepath: str) -> list:
-  """Read vectorstore_map.csv, return list of VectorStoreMapRow."""
-  return _read_map_file(filepath, VectorStoreMapRow)
+def _read_map_rows(filepath: str, row_class: type, store = None) -> list:
+  """Rows from the map store if it holds the current state of filepath, else parsed from the CSV file."""
+  if store is not None:
+    try: rows = store.read_rows(os.path.basename(filepath), filepath)
+    except Exception: rows = None
+    if rows is not None: return rows
+  return _read_map_file(filepath, row_class)
+
+def map_file_exists(filepath: str, store = None) -> bool:
+  """True if the map CSV file exists or the store holds rows for it (CSV files of the store are exported on demand)."""
+  if os.path.exists(filepath): return True
+  if store is None: return False
+  try: return store.has_map(os.path.basename(filepath))
+  except Exception: return False
+
+def read_sharepoint_map(filepath: str, store = None) -> list:
+  """Read sharepoint_map.csv, return list of SharePointMapRow. Served from store if given and current."""
+  return _read_map_rows(filepath, SharePointMapRow, store)
+
+def read_files_map(filepath: str, store = None) -> list:
+  """Read files_map.csv, return list of FilesMapRow. Served from store if given and current."""
+  return _read_map_rows(filepath, FilesMapRow, store)
+
+def read_vectorstore_map(filepath: str, store = None) -> list:
+  """Read vectorstore_map.csv, return list of VectorStoreMapRow. Served from store if given and current."""
+  return _read_map_rows(filepath, VectorStoreMapRow, store)
 
 # ----------------------------------------- END: Read Functions -------------------------------------------------------
 
@@ -221,31 +320,71 @@ def detect_changes(sharepoint_items: list, local_items: list) -> ChangeDetection
   sp_by_id = {item.sharepoint_unique_file_id: item for item in sharepoint_items}
   local_by_id = {item.sharepoint_unique_file_id: item for item in local_items}
   
-  sp_ids = set(sp_by_id.keys())
-  local_ids = set(local_by_id.keys())
-  
-  added_ids = sp_ids - local_ids
-  removed_ids = local_ids - sp_ids
-  common_ids = sp_ids & local_ids
-  
-  added = [sp_by_id[uid] for uid in added_ids]
-  removed = [local_by_id[uid] for uid in removed_ids]
+  # Iterate dicts (insertion order) instead of sets so map file rows keep SharePoint order across runs
+  added = []
   changed = []
   unchanged = []
-  
-  for uid in common_ids:
-    sp_item = sp_by_id[uid]
-    local_item = local_by_id[uid]
-    if is_file_changed(sp_item, local_item):
+  for uid, sp_item in sp_by_id.items():
+    local_item = local_by_id.get(uid)
+    if local_item is None:
+      added.append(sp_item)
+    elif is_file_changed(sp_item, local_item):
       changed.append(sp_item)
     else:
       unchanged.append(local_item)
+  removed = [local_item for uid, local_item in local_by_id.items() if uid not in sp_by_id]
   
   return ChangeDetectionResult(added=added, removed=removed, changed=changed, unchanged=unchanged)
 
+def apply_sharepoint_changes(previous_items: list, changed_items: list, removed_listitem_ids: set) -> list:
+  """
+  Rebuild the current SharePoint state from the previous sharepoint_map.csv rows and a change log delta.
+  Used by incremental crawls with a change token instead of enumerating the whole library; the result is passed to detect_changes().
+  
+  Args:
+    previous_items: list[SharePointMapRow] from sharepoint_map.csv of the last crawl
+    changed_items: list[SharePointMapRow] re-read from SharePoint for added and modified list items
+    removed_listitem_ids: sharepoint_listitem_id values of deleted items and of modified items that no longer match the source filter
+    
+  Returns:
+    list[SharePointMapRow] in previous order, new items appended
+  """
+  changed_by_id = {item.sharepoint_listitem_id: item for item in changed_items}
+  result = []
+  for item in previous_items:
+    if item.sharepoint_listitem_id in removed_listitem_ids: continue
+    result.append(changed_by_id.pop(item.sharepoint_listitem_id, item))
+  result.extend(item for item in changed_by_id.values() if item.sharepoint_listitem_id not in removed_listitem_ids)
+  return result
+
 # ----------------------------------------- END: Change Detection -----------------------------------------------------
 
 
+# ----------------------------------------- START: Change Token -------------------------------------------------------
+
+def read_change_token(filepath: str) -> Optional[dict]:
+  """Read sharepoint_change_token.json ({list_id, filter, change_token, saved_utc}). Returns None if missing or unreadable."""
+  if not os.path.exists(filepath): return None
+  try:
+    with open(filepath, 'r', encoding='utf-8') as f: data = json.load(f)
+    return data if isinstance(data, dict) and data.get("change_token") else None
+  except Exception:
+    return None  # Fallback to full enumeration on corrupted file
+
+def write_change_token(filepath: str, list_id: str, filter: str, change_token: str, saved_utc: str) -> None:
+  """Write sharepoint_change_token.json atomically (temp file + rename). Must be written after sharepoint_map.csv."""
+  temp_path = filepath + ".tmp"
+  with open(temp_path, 'w', encoding='utf-8') as f:
+    json.dump({"list_id": list_id, "filter": filter or "", "change_token": change_token, "saved_utc": saved_utc}, f, indent=2)
+  os.replace(temp_path, filepath)
+
+def delete_change_token(filepath: str) -> None:
+  """Delete sharepoint_change_token.json. Called before a full enumeration so a stale or rejected token is not reused."""
+  if os.path.exists(filepath): os.remove(filepath)
+
+# ----------------------------------------- END: Change Token ---------------------------------------------------------
+
+
 # ----------------------------------------- START: Conversion Helpers -------------------------------------------------
 
 def sharepoint_map_row_to_files_map_row(sp_row: SharePointMapRow, file_relative_path: str = "", downloaded_utc: str = "", downloaded_timestamp: int = 0, sharepoint_error: str = "", processing_error: str = "") -> FilesMapRow:
@@ -0,0 +1,412 @@
+# Map Store Functions V2 - Indexed map store backend for sharepoint_map.csv, files_map.csv and vectorstore_map.csv
+# With CRAWLER_MAP_STORE_BACKEND="sqlite" every source folder gets a SQLite store that holds the map rows. MapFileWriter
+# writes only added, changed and removed rows into it (unchanged rows are recognized by a hash of their values and never
+# reach the database), the read_*_map() functions read from it. The map CSV files stay the export format (reports,
+# selftest, manual inspection) and are exported on demand (export_outdated_map_csvs).
+
+import csv, hashlib, marshal, os, sqlite3
+from dataclasses import dataclass, fields
+from typing import Iterable, Optional
+
+from hardcoded_config import CRAWLER_HARDCODED_CONFIG
+from routers_v2.common_map_file_functions_v2 import SharePointMapRow, FilesMapRow, VectorStoreMapRow, _read_map_file, get_row_codec
+
+# Map file name -> row class. The table name is the file name without extension.
+MAP_ROW_CLASSES = {
+  CRAWLER_HARDCODED_CONFIG.SHAREPOINT_MAP_CSV: SharePointMapRow,
+  CRAWLER_HARDCODED_CONFIG.FILE_MAP_CSV: FilesMapRow,
+  CRAWLER_HARDCODED_CONFIG.VECTOR_STORE_MAP_CSV: VectorStoreMapRow,
+}
+MAP_STORE_BACKENDS = ["csv", "sqlite"]
+UPSERT_BATCH_SIZE = 5000
+# map_state.csv_size of a map whose CSV file was not exported since the rows changed (the store holds the current rows)
+CSV_OUTDATED = -1
+
+
+# ----------------------------------------- START: SqliteMapStore Class -----------------------------------------------
+
+@dataclass
+class _MapWriteSession:
+  generation: int
+  connection: sqlite3.Connection
+  stored: dict       # Row key -> row_hash of stored rows not written in this session yet (left over on end_write: removed)
+  seen: set          # sharepoint_unique_file_id values written in this session
+  duplicates: dict   # sharepoint_unique_file_id -> last occurrence of ids written more than once
+  pending: list      # Added/changed row value tuples not yet written to the incoming table
+  written: int       # Rows written in this session (also the next sequence number)
+
+class SqliteMapStore:
+  """
+  SQLite map store for one source folder. One table per map file, keyed by sharepoint_unique_file_id and 'occurrence'
+  (unique index; rows with the same id are kept as occurrence 0, 1, ... in write order, as the CSV file keeps them),
+  'row_hash' identifies the row values, 'position' keeps the row order (existing rows keep their position, new rows
+  are appended). Rollback journal instead of WAL: the persistent storage can be a network share (Azure App Service
+  /home), where WAL shared memory is not supported. Table 'map_state' records
+  per map the size/mtime of the CSV file that matches the stored rows, or CSV_OUTDATED if the rows changed since the
+  last export. Rows are served while the CSV file is outdated or unchanged since it was written; a CSV file changed
+  outside the store (manual edits, restores from a zip) makes read_rows() return None, so callers parse the CSV file.
+
+  Write session (used by MapFileWriter): all rows of the map are written, only the differences reach the database.
+  begin_write() loads the keys and row hashes of the stored rows; rows whose hash is unchanged are skipped, added/changed
+  rows go to a temporary table, end_write() upserts them and deletes rows that were not written, in one transaction
+  (readers see the previous or the new state, never a partial one):
+    generation = store.begin_write("files_map.csv")
+    store.upsert_values("files_map.csv", values_list, generation)    # repeated
+    row_count, upserted, deleted = store.end_write("files_map.csv", generation, csv_path)
+
+  Single operations (own connection and transaction), by sharepoint_unique_file_id (upserts and lookups use occurrence 0,
+  deletes remove all occurrences):
+    store.get_row("files_map.csv", unique_id) / get_rows() / upsert_rows() / delete_rows() / read_rows() / export_csv()
+  """
+
+  def __init__(self, db_path: str):
+    self.db_path = db_path
+    self._sessions: dict[str, _MapWriteSession] = {}
+    self._generation = 0
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = self._connect()
+    try:
+      # Stores created with WAL switch back to the rollback journal
+      conn.execute("PRAGMA journal_mode=DELETE")
+      # 'with conn' commits or rolls back, it does not close the connection
+      with conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS map_state (map_name TEXT PRIMARY KEY, csv_size INTEGER NOT NULL, csv_mtime_ns INTEGER NOT NULL)")
+        for map_name, row_class in MAP_ROW_CLASSES.items():
+          table = _table_name(map_name)
+          conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({_column_definitions(row_class)}, occurrence INTEGER NOT NULL, row_hash BLOB NOT NULL, position INTEGER NOT NULL)")
+          conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_key ON {table} (sharepoint_unique_file_id, occurrence)")
+          conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_position ON {table} (position)")
+    finally:
+      conn.close()
+
+  def _connect(self) -> sqlite3.Connection:
+    conn = sqlite3.connect(self.db_path, timeout=30)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+  # ---------- Write session ----------
+
+  def begin_write(self, map_name: str) -> int:
+    """Start writing all rows of map_name. Returns the session generation number. Nothing changes until end_write()."""
+    row_class = _get_row_class(map_name)
+    self.abort_write(map_name)
+    self._generation += 1
+    conn = self._connect()
+    try:
+      # Row key: the id for occurrence 0 (almost all rows), (id, occurrence) for further rows with the same id
+      table = _table_name(map_name)
+      stored = dict(conn.execute(f"SELECT sharepoint_unique_file_id, row_hash FROM {table} WHERE occurrence = 0"))
+      stored.update(((uid, occurrence), row_hash) for uid, occurrence, row_hash in conn.execute(f"SELECT sharepoint_unique_file_id, occurrence, row_hash FROM {table} WHERE occurrence > 0"))
+      # Added/changed rows live in a temporary table of this connection (temp storage, not the database file)
+      conn.execute(f"CREATE TEMP TABLE incoming ({_column_definitions(row_class)}, occurrence INTEGER NOT NULL, row_hash BLOB NOT NULL, seq INTEGER NOT NULL)")
+    except Exception:
+      conn.close()
+      raise
+    self._sessions[map_name] = _MapWriteSession(generation=self._generation, connection=conn, stored=stored, seen=set(), duplicates={}, pending=[], written=0)
+    return self._generation
+
+  def end_write(self, map_name: str, generation: int, csv_path: Optional[str] = None, from_csv: bool = False) -> tuple[int, int, int]:
+    """
+    Upsert rows that were added or changed in this session, delete rows that were not written, in one transaction.
+    from_csv=True: the rows were read from csv_path (import), which is recorded as current. Otherwise csv_path stays
+    current only if no row changed and it is unchanged since it was recorded.
+    Returns (row count, upserted rows, deleted rows).
+    """
+    session = self._get_session(map_name, generation)
+    del self._sessions[map_name]
+    table, conn = _table_name(map_name), session.connection
+    names = get_row_codec(_get_row_class(map_name)).names
+    try:
+      with conn:
+        self._write_pending(session)
+        # Added/changed rows are upserted in write order, new rows get positions after the last stored row
+        next_position = (conn.execute(f"SELECT MAX(position) FROM {table}").fetchone()[0] or 0) + 1
+        columns = ", ".join(names)
+        upserted = conn.execute(f"{_insert_sql(map_name)} SELECT {columns}, occurrence, row_hash, seq + ? FROM temp.incoming WHERE true ORDER BY seq {_upsert_conflict_sql(map_name)}", (next_position,)).rowcount
+        removed = [key if isinstance(key, tuple) else (key, 0) for key in session.stored]
+        deleted = conn.executemany(f"DELETE FROM {table} WHERE sharepoint_unique_file_id = ? AND occurrence = ?", removed).rowcount if removed else 0
+        state = conn.execute("SELECT csv_size, csv_mtime_ns FROM map_state WHERE map_name = ?", (map_name,)).fetchone()
+        csv_state = _get_file_state(csv_path)
+        if from_csv: self._set_csv_state(conn, map_name, *csv_state)
+        elif upserted or deleted or state is None or tuple(state) != csv_state or csv_state[0] < 0: self._set_csv_state(conn, map_name, CSV_OUTDATED, CSV_OUTDATED)
+        conn.execute("DROP TABLE temp.incoming")
+    finally:
+      conn.close()
+    return session.written, upserted, deleted
+
+  def abort_write(self, map_name: str) -> None:
+    """Drop an open write session (no-op if none). Stored rows are not changed."""
+    session = self._sessions.pop(map_name, None)
+    if session: session.connection.close()
+
+  def _get_session(self, map_name: str, generation: int) -> "_MapWriteSession":
+    session = self._sessions.get(map_name)
+    if session is None: raise ValueError(f"No write session for '{map_name}'")
+    if session.generation != generation: raise ValueError(f"Write session for '{map_name}' has generation {session.generation}, not {generation}")
+    return session
+
+  def _add_session_values(self, session: "_MapWriteSession", uid_index: int, values_list: list) -> None:
+    """Compare rows with the stored rows by key and row hash, keep added/changed rows for the incoming table."""
+    stored, seen, duplicates, pending = session.stored, session.seen, session.duplicates, session.pending
+    row_hash = _row_hash
+    for values in values_list:
+      uid = values[uid_index]
+      if uid in seen:
+        occurrence = duplicates[uid] = duplicates.get(uid, 0) + 1
+        key = (uid, occurrence)
+      else:
+        seen.add(uid)
+        occurrence, key = 0, uid
+      digest = row_hash(values)
+      if stored.pop(key, None) != digest: pending.append(tuple(values) + (occurrence, digest, session.written))
+      session.written += 1
+
+  def _write_pending(self, session: "_MapWriteSession") -> None:
+    # Only the temporary table is written: no write lock on the database is held between batches
+    if not session.pending: return
+    session.connection.executemany(f"INSERT INTO temp.incoming VALUES ({', '.join('?' * len(session.pending[0]))})", session.pending)
+    session.pending = []
+
+  # ---------- Rows ----------
+
+  def upsert_rows(self, map_name: str, rows: Iterable, generation: Optional[int] = None) -> int:
+    """
+    Insert or update rows by sharepoint_unique_file_id. Returns the number of rows.
+    Inside a write session (generation given): rows are compared with the stored rows, the differences applied on end_write().
+    Outside: existing rows keep their position, new rows are appended, the CSV file is marked as outdated (see export_csv).
+    """
+    to_values = get_row_codec(_get_row_class(map_name)).to_values
+    return self.upsert_values(map_name, [to_values(row) for row in rows], generation)
+
+  def upsert_values(self, map_name: str, values_list: list, generation: Optional[int] = None) -> int:
+    """As upsert_rows() with row value tuples in column order (MapRowCodec.to_values)."""
+    names = get_row_codec(_get_row_class(map_name)).names
+    if generation is not None:
+      session = self._get_session(map_name, generation)
+      self._add_session_values(session, names.index("sharepoint_unique_file_id"), values_list)
+      if len(session.pending) >= UPSERT_BATCH_SIZE:
+        with session.connection: self._write_pending(session)
+      return len(values_list)
+    conn = self._connect()
+    try:
+      with conn:
+        count = self._upsert(conn, map_name, [tuple(values) + (0, _row_hash(values)) for values in values_list])
+        if count: self._set_csv_state(conn, map_name, CSV_OUTDATED, CSV_OUTDATED)
+    finally:
+      conn.close()
+    return count
+
+  def delete_rows(self, map_name: str, unique_ids: Iterable[str]) -> int:
+    """Delete rows (all occurrences) by sharepoint_unique_file_id. Returns the number of deleted rows. The CSV file is marked as outdated."""
+    table = _table_name(map_name)
+    conn = self._connect()
+    try:
+      with conn:
+        deleted = sum(conn.execute(f"DELETE FROM {table} WHERE sharepoint_unique_file_id = ?", (uid,)).rowcount for uid in unique_ids)
+        if deleted: self._set_csv_state(conn, map_name, CSV_OUTDATED, CSV_OUTDATED)
+    finally:
+      conn.close()
+    return deleted
+
+  def _upsert(self, conn: sqlite3.Connection, map_name: str, values_list: list) -> int:
+    """Upsert row value tuples + (occurrence, row_hash) by key (existing rows keep their position, new rows are appended in list order)."""
+    if not values_list: return 0
+    table = _table_name(map_name)
+    next_position = (conn.execute(f"SELECT MAX(position) FROM {table}").fetchone()[0] or 0) + 1
+    conn.executemany(_upsert_sql(map_name), [tuple(values) + (next_position + i,) for i, values in enumerate(values_list)])
+    return len(values_list)
+
+  def get_row(self, map_name: str, unique_id: str):
+    """Row by sharepoint_unique_file_id (indexed lookup) or None."""
+    return self.get_rows(map_name, [unique_id]).get(unique_id)
+
+  def get_rows(self, map_name: str, unique_ids: Iterable[str]) -> dict:
+    """Rows by sharepoint_unique_file_id (first occurrence). Returns {unique_id: row} for the ids found."""
+    row_class = _get_row_class(map_name)
+    names = get_row_codec(row_class).names
+    uid_index = names.index("sharepoint_unique_file_id")
+    unique_ids = list(unique_ids)
+    result = {}
+    conn = self._connect()
+    try:
+      for i in range(0, len(unique_ids), 500):
+        chunk = unique_ids[i:i + 500]
+        for values in conn.execute(f"SELECT {', '.join(names)} FROM {_table_name(map_name)} WHERE sharepoint_unique_file_id IN ({', '.join('?' * len(chunk))}) AND occurrence = 0", chunk):
+          result[values[uid_index]] = row_class(*values)
+    finally:
+      conn.close()
+    return result
+
+  def count_rows(self, map_name: str) -> int:
+    conn = self._connect()
+    try: return conn.execute(f"SELECT COUNT(*) FROM {_table_name(map_name)}").fetchone()[0]
+    finally: conn.close()
+
+  def has_map(self, map_name: str) -> bool:
+    """True if rows of map_name were written to the store (the map exists, even with 0 rows)."""
+    conn = self._connect()
+    try: return conn.execute("SELECT 1 FROM map_state WHERE map_name = ?", (map_name,)).fetchone() is not None
+    finally: conn.close()
+
+  def is_csv_outdated(self, map_name: str) -> bool:
+    """True if the rows of map_name changed since its CSV file was last written or imported."""
+    conn = self._connect()
+    try:
+      state = conn.execute("SELECT csv_size FROM map_state WHERE map_name = ?", (map_name,)).fetchone()
+      return state is not None and state[0] == CSV_OUTDATED
+    finally:
+      conn.close()
+
+  def drop_map(self, map_name: str) -> int:
+    """Delete all rows of map_name and its state (as deleting the map file). Returns the number of deleted rows."""
+    table = _table_name(map_name)
+    self.abort_write(map_name)
+    conn = self._connect()
+    try:
+      with conn:
+        deleted = conn.execute(f"DELETE FROM {table}").rowcount
+        conn.execute("DELETE FROM map_state WHERE map_name = ?", (map_name,))
+    finally:
+      conn.close()
+    return deleted
+
+  def read_rows(self, map_name: str, csv_path: Optional[str] = None) -> Optional[list]:
+    """
+    All rows in map file order. Returns None if map_name is unknown, was never written, or (with csv_path) the CSV file
+    was recorded as current but has changed since. Callers then parse the CSV file.
+    """
+    row_class = MAP_ROW_CLASSES.get(map_name)
+    if row_class is None: return None
+    names = get_row_codec(row_class).names
+    conn = self._connect()
+    try:
+      # Snapshot: state and rows are read in one transaction, a concurrent writer commits either before or after
+      conn.execute("BEGIN")
+      state = conn.execute("SELECT csv_size, csv_mtime_ns FROM map_state WHERE map_name = ?", (map_name,)).fetchone()
+      if state is None: return None
+      if state[0] != CSV_OUTDATED and csv_path is not None and _get_file_state(csv_path) != tuple(state): return None
+      return [row_class(*values) for values in conn.execute(f"SELECT {', '.join(names)} FROM {_table_name(map_name)} ORDER BY position")]
+    finally:
+      conn.close()
+
+  # ---------- CSV import / export ----------
+
+  def import_csv(self, map_name: str, csv_path: str) -> int:
+    """Replace the rows of map_name with the rows of a map CSV file. Returns the row count."""
+    rows = _read_map_file(csv_path, _get_row_class(map_name))
+    generation = self.begin_write(map_name)
+    try:
+      for i in range(0, len(rows), UPSERT_BATCH_SIZE): self.upsert_rows(map_name, rows[i:i + UPSERT_BATCH_SIZE], generation)
+    except Exception:
+      self.abort_write(map_name)
+      raise
+    return self.end_write(map_name, generation, csv_path, from_csv=True)[0]
+
+  def export_csv(self, map_name: str, csv_path: str) -> int:
+    """Write all rows of map_name to a map CSV file (temp file + rename) and record it as current. Returns the row count."""
+    names = get_row_codec(_get_row_class(map_name)).names
+    temp_path = csv_path + ".tmp"
+    count = 0
+    conn = self._connect()
+    try:
+      with conn:
+        with open(temp_path, 'w', newline='', encoding='utf-8') as f:
+          writer = csv.writer(f)
+          writer.writerow(names)
+          for values in conn.execute(f"SELECT {', '.join(names)} FROM {_table_name(map_name)} ORDER BY position"):
+            writer.writerow(values)
+            count += 1
+        os.replace(temp_path, csv_path)
+        csv_size, csv_mtime_ns = _get_file_state(csv_path)
+        self._set_csv_state(conn, map_name, csv_size, csv_mtime_ns)
+    finally:
+      conn.close()
+    return count
+
+  def _set_csv_state(self, conn: sqlite3.Connection, map_name: str, csv_size: int, csv_mtime_ns: int) -> None:
+    """Record the CSV file that matches the stored rows, or CSV_OUTDATED until export_csv() is called."""
+    conn.execute("INSERT INTO map_state (map_name, csv_size, csv_mtime_ns) VALUES (?, ?, ?) ON CONFLICT (map_name) DO UPDATE SET csv_size = excluded.csv_size, csv_mtime_ns = excluded.csv_mtime_ns", (map_name, csv_size, csv_mtime_ns))
+
+# ----------------------------------------- END: SqliteMapStore Class -------------------------------------------------
+
+
+# ----------------------------------------- START: Store Functions ----------------------------------------------------
+
+def _table_name(map_name: str) -> str:
+  """Table of a map file. Only known map file names are accepted (table names end up in SQL text)."""
+  _get_row_class(map_name)
+  return os.path.splitext(map_name)[0]
+
+def _column_definitions(row_class: type) -> str:
+  return ", ".join(f"{f.name} {'INTEGER' if f.type == int else 'TEXT'}" for f in fields(row_class))
+
+def _row_hash(values: tuple) -> bytes:
+  """
+  64-bit hash of row values. Unlike hash(), it does not depend on the process. The marshal format can change with
+  the Python version; then all rows count as changed once.
+  """
+  return hashlib.blake2b(marshal.dumps(tuple(values)), digest_size=8).digest()
+
+def _insert_sql(map_name: str) -> str:
+  return f"INSERT INTO {_table_name(map_name)} ({', '.join(get_row_codec(_get_row_class(map_name)).names)}, occurrence, row_hash, position)"
+
+def _upsert_conflict_sql(map_name: str) -> str:
+  """Upsert clause: a row with the same key gets the new values and keeps its position."""
+  names = get_row_codec(_get_row_class(map_name)).names
+  return f"ON CONFLICT (sharepoint_unique_file_id, occurrence) DO UPDATE SET {', '.join(f'{name} = excluded.{name}' for name in names + ('row_hash',) if name != 'sharepoint_unique_file_id')}"
+
+def _upsert_sql(map_name: str) -> str:
+  column_count = len(get_row_codec(_get_row_class(map_name)).names) + 3
+  return f"{_insert_sql(map_name)} VALUES ({', '.join('?' * column_count)}) {_upsert_conflict_sql(map_name)}"
+
+def _get_row_class(map_name: str) -> type:
+  row_class = MAP_ROW_CLASSES.get(map_name)
+  if row_class is None: raise ValueError(f"Unknown map file '{map_name}', expected one of: {', '.join(MAP_ROW_CLASSES)}")
+  return row_class
+
+def _get_file_state(path: Optional[str]) -> tuple[int, int]:
+  """(size, mtime_ns) of a file, (-1, -1) if missing or no path."""
+  if not path or not os.path.exists(path): return -1, -1
+  stat = os.stat(path)
+  return stat.st_size, stat.st_mtime_ns
+
+def get_map_store_backend() -> str:
+  backend = CRAWLER_HARDCODED_CONFIG.CRAWLER_MAP_STORE_BACKEND
+  if backend not in MAP_STORE_BACKENDS: raise ValueError(f"Invalid CRAWLER_MAP_STORE_BACKEND '{backend}', expected one of: {', '.join(MAP_STORE_BACKENDS)}")
+  return backend
+
+def migrate_csv_maps_to_store(source_folder: str, store: SqliteMapStore) -> dict:
+  """Import all existing map CSV files of a source folder into the store. Returns {map_name: row_count}."""
+  counts = {}
+  for map_name in MAP_ROW_CLASSES:
+    csv_path = os.path.join(source_folder, map_name)
+    if os.path.exists(csv_path): counts[map_name] = store.import_csv(map_name, csv_path)
+  return counts
+
+def export_outdated_map_csvs(source_folder: str, store: Optional[SqliteMapStore] = None) -> dict:
+  """
+  Write the map CSV files of a source folder whose rows changed in the store since the last export (on demand: crawl
+  reports, selftest, switching back to the csv backend). No-op without a store file. Returns {map_name: row_count}.
+  """
+  if store is None:
+    db_path = os.path.join(source_folder, CRAWLER_HARDCODED_CONFIG.MAP_STORE_SQLITE)
+    if not os.path.exists(db_path): return {}
+    store = SqliteMapStore(db_path)
+  return {map_name: store.export_csv(map_name, os.path.join(source_folder, map_name)) for map_name in MAP_ROW_CLASSES if store.is_csv_outdated(map_name)}
+
+def open_map_store(source_folder: str) -> Optional[SqliteMapStore]:
+  """
+  Map store of a source folder, or None for CRAWLER_MAP_STORE_BACKEND="csv".
+  A new store is filled from existing map CSV files (migration on first use). With the csv backend, CSV files left
+  outdated by an earlier sqlite backend run are exported first, so the CSV files hold the current rows again.
+  """
+  if get_map_store_backend() != "sqlite":
+    export_outdated_map_csvs(source_folder)
+    return None
+  db_path = os.path.join(source_folder, CRAWLER_HARDCODED_CONFIG.MAP_STORE_SQLITE)
+  is_new = not os.path.exists(db_path)
+  store = SqliteMapStore(db_path)
+  if is_new: migrate_csv_maps_to_store(source_folder, store)
+  return store
+
+# ----------------------------------------- END: Store Functions ------------------------------------------------------
@@ -44,7 +44,7 @@ def get_type_from_folder(folder: str) -> str:
 
 # ----------------------------------------- START: Report CRUD Functions ------------------------------------------------------
 
-def create_report(report_type: str, filename: str, files: list[tuple[str, bytes]], metadata: dict, storage_path: str = None, keep_folder_structure: bool = True, dry_run: bool = False, logger: Optional[MiddlewareLogger] = None) -> str:
+def create_report(report_type: str, filename: str, files: list[tuple[str, bytes | Path]], metadata: dict, storage_path: str = None, keep_folder_structure: bool = True, dry_run: bool = False, logger: Optional[MiddlewareLogger] = None) -> str:
   """
   Create a report archive with report.json and provided files.
   Returns report_id on success.
@@ -52,7 +52,7 @@ def create_report(report_type: str, filename: str, files: list[tuple[str, bytes]
   Args:
     report_type: "crawl", "site_scan", etc.
     filename: Archive filename without .zip extension
-    files: List of (archive_path, content_bytes) tuples
+    files: List of (archive_path, content_bytes) tuples; content may also be the Path of a file, which is copied into the archive without reading it into memory
     metadata: Dict with title, type, ok, error and type-specific fields
     keep_folder_structure: If True, preserve file paths; if False, flatten to root
     dry_run: If True, simulate without writing to disk
@@ -84,7 +84,7 @@ def create_report(report_type: str, filename: str, files: list[tuple[str, bytes]
     files_inventory.append({
       "filename": os.path.basename(file_path),
       "file_path": actual_path,
-      "file_size": len(content),
+      "file_size": os.path.getsize(content) if isinstance(content, Path) else len(content),
       "last_modified_utc": now_utc
     })
   
@@ -112,7 +112,8 @@ def create_report(report_type: str, filename: str, files: list[tuple[str, bytes]
       zf.writestr("report.json", report_json_content)
       for file_path, content in files:
         actual_path = file_path if keep_folder_structure else os.path.basename(file_path)
-        zf.writestr(actual_path, content)
+        if isinstance(content, Path): zf.write(content, actual_path)
+        else: zf.writestr(actual_path, content)
     if logger: logger.log_function_output(f"  OK.")
   
   return report_id
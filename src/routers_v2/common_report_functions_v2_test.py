@@ -167,6 +167,21 @@ def test_create_report(temp_dir: str):
   with zipfile.ZipFile(archive_empty_content, 'r') as zf:
     test("C12: Empty file exists", "empty.txt" in zf.namelist())
     test("C12: Empty file is 0 bytes", len(zf.read("empty.txt")) == 0)
+  
+  # C13: File path content (copied from disk)
+  source_file = Path(temp_dir) / "source.csv"
+  source_file.write_bytes(b"col1,col2\n" * 1000)
+  rf.create_report(
+    report_type="crawl",
+    filename="path_content_test",
+    files=[("data/source.csv", source_file)],
+    metadata={"title": "Path content", "ok": True, "error": ""}
+  )
+  archive_path_content = Path(temp_dir) / "reports" / "crawls" / "path_content_test.zip"
+  with zipfile.ZipFile(archive_path_content, 'r') as zf:
+    test("C13: File path content copied", zf.read("data/source.csv") == source_file.read_bytes())
+    report_json = json.loads(zf.read("report.json").decode("utf-8"))
+    test("C13: File path size in inventory", report_json["files"][1]["file_size"] == 10000)
 
 def test_list_reports(temp_dir: str):
   section("list_reports()")
@@ -1,25 +1,37 @@
 # Common functions for SharePoint security scanning
 # Implements permission scanning per _V2_SPEC_SITES_SECURITY_SCAN.md [SITE-SP03]
-# V2 version using MiddlewareLogger and Office365-REST-Python-Client
+# V2 version using MiddlewareLogger and the async SharePointRestClient (common_sharepoint_client_v2.py)
 
-import asyncio, datetime, json, os, re, requests, tempfile
-from typing import Any, AsyncGenerator, Optional
+import asyncio, datetime, json, operator, os, re, requests, shutil, tempfile
+from pathlib import Path
+from typing import Any, AsyncGenerator, Callable, Optional
 from azure.identity import CertificateCredential
 from msgraph import GraphServiceClient
-from office365.sharepoint.client_context import ClientContext
 from hardcoded_config import CRAWLER_HARDCODED_CONFIG
+from routers_v2.common_entra_group_functions_v2 import get_entra_group_cache_folder, get_entra_group_resolver
+from routers_v2.common_job_functions_v2 import SourceStepWriter
 from routers_v2.common_logging_functions_v2 import MiddlewareLogger, UNKNOWN
-from routers_v2.common_sharepoint_functions_v2 import connect_to_site_using_client_id_and_certificate
+from routers_v2.common_sharepoint_client_v2 import SharePointRestClient, create_sharepoint_client
 
 # ----------------------------------------- START: Constants ------------------------------------------------------------------
 
 MAX_NESTING_LEVEL = 5
 BATCH_SIZE = 2000  # Reduced from 5000 to avoid SharePoint list view threshold errors
 PROGRESS_INTERVAL_SECONDS = 5
+# Rows CsvStreamWriter formats and keeps before appending them to the file
+CSV_WRITE_BUFFER_ROWS = 1000
+# Escaped values a CSV row formatter memoizes per column before the column cache is cleared
+CSV_ESCAPE_CACHE_ENTRIES = 1024
+# Subsites write their CSV rows to numbered folders below the output folder until they are merged in subsite order
+SUBSITE_OUTPUT_SUBFOLDER = "_subsites"
 
 # Built-in list templates to include (Generic List, Document Library, Site Pages)
 INCLUDED_TEMPLATES = [100, 101, 119]
 
+# Role assignments with member and permission levels. Members are selected with the Principal properties only
+# (no Email), matching the Office365 object model the scanner output was verified against.
+ROLE_ASSIGNMENTS_QUERY = {"$expand": "Member,RoleDefinitionBindings", "$select": "PrincipalId,Member/Id,Member/Title,Member/LoginName,Member/PrincipalType,RoleDefinitionBindings/Name"}
+
 # CSV Column Definitions (EXACT order - must match PowerShell scanner)
 # All CSVs start with Job,SiteUrl prefix
 CSV_COLUMNS_SITE_CONTENTS = ["Job", "SiteUrl", "Id", "Type", "Title", "Url"]
@@ -52,14 +64,40 @@ def csv_escape(value, is_numeric: bool = False) -> str:
 # Columns that should not be quoted (numeric/boolean values)
 NUMERIC_COLUMNS = {"Job", "Id", "NestingLevel", "IsGuest"}
 
+_csv_row_formatters: dict[tuple, Callable[[dict], str]] = {}
+
+def get_csv_row_formatter(columns: list) -> Callable[[dict], str]:
+  """
+  Row formatter for fixed columns with the output of csv_escape(). Escaped strings are memoized per column (site URLs,
+  logins, group names and permission levels repeat on most rows); a column cache is cleared when it reaches
+  CSV_ESCAPE_CACHE_ENTRIES, so unique values (item URLs, IDs) do not grow it.
+  """
+  columns = tuple(columns)
+  format_row = _csv_row_formatters.get(columns)
+  if format_row is not None: return format_row
+  get_values = operator.itemgetter(*columns) if len(columns) > 1 else lambda row: (row[columns[0]],)
+  numeric_flags = [col in NUMERIC_COLUMNS for col in columns]
+  # Only str values are memoized: True == 1 would otherwise share the escaped text of another type
+  escape_caches: list[dict[str, str]] = [{} for _ in columns]
+  def format_row(row: dict) -> str:
+    try: values = get_values(row)
+    except KeyError: values = tuple(row.get(col, '') for col in columns)
+    parts = []
+    for value, escaped, is_numeric in zip(values, escape_caches, numeric_flags):
+      text = escaped.get(value) if type(value) is str else None
+      if text is None:
+        text = csv_escape(value, is_numeric)
+        if type(value) is str:
+          if len(escaped) >= CSV_ESCAPE_CACHE_ENTRIES: escaped.clear()
+          escaped[value] = text
+      parts.append(text)
+    return ','.join(parts)
+  _csv_row_formatters[columns] = format_row
+  return format_row
+
 def csv_row(row: dict, columns: list) -> str:
   """Convert dict to CSV row string with proper escaping."""
-  parts = []
-  for col in columns:
-    val = row.get(col, '')
-    is_numeric = col in NUMERIC_COLUMNS
-    parts.append(csv_escape(val, is_numeric=is_numeric))
-  return ','.join(parts)
+  return get_csv_row_formatter(columns)(row)
 
 def write_csv_header(file_path: str, columns: list) -> None:
   """Write CSV header row to file (UTF-8 without BOM)."""
@@ -69,39 +107,86 @@ def write_csv_header(file_path: str, columns: list) -> None:
 def append_csv_rows(file_path: str, rows: list[dict], columns: list) -> None:
   """Append rows to CSV file."""
   if not rows: return
+  format_row = get_csv_row_formatter(columns)
   with open(file_path, 'a', encoding='utf-8', newline='') as f:
     for row in rows:
-      f.write(csv_row(row, columns) + '\n')
+      f.write(format_row(row) + '\n')
+
+class CsvStreamWriter:
+  """
+  Appends rows to a CSV file while they are produced. Rows are formatted at once and kept as lines until buffer_rows
+  are pending, then appended to the file in one write (the file is only open while writing). Call flush() when done.
+  """
+
+  def __init__(self, file_path: str, columns: list, buffer_rows: int = CSV_WRITE_BUFFER_ROWS):
+    self.file_path = file_path
+    self.buffer_rows = max(1, buffer_rows)
+    self.rows_written = 0
+    self._format_row = get_csv_row_formatter(columns)
+    self._lines: list[str] = []
+
+  def write_row(self, row: dict) -> None:
+    self._lines.append(self._format_row(row))
+    if len(self._lines) >= self.buffer_rows: self.flush()
+
+  def flush(self) -> None:
+    """Append the pending rows to the file."""
+    if not self._lines: return
+    with open(self.file_path, 'a', encoding='utf-8', newline='') as f:
+      f.write('\n'.join(self._lines))
+      f.write('\n')
+    self.rows_written += len(self._lines)
+    self._lines.clear()
+
+def merge_csv_folders(target_folder: str, source_folders: list[str]) -> None:
+  """Append the CSV files of source_folders (rows only) to the same-named files in target_folder, folder by folder. Removes the source folders."""
+  for source_folder in source_folders:
+    if not os.path.isdir(source_folder): continue
+    for file_name in sorted(os.listdir(source_folder)):
+      if not file_name.endswith(".csv"): continue
+      with open(os.path.join(source_folder, file_name), 'rb') as source, open(os.path.join(target_folder, file_name), 'ab') as target:
+        shutil.copyfileobj(source, target)
+    shutil.rmtree(source_folder, ignore_errors=True)
 
 # ----------------------------------------- END: CSV Functions ----------------------------------------------------------------
 
 
+# ----------------------------------------- START: Concurrent Scanning --------------------------------------------------------
+
+def get_max_parallel_webs(requested: Optional[int] = None) -> int:
+  """Sites and subsites scanned at the same time. None or 0 = SECURITY_SCAN_MAX_PARALLEL_WEBS, 1 = sequential."""
+  if not requested: return max(1, CRAWLER_HARDCODED_CONFIG.SECURITY_SCAN_MAX_PARALLEL_WEBS)
+  return max(1, int(requested))
+
+class ScanSiteWriter(SourceStepWriter):
+  """
+  SourceStepWriter view for one site or subsite of a concurrent scan. Step results (writer._step_result) are stored per view,
+  log lines go to the shared job stream with '[label] ' after the timestamp, e.g. '[2026-01-01 10:00:00] [SITE01/projects]   3 lists found'.
+  """
+
+  def __init__(self, writer, label: str = ""):
+    super().__init__(writer._writer if isinstance(writer, SourceStepWriter) else writer)
+    self.label = label
+
+  def emit_log(self, message: str) -> str:
+    if self.label:
+      timestamp, separator, text = message.partition("] ")
+      message = f"{timestamp}] [{self.label}] {text}" if separator and timestamp.startswith("[") else f"[{self.label}] {message}"
+    return self._writer.emit_log(message)
+
+# ----------------------------------------- END: Concurrent Scanning ----------------------------------------------------------
+
+
 # ----------------------------------------- START: Cache Functions ------------------------------------------------------------
 
 def get_entra_cache_folder(storage_path: str) -> str:
   """Get Entra ID group cache folder path."""
-  return os.path.join(storage_path, CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_PATH_SITES_SUBFOLDER, "_entra_group_cache")
-
-def load_entra_group_cache(storage_path: str, group_id: str) -> dict | None:
-  """Load cached Entra ID group members if available."""
-  cache_path = os.path.join(get_entra_cache_folder(storage_path), f"{group_id}.json")
-  if not os.path.exists(cache_path): return None
-  try:
-    with open(cache_path, 'r', encoding='utf-8') as f: return json.load(f)
-  except: return None
-
-def save_entra_group_cache(storage_path: str, group_id: str, data: dict) -> None:
-  """Save Entra ID group members to cache."""
-  cache_folder = get_entra_cache_folder(storage_path)
-  os.makedirs(cache_folder, exist_ok=True)
-  cache_path = os.path.join(cache_folder, f"{group_id}.json")
-  with open(cache_path, 'w', encoding='utf-8') as f: json.dump(data, f, indent=2)
+  return get_entra_group_cache_folder(storage_path)
 
 def delete_all_entra_caches(storage_path: str) -> int:
-  """Delete all Entra ID group caches. Returns count of deleted files."""
+  """Delete all cached Entra ID groups (memory and disk, including per-group JSON files of earlier versions). Returns count of deleted groups."""
+  count = get_entra_group_resolver(storage_path).invalidate()
   cache_folder = get_entra_cache_folder(storage_path)
-  if not os.path.exists(cache_folder): return 0
-  count = 0
   for f in os.listdir(cache_folder):
     if f.endswith('.json'):
       os.remove(os.path.join(cache_folder, f))
@@ -202,63 +287,76 @@ def extract_group_id_from_login(login_name: str) -> str | None:
   return None
 
 async def resolve_entra_group_members(storage_path: str, graph_client: GraphServiceClient, group_id: str, group_name: str, nesting_level: int, parent_group: str, writer, logger: MiddlewareLogger) -> list:
-  """Resolve Entra ID group members using Graph API with caching."""
+  """Resolve Entra ID group members using Graph API with caching (common_entra_group_functions_v2.py). Returns new member rows per call."""
   if nesting_level > MAX_NESTING_LEVEL:
     ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     writer.emit_log(f"[{ts}]           WARNING: Max nesting level ({MAX_NESTING_LEVEL}) reached for group_name='{group_name}'")
     return []
   
   # Check cache first
-  cached = load_entra_group_cache(storage_path, group_id)
+  resolver = get_entra_group_resolver(storage_path)
+  cached = resolver.get_cached(group_id)
   if cached:
-    member_count = len(cached.get('members', []))
+    users = cached[0]
     ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    writer.emit_log(f"[{ts}]           Using cached {member_count} member(s) for group_name='{group_name}'".replace("(s)", "s" if member_count != 1 else ""))
-    return cached.get("members", [])
+    writer.emit_log(f"[{ts}]           Using cached {len(users)} member(s) for group_name='{group_name}'".replace("(s)", "s" if len(users) != 1 else ""))
+    return get_entra_group_member_rows(users, group_id, group_name, nesting_level, parent_group)
   
-  # Fetch from Graph API using transitive members
+  # Fetch from Graph API using transitive members (all pages, shared with concurrent lookups of the same group)
   ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
   writer.emit_log(f"[{ts}]           Fetching from Graph API for group_name='{group_name}'...")
-  members = []
   try:
-    members_response = await graph_client.groups.by_group_id(group_id).transitive_members.get()
-    
-    for member in members_response.value:
-      if hasattr(member, 'odata_type') and member.odata_type == "#microsoft.graph.user":
-        upn = member.user_principal_name or ""
-        is_guest = "true" if "#ext#" in upn.lower() else "false"
-        members.append({
-          "Id": "",  # Empty for nested Entra ID members per SPEC
-          "LoginName": upn,
-          "DisplayName": member.display_name or "",
-          "Email": member.mail or "",
-          "IsGuest": is_guest,
-          "NestingLevel": nesting_level,
-          "ParentGroup": parent_group,
-          "ViaGroup": group_name,
-          "ViaGroupId": group_id,
-          "ViaGroupType": "SecurityGroup",
-          "AssignmentType": "Group"
-        })
-    
-    # Cache result
-    save_entra_group_cache(storage_path, group_id, {
-      "group_id": group_id,
-      "group_name": group_name,
-      "cached_utc": datetime.datetime.now(datetime.timezone.utc).isoformat() + "Z",
-      "member_count": len(members),
-      "members": members
-    })
-    ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    writer.emit_log(f"[{ts}]           OK. {len(members)} member(s) resolved and cached.".replace("(s)", "s" if len(members) != 1 else ""))
+    users, _ = await resolver.get_users(graph_client, group_id, group_name)
   except Exception as e:
     ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     writer.emit_log(f"[{ts}]           ERROR: Failed to resolve Entra group_name='{group_name}' -> {e}")
-  
-  return members
+    return []
+  ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+  writer.emit_log(f"[{ts}]           OK. {len(users)} member(s) resolved and cached.".replace("(s)", "s" if len(users) != 1 else ""))
+  return get_entra_group_member_rows(users, group_id, group_name, nesting_level, parent_group)
 
-async def resolve_sharepoint_group_members(ctx: ClientContext, group, storage_path: str, graph_client: Optional[GraphServiceClient], writer, nesting_level: int, parent_group: str, logger: MiddlewareLogger, settings: dict = None) -> list:
-  """Resolve all members of a SharePoint group, including nested Entra ID groups."""
+def get_entra_group_member_rows(users: list[dict], group_id: str, group_name: str, nesting_level: int, parent_group: str) -> list:
+  """Member rows of the cached group users for one lookup (callers add and change columns, cached users stay unchanged)."""
+  return [{
+    "Id": "",  # Empty for nested Entra ID members per SPEC
+    "LoginName": user["LoginName"],
+    "DisplayName": user["DisplayName"],
+    "Email": user["Email"],
+    "IsGuest": user["IsGuest"],
+    "NestingLevel": nesting_level,
+    "ParentGroup": parent_group,
+    "ViaGroup": group_name,
+    "ViaGroupId": group_id,
+    "ViaGroupType": "SecurityGroup",
+    "AssignmentType": "Group"
+  } for user in users]
+
+def get_entra_groups_to_resolve(members: list[dict], settings: dict = None) -> dict:
+  """{group_id: group_name} of the Entra ID groups among members (role assignment Member or SharePoint group user dicts), skipping ignored accounts and do_not_resolve_these_groups."""
+  if settings is None: settings = {}
+  ignore_accounts = set(settings.get("ignore_accounts", []))
+  do_not_resolve = set(settings.get("do_not_resolve_these_groups", []))
+  groups = {}
+  for member in members:
+    login_name = member.get("LoginName") or ""
+    if not is_entra_id_group(login_name) or any(ignored in login_name for ignored in ignore_accounts): continue
+    group_name = member.get("Title") or login_name
+    group_id = extract_group_id_from_login(login_name)
+    if group_id and group_name not in do_not_resolve: groups.setdefault(group_id, group_name)
+  return groups
+
+async def prefetch_entra_groups(storage_path: str, graph_client: Optional[GraphServiceClient], groups: dict, writer) -> None:
+  """Fetch the uncached groups ({group_id: group_name}) concurrently, so the following resolve_entra_group_members() calls are cache hits. Errors are logged by those calls."""
+  if not graph_client or not groups: return
+  resolver = get_entra_group_resolver(storage_path)
+  uncached = {group_id: group_name for group_id, group_name in groups.items() if resolver.get_cached(group_id) is None}
+  if len(uncached) < 2: return
+  ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+  writer.emit_log(f"[{ts}]       Fetching {len(uncached)} Entra ID groups from Graph API ({resolver.max_parallel} at a time)...")
+  await resolver.resolve_many(graph_client, uncached)
+
+async def resolve_sharepoint_group_members(sp_client: SharePointRestClient, group: dict, storage_path: str, graph_client: Optional[GraphServiceClient], writer, nesting_level: int, parent_group: str, logger: MiddlewareLogger, settings: dict = None, raise_errors: bool = False) -> list:
+  """Resolve all members of a SharePoint group (dict with Id, Title), including nested Entra ID groups. raise_errors=False: failed member requests are logged and return []."""
   if settings is None: settings = {}
   max_nesting = settings.get("max_group_nesting_level", MAX_NESTING_LEVEL)
   ignore_accounts = set(settings.get("ignore_accounts", []))
@@ -268,29 +366,32 @@ async def resolve_sharepoint_group_members(ctx: ClientContext, group, storage_pa
   
   members = []
   try:
-    # Use group.users.get() to get direct members, then resolve Entra groups via Graph
+    # Get direct members of the group, then resolve Entra groups via Graph
     # This preserves the nested group structure (ViaGroup = Entra group name)
-    users = group.users.get().execute_query()
+    users = await sp_client.get_all(f"/_api/web/sitegroups/getbyid({group['Id']})/users")
   except Exception as e:
+    if raise_errors: raise
     ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    writer.emit_log(f"[{ts}]       ERROR: Failed to get users for group_title='{group.title}' -> {e}")
+    writer.emit_log(f"[{ts}]       ERROR: Failed to get users for group_title='{group.get('Title')}' -> {e}")
     return []
+  sp_group_title, sp_group_id = group.get("Title"), group.get("Id")
+  await prefetch_entra_groups(storage_path, graph_client, get_entra_groups_to_resolve(users, settings), writer)
   
   user_count = len(users)
   ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-  writer.emit_log(f"[{ts}]       {user_count} member(s) in group_title='{group.title}'".replace("(s)", "s" if user_count != 1 else ""))
+  writer.emit_log(f"[{ts}]       {user_count} member(s) in group_title='{sp_group_title}'".replace("(s)", "s" if user_count != 1 else ""))
   
   for user in users:
-    login_name = user.login_name or ""
+    login_name = user.get("LoginName") or ""
     # Skip ignored accounts from settings
     if any(ignored in login_name for ignored in ignore_accounts): continue
     
     ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    writer.emit_log(f"[{ts}]         Member: type={user.principal_type} display_name='{user.title}' login='{login_name[:50]}...'")
+    writer.emit_log(f"[{ts}]         Member: type={user.get('PrincipalType')} display_name='{user.get('Title')}' login='{login_name[:50]}...'")
     
     if is_entra_id_group(login_name):
       group_id = extract_group_id_from_login(login_name)
-      group_display_name = user.title or login_name
+      group_display_name = user.get("Title") or login_name
       writer.emit_log(f"[{ts}]           -> Entra ID group (group_id={group_id})")
       
       # Check if group should not be resolved (from settings) - still add entry, just skip nested resolution
@@ -305,8 +406,8 @@ async def resolve_sharepoint_group_members(ctx: ClientContext, group, storage_pa
           "IsGuest": "false",
           "NestingLevel": nesting_level,
           "ParentGroup": parent_group,
-          "ViaGroup": group.title,
-          "ViaGroupId": str(group.id),
+          "ViaGroup": sp_group_title,
+          "ViaGroupId": str(sp_group_id),
           "ViaGroupType": "SharePointGroup",
           "AssignmentType": "Group"
         })
@@ -316,8 +417,8 @@ async def resolve_sharepoint_group_members(ctx: ClientContext, group, storage_pa
         writer.emit_log(f"[{ts}]           Resolving via Graph API...")
         # Resolve Entra ID group members
         nested = await resolve_entra_group_members(
-          storage_path, graph_client, group_id, user.title or login_name,
-          nesting_level + 1, group.title, writer, logger
+          storage_path, graph_client, group_id, user.get("Title") or login_name,
+          nesting_level + 1, sp_group_title, writer, logger
         )
         ts2 = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         writer.emit_log(f"[{ts2}]           OK. {len(nested)} nested member(s) resolved.".replace("(s)", "s" if len(nested) != 1 else ""))
@@ -329,27 +430,112 @@ async def resolve_sharepoint_group_members(ctx: ClientContext, group, storage_pa
     else:
       is_guest = "true" if "#ext#" in login_name.lower() else "false"
       members.append({
-        "Id": str(user.id) if user.id else "",
+        "Id": str(user.get("Id")) if user.get("Id") else "",
         "LoginName": normalize_login_name(login_name),
-        "DisplayName": user.title or "",
-        "Email": user.email or "",
+        "DisplayName": user.get("Title") or "",
+        "Email": user.get("Email") or "",
         "IsGuest": is_guest,
         "NestingLevel": nesting_level,
         "ParentGroup": parent_group,
-        "ViaGroup": group.title,
-        "ViaGroupId": str(group.id),
+        "ViaGroup": sp_group_title,
+        "ViaGroupId": str(sp_group_id),
         "ViaGroupType": "SharePointGroup",
         "AssignmentType": "Group"
       })
   
   return members
 
+class SharePointGroupCache:
+  """
+  Resolved SharePoint groups of one scan, keyed by web URL, group id and nesting context (nesting level, parent group).
+  scan_site_groups() adds the site groups and resolves the groups with permissions, scan_broken_inheritance_items() reuses them
+  instead of requesting the group and its members again for every item. Returned member lists are shared: callers must not change them.
+  Concurrent lookups of a group that is being requested wait for that request. Failed requests are logged and not cached.
+  """
+
+  def __init__(self):
+    self._groups: dict[tuple, dict] = {}    # (web url, group id) -> {Id, Title}
+    self._members: dict[tuple, list] = {}   # (web url, group id, nesting level, parent group) -> member rows
+    self._groups_in_flight: dict[tuple, asyncio.Task] = {}
+    self._members_in_flight: dict[tuple, asyncio.Task] = {}
+    self._stats = {"hits": 0, "misses": 0, "shared": 0, "group_hits": 0, "group_misses": 0, "group_shared": 0}
+
+  def add_groups(self, sp_client: SharePointRestClient, groups: list[dict]) -> None:
+    """Remember site groups (dicts with Id, Title) loaded by the caller."""
+    for group in groups: self._groups[(sp_client.site_url, group.get("Id"))] = {"Id": group.get("Id"), "Title": group.get("Title")}
+
+  async def get_group(self, sp_client: SharePointRestClient, group_id) -> dict:
+    """Site group {Id, Title}, requested from SharePoint if not known yet (one request for concurrent lookups of the group)."""
+    key = (sp_client.site_url, group_id)
+    group = self._groups.get(key)
+    if group is not None:
+      self._stats["group_hits"] += 1
+      return group
+    task = self._groups_in_flight.get(key)
+    if task is not None: self._stats["group_shared"] += 1
+    else:
+      self._stats["group_misses"] += 1
+      # Own task: the request continues for the other waiters if this lookup is cancelled
+      task = asyncio.ensure_future(self._request_group(key, sp_client, group_id))
+      self._groups_in_flight[key] = task
+    return await asyncio.shield(task)
+
+  async def get_members(self, sp_client: SharePointRestClient, group: dict, storage_path: str, graph_client: Optional[GraphServiceClient], writer, nesting_level: int, parent_group: str, logger: MiddlewareLogger, settings: dict = None) -> list:
+    """Members of the group (resolve_sharepoint_group_members), resolved once per web and nesting context, also for concurrent lookups."""
+    key = (sp_client.site_url, group.get("Id"), nesting_level, parent_group)
+    members = self._members.get(key)
+    if members is not None:
+      self._stats["hits"] += 1
+      ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+      writer.emit_log(f"[{ts}]       Using {len(members)} resolved member(s) of group_title='{group.get('Title')}'".replace("(s)", "s" if len(members) != 1 else ""))
+      return members
+    task = self._members_in_flight.get(key)
+    shared = task is not None
+    if shared: self._stats["shared"] += 1
+    else:
+      self._stats["misses"] += 1
+      # Own task: the resolution continues for the other waiters if this lookup is cancelled
+      task = asyncio.ensure_future(self._resolve_members(key, sp_client, group, storage_path, graph_client, writer, nesting_level, parent_group, logger, settings))
+      self._members_in_flight[key] = task
+    try: members = await asyncio.shield(task)
+    except Exception as e:
+      ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+      writer.emit_log(f"[{ts}]       ERROR: Failed to get users for group_title='{group.get('Title')}' -> {e}")
+      return []
+    if shared:
+      ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+      writer.emit_log(f"[{ts}]       Using {len(members)} resolved member(s) of group_title='{group.get('Title')}'".replace("(s)", "s" if len(members) != 1 else ""))
+    return members
+
+  async def _request_group(self, key: tuple, sp_client: SharePointRestClient, group_id) -> dict:
+    try: group = await sp_client.get_json(f"/_api/web/sitegroups/getbyid({group_id})", {"$select": "Id,Title"})
+    finally: self._groups_in_flight.pop(key, None)
+    self._groups[key] = group
+    return group
+
+  async def _resolve_members(self, key: tuple, sp_client: SharePointRestClient, group: dict, storage_path: str, graph_client: Optional[GraphServiceClient], writer, nesting_level: int, parent_group: str, logger: MiddlewareLogger, settings: dict) -> list:
+    try: members = await resolve_sharepoint_group_members(sp_client, group, storage_path, graph_client, writer, nesting_level, parent_group, logger, settings, raise_errors=True)
+    finally: self._members_in_flight.pop(key, None)
+    self._members[key] = members
+    return members
+
+  def get_stats(self) -> dict:
+    """Member and group lookups with hit ratios. Lookups that waited for a running request (shared) count as hits."""
+    lookups = self._stats["hits"] + self._stats["misses"] + self._stats["shared"]
+    group_lookups = self._stats["group_hits"] + self._stats["group_misses"] + self._stats["group_shared"]
+    return {
+      **self._stats,
+      "groups_resolved": len(self._members),
+      "hit_ratio": round((self._stats["hits"] + self._stats["shared"]) / lookups, 3) if lookups else None,
+      "group_hit_ratio": round((self._stats["group_hits"] + self._stats["group_shared"]) / group_lookups, 3) if group_lookups else None
+    }
+
 # ----------------------------------------- END: Group Resolution -------------------------------------------------------------
 
 
 # ----------------------------------------- START: Scanning Functions ---------------------------------------------------------
 
-async def scan_site_contents(ctx: ClientContext, output_folder: str, writer, logger: MiddlewareLogger, current_step: int, total_steps: int, settings: dict = None, site_url: str = "") -> AsyncGenerator[str, None]:
+async def scan_site_contents(sp_client: SharePointRestClient, output_folder: str, writer, logger: MiddlewareLogger, current_step: int, total_steps: int, settings: dict = None, site_url: str = "") -> AsyncGenerator[str, None]:
   """Scan lists/libraries and write 01_SiteContents.csv. Yields SSE events. Sets writer._step_result with stats."""
   stats = {"lists_scanned": 0}
   contents_file = os.path.join(output_folder, "01_SiteContents.csv")
@@ -366,33 +552,30 @@ async def scan_site_contents(ctx: ClientContext, output_folder: str, writer, log
   ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
   if current_step > 0:
     yield writer.emit_log(f"[{ts}] [ {current_step} / {total_steps} ] Scanning site contents...")
-  lists = ctx.web.lists.get().select(["Id", "Title", "BaseTemplate", "Hidden", "RootFolder"]).expand(["RootFolder"]).execute_query()
+  lists = await sp_client.get_all("/_api/web/lists", {"$select": "Id,Title,BaseTemplate,Hidden,RootFolder/ServerRelativeUrl", "$expand": "RootFolder"})
   
   rows = []
   for lst in lists:
-    if lst.base_template not in INCLUDED_TEMPLATES: continue
-    if lst.properties.get("Hidden", False): continue
-    if lst.title in ignore_lists: continue
+    if lst.get("BaseTemplate") not in INCLUDED_TEMPLATES: continue
+    if lst.get("Hidden", False): continue
+    if lst.get("Title") in ignore_lists: continue
     
     stats["lists_scanned"] += 1
     
     # Type casing: List, Library, SitePages (match PowerShell)
-    list_type = "List" if lst.base_template == 100 else "Library"
-    if lst.base_template == 119: list_type = "SitePages"
+    list_type = "List" if lst.get("BaseTemplate") == 100 else "Library"
+    if lst.get("BaseTemplate") == 119: list_type = "SitePages"
     
     # Get root folder URL from expanded property - use full URL
-    try:
-      server_rel_url = lst.root_folder.properties.get("ServerRelativeUrl", "") if lst.root_folder else ""
-      url = f"{tenant_url}{server_rel_url}" if server_rel_url else ""
-    except:
-      url = ""
+    server_rel_url = (lst.get("RootFolder") or {}).get("ServerRelativeUrl", "")
+    url = f"{tenant_url}{server_rel_url}" if server_rel_url else ""
     
     rows.append({
       "Job": 1,
       "SiteUrl": site_url,
-      "Id": str(lst.id),
+      "Id": str(lst.get("Id")),
       "Type": list_type,
-      "Title": lst.title,
+      "Title": lst.get("Title"),
       "Url": url
     })
   
@@ -401,10 +584,11 @@ async def scan_site_contents(ctx: ClientContext, output_folder: str, writer, log
   yield writer.emit_log(f"[{ts}]   {stats['lists_scanned']} list(s)/libraries found.".replace("(s)", "s" if stats['lists_scanned'] != 1 else ""))
   writer._step_result = stats
 
-async def scan_site_groups(ctx: ClientContext, storage_path: str, output_folder: str, graph_client: Optional[GraphServiceClient], writer, logger: MiddlewareLogger, current_step: int, total_steps: int, settings: dict = None, site_url: str = "", skip_users_csv: bool = False) -> AsyncGenerator[str, None]:
-  """Scan site groups and write 02_SiteGroups.csv and 03_SiteUsers.csv. Yields SSE events. Sets writer._step_result with stats."""
+async def scan_site_groups(sp_client: SharePointRestClient, storage_path: str, output_folder: str, graph_client: Optional[GraphServiceClient], writer, logger: MiddlewareLogger, current_step: int, total_steps: int, settings: dict = None, site_url: str = "", skip_users_csv: bool = False, group_cache: Optional[SharePointGroupCache] = None) -> AsyncGenerator[str, None]:
+  """Scan site groups and write 02_SiteGroups.csv and 03_SiteUsers.csv. Yields SSE events. Sets writer._step_result with stats. Resolved groups are added to group_cache."""
   stats = {"groups_found": 0, "users_found": 0, "external_users_found": 0}
   if settings is None: settings = {}
+  if group_cache is None: group_cache = SharePointGroupCache()
   
   # Extract settings
   ignore_permission_levels = set(settings.get("ignore_permission_levels", ["Limited Access"]))
@@ -426,51 +610,53 @@ async def scan_site_groups(ctx: ClientContext, storage_path: str, output_folder:
     yield writer.emit_log(f"[{ts}] [ {current_step} / {total_steps} ] Scanning site groups (graph_client_available={graph_client is not None})...")
   
   # Load site groups with role assignments to get permission levels
-  role_assignments = ctx.web.role_assignments.get()
-  role_assignments.expand(["Member", "RoleDefinitionBindings"]).execute_query()
-  ra_list = list(role_assignments)
+  ra_list = await sp_client.get_all("/_api/web/roleassignments", ROLE_ASSIGNMENTS_QUERY)
   ra_count = len(ra_list)
   ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
   yield writer.emit_log(f"[{ts}]   {ra_count} role assignment(s) found.".replace("(s)", "s" if ra_count != 1 else ""))
+  # Directly assigned Entra ID groups are fetched concurrently before the role assignments are processed in order
+  if graph_client: await prefetch_entra_groups(storage_path, graph_client, get_entra_groups_to_resolve([ra.get("Member") or {} for ra in ra_list if (ra.get("Member") or {}).get("PrincipalType") == 4], settings), writer)
   
   # Build group -> permission level mapping and collect direct assignments
   group_permissions = {}
   direct_user_rows = []  # Direct user/security group assignments at site level
   
   for ra_idx, ra in enumerate(ra_list, 1):
-    member = ra.member
+    member = ra.get("Member") or {}
+    principal_type = member.get("PrincipalType")
     # Determine assignment type based on principal_type
-    if member.principal_type == 1: assign_type = "User"
-    elif member.principal_type == 4: assign_type = "SecurityGroup"
-    elif member.principal_type == 8: assign_type = "SharePointGroup"
-    else: assign_type = f"Unknown({member.principal_type})"
+    if principal_type == 1: assign_type = "User"
+    elif principal_type == 4: assign_type = "SecurityGroup"
+    elif principal_type == 8: assign_type = "SharePointGroup"
+    else: assign_type = f"Unknown({principal_type})"
     
     # Get permission levels (skip ignored permission levels from settings)
-    perm_levels = [b.properties.get('Name', '') for b in ra.role_definition_bindings if b.properties.get('Name', '') not in ignore_permission_levels]
+    bindings = ra.get("RoleDefinitionBindings") or []
+    perm_levels = [b.get('Name', '') for b in bindings if b.get('Name', '') not in ignore_permission_levels]
     perm_str = ', '.join(perm_levels) if perm_levels else "Ignored permission levels only"
     
     ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    yield writer.emit_log(f"[{ts}]     ( {ra_idx} / {ra_count} ) {assign_type}: '{member.title}' -> {perm_str}")
+    yield writer.emit_log(f"[{ts}]     ( {ra_idx} / {ra_count} ) {assign_type}: '{member.get('Title')}' -> {perm_str}")
     
-    for binding in ra.role_definition_bindings:
-      perm_name = binding.properties.get('Name', '')
+    for binding in bindings:
+      perm_name = binding.get('Name', '')
       # FILTER: Skip ignored permission levels from settings
       if perm_name in ignore_permission_levels: continue
       
-      if member.principal_type == 8:  # SharePoint Group
-        group_permissions[member.id] = perm_name
-      elif member.principal_type == 1:  # Direct User assignment
-        login_name = member.login_name or ""
+      if principal_type == 8:  # SharePoint Group
+        group_permissions[member.get("Id")] = perm_name
+      elif principal_type == 1:  # Direct User assignment
+        login_name = member.get("LoginName") or ""
         # Skip ignored accounts from settings
         if any(ignored in login_name for ignored in ignore_accounts): continue
         is_guest = "true" if "#ext#" in login_name.lower() else "false"
         direct_user_rows.append({
           "Job": 1,
           "SiteUrl": site_url,
-          "Id": str(member.id) if member.id else "",
+          "Id": str(member.get("Id")) if member.get("Id") else "",
           "LoginName": normalize_login_name(login_name),
-          "DisplayName": member.title or "",
-          "Email": member.email or "" if hasattr(member, 'email') else "",
+          "DisplayName": member.get("Title") or "",
+          "Email": "",  # Role assignment members carry no Email (see ROLE_ASSIGNMENTS_QUERY)
           "PermissionLevel": perm_name,
           "IsGuest": is_guest,
           "ViaGroup": "",
@@ -480,11 +666,11 @@ async def scan_site_groups(ctx: ClientContext, storage_path: str, output_folder:
           "NestingLevel": 0,
           "ParentGroup": ""
         })
-      elif member.principal_type == 4:  # Direct Security Group (Entra ID group) assignment
-        login_name = member.login_name or ""
+      elif principal_type == 4:  # Direct Security Group (Entra ID group) assignment
+        login_name = member.get("LoginName") or ""
         # Skip ignored accounts from settings
         if any(ignored in login_name for ignored in ignore_accounts): continue
-        group_display_name = member.title or ""
+        group_display_name = member.get("Title") or ""
         # Check if group should not be resolved - add group entry but don't resolve members
         if group_display_name in do_not_resolve_these_groups:
           ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -543,8 +729,9 @@ async def scan_site_groups(ctx: ClientContext, storage_path: str, output_folder:
           })
   
   # Load all site groups and filter to those with permissions (skip ignored SP groups)
-  all_groups = ctx.web.site_groups.get().execute_query()
-  groups_to_process = [g for g in all_groups if group_permissions.get(g.id, "") and g.title not in ignore_sharepoint_groups]
+  all_groups = await sp_client.get_all("/_api/web/sitegroups", {"$select": "Id,Title,OwnerTitle"})
+  group_cache.add_groups(sp_client, all_groups)
+  groups_to_process = [g for g in all_groups if group_permissions.get(g.get("Id"), "") and g.get("Title") not in ignore_sharepoint_groups]
   total_groups = len(groups_to_process)
   
   ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -561,13 +748,14 @@ async def scan_site_groups(ctx: ClientContext, storage_path: str, output_folder:
     if login: seen_users.add(login)
   
   for idx, group in enumerate(groups_to_process, 1):
-    perm_level = group_permissions.get(group.id, "")
+    group_title = group.get("Title")
+    perm_level = group_permissions.get(group.get("Id"), "")
     
     stats["groups_found"] += 1
     
     # Determine role
     role = "Custom"
-    title_lower = group.title.lower() if group.title else ""
+    title_lower = group_title.lower() if group_title else ""
     if "owner" in title_lower: role = "SiteOwners"
     elif "member" in title_lower: role = "SiteMembers"
     elif "visitor" in title_lower: role = "SiteVisitors"
@@ -575,18 +763,18 @@ async def scan_site_groups(ctx: ClientContext, storage_path: str, output_folder:
     group_rows.append({
       "Job": 1,
       "SiteUrl": site_url,
-      "Id": str(group.id),
+      "Id": str(group.get("Id")),
       "Role": role,
-      "Title": group.title,
+      "Title": group_title,
       "PermissionLevel": perm_level,
-      "Owner": group.owner_title or ""
+      "Owner": group.get("OwnerTitle") or ""
     })
     
     ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    yield writer.emit_log(f"[{ts}]     ( {idx} / {total_groups} ) SharePointGroup: group_title='{group.title}'...")
+    yield writer.emit_log(f"[{ts}]     ( {idx} / {total_groups} ) SharePointGroup: group_title='{group_title}'...")
     
     # Groups in do_not_resolve_these_groups: add group entry but don't resolve members
-    if group.title in do_not_resolve_these_groups:
+    if group_title in do_not_resolve_these_groups:
       ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
       yield writer.emit_log(f"[{ts}]       NOT resolving members: Group in do_not_resolve_these_groups (adding group entry)")
       # Add the group itself as an entry (not resolved to individual members)
@@ -594,8 +782,8 @@ async def scan_site_groups(ctx: ClientContext, storage_path: str, output_folder:
         "Job": 1,
         "SiteUrl": site_url,
         "Id": "",
-        "LoginName": group.title,  # Use group title as LoginName
-        "DisplayName": group.title,
+        "LoginName": group_title,  # Use group title as LoginName
+        "DisplayName": group_title,
         "Email": "",
         "PermissionLevel": perm_level,
         "IsGuest": "false",
@@ -610,8 +798,9 @@ async def scan_site_groups(ctx: ClientContext, storage_path: str, output_folder:
       continue
     
     # Resolve members
-    members = await resolve_sharepoint_group_members(ctx, group, storage_path, graph_client, writer, 1, "", logger, settings)
-    for member in members:
+    # Same nesting context as the item scan, which reuses the resolved members
+    members = await group_cache.get_members(sp_client, group, storage_path, graph_client, writer, 1, "", logger, settings)
+    for member in map(dict, members):
       login_name = member.get("LoginName", "")
       # Skip duplicates (match PowerShell behavior)
       if login_name in seen_users:
@@ -635,11 +824,26 @@ async def scan_site_groups(ctx: ClientContext, storage_path: str, output_folder:
   yield writer.emit_log(f"[{ts}]   {stats['groups_found']} group(s), {stats['users_found']} user(s) found.".replace("(s)", "s" if stats['groups_found'] != 1 else "", 1).replace("(s)", "s" if stats['users_found'] != 1 else "", 1))
   writer._step_result = stats
 
-async def scan_broken_inheritance_items(ctx: ClientContext, storage_path: str, output_folder: str, graph_client: Optional[GraphServiceClient], writer, logger: MiddlewareLogger, current_step: int, total_steps: int, settings: dict = None, site_url: str = "") -> AsyncGenerator[str, None]:
-  """Scan items with broken inheritance and write 04/05 CSVs. Yields SSE events. Sets writer._step_result with stats."""
+async def get_role_assignments_batched(sp_client: SharePointRestClient, items_path: str, item_ids: list) -> dict:
+  """
+  Role assignments (ROLE_ASSIGNMENTS_QUERY) of the items in one $batch request. Returns {item_id: role assignments}.
+  Items whose request failed are left out, so the caller can request them one by one (with retry and the usual error).
+  """
+  responses = await sp_client.batch_get_json([(f"{items_path}({item_id})/roleassignments", ROLE_ASSIGNMENTS_QUERY) for item_id in item_ids])
+  role_assignments = {}
+  for item_id, response in zip(item_ids, responses):
+    if isinstance(response, Exception): continue
+    ra_list = response.get("value", [])
+    if response.get("odata.nextLink"): ra_list = ra_list + await sp_client.get_all(response["odata.nextLink"])
+    role_assignments[item_id] = ra_list
+  return role_assignments
+
+async def scan_broken_inheritance_items(sp_client: SharePointRestClient, storage_path: str, output_folder: str, graph_client: Optional[GraphServiceClient], writer, logger: MiddlewareLogger, current_step: int, total_steps: int, settings: dict = None, site_url: str = "", group_cache: Optional[SharePointGroupCache] = None) -> AsyncGenerator[str, None]:
+  """Scan items with broken inheritance and write 04/05 CSVs. Yields SSE events. Sets writer._step_result with stats. SharePoint groups are resolved once via group_cache."""
   stats = {"items_scanned": 0, "items_with_individual_permissions": 0, "items_shared_with_everyone": 0}
   items_shared_with_everyone_items = set()  # Track unique items shared with everyone
   if settings is None: settings = {}
+  if group_cache is None: group_cache = SharePointGroupCache()
   tenant_url = site_url.split("/sites/")[0] if "/sites/" in site_url else site_url.rsplit("/", 1)[0]
   
   # Extract settings
@@ -661,56 +865,52 @@ async def scan_broken_inheritance_items(ctx: ClientContext, storage_path: str, o
   if current_step > 0:
     yield writer.emit_log(f"[{ts}] [ {current_step} / {total_steps} ] Scanning items with broken inheritance...")
   
-  all_lists = ctx.web.lists.get().select(["Id", "Title", "BaseTemplate", "Hidden", "DefaultViewUrl"]).execute_query()
+  all_lists = await sp_client.get_all("/_api/web/lists", {"$select": "Id,Title,BaseTemplate,Hidden,DefaultViewUrl"})
   
   ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
   yield writer.emit_log(f"[{ts}]   {len(all_lists)} lists found, filtering...")
   
   # Filter to relevant lists: skip hidden and lists in ignore_lists
-  lists_to_scan = [lst for lst in all_lists if lst.base_template in INCLUDED_TEMPLATES and not lst.properties.get("Hidden", False) and lst.title not in ignore_lists]
+  lists_to_scan = [lst for lst in all_lists if lst.get("BaseTemplate") in INCLUDED_TEMPLATES and not lst.get("Hidden", False) and lst.get("Title") not in ignore_lists]
   total_lists = len(lists_to_scan)
   
   ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
   yield writer.emit_log(f"[{ts}]   {total_lists} list(s)/libraries to scan.".replace("(s)", "s" if total_lists != 1 else ""))
   
-  item_rows = []
-  access_rows = []
+  # Rows go to the CSV files while they are produced, only the pending buffer is kept in memory
+  items_csv = CsvStreamWriter(items_file, CSV_COLUMNS_INDIVIDUAL_ITEMS)
+  access_csv = CsvStreamWriter(access_file, CSV_COLUMNS_INDIVIDUAL_ACCESS)
   
   for list_idx, lst in enumerate(lists_to_scan, 1):
+    list_id, list_title, base_template = lst.get("Id"), lst.get("Title"), lst.get("BaseTemplate")
+    items_path = f"/_api/web/lists(guid'{list_id}')/items"
     # Determine list type for logging
-    if lst.base_template == 100: list_type = "List"
-    elif lst.base_template == 119: list_type = "SitePages"
+    if base_template == 100: list_type = "List"
+    elif base_template == 119: list_type = "SitePages"
     else: list_type = "Library"
     
     ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    yield writer.emit_log(f"[{ts}]     ( {list_idx} / {total_lists} ) {list_type}: list_title='{lst.title}'...")
+    yield writer.emit_log(f"[{ts}]     ( {list_idx} / {total_lists} ) {list_type}: list_title='{list_title}'...")
     
-    # Try SDK first, fall back to REST API for large libraries (>5000 items)
+    # Try ID-batched query first, fall back to plain paging for large libraries (>5000 items)
     last_id = 0
     batch_num = 0
-    list_items_with_perms = []  # Items with broken permissions (as dicts)
-    use_rest_api = False
+    list_items_with_perms = []  # Items with broken permissions as (ID, FileRef, FileLeafRef, FSObjType) tuples
+    use_paged_query = False
     
     while True:
       try:
-        items = lst.items.filter(f"ID gt {last_id}").select(
-          ["ID", "FileRef", "FileLeafRef", "FSObjType", "HasUniqueRoleAssignments"]
-        ).top(BATCH_SIZE).get().execute_query()
+        items = await sp_client.get_json(items_path, {"$filter": f"ID gt {last_id}", "$select": "ID,FileRef,FileLeafRef,FSObjType,HasUniqueRoleAssignments", "$top": str(BATCH_SIZE)})
+        items = items.get("value", [])
         
         if len(items) == 0: break
         
         batch_num += 1
         for item in items:
           stats["items_scanned"] += 1
-          if item.properties.get("HasUniqueRoleAssignments"):
-            list_items_with_perms.append({
-              "ID": item.properties.get("ID"),
-              "FileRef": item.properties.get("FileRef", ""),
-              "FileLeafRef": item.properties.get("FileLeafRef", ""),
-              "FSObjType": item.properties.get("FSObjType", 0),
-              "sdk_item": item  # Keep SDK item reference for role assignments
-            })
-          last_id = item.properties.get("ID", 0)
+          if item.get("HasUniqueRoleAssignments"):
+            list_items_with_perms.append((item.get("ID"), item.get("FileRef", ""), item.get("FileLeafRef", ""), item.get("FSObjType", 0)))
+          last_id = item.get("ID", 0)
         
         if batch_num % 2 == 0:
           ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -722,65 +922,44 @@ async def scan_broken_inheritance_items(ctx: ClientContext, storage_path: str, o
         error_str = str(e)
         ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         if "SPQueryThrottledException" in error_str or "list view threshold" in error_str.lower():
-          yield writer.emit_log(f"[{ts}]       SDK throttled - switching to REST API for large library...")
-          use_rest_api = True
+          yield writer.emit_log(f"[{ts}]       Query throttled - switching to paged query for large library...")
+          use_paged_query = True
         else:
-          yield writer.emit_log(f"[{ts}]   ERROR: Failed to get items from '{lst.title}' -> {e}")
+          yield writer.emit_log(f"[{ts}]   ERROR: Failed to get items from '{list_title}' -> {e}")
         break
     
-    # If SDK was throttled, use REST API with odata.nextLink pagination via SDK's request mechanism
-    if use_rest_api:
-      from office365.runtime.http.request_options import RequestOptions
+    # If the filtered query was throttled, page through all items with odata.nextLink (no filter, not subject to the list view threshold)
+    if use_paged_query:
       list_items_with_perms = []  # Reset
       stats["items_scanned"] -= batch_num * BATCH_SIZE  # Adjust count
       batch_num = 0
       
-      site_url = ctx.web.url
-      list_id = lst.id
-      next_url = f"{site_url}/_api/web/lists(guid'{list_id}')/items?$select=ID,FileRef,FileLeafRef,FSObjType,HasUniqueRoleAssignments&$top=5000"
+      next_url, next_params = items_path, {"$select": "ID,FileRef,FileLeafRef,FSObjType,HasUniqueRoleAssignments", "$top": "5000"}
       
       while next_url:
         try:
-          # Use SDK's authenticated request mechanism
-          request = RequestOptions(next_url)
-          request.set_header("Accept", "application/json;odata=verbose")
-          response = ctx.pending_request().execute_request_direct(request)
-          
-          if response.status_code != 200:
-            ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            yield writer.emit_log(f"[{ts}]   ERROR: REST API returned {response.status_code}")
-            break
+          data = await sp_client.get_json(next_url, next_params)
           
-          data = response.json()
-          items_data = data.get("d", {}).get("results", [])
-          
-          for item_data in items_data:
+          for item_data in data.get("value", []):
             stats["items_scanned"] += 1
             if item_data.get("HasUniqueRoleAssignments"):
-              list_items_with_perms.append({
-                "ID": item_data.get("ID"),
-                "FileRef": item_data.get("FileRef", ""),
-                "FileLeafRef": item_data.get("FileLeafRef", ""),
-                "FSObjType": item_data.get("FSObjType", 0),
-                "sdk_item": None  # Will fetch SDK item when needed
-              })
+              list_items_with_perms.append((item_data.get("ID"), item_data.get("FileRef", ""), item_data.get("FileLeafRef", ""), item_data.get("FSObjType", 0)))
           
           batch_num += 1
           if batch_num % 2 == 0:
             ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            yield writer.emit_log(f"[{ts}]       REST: Fetched {stats['items_scanned']} items, {len(list_items_with_perms)} with broken permissions...")
+            yield writer.emit_log(f"[{ts}]       Paged query: Fetched {stats['items_scanned']} items, {len(list_items_with_perms)} with broken permissions...")
           
           # Handle pagination
-          next_link = data.get("d", {}).get("__next", "")
-          next_url = next_link if next_link else None
+          next_url, next_params = data.get("odata.nextLink"), None
           
         except Exception as e:
           ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-          yield writer.emit_log(f"[{ts}]   ERROR: REST API failed -> {e}")
+          yield writer.emit_log(f"[{ts}]   ERROR: Paged query failed -> {e}")
           break
       
       ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-      yield writer.emit_log(f"[{ts}]       REST API complete: {len(list_items_with_perms)} items with broken permissions")
+      yield writer.emit_log(f"[{ts}]       Paged query complete: {len(list_items_with_perms)} items with broken permissions")
     
     if len(list_items_with_perms) == 0:
       continue  # Skip to next list
@@ -793,38 +972,45 @@ async def scan_broken_inheritance_items(ctx: ClientContext, storage_path: str, o
     # Progress tracking for broken items
     broken_item_idx = 0
     broken_progress_interval = max(1, total_broken // 10)  # Report every ~10%
+    # Role assignments of the next items, fetched with one $batch request per SECURITY_SCAN_ROLE_ASSIGNMENTS_BATCH_SIZE items
+    ra_batch_size = CRAWLER_HARDCODED_CONFIG.SECURITY_SCAN_ROLE_ASSIGNMENTS_BATCH_SIZE
+    prefetched_role_assignments = {}
     
-    for item_data in list_items_with_perms:
+    for item_id, file_ref, file_name, fs_obj_type in list_items_with_perms:
+      if ra_batch_size > 1 and broken_item_idx % ra_batch_size == 0:
+        batch_item_ids = [batch_item[0] for batch_item in list_items_with_perms[broken_item_idx:broken_item_idx + ra_batch_size]]
+        try:
+          prefetched_role_assignments = await get_role_assignments_batched(sp_client, items_path, batch_item_ids)
+          if graph_client: await prefetch_entra_groups(storage_path, graph_client, get_entra_groups_to_resolve([ra.get("Member") or {} for ra_list in prefetched_role_assignments.values() for ra in ra_list if (ra.get("Member") or {}).get("PrincipalType") == 4], settings), writer)
+        except Exception as e:
+          prefetched_role_assignments = {}
+          ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+          yield writer.emit_log(f"[{ts}]       WARNING: Batched role assignment request failed, requesting items one by one -> {e}")
       broken_item_idx += 1
       # Emit progress every ~10% of items
       if broken_item_idx % broken_progress_interval == 0 or broken_item_idx == total_broken:
         ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         yield writer.emit_log(f"[{ts}]       ( {broken_item_idx} / {total_broken} ) Processing broken permissions...")
       stats["items_with_individual_permissions"] += 1
-      item_id = item_data.get("ID", 0)
-      file_ref = item_data.get("FileRef", "")
-      file_name = item_data.get("FileLeafRef", "")
-      fs_obj_type = item_data.get("FSObjType", 0)
-      sdk_item = item_data.get("sdk_item")  # May be None for REST API items
       
       # Match PowerShell scanner Type values: File, Folder, Item
       if fs_obj_type == 1:
         item_type = "Folder"
-      elif lst.base_template == 101:  # Document Library
+      elif base_template == 101:  # Document Library
         item_type = "File"
       else:
         item_type = "Item"
       
       # Build full URL - PowerShell uses different formats for lists vs libraries
-      if lst.base_template == 100:  # List - use DefaultViewUrl with filter
-        default_view_url = lst.properties.get("DefaultViewUrl", "") or ""
+      if base_template == 100:  # List - use DefaultViewUrl with filter
+        default_view_url = lst.get("DefaultViewUrl", "") or ""
         if not default_view_url:
           default_view_url = file_ref  # Fallback to FileRef
         full_url = f"{tenant_url}{default_view_url}?FilterField1=ID&FilterValue1={item_id}"
       else:  # Library/SitePages - use FileRef
         full_url = f"{tenant_url}{file_ref}" if file_ref.startswith("/") else file_ref
       
-      item_rows.append({
+      items_csv.write_row({
         "Job": 1,
         "SiteUrl": site_url,
         "Id": str(item_id),
@@ -833,23 +1019,20 @@ async def scan_broken_inheritance_items(ctx: ClientContext, storage_path: str, o
         "Url": full_url
       })
       
-      # Get role assignments for this item
+      # Get role assignments for this item (prefetched by the $batch request unless it failed for this item)
       try:
-        # For REST API items, fetch SDK item first
-        if sdk_item is None:
-          sdk_item = lst.items.get_by_id(item_id)
-        role_assignments = sdk_item.role_assignments.get()
-        role_assignments.expand(["Member", "RoleDefinitionBindings"]).execute_query()
-        ra_list = list(role_assignments)
+        ra_list = prefetched_role_assignments.pop(item_id, None)
+        if ra_list is None: ra_list = await sp_client.get_all(f"{items_path}({item_id})/roleassignments", ROLE_ASSIGNMENTS_QUERY)
         
         for ra in ra_list:
-          member = ra.member
-          bindings_list = list(ra.role_definition_bindings) if ra.role_definition_bindings else []
+          member = ra.get("Member") or {}
+          principal_type = member.get("PrincipalType")
+          bindings_list = ra.get("RoleDefinitionBindings") or []
           for binding in bindings_list:
-            perm_name = binding.properties.get('Name', '')
+            perm_name = binding.get('Name', '')
             if perm_name == "Limited Access": continue
             
-            member_title = member.title or ""
+            member_title = member.get("Title") or ""
             if "Everyone except external users" in member_title:
               items_shared_with_everyone_items.add(item_id)
             
@@ -857,21 +1040,18 @@ async def scan_broken_inheritance_items(ctx: ClientContext, storage_path: str, o
             if member_title in do_not_resolve_these_groups:
               continue
             
-            login_name = member.login_name or ""
+            login_name = member.get("LoginName") or ""
             
-            # member.principal_type: 1=User, 4=SecurityGroup, 8=SharePointGroup
-            if member.principal_type == 8:  # SharePoint Group
+            # principal_type: 1=User, 4=SecurityGroup, 8=SharePointGroup
+            if principal_type == 8:  # SharePoint Group
               # Skip SharePoint groups if omit_sharepoint_groups_in_broken_permissions_file is true
               if omit_sp_groups:
                 continue
-              # Resolve SharePoint group to individual members
-              sp_group = ctx.web.site_groups.get_by_id(member.id)
-              sp_group.get().execute_query()
-              resolved_members = await resolve_sharepoint_group_members(
-                ctx, sp_group, storage_path, graph_client, writer, 1, "", logger, settings
-              )
+              # Resolve SharePoint group to individual members (once per scan, usually already resolved by scan_site_groups)
+              sp_group = await group_cache.get_group(sp_client, member.get('Id'))
+              resolved_members = await group_cache.get_members(sp_client, sp_group, storage_path, graph_client, writer, 1, "", logger, settings)
               for resolved in resolved_members:
-                access_rows.append({
+                access_csv.write_row({
                   "Job": 1,
                   "SiteUrl": site_url,
                   "Id": str(item_id),
@@ -886,20 +1066,20 @@ async def scan_broken_inheritance_items(ctx: ClientContext, storage_path: str, o
                   "SharedByDisplayName": "",
                   "SharedByLoginName": "",
                   "ViaGroup": member_title,
-                  "ViaGroupId": str(member.id),
+                  "ViaGroupId": str(member.get("Id")),
                   "ViaGroupType": "SharePointGroup",
                   "AssignmentType": "Group",
                   "NestingLevel": resolved.get("NestingLevel", 1),
                   "ParentGroup": resolved.get("ParentGroup", "")
                 })
-            elif member.principal_type == 4 and is_entra_id_group(login_name):  # Entra ID Security/M365 Group
+            elif principal_type == 4 and is_entra_id_group(login_name):  # Entra ID Security/M365 Group
               group_id = extract_group_id_from_login(login_name)
               if group_id and graph_client:
                 resolved_members = await resolve_entra_group_members(
                   storage_path, graph_client, group_id, member_title, 1, "", writer, logger
                 )
                 for resolved in resolved_members:
-                  access_rows.append({
+                  access_csv.write_row({
                     "Job": 1,
                     "SiteUrl": site_url,
                     "Id": str(item_id),
@@ -922,7 +1102,7 @@ async def scan_broken_inheritance_items(ctx: ClientContext, storage_path: str, o
                   })
             else:  # Direct user (principal_type == 1) or unresolvable
               is_guest = "true" if "#ext#" in login_name.lower() else "false"
-              access_rows.append({
+              access_csv.write_row({
                 "Job": 1,
                 "SiteUrl": site_url,
                 "Id": str(item_id),
@@ -930,7 +1110,7 @@ async def scan_broken_inheritance_items(ctx: ClientContext, storage_path: str, o
                 "Url": full_url,
                 "LoginName": normalize_login_name(login_name),
                 "DisplayName": member_title,
-                "Email": member.email or "" if hasattr(member, 'email') else "",
+                "Email": "",  # Role assignment members carry no Email (see ROLE_ASSIGNMENTS_QUERY)
                 "PermissionLevel": perm_name,
                 "IsGuest": is_guest,
                 "SharedDateTime": "",
@@ -939,7 +1119,7 @@ async def scan_broken_inheritance_items(ctx: ClientContext, storage_path: str, o
                 "ViaGroup": "",
                 "ViaGroupId": "",
                 "ViaGroupType": "",
-                "AssignmentType": "User" if member.principal_type == 1 else "Group",
+                "AssignmentType": "User" if principal_type == 1 else "Group",
                 "NestingLevel": 0,
                 "ParentGroup": ""
               })
@@ -947,8 +1127,8 @@ async def scan_broken_inheritance_items(ctx: ClientContext, storage_path: str, o
         ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         yield writer.emit_log(f"[{ts}]     ERROR: Failed to get permissions for item_id={item_id} -> {e}")
   
-  append_csv_rows(items_file, item_rows, CSV_COLUMNS_INDIVIDUAL_ITEMS)
-  append_csv_rows(access_file, access_rows, CSV_COLUMNS_INDIVIDUAL_ACCESS)
+  items_csv.flush()
+  access_csv.flush()
   
   # Update items_shared_with_everyone count
   stats["items_shared_with_everyone"] = len(items_shared_with_everyone_items)
@@ -963,22 +1143,27 @@ async def scan_broken_inheritance_items(ctx: ClientContext, storage_path: str, o
 # ----------------------------------------- START: Subsite Scanning -----------------------------------------------------------
 
 async def scan_subsites(
-  parent_ctx: ClientContext,
+  parent_client: SharePointRestClient,
   storage_path: str,
   output_folder: str,
   graph_client,
   writer,
   logger: MiddlewareLogger,
   settings: dict,
-  client_id: str,
-  tenant_id: str,
-  cert_path: str,
-  cert_password: str,
   depth: int = 0,
-  max_depth: int = 5
+  max_depth: int = 5,
+  scan_slots: Optional[asyncio.Semaphore] = None,
+  group_cache: Optional[SharePointGroupCache] = None
 ) -> dict:
-  """Recursively scan subsites when include_subsites=true (SCAN-FR-06)."""
+  """
+  Recursively scan subsites when include_subsites=true (SCAN-FR-06). Subsite clients share the parent's connection pool and token.
+  Subsites run concurrently, each holding one of scan_slots while it scans its own web (None = one at a time). Each subsite writes
+  to its own folder below output_folder, the folders are merged in subsite order, so the CSVs match a sequential scan.
+  Resolved SharePoint groups are kept per subsite web in group_cache (None = one cache for this call).
+  """
   stats = {"subsites_scanned": 0, "groups_found": 0, "users_found": 0, "external_users_found": 0, "items_scanned": 0, "items_with_individual_permissions": 0, "items_shared_with_everyone": 0}
+  if scan_slots is None: scan_slots = asyncio.Semaphore(1)
+  if group_cache is None: group_cache = SharePointGroupCache()
   
   if depth >= max_depth:
     ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -987,106 +1172,114 @@ async def scan_subsites(
   
   # Get subsites with Url, Title and HasUniqueRoleAssignments properties loaded
   try:
-    webs = parent_ctx.web.webs.get().select(["Id", "Title", "Url", "HasUniqueRoleAssignments"]).execute_query()
+    parent_web = await parent_client.get_json("/_api/web", {"$select": "Url"})
+    webs = await parent_client.get_all("/_api/web/webs", {"$select": "Id,Title,Url,HasUniqueRoleAssignments"})
   except Exception as e:
     ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     writer.emit_log(f"[{ts}]   ERROR: Failed to get subsites -> {e}")
     return stats
   
-  subsites = list(webs)
+  subsites = webs
+  # Get parent site URL for Job/SiteUrl columns
+  parent_site_url = parent_web.get("Url") or parent_client.site_url
   if not subsites:
     return stats
   
   ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
   writer.emit_log(f"[{ts}]   Found {len(subsites)} subsite(s) at depth={depth}".replace("(s)", "s" if len(subsites) != 1 else ""))
   
-  contents_file = os.path.join(output_folder, "01_SiteContents.csv")
+  parent_label = writer.label if isinstance(writer, ScanSiteWriter) else ""
+  subsite_folders = [os.path.join(output_folder, SUBSITE_OUTPUT_SUBFOLDER, str(idx)) for idx in range(1, len(subsites) + 1)]
   
-  for idx, subweb in enumerate(subsites, 1):
-    stats["subsites_scanned"] += 1
-    subsite_url = subweb.url
-    subsite_title = subweb.title or "Untitled"
-    subsite_id = subweb.id
-    
-    ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    writer.emit_log(f"[{ts}]   ( {idx} / {len(subsites)} ) SUBSITE: '{subsite_title}' url='{subsite_url}'")
-    
-    # Get parent site URL for Job/SiteUrl columns
-    parent_site_url = parent_ctx.web.url
+  async def scan_subsite(idx: int, subweb: dict) -> dict:
+    subsite_stats = dict.fromkeys(stats, 0)
+    subsite_stats["subsites_scanned"] = 1
+    subsite_url = subweb.get("Url")
+    subsite_title = subweb.get("Title") or "Untitled"
+    subsite_id = subweb.get("Id")
+    subsite_folder = subsite_folders[idx - 1]
+    os.makedirs(subsite_folder, exist_ok=True)
+    # Own step results and log label per subsite, e.g. '[/projects/alpha]'
+    subsite_writer = ScanSiteWriter(writer, f"{parent_label}/{(subsite_url or '').rstrip('/').rsplit('/', 1)[-1]}")
     
-    # Add subsite to 01_SiteContents.csv
-    append_csv_rows(contents_file, [{
-      "Job": 1,
-      "SiteUrl": parent_site_url,
-      "Id": str(subsite_id),
-      "Type": "Subsite",
-      "Title": subsite_title,
-      "Url": subsite_url
-    }], CSV_COLUMNS_SITE_CONTENTS)
-    
-    # Check if subsite has broken inheritance - add to 04_IndividualPermissionItems.csv
-    has_unique = subweb.properties.get("HasUniqueRoleAssignments", False)
-    if has_unique:
-      items_file = os.path.join(output_folder, "04_IndividualPermissionItems.csv")
-      append_csv_rows(items_file, [{
+    async with scan_slots:
+      ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+      writer.emit_log(f"[{ts}]   ( {idx} / {len(subsites)} ) SUBSITE: '{subsite_title}' url='{subsite_url}'")
+      
+      # Add subsite to 01_SiteContents.csv
+      append_csv_rows(os.path.join(subsite_folder, "01_SiteContents.csv"), [{
         "Job": 1,
         "SiteUrl": parent_site_url,
         "Id": str(subsite_id),
         "Type": "Subsite",
         "Title": subsite_title,
         "Url": subsite_url
-      }], CSV_COLUMNS_INDIVIDUAL_ITEMS)
-      stats["items_with_individual_permissions"] += 1
-      ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-      writer.emit_log(f"[{ts}]     Subsite has broken inheritance")
-    
-    # Create new context for subsite using same credentials
-    try:
-      from routers_v2.common_sharepoint_functions_v2 import connect_to_site_using_client_id_and_certificate
-      sub_ctx = connect_to_site_using_client_id_and_certificate(subsite_url, client_id, tenant_id, cert_path, cert_password)
-      sub_ctx.web.get().execute_query()
-      
-      ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-      writer.emit_log(f"[{ts}]     Connected to subsite")
-      
-      # Scan subsite site contents (lists/libraries) - append to same CSV
-      # Use subsite_url for SiteUrl column to match PowerShell behavior
-      async for sse in scan_site_contents(sub_ctx, output_folder, writer, logger, 0, 0, settings, site_url=subsite_url):
-        pass  # Execute generator but don't yield SSE events for subsite scanning
-      
-      # Scan subsite groups (skip_users_csv=True to match PowerShell - only main site users in 03_SiteUsers.csv)
-      async for sse in scan_site_groups(sub_ctx, storage_path, output_folder, graph_client, writer, logger, 0, 0, settings, site_url=parent_site_url, skip_users_csv=True):
-        pass  # Execute generator but don't yield SSE events for subsite scanning
-      group_stats = writer._step_result or {"groups_found": 0, "users_found": 0, "external_users_found": 0}
-      stats["groups_found"] += group_stats["groups_found"]
-      stats["users_found"] += group_stats["users_found"]
-      stats["external_users_found"] += group_stats.get("external_users_found", 0)
-      
-      # Scan subsite broken inheritance items
-      ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-      writer.emit_log(f"[{ts}]     Scanning subsite items with broken inheritance...")
-      async for sse in scan_broken_inheritance_items(sub_ctx, storage_path, output_folder, graph_client, writer, logger, 0, 0, settings, site_url=parent_site_url):
-        pass  # Execute generator but don't yield SSE events for subsite scanning
-      item_stats = writer._step_result or {"items_scanned": 0, "items_with_individual_permissions": 0}
-      ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-      writer.emit_log(f"[{ts}]     {item_stats['items_scanned']} items scanned, {item_stats['items_with_individual_permissions']} with broken inheritance.")
-      stats["items_scanned"] += item_stats["items_scanned"]
-      stats["items_with_individual_permissions"] += item_stats["items_with_individual_permissions"]
-      stats["items_shared_with_everyone"] += item_stats.get("items_shared_with_everyone", 0)
+      }], CSV_COLUMNS_SITE_CONTENTS)
       
-      # Recurse into sub-subsites
-      sub_stats = await scan_subsites(sub_ctx, storage_path, output_folder, graph_client, writer, logger, settings, client_id, tenant_id, cert_path, cert_password, depth + 1, max_depth)
-      stats["subsites_scanned"] += sub_stats["subsites_scanned"]
-      stats["groups_found"] += sub_stats["groups_found"]
-      stats["users_found"] += sub_stats["users_found"]
-      stats["external_users_found"] += sub_stats.get("external_users_found", 0)
-      stats["items_scanned"] += sub_stats["items_scanned"]
-      stats["items_with_individual_permissions"] += sub_stats["items_with_individual_permissions"]
-      stats["items_shared_with_everyone"] += sub_stats.get("items_shared_with_everyone", 0)
+      # Check if subsite has broken inheritance - add to 04_IndividualPermissionItems.csv
+      has_unique = subweb.get("HasUniqueRoleAssignments", False)
+      if has_unique:
+        append_csv_rows(os.path.join(subsite_folder, "04_IndividualPermissionItems.csv"), [{
+          "Job": 1,
+          "SiteUrl": parent_site_url,
+          "Id": str(subsite_id),
+          "Type": "Subsite",
+          "Title": subsite_title,
+          "Url": subsite_url
+        }], CSV_COLUMNS_INDIVIDUAL_ITEMS)
+        subsite_stats["items_with_individual_permissions"] += 1
+        ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        subsite_writer.emit_log(f"[{ts}]     Subsite has broken inheritance")
       
-    except Exception as e:
-      ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-      writer.emit_log(f"[{ts}]     ERROR: Failed to scan subsite '{subsite_title}' -> {e}")
+      # Create client for subsite (same tenant, so the pooled connections and cached token are reused)
+      try:
+        sub_client = parent_client.for_site(subsite_url)
+        await sub_client.get_json("/_api/web", {"$select": "Title,Url"})
+        
+        ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        subsite_writer.emit_log(f"[{ts}]     Connected to subsite")
+        
+        # Scan subsite site contents (lists/libraries) - append to same CSV
+        # Use subsite_url for SiteUrl column to match PowerShell behavior
+        async for sse in scan_site_contents(sub_client, subsite_folder, subsite_writer, logger, 0, 0, settings, site_url=subsite_url):
+          pass  # Execute generator but don't yield SSE events for subsite scanning
+        
+        # Scan subsite groups (skip_users_csv=True to match PowerShell - only main site users in 03_SiteUsers.csv)
+        async for sse in scan_site_groups(sub_client, storage_path, subsite_folder, graph_client, subsite_writer, logger, 0, 0, settings, site_url=parent_site_url, skip_users_csv=True, group_cache=group_cache):
+          pass  # Execute generator but don't yield SSE events for subsite scanning
+        group_stats = subsite_writer._step_result or {"groups_found": 0, "users_found": 0, "external_users_found": 0}
+        subsite_stats["groups_found"] += group_stats["groups_found"]
+        subsite_stats["users_found"] += group_stats["users_found"]
+        subsite_stats["external_users_found"] += group_stats.get("external_users_found", 0)
+        
+        # Scan subsite broken inheritance items
+        ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        subsite_writer.emit_log(f"[{ts}]     Scanning subsite items with broken inheritance...")
+        async for sse in scan_broken_inheritance_items(sub_client, storage_path, subsite_folder, graph_client, subsite_writer, logger, 0, 0, settings, site_url=parent_site_url, group_cache=group_cache):
+          pass  # Execute generator but don't yield SSE events for subsite scanning
+        item_stats = subsite_writer._step_result or {"items_scanned": 0, "items_with_individual_permissions": 0}
+        ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        subsite_writer.emit_log(f"[{ts}]     {item_stats['items_scanned']} items scanned, {item_stats['items_with_individual_permissions']} with broken inheritance.")
+        subsite_stats["items_scanned"] += item_stats["items_scanned"]
+        subsite_stats["items_with_individual_permissions"] += item_stats["items_with_individual_permissions"]
+        subsite_stats["items_shared_with_everyone"] += item_stats.get("items_shared_with_everyone", 0)
+      except Exception as e:
+        ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        writer.emit_log(f"[{ts}]     ERROR: Failed to scan subsite '{subsite_title}' -> {e}")
+        return subsite_stats
+    
+    # Recurse into sub-subsites after releasing the slot: children wait for free slots, not for their parent
+    sub_stats = await scan_subsites(sub_client, storage_path, subsite_folder, graph_client, subsite_writer, logger, settings, depth + 1, max_depth, scan_slots, group_cache)
+    for key in subsite_stats: subsite_stats[key] += sub_stats.get(key, 0)
+    return subsite_stats
+  
+  try:
+    subsite_results = await asyncio.gather(*(scan_subsite(idx, subweb) for idx, subweb in enumerate(subsites, 1)))
+    merge_csv_folders(output_folder, subsite_folders)
+  finally:
+    shutil.rmtree(os.path.join(output_folder, SUBSITE_OUTPUT_SUBFOLDER), ignore_errors=True)
+  for subsite_stats in subsite_results:
+    for key in stats: stats[key] += subsite_stats[key]
   
   return stats
 
@@ -1107,10 +1300,12 @@ async def run_security_scan(
   cert_path: str,
   cert_password: str,
   writer,  # StreamingJobWriter
-  logger: MiddlewareLogger
+  logger: MiddlewareLogger,
+  scan_slots: Optional[asyncio.Semaphore] = None
 ) -> AsyncGenerator[str, None]:
   """
   Run security scan and yield SSE events.
+  The site holds one of scan_slots while its own web is scanned, subsites share them (None = get_max_parallel_webs() slots for this scan).
   
   Args:
     site_url: SharePoint site URL
@@ -1125,6 +1320,7 @@ async def run_security_scan(
     cert_password: Certificate password
     writer: StreamingJobWriter for SSE events
     logger: MiddlewareLogger instance
+    scan_slots: Webs scanned at the same time, shared by all sites of run_multi_site_security_scan()
   
   Yields:
     SSE event strings
@@ -1175,15 +1371,22 @@ async def run_security_scan(
     "subsites_scanned": 0
   }
   
+  if scan_slots is None: scan_slots = asyncio.Semaphore(get_max_parallel_webs())
+  # SharePoint groups resolved by the site groups step are reused by the items step, for the site and its subsites
+  group_cache = SharePointGroupCache()
+  holds_scan_slot = False
   try:
+    await scan_slots.acquire()
+    holds_scan_slot = True
+    
     # Step 1: Connect to SharePoint
     current_step += 1
     ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     yield writer.emit_log(f"[{ts}] [ {current_step} / {total_steps} ] Connecting to SharePoint site_url='{site_url}'...")
-    ctx = connect_to_site_using_client_id_and_certificate(site_url, client_id, tenant_id, cert_path, cert_password)
-    ctx.web.get().execute_query()
+    sp_client = create_sharepoint_client(site_url, client_id, tenant_id, cert_path, cert_password)
+    web = await sp_client.get_json("/_api/web", {"$select": "Title,Url"})
     ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    yield writer.emit_log(f"[{ts}]   OK. Connected to site_title='{ctx.web.title}'")
+    yield writer.emit_log(f"[{ts}]   OK. Connected to site_title='{web.get('Title')}'")
     
     # Step 2: Initialize Graph client for Entra ID resolution (using certificate auth)
     current_step += 1
@@ -1207,14 +1410,14 @@ async def run_security_scan(
     # Scan based on scope - all scan functions are now async generators that yield SSE events
     if scope in ["all", "site", "lists"]:
       current_step += 1
-      async for sse in scan_site_contents(ctx, output_folder, writer, logger, current_step, total_steps, settings, site_url=site_url):
+      async for sse in scan_site_contents(sp_client, output_folder, writer, logger, current_step, total_steps, settings, site_url=site_url):
         yield sse
       content_stats = writer._step_result or {}
       stats["lists_scanned"] = content_stats.get("lists_scanned", 0)
     
     if scope in ["all", "site"]:
       current_step += 1
-      async for sse in scan_site_groups(ctx, storage_path, output_folder, graph_client, writer, logger, current_step, total_steps, settings, site_url=site_url):
+      async for sse in scan_site_groups(sp_client, storage_path, output_folder, graph_client, writer, logger, current_step, total_steps, settings, site_url=site_url, group_cache=group_cache):
         yield sse
       group_stats = writer._step_result or {}
       stats["groups_found"] = group_stats.get("groups_found", 0)
@@ -1223,19 +1426,23 @@ async def run_security_scan(
     
     if scope in ["all", "items"]:
       current_step += 1
-      async for sse in scan_broken_inheritance_items(ctx, storage_path, output_folder, graph_client, writer, logger, current_step, total_steps, settings, site_url=site_url):
+      async for sse in scan_broken_inheritance_items(sp_client, storage_path, output_folder, graph_client, writer, logger, current_step, total_steps, settings, site_url=site_url, group_cache=group_cache):
         yield sse
       item_stats = writer._step_result or {}
       stats["items_scanned"] = item_stats.get("items_scanned", 0)
       stats["items_with_individual_permissions"] = item_stats.get("items_with_individual_permissions", 0)
       stats["items_shared_with_everyone"] = item_stats.get("items_shared_with_everyone", 0)
     
+    # Subsites and other sites use the slot from here on
+    scan_slots.release()
+    holds_scan_slot = False
+    
     # Scan subsites if requested (SCAN-FR-06)
     if include_subsites:
       current_step += 1
       ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
       yield writer.emit_log(f"[{ts}] [ {current_step} / {total_steps} ] Scanning subsites recursively...")
-      subsite_stats = await scan_subsites(ctx, storage_path, output_folder, graph_client, writer, logger, settings, client_id, tenant_id, cert_path, cert_password)
+      subsite_stats = await scan_subsites(sp_client, storage_path, output_folder, graph_client, writer, logger, settings, scan_slots=scan_slots, group_cache=group_cache)
       for sse in writer.drain_sse_queue(): yield sse
       ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
       yield writer.emit_log(f"[{ts}]   {subsite_stats['subsites_scanned']} subsite(s) scanned.".replace("(s)", "s" if subsite_stats['subsites_scanned'] != 1 else ""))
@@ -1248,6 +1455,8 @@ async def run_security_scan(
       stats["items_with_individual_permissions"] += subsite_stats["items_with_individual_permissions"]
       stats["items_shared_with_everyone"] += subsite_stats.get("items_shared_with_everyone", 0)
     
+    stats["sharepoint_group_cache"] = group_cache.get_stats()
+    
     # Final step: Create report archive
     current_step += 1
     ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -1256,13 +1465,11 @@ async def run_security_scan(
     # Import here to avoid circular dependency
     from routers_v2.common_report_functions_v2 import create_report
     
-    # Read CSV files from output folder
+    # CSV files from output folder (copied into the archive from disk, not read into memory)
     files = []
     for csv_file in os.listdir(output_folder):
       if csv_file.endswith(".csv"):
-        file_path = os.path.join(output_folder, csv_file)
-        with open(file_path, "rb") as f:
-          files.append((csv_file, f.read()))
+        files.append((csv_file, Path(output_folder, csv_file)))
     
     # Generate filename with timestamp
     timestamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d_%H-%M-%S")
@@ -1293,6 +1500,8 @@ async def run_security_scan(
     yield writer.emit_log(f"[{ts}]   OK. Report created report_path='{report_path}'")
     ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     yield writer.emit_log(f"[{ts}] Scan complete. {stats['groups_found']} groups, {stats['users_found']} users, {stats['items_with_individual_permissions']} items with broken inheritance.")
+    cache_stats = stats["sharepoint_group_cache"]
+    yield writer.emit_log(f"[{ts}]   SharePoint group cache: {cache_stats['hits']} hit(s), {cache_stats['misses']} miss(es), hit ratio {cache_stats['hit_ratio']} | groups: {cache_stats['group_hits']} hit(s), {cache_stats['group_misses']} request(s)".replace("(s)", "s" if cache_stats['hits'] != 1 else "", 1).replace("(es)", "es" if cache_stats['misses'] != 1 else "").replace("(s)", "s" if cache_stats['group_hits'] != 1 else "", 1).replace("(s)", "s" if cache_stats['group_misses'] != 1 else "", 1))
     
     # Return stats for end event
     writer._step_result = {
@@ -1309,9 +1518,82 @@ async def run_security_scan(
       yield writer.emit_log(f"[{ts}] HINT: Security scan requires Sites.Selected 'fullcontrol' permission ('read' and 'write' are insufficient). Cannot access /_api/Web/lists, site_groups, or role_assignments.")
     raise
   finally:
+    if holds_scan_slot: scan_slots.release()
     # Cleanup temp folder
-    import shutil
     if os.path.exists(output_folder):
       shutil.rmtree(output_folder, ignore_errors=True)
 
 # ----------------------------------------- END: Main Scanner -----------------------------------------------------------------
+
+
+# ----------------------------------------- START: Multi-Site Scanner ---------------------------------------------------------
+
+async def run_multi_site_security_scan(
+  sites: list[tuple[str, str]],
+  scope: str,
+  include_subsites: bool,
+  delete_caches: bool,
+  storage_path: str,
+  client_id: str,
+  tenant_id: str,
+  cert_path: str,
+  cert_password: str,
+  writer,  # StreamingJobWriter
+  logger: MiddlewareLogger,
+  max_parallel_webs: Optional[int] = None,
+  site_scanned: Optional[Callable[[str, dict], None]] = None
+) -> AsyncGenerator[str, None]:
+  """
+  Scan several sites [(site_id, site_url), ...] in one job with run_security_scan(). Sites and their subsites run concurrently,
+  at most max_parallel_webs webs at a time (None or 0 = SECURITY_SCAN_MAX_PARALLEL_WEBS). All sites share the SharePoint connection
+  pool and token cache, the Graph client and the Entra ID group cache. Each site writes its own output folder and report,
+  its log lines are prefixed with [site_id]. A failed site does not stop the others.
+  
+  site_scanned(site_id, result) is called as soon as a site is done, result = {"ok", "error", "report_path", "stats"}.
+  Result: {site_id: result} stored in writer._step_result.
+  """
+  scan_slots = asyncio.Semaphore(get_max_parallel_webs(max_parallel_webs))
+  results = {}
+  
+  # Caches are shared by all sites: delete them once, before any site resolves groups
+  if delete_caches:
+    ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    yield writer.emit_log(f"[{ts}] Deleting cached Entra ID group files...")
+    deleted = delete_all_entra_caches(storage_path)
+    ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    yield writer.emit_log(f"[{ts}]   {deleted} cache file(s) deleted.".replace("(s)", "s" if deleted != 1 else ""))
+  
+  ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+  yield writer.emit_log(f"[{ts}] Scanning {len(sites)} site(s), up to {get_max_parallel_webs(max_parallel_webs)} sites and subsites at the same time...".replace("(s)", "s" if len(sites) != 1 else "", 1))
+  
+  async def scan_site(site_id: str, site_url: str) -> None:
+    site_writer = ScanSiteWriter(writer, site_id)
+    site_logger = logger.create_prefixed(f"[{site_id}] ")
+    try:
+      async for sse in run_security_scan(site_url, site_id, scope, include_subsites, False, storage_path, client_id, tenant_id, cert_path, cert_password, site_writer, site_logger, scan_slots=scan_slots):
+        pass  # Log events are written to the job stream by site_writer
+      step_result = site_writer._step_result or {}
+      result = {"ok": True, "error": "", "report_path": step_result.get("report_path", ""), "stats": step_result.get("stats", {})}
+    except Exception as e:
+      result = {"ok": False, "error": str(e), "report_path": "", "stats": {}}
+    results[site_id] = result
+    if site_scanned: site_scanned(site_id, result)
+    ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    writer.emit_log(f"[{ts}] ( {len(results)} / {len(sites)} ) Site '{site_id}' {'done' if result['ok'] else 'FAILED -> ' + result['error']}.")
+  
+  runners = [asyncio.ensure_future(scan_site(site_id, site_url)) for site_id, site_url in sites]
+  try:
+    pending = set(runners)
+    while pending:
+      _, pending = await asyncio.wait(pending, timeout=PROGRESS_INTERVAL_SECONDS)
+      for sse in writer.drain_sse_queue(): yield sse
+  finally:
+    for runner in runners:
+      if not runner.done(): runner.cancel()
+  
+  failed = sum(1 for result in results.values() if not result["ok"])
+  ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+  yield writer.emit_log(f"[{ts}] {len(results) - failed} of {len(sites)} site(s) scanned, {failed} failed.".replace("(s)", "s" if len(sites) != 1 else ""))
+  writer._step_result = results
+
+# ----------------------------------------- END: Multi-Site Scanner -----------------------------------------------------------
@@ -0,0 +1,496 @@
+# Common SharePoint Client V2 - Async SharePoint REST client with pooled keep-alive connections and a shared token cache
+# Used by crawler.py (library listing, file download, list export) and common_security_scan_functions_v2.py
+# so SharePoint round trips never block the event loop of the app worker.
+
+import asyncio, httpx, importlib.util, json, os, re, uuid
+from typing import Any, Awaitable, Callable, Optional
+from urllib.parse import quote, urlparse
+
+from hardcoded_config import CRAWLER_HARDCODED_CONFIG
+from routers_v2.common_logging_functions_v2 import MiddlewareLogger, UNKNOWN
+from routers_v2.common_sharepoint_functions_v2 import SharePointFile, ListFieldInfo, LIST_EXPORT_IGNORE_FIELDS, _is_transient_error, acquire_token_with_certificate, get_cached_token, get_resource_url, list_item_to_sharepoint_file
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+ODATA_ACCEPT_HEADER = "application/json;odata=nometadata"
+PARTIAL_FILE_SUFFIX = ".partial"
+
+
+# ----------------------------------------- START: HTTP Client Pool ---------------------------------------------------
+
+# One httpx.AsyncClient per app worker process. Its connection pool is bound to the event loop that created it,
+# so it is recreated if the loop changes (e.g. scripts calling asyncio.run() repeatedly).
+_http_client: Optional[httpx.AsyncClient] = None
+_http_client_loop = None
+
+def is_http2_available() -> bool:
+  return importlib.util.find_spec("h2") is not None
+
+def get_sharepoint_http_client() -> httpx.AsyncClient:
+  global _http_client, _http_client_loop
+  loop = asyncio.get_running_loop()
+  if _http_client is None or _http_client_loop is not loop or _http_client.is_closed:
+    limits = httpx.Limits(max_connections=CRAWLER_HARDCODED_CONFIG.SHAREPOINT_HTTP_MAX_CONNECTIONS, max_keepalive_connections=CRAWLER_HARDCODED_CONFIG.SHAREPOINT_HTTP_MAX_KEEPALIVE_CONNECTIONS)
+    timeout = httpx.Timeout(CRAWLER_HARDCODED_CONFIG.SHAREPOINT_HTTP_TIMEOUT_SECONDS, connect=30.0)
+    _http_client = httpx.AsyncClient(http2=is_http2_available(), limits=limits, timeout=timeout, follow_redirects=True)
+    _http_client_loop = loop
+  return _http_client
+
+async def close_sharepoint_http_client() -> None:
+  global _http_client, _http_client_loop
+  if _http_client is not None and _http_client_loop is asyncio.get_running_loop(): await _http_client.aclose()
+  _http_client, _http_client_loop = None, None
+
+# ----------------------------------------- END: HTTP Client Pool -----------------------------------------------------
+
+
+# ----------------------------------------- START: Errors and Retry ---------------------------------------------------
+
+class SharePointRequestError(Exception):
+  """Non-2xx response from SharePoint. str(e) contains status code, reason, url and the SharePoint error code/message."""
+  def __init__(self, message: str, status_code: int, retry_after_seconds: float = 0.0):
+    super().__init__(message)
+    self.status_code = status_code
+    self.retry_after_seconds = retry_after_seconds
+
+# HTTP 429 (throttled) and 503 (server busy) are retried, honoring the Retry-After header SharePoint sends with them
+RETRYABLE_STATUS_CODES = {429, 503}
+
+def _get_error_detail(content: bytes) -> str:
+  """' -> code: message' of a SharePoint JSON error body, '' if there is none."""
+  try:
+    error = json.loads(content)
+    error = error.get("odata.error") or error.get("error") or {}
+    message = error.get("message", "")
+    if isinstance(message, dict): message = message.get("value", "")
+    return f" -> {error.get('code', '')}: {message}" if error else ""
+  except Exception:
+    return ""
+
+async def _raise_for_status(response: httpx.Response) -> None:
+  if response.is_success: return
+  await response.aread()
+  detail = _get_error_detail(response.content)
+  try: retry_after = float(response.headers.get("retry-after", "0"))
+  except ValueError: retry_after = 0.0
+  raise SharePointRequestError(f"{response.status_code} {response.reason_phrase} for url: {response.request.url}{detail}", response.status_code, retry_after)
+
+def _is_content_encoded(response: httpx.Response) -> bool:
+  """True if the body is sent compressed (Content-Encoding: gzip, ...). httpx decodes it, so its sizes and ranges do not apply to the file."""
+  return response.headers.get("content-encoding", "identity").strip().lower() not in ("", "identity")
+
+def _get_total_size(response: httpx.Response, offset: int) -> Optional[int]:
+  """
+  Total file size from 'Content-Range: bytes 100-199/200' (206) or Content-Length + offset.
+  None if unknown or the body is content-encoded (the headers then count compressed bytes).
+  """
+  if _is_content_encoded(response): return None
+  content_range = response.headers.get("content-range", "")
+  if "/" in content_range:
+    total = content_range.rsplit("/", 1)[1]
+    return int(total) if total.isdigit() else None
+  content_length = response.headers.get("content-length")
+  return int(content_length) + offset if content_length and content_length.isdigit() else None
+
+def _is_retryable_error(e: Exception) -> bool:
+  if isinstance(e, SharePointRequestError): return e.status_code in RETRYABLE_STATUS_CODES
+  return isinstance(e, httpx.TransportError) or _is_transient_error(e)
+
+async def execute_with_retry_async(request_action: Callable[[], Awaitable[Any]], max_retries: int = 5, delay_seconds: float = 3.0) -> Any:
+  """
+  Async counterpart of _execute_with_retry(): awaits request_action() and retries transient connection errors
+  with the same progressive delay (3s, 6s, 9s, 12s, 15s). Throttling responses (429/503) are retried too,
+  waiting at least the Retry-After time. Waiting does not block the event loop.
+
+  Raises:
+    The original exception if all retries fail or if error is not retryable
+  """
+  last_exception = None
+  for attempt in range(max_retries + 1):
+    try:
+      return await request_action()
+    except Exception as e:
+      last_exception = e
+      if not _is_retryable_error(e) or attempt >= max_retries:
+        raise
+      retry_after = e.retry_after_seconds if isinstance(e, SharePointRequestError) else 0.0
+      await asyncio.sleep(max(retry_after, delay_seconds * (attempt + 1)))
+  raise last_exception
+
+# ----------------------------------------- END: Errors and Retry -----------------------------------------------------
+
+
+# ----------------------------------------- START: SharePoint REST Client ---------------------------------------------
+
+def escape_odata_string(value: str) -> str:
+  """Escape a value for use inside an OData string literal in a URL path, e.g. getlist('...')."""
+  return quote(value.replace("'", "''"), safe="/:@")
+
+class SharePointRestClient:
+  """
+  Async client for the SharePoint REST API (/_api) of one site. Requests go through the shared connection pool,
+  bearer tokens come from token_provider (see create_sharepoint_client). Responses use odata=nometadata,
+  so JSON objects have the same property names and values as ClientObject.properties of Office365-REST-Python-Client.
+
+  Usage:
+    sp_client = create_sharepoint_client(site_url, client_id, tenant_id, cert_path, cert_password)
+    web = await sp_client.get_json("/_api/web", {"$select": "Title,Url"})
+    lists = await sp_client.get_all("/_api/web/lists", {"$select": "Id,Title"})
+  """
+
+  def __init__(self, site_url: str, token_provider: Callable[[], Awaitable[str]]):
+    self.site_url = site_url.rstrip('/')
+    self.base_url = get_resource_url(self.site_url)
+    self._token_provider = token_provider
+    self.request_count = 0
+
+  def for_site(self, site_url: str) -> "SharePointRestClient":
+    """Client for another site (e.g. a subsite) of the same tenant, sharing the token provider."""
+    return SharePointRestClient(site_url, self._token_provider)
+
+  def _build_url(self, path_or_url: str) -> str:
+    if path_or_url.startswith("http://") or path_or_url.startswith("https://"): return path_or_url
+    return self.site_url + path_or_url
+
+  async def _get_headers(self, accept: str = ODATA_ACCEPT_HEADER) -> dict:
+    return {"Authorization": f"Bearer {await self._token_provider()}", "Accept": accept}
+
+  async def request(self, method: str, path_or_url: str, params: dict = None, json: Any = None, headers: dict = None, content: bytes = None) -> httpx.Response:
+    """Send a request with retry. Returns the (fully read) response. Raises SharePointRequestError for non-2xx responses."""
+    url = self._build_url(path_or_url)
+    async def send_once():
+      request_headers = await self._get_headers()
+      if headers: request_headers.update(headers)
+      self.request_count += 1
+      response = await get_sharepoint_http_client().request(method, url, params=params, json=json, headers=request_headers, content=content)
+      await _raise_for_status(response)
+      return response
+    return await execute_with_retry_async(send_once)
+
+  async def get_json(self, path_or_url: str, params: dict = None) -> dict:
+    response = await self.request("GET", path_or_url, params=params)
+    return response.json()
+
+  async def get_all(self, path_or_url: str, params: dict = None, page_loaded: Callable[[list], None] = None) -> list[dict]:
+    """GET a collection and follow odata.nextLink until all pages are loaded. page_loaded(items_so_far) is called after each page."""
+    items = []
+    next_url, next_params = path_or_url, params
+    while next_url:
+      data = await self.get_json(next_url, next_params)
+      items.extend(data.get("value", []))
+      if page_loaded: page_loaded(items)
+      next_url, next_params = data.get("odata.nextLink"), None
+    return items
+
+  async def batch_get_json(self, requests: list[tuple[str, Optional[dict]]]) -> list[Any]:
+    """
+    Send GET requests [(path_or_url, params), ...] in one OData $batch request (SharePoint accepts at most 100).
+    Returns one result per request in the same order: the JSON response, or a SharePointRequestError if that request failed.
+    Failed requests do not affect the others and are not retried. Throttling of the $batch request itself is retried.
+    """
+    boundary = f"batch_{uuid.uuid4()}"
+    urls = [str(httpx.URL(self._build_url(path_or_url), params=params)) for path_or_url, params in requests]
+    body = "".join(f"--{boundary}\r\nContent-Type: application/http\r\nContent-Transfer-Encoding: binary\r\n\r\nGET {url} HTTP/1.1\r\nAccept: {ODATA_ACCEPT_HEADER}\r\n\r\n" for url in urls) + f"--{boundary}--\r\n"
+    response = await self.request("POST", "/_api/$batch", headers={"Content-Type": f"multipart/mixed; boundary={boundary}"}, content=body.encode("utf-8"))
+    parts = _parse_batch_response(response)
+    if len(parts) != len(urls): raise SharePointRequestError(f"{len(parts)} of {len(urls)} responses in $batch response for url: {response.request.url}", response.status_code)
+    results = []
+    for url, (status_code, reason_phrase, part_body) in zip(urls, parts):
+      if 200 <= status_code < 300: results.append(json.loads(part_body) if part_body else {})
+      else: results.append(SharePointRequestError(f"{status_code} {reason_phrase} for url: {url}{_get_error_detail(part_body)}", status_code))
+    return results
+
+  async def download_file(self, server_relative_url: str, target_path: str, expected_size: int = 0, max_retries: int = 5, delay_seconds: float = 3.0, max_total_retries: int = 20) -> int:
+    """
+    Stream file content to target_path + PARTIAL_FILE_SUFFIX in DOWNLOAD_CHUNK_SIZE chunks, then rename it to target_path.
+    A retry resumes from the current size of the partial file with a Range request (If-Range guards against the file
+    changing in between); attempts that made progress do not count against max_retries, but all retries count against
+    max_total_retries, so a connection that keeps dropping does not retry forever. Memory use does not depend on file size.
+    If the partial file is already complete (connection dropped after the last byte), a 416 response to the Range
+    request completes the download; any other 416 restarts it from byte 0.
+    The final size is verified against the total size SharePoint reported, else against expected_size (SharePointMapRow.file_size).
+    Requests ask for Accept-Encoding: identity. If SharePoint compresses the body anyway, byte offsets of the decoded file
+    do not match the Range of the compressed body, so a retry downloads the whole file again.
+
+    Returns:
+      Bytes written
+    """
+    url = self._build_url(f"/_api/web/GetFileByServerRelativePath(decodedurl='{escape_odata_string(server_relative_url)}')/$value")
+    partial_path = target_path + PARTIAL_FILE_SUFFIX
+    # A partial file left by an earlier crawl may belong to an older version of the file
+    if os.path.exists(partial_path): os.remove(partial_path)
+    state = {"etag": None, "total_size": None, "encoded": False}
+
+    async def download_range(offset: int) -> None:
+      request_headers = await self._get_headers(accept="*/*")
+      # Sizes and ranges below count file bytes only if the body is not compressed
+      request_headers["Accept-Encoding"] = "identity"
+      if offset > 0:
+        request_headers["Range"] = f"bytes={offset}-"
+        if state["etag"]: request_headers["If-Range"] = state["etag"]
+      self.request_count += 1
+      async with get_sharepoint_http_client().stream("GET", url, headers=request_headers) as response:
+        if response.status_code == 416 and offset > 0:
+          # 'Content-Range: bytes */<total>': nothing left to send if the partial file already has all bytes
+          total = response.headers.get("content-range", "").rsplit("/", 1)[-1]
+          if total.isdigit() and int(total) == offset:
+            state["total_size"] = offset
+            return
+          os.remove(partial_path)
+          raise httpx.ReadError(f"Range 'bytes={offset}-' not satisfiable (Content-Range: '{response.headers.get('content-range', '')}'), restarting download")
+        await _raise_for_status(response)
+        # Server ignored the range or the file changed (If-Range mismatch): start over
+        if response.status_code != 206: offset = 0
+        state["encoded"] = _is_content_encoded(response)
+        state["etag"] = response.headers.get("etag") or state["etag"]
+        state["total_size"] = _get_total_size(response, offset) or state["total_size"]
+        with open(partial_path, 'r+b' if offset > 0 else 'wb') as f:
+          f.seek(offset)
+          f.truncate()
+          async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+            f.write(chunk)
+
+    attempt, retries = 0, 0
+    while True:
+      offset = os.path.getsize(partial_path) if os.path.exists(partial_path) and not state["encoded"] else 0
+      try:
+        await download_range(offset)
+        bytes_written = os.path.getsize(partial_path)
+        expected_total = state["total_size"] or expected_size
+        if expected_total and bytes_written < expected_total: raise httpx.ReadError(f"Download incomplete: {bytes_written} of {expected_total} bytes received")
+        break
+      except Exception as e:
+        made_progress = not state["encoded"] and os.path.exists(partial_path) and os.path.getsize(partial_path) > offset
+        if made_progress: attempt = 0
+        if not _is_retryable_error(e) or attempt >= max_retries or retries >= max_total_retries:
+          if os.path.exists(partial_path): os.remove(partial_path)
+          raise
+        retry_after = e.retry_after_seconds if isinstance(e, SharePointRequestError) else 0.0
+        await asyncio.sleep(max(retry_after, delay_seconds * (attempt + 1)))
+        attempt += 1; retries += 1
+    if expected_total and bytes_written != expected_total:
+      os.remove(partial_path)
+      raise ValueError(f"Size mismatch for '{server_relative_url}': expected {expected_total} bytes, received {bytes_written} bytes")
+    os.replace(partial_path, target_path)
+    return bytes_written
+
+_BOUNDARY_PATTERN = re.compile(r'boundary="?([^";]+)"?')
+
+def _parse_batch_response(response: httpx.Response) -> list[tuple[int, str, bytes]]:
+  """(status code, reason phrase, body) of each response in a multipart/mixed $batch response."""
+  match = _BOUNDARY_PATTERN.search(response.headers.get("content-type", ""))
+  if not match: raise SharePointRequestError(f"No multipart boundary in $batch response for url: {response.request.url}", response.status_code)
+  results = []
+  for part in response.content.replace(b"\r\n", b"\n").split(b"--" + match.group(1).encode())[1:]:
+    if part.startswith(b"--"): break
+    # Part headers (Content-Type: application/http), blank line, HTTP response: status line, headers, blank line, body
+    _, _, http_response = part.partition(b"\n\n")
+    head, _, body = http_response.partition(b"\n\n")
+    status_line = head.split(b"\n", 1)[0].decode("utf-8", errors="replace").split(" ", 2)
+    if len(status_line) < 2 or not status_line[1].isdigit(): raise SharePointRequestError(f"Invalid part in $batch response for url: {response.request.url}", response.status_code)
+    results.append((int(status_line[1]), status_line[2] if len(status_line) > 2 else "", body.strip()))
+  return results
+
+def create_sharepoint_client(site_url: str, client_id: str, tenant_id: str, cert_path: str, cert_password: str) -> SharePointRestClient:
+  """Create a SharePointRestClient that authenticates with certificate credentials via the shared token cache. No request is sent."""
+  resource = get_resource_url(site_url)
+  async def token_provider() -> str:
+    # Cached tokens are returned without a thread hop; MSAL token requests run in a worker thread
+    token = get_cached_token(resource, client_id, tenant_id, cert_path)
+    if token: return token
+    access_token, _ = await asyncio.to_thread(acquire_token_with_certificate, resource, client_id, tenant_id, cert_path, cert_password)
+    return access_token
+  return SharePointRestClient(site_url, token_provider)
+
+# ----------------------------------------- END: SharePoint REST Client -----------------------------------------------
+
+
+# ----------------------------------------- START: Document Library Operations ----------------------------------------
+
+async def get_document_library_async(sp_client: SharePointRestClient, site_url: str, library_url_part: str) -> tuple[Optional[dict], Optional[str]]:
+  """
+  Async version of try_get_document_library(). Returns (list properties or None, error_message or None).
+  Example: site_url='https://contoso.sharepoint.com/sites/demosite', library_url_part='/Shared Documents' -> '/sites/demosite/Shared Documents'
+  """
+  site_path = urlparse(site_url).path.rstrip('/')
+  if not library_url_part.startswith('/'): library_url_part = '/' + library_url_part
+  site_relative_url = site_path + library_url_part
+  try:
+    document_library = await sp_client.get_json(f"/_api/web/getlist('{escape_odata_string(site_relative_url)}')", {"$select": "Id,Title"})
+    return document_library, None
+  except Exception as e:
+    return None, f"Failed to get document library at '{site_relative_url}': {str(e)}"
+
+async def get_document_library_files_async(sp_client: SharePointRestClient, document_library: dict, filter: str, logger: MiddlewareLogger, dry_run: bool = False) -> list[SharePointFile]:
+  """Async version of get_document_library_files(). Same query, paging (5000 items per page), output and logging."""
+  logger.log_function_header("get_document_library_files_async()")
+  lib_title = document_library.get('Title') or UNKNOWN
+  try:
+    lib_id = document_library.get('Id') or UNKNOWN
+    logger.log_function_output(f"Library: '{lib_title}' (ID={lib_id})")
+
+    def print_progress(items):
+      logger.log_function_output(f"{len(items)} item{'' if len(items) == 1 else 's'} retrieved so far...")
+
+    # Use FSObjType to filter: 0 = file, 1 = folder. Like the Office365 query builder, a custom filter replaces it.
+    params = {"$select": "Id,UniqueId,FileLeafRef,FileRef,File/Length,Modified,FSObjType", "$expand": "File", "$filter": "FSObjType eq 0", "$top": "5000"}
+    if filter and filter.strip():
+      params["$filter"] = filter
+      logger.log_function_output(f"Applying filter: {filter}")
+
+    all_items = await sp_client.get_all(f"/_api/web/lists(guid'{lib_id}')/items", params, print_progress)
+    logger.log_function_output(f"{len(all_items)} file{'' if len(all_items) == 1 else 's'} retrieved.")
+
+    sharepoint_files = []
+    for item in all_items:
+      try:
+        sharepoint_files.append(list_item_to_sharepoint_file(item, sp_client.base_url, logger))
+      except Exception as item_error:
+        logger.log_function_output(f"  WARNING: File '{item.get('FileRef') or UNKNOWN}' (ID={item.get('Id') or UNKNOWN}) - failed to process -> {item_error}")
+
+    logger.log_function_output(f"{len(sharepoint_files)} file{'' if len(sharepoint_files) == 1 else 's'} converted to SharePointFile objects.")
+    logger.log_function_footer()
+    return sharepoint_files
+  except Exception as e:
+    logger.log_function_output(f"  ERROR: Failed to retrieve files from library '{lib_title}' -> {str(e)}")
+    logger.log_function_footer()
+    return []
+
+# SP.ChangeType values: item gone from the library (DeleteObject, MoveAway) vs. item added or modified (Add, Update, Rename, MoveInto, Restore, SystemUpdate).
+# Rename, MoveInto and Restore of a folder change the paths of all files below it without logging a change per file.
+CHANGE_TYPES_DELETED = {3, 5}
+CHANGE_TYPES_MODIFIED = {1, 2, 4, 6, 7, 15}
+CHANGE_TYPES_MOVED = {4, 6, 7}
+CHANGE_QUERY_ROW_LIMIT = 1000
+ITEM_IDS_PER_REQUEST = 50
+
+async def get_list_change_token_async(sp_client: SharePointRestClient, list_id: str) -> str:
+  """Return the list's current change token (SP.ChangeToken.StringValue)."""
+  data = await sp_client.get_json(f"/_api/web/lists(guid'{list_id}')", {"$select": "CurrentChangeToken"})
+  return (data.get("CurrentChangeToken") or {}).get("StringValue", "")
+
+async def get_list_item_changes_async(sp_client: SharePointRestClient, list_id: str, change_token_start: str, change_token_end: str) -> tuple[set[int], set[int], set[int]]:
+  """
+  Read the list change log between two change tokens with GetChanges, paging by CHANGE_QUERY_ROW_LIMIT.
+  Returns (modified_item_ids, deleted_item_ids, moved_item_ids). An item deleted after being modified is only in deleted_item_ids.
+  moved_item_ids (subset of modified_item_ids) had a Rename, MoveInto or Restore change.
+  Raises SharePointRequestError if the start token is no longer valid (change log retention exceeded).
+  """
+  modified_ids, deleted_ids, moved_ids = set(), set(), set()
+  start_token = change_token_start
+  while True:
+    query = {"Item": True, "Add": True, "Update": True, "DeleteObject": True, "Rename": True, "Move": True, "Restore": True, "SystemUpdate": True, "RowLimit": CHANGE_QUERY_ROW_LIMIT, "ChangeTokenStart": {"StringValue": start_token}, "ChangeTokenEnd": {"StringValue": change_token_end}}
+    response = await sp_client.request("POST", f"/_api/web/lists(guid'{list_id}')/GetChanges", json={"query": query}, headers={"Content-Type": ODATA_ACCEPT_HEADER})
+    changes = response.json().get("value", [])
+    for change in changes:
+      item_id, change_type = change.get("ItemId"), change.get("ChangeType")
+      if not item_id: continue
+      if change_type in CHANGE_TYPES_DELETED:
+        deleted_ids.add(item_id)
+        modified_ids.discard(item_id)
+        moved_ids.discard(item_id)
+      elif change_type in CHANGE_TYPES_MODIFIED:
+        modified_ids.add(item_id)
+        deleted_ids.discard(item_id)
+        if change_type in CHANGE_TYPES_MOVED: moved_ids.add(item_id)
+    if len(changes) < CHANGE_QUERY_ROW_LIMIT: break
+    start_token = (changes[-1].get("ChangeToken") or {}).get("StringValue", "")
+    if not start_token: break
+  return modified_ids, deleted_ids, moved_ids
+
+async def get_document_library_items_by_ids_async(sp_client: SharePointRestClient, document_library: dict, item_ids: list[int], filter: str = None) -> list[dict]:
+  """
+  Get document library items (files and folders) by list item id, ITEM_IDS_PER_REQUEST ids per request.
+  Same $select/$expand as get_document_library_files_async(); filter (optional, e.g. 'FSObjType eq 0') is combined with the id filter.
+  """
+  lib_id = document_library.get('Id') or UNKNOWN
+  items = []
+  for i in range(0, len(item_ids), ITEM_IDS_PER_REQUEST):
+    id_filter = " or ".join(f"Id eq {item_id}" for item_id in item_ids[i:i + ITEM_IDS_PER_REQUEST])
+    params = {"$select": "Id,UniqueId,FileLeafRef,FileRef,File/Length,Modified,FSObjType", "$expand": "File", "$filter": f"({filter}) and ({id_filter})" if filter and filter.strip() else id_filter, "$top": "5000"}
+    items.extend(await sp_client.get_all(f"/_api/web/lists(guid'{lib_id}')/items", params))
+  return items
+
+async def get_site_pages_async(sp_client: SharePointRestClient, site_url: str, pages_url_part: str, filter_query: str, logger: MiddlewareLogger, dry_run: bool = False) -> list[SharePointFile]:
+  """Async version of get_site_pages()."""
+  logger.log_function_header("get_site_pages_async()")
+  library, error = await get_document_library_async(sp_client, site_url, pages_url_part)
+  if error:
+    logger.log_function_output(f"ERROR: Site pages '{pages_url_part}' - {error}")
+    logger.log_function_footer()
+    return []
+  result = await get_document_library_files_async(sp_client, library, filter_query, logger, dry_run)
+  logger.log_function_footer()
+  return result
+
+async def download_file_from_sharepoint_async(sp_client: SharePointRestClient, server_relative_url: str, target_path: str, preserve_timestamp: bool = True, last_modified_timestamp: int = None, dry_run: bool = False, expected_size: int = 0) -> tuple[bool, str]:
+  """
+  Async version of download_file_from_sharepoint(). Returns (success, error_message). dry_run=True verifies the file exists only.
+  The file is written to '<target_path>.partial' and renamed when complete and its size is verified (expected_size = SharePointMapRow.file_size, 0 = unknown).
+  """
+  try:
+    if dry_run:
+      await sp_client.get_json(f"/_api/web/GetFileByServerRelativePath(decodedurl='{escape_odata_string(server_relative_url)}')", {"$select": "Name"})
+      return True, ""
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    await sp_client.download_file(server_relative_url, target_path, expected_size)
+    if preserve_timestamp and last_modified_timestamp:
+      os.utime(target_path, (last_modified_timestamp, last_modified_timestamp))
+    return True, ""
+  except asyncio.CancelledError:
+    if not dry_run: _remove_download_files(target_path)
+    raise
+  except Exception as e:
+    if not dry_run: _remove_download_files(target_path)
+    return False, str(e)
+
+def _remove_download_files(target_path: str) -> None:
+  """Remove the target file and its partial file after a failed download (files_map.csv will not reference the file)."""
+  for path in (target_path, target_path + PARTIAL_FILE_SUFFIX):
+    if os.path.exists(path): os.remove(path)
+
+# ----------------------------------------- END: Document Library Operations ------------------------------------------
+
+
+# ----------------------------------------- START: List Export Operations ---------------------------------------------
+
+async def get_list_fields_async(sp_client: SharePointRestClient, list_name: str, logger: MiddlewareLogger) -> list[ListFieldInfo]:
+  """Async version of get_list_fields()."""
+  logger.log_function_header("get_list_fields_async()")
+  try:
+    fields = await sp_client.get_all(f"/_api/web/lists/getbytitle('{escape_odata_string(list_name)}')/fields", {"$filter": "Hidden eq false"})
+    result = []
+    for f in fields:
+      internal_name = f.get('InternalName', '')
+      # Skip system fields
+      if internal_name.startswith('_') or internal_name in LIST_EXPORT_IGNORE_FIELDS: continue
+      result.append(ListFieldInfo(internal_name=internal_name, display_name=f.get('Title', internal_name), field_type_kind=f.get('FieldTypeKind', 0), is_hidden=f.get('Hidden', False)))
+    logger.log_function_output(f"{len(result)} visible field{'' if len(result) == 1 else 's'} retrieved.")
+    logger.log_function_footer()
+    return result
+  except Exception as e:
+    logger.log_function_output(f"  ERROR: Failed to get fields for '{list_name}' -> {str(e)}")
+    logger.log_function_footer()
+    return []
+
+async def get_list_items_with_fields_async(sp_client: SharePointRestClient, list_name: str, filter_query: str, logger: MiddlewareLogger) -> tuple[list[dict], list[ListFieldInfo]]:
+  """Async version of get_list_items_with_fields(). Returns (items, fields)."""
+  logger.log_function_header("get_list_items_with_fields_async()")
+  try:
+    fields = await get_list_fields_async(sp_client, list_name, logger)
+    params = {"$top": "5000"}
+    if fields: params["$select"] = ",".join(f.internal_name for f in fields)
+    if filter_query and filter_query.strip(): params["$filter"] = filter_query
+
+    def print_progress(items):
+      logger.log_function_output(f"{len(items)} list item{'' if len(items) == 1 else 's'} retrieved so far...")
+
+    items = await sp_client.get_all(f"/_api/web/lists/getbytitle('{escape_odata_string(list_name)}')/items", params, print_progress)
+    logger.log_function_output(f"{len(items)} list item{'' if len(items) == 1 else 's'} retrieved with {len(fields)} field{'' if len(fields) == 1 else 's'}.")
+    logger.log_function_footer()
+    return items, fields
+  except Exception as e:
+    logger.log_function_output(f"  ERROR: Failed to get items with fields from list '{list_name}' -> {str(e)}")
+    logger.log_function_footer()
+    return [], []
+
+# ----------------------------------------- END: List Export Operations -----------------------------------------------
@@ -1,12 +1,13 @@
 # Common functions for SharePoint operations using Office365-REST-Python-Client
 # https://pypi.org/project/Office365-REST-Python-Client/#Working-with-SharePoint-API
 # V2 version using MiddlewareLogger
-import csv, os, re, time
+import csv, msal, os, re, threading, time
 from cryptography import x509
 from datetime import datetime, timezone
 from typing import Optional, Any
 from urllib.parse import urlparse, quote, unquote
 from dataclasses import asdict, dataclass, field
+from office365.runtime.auth.token_response import TokenResponse
 from office365.sharepoint.client_context import ClientContext
 from office365.sharepoint.lists.list import List as DocumentLibrary
 from cryptography.hazmat.primitives.serialization import pkcs12, Encoding, PrivateFormat, NoEncryption
@@ -114,6 +115,63 @@ def get_or_create_pem_from_pfx(cert_path: str, cert_password: str) -> tuple[str,
   
   return pem_file, thumbprint
 
+# ----------------------------------------- START: Token Cache -----------------------------------------------------
+
+# App-only tokens are shared by all ClientContexts and SharePointRestClients of this worker process.
+# Key = (tenant_id, client_id, cert_path, resource). A token is reused until TOKEN_REFRESH_MARGIN_SECONDS before it expires.
+TOKEN_REFRESH_MARGIN_SECONDS = 300
+_token_cache: dict[tuple, tuple[str, float]] = {}
+_token_cache_lock = threading.Lock()
+_msal_apps: dict[tuple, msal.ConfidentialClientApplication] = {}
+
+def get_resource_url(site_url: str) -> str:
+  """Token resource for a site URL, e.g. 'https://contoso.sharepoint.com/sites/demo' -> 'https://contoso.sharepoint.com'."""
+  parsed = urlparse(site_url)
+  return f"{parsed.scheme}://{parsed.netloc}"
+
+def acquire_token_with_certificate(resource: str, client_id: str, tenant_id: str, cert_path: str, cert_password: str) -> tuple[str, float]:
+  """
+  Get an app-only access token for resource using certificate credentials. Blocking (MSAL) and thread-safe.
+  
+  Returns:
+    tuple: (access_token, expires_on) - expires_on is a Unix timestamp
+    
+  Raises:
+    ValueError if the token request is rejected
+  """
+  key = (tenant_id, client_id, cert_path, resource)
+  with _token_cache_lock:
+    cached = _token_cache.get(key)
+    if cached and cached[1] - TOKEN_REFRESH_MARGIN_SECONDS > time.time(): return cached
+    app_key = (tenant_id, client_id, cert_path)
+    app = _msal_apps.get(app_key)
+    if app is None:
+      pem_file, thumbprint = get_or_create_pem_from_pfx(cert_path, cert_password)
+      with open(pem_file, 'r', encoding='utf-8') as f: private_key = f.read()
+      app = msal.ConfidentialClientApplication(client_id, authority=f"https://login.microsoftonline.com/{tenant_id}", client_credential={"thumbprint": thumbprint, "private_key": private_key})
+      _msal_apps[app_key] = app
+    result = app.acquire_token_for_client(scopes=[f"{resource}/.default"])
+    if "access_token" not in result:
+      raise ValueError(f"Failed to acquire token for resource '{resource}': {result.get('error', UNKNOWN)} - {result.get('error_description', '')}")
+    token = (result["access_token"], time.time() + int(result.get("expires_in", 3599)))
+    _token_cache[key] = token
+    return token
+
+def get_cached_token(resource: str, client_id: str, tenant_id: str, cert_path: str) -> Optional[str]:
+  """Return a cached access token that is not about to expire, else None. Non-blocking."""
+  cached = _token_cache.get((tenant_id, client_id, cert_path, resource))
+  if cached and cached[1] - TOKEN_REFRESH_MARGIN_SECONDS > time.time(): return cached[0]
+  return None
+
+def clear_token_cache() -> None:
+  """Drop all cached tokens and MSAL apps (for testing or certificate changes)."""
+  with _token_cache_lock:
+    _token_cache.clear()
+    _msal_apps.clear()
+
+# ----------------------------------------- END: Token Cache -------------------------------------------------------
+
+
 def connect_to_site_using_client_id_and_certificate(site_url: str, client_id: str, tenant_id: str, cert_path: str, cert_password: str) -> ClientContext:
   """
   Connect to a SharePoint site using certificate-based authentication (App-Only authentication).
@@ -130,11 +188,12 @@ def connect_to_site_using_client_id_and_certificate(site_url: str, client_id: st
     ClientContext: An authenticated SharePoint client context object
   """
   
-  # Get or create PEM file from PFX certificate
-  pem_file, thumbprint = get_or_create_pem_from_pfx(cert_path, cert_password)
-  
-  # Connect using certificate-based authentication; the library handles MSAL token acquisition internally
-  ctx = ClientContext(site_url).with_client_certificate( tenant=tenant_id, client_id=client_id, thumbprint=thumbprint, cert_path=pem_file )
+  # Tokens come from the process-wide token cache, so contexts for the same tenant (subsites, download workers) share one token
+  resource = get_resource_url(site_url)
+  def acquire_cached_token():
+    access_token, expires_on = acquire_token_with_certificate(resource, client_id, tenant_id, cert_path, cert_password)
+    return TokenResponse(access_token=access_token, token_type="Bearer", expiresIn=max(0, int(expires_on - time.time()) - TOKEN_REFRESH_MARGIN_SECONDS))
+  ctx = ClientContext(site_url).with_access_token(acquire_cached_token)
   return ctx
 
 def test_connection(ctx: ClientContext) -> tuple[bool, str, str]:
@@ -201,6 +260,61 @@ def try_get_document_library(ctx: ClientContext, site_url: str, library_url_part
     return None, error_message
 
 
+def list_item_to_sharepoint_file(properties: dict, site_base_url: str, logger: MiddlewareLogger) -> SharePointFile:
+  """Convert document library item properties (Id, UniqueId, FileLeafRef, FileRef, File/Length, Modified) to a SharePointFile. Raises on invalid values."""
+  # Extract properties
+  item_id = int(properties.get('Id', 0))
+  unique_id = str(properties.get('UniqueId', ''))
+  file_leaf_ref = properties.get('FileLeafRef', '')
+  file_ref = properties.get('FileRef', '')
+  # Derive file_type from filename
+  file_type = file_leaf_ref.rsplit('.', 1)[-1].lower() if '.' in file_leaf_ref else ''
+  # Build URLs
+  raw_url = site_base_url + file_ref
+  url = site_base_url + quote(file_ref, safe='/:@')
+  # Get file size from expanded File property
+  file_size = 0
+  if 'File' in properties and properties['File']:
+    file_obj = properties['File']
+    # File is a dict when properties come from SharePointRestClient, a File object when they come from ClientContext
+    if isinstance(file_obj, dict):
+      file_size = int(file_obj.get('Length') or 0)
+    elif hasattr(file_obj, 'properties') and 'Length' in file_obj.properties:
+      file_size = int(file_obj.properties['Length'])
+    elif hasattr(file_obj, 'Length'):
+      file_size = int(file_obj.Length)
+  if file_size == 0 and 'Length' in properties:
+    file_size = int(properties.get('Length', 0))
+  modified = properties.get('Modified', '')
+  
+  # Parse and format the modified date
+  last_modified_utc = ''
+  last_modified_timestamp = 0
+  if modified:
+    try:
+      dt = datetime.fromisoformat(modified.replace('Z', '+00:00'))
+      last_modified_utc = dt.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+      last_modified_timestamp = int(dt.timestamp())
+    except Exception as date_error:
+      logger.log_function_output(f"  WARNING: File '{file_ref}' (ID={item_id}) - failed to parse date '{modified}' -> {date_error}")
+      last_modified_utc = modified
+      last_modified_timestamp = 0
+  
+  # Create SharePointFile instance with new fields
+  sp_file = SharePointFile(
+    sharepoint_listitem_id=item_id,
+    sharepoint_unique_file_id=unique_id,
+    filename=file_leaf_ref,
+    file_type=file_type,
+    file_size=file_size,
+    url=url,
+    raw_url=raw_url,
+    server_relative_url=file_ref,
+    last_modified_utc=last_modified_utc,
+    last_modified_timestamp=last_modified_timestamp
+  )
+  return sp_file
+
 def get_document_library_files(ctx: ClientContext, document_library: DocumentLibrary, filter: str, logger: MiddlewareLogger, dry_run: bool = False) -> list[SharePointFile]:
   """
   Get all files from a SharePoint document library, handling pagination automatically.
@@ -259,56 +373,7 @@ def get_document_library_files(ctx: ClientContext, document_library: DocumentLib
     
     for item in all_items:
       try:
-        # Extract properties
-        item_id = int(item.properties.get('Id', 0))
-        unique_id = str(item.properties.get('UniqueId', ''))
-        file_leaf_ref = item.properties.get('FileLeafRef', '')
-        file_ref = item.properties.get('FileRef', '')
-        # Derive file_type from filename
-        file_type = file_leaf_ref.rsplit('.', 1)[-1].lower() if '.' in file_leaf_ref else ''
-        # Build URLs
-        raw_url = site_base_url + file_ref
-        url = site_base_url + quote(file_ref, safe='/:@')
-        # Get file size from expanded File property
-        file_size = 0
-        if 'File' in item.properties and item.properties['File']:
-          file_obj = item.properties['File']
-          if hasattr(file_obj, 'properties') and 'Length' in file_obj.properties:
-            file_size = int(file_obj.properties['Length'])
-          elif hasattr(file_obj, 'Length'):
-            file_size = int(file_obj.Length)
-        if file_size == 0 and 'Length' in item.properties:
-          file_size = int(item.properties.get('Length', 0))
-        modified = item.properties.get('Modified', '')
-        
-        # Parse and format the modified date
-        last_modified_utc = ''
-        last_modified_timestamp = 0
-        if modified:
-          try:
-            dt = datetime.fromisoformat(modified.replace('Z', '+00:00'))
-            last_modified_utc = dt.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
-            last_modified_timestamp = int(dt.timestamp())
-          except Exception as date_error:
-            logger.log_function_output(f"  WARNING: File '{file_ref}' (ID={item_id}) - failed to parse date '{modified}' -> {date_error}")
-            last_modified_utc = modified
-            last_modified_timestamp = 0
-        
-        # Create SharePointFile instance with new fields
-        sp_file = SharePointFile(
-          sharepoint_listitem_id=item_id,
-          sharepoint_unique_file_id=unique_id,
-          filename=file_leaf_ref,
-          file_type=file_type,
-          file_size=file_size,
-          url=url,
-          raw_url=raw_url,
-          server_relative_url=file_ref,
-          last_modified_utc=last_modified_utc,
-          last_modified_timestamp=last_modified_timestamp
-        )
-        sharepoint_files.append(sp_file)
-        
+        sharepoint_files.append(list_item_to_sharepoint_file(item.properties, site_base_url, logger))
       except Exception as item_error:
         item_id_str = item.properties.get('Id') or UNKNOWN
         file_ref_str = item.properties.get('FileRef') or UNKNOWN
@@ -3,18 +3,23 @@
 
 import asyncio, datetime, httpx, json, os, shutil, textwrap, zipfile
 from dataclasses import asdict, dataclass
-from typing import AsyncGenerator, Optional
+from typing import AsyncGenerator, Callable, Optional
 from fastapi import APIRouter, Request
 from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 
 from hardcoded_config import CRAWLER_HARDCODED_CONFIG
 from routers_v2.common_ui_functions_v2 import generate_router_docs_page, generate_endpoint_docs, json_result, html_result, generate_ui_page
 from routers_v2.common_logging_functions_v2 import MiddlewareLogger, UNKNOWN
-from routers_v2.common_job_functions_v2 import list_jobs, StreamingJobWriter, ControlAction, stream_with_flush
+from routers_v2.common_job_functions_v2 import list_jobs, StreamingJobWriter, SourceStepWriter, ControlAction, stream_with_flush
+from routers_v2.common_job_monitor_functions_v2 import follow_job_log
+from routers_v2.common_job_runner_functions_v2 import JobContext, get_job_runner, register_job_type, run_cpu_bound
 from routers_v2.common_crawler_functions_v2 import DomainConfig, FileSource, ListSource, SitePageSource, load_domain, save_domain_to_file, delete_domain_folder, get_sources_for_scope, get_source_folder_path, get_embedded_folder_path, get_failed_folder_path, get_originals_folder_path, server_relative_url_to_local_path, get_file_relative_path, get_map_filename, cleanup_temp_map_files, is_file_embeddable, filter_embeddable_files, load_files_metadata, save_files_metadata, update_files_metadata, get_domain_path, SOURCE_TYPE_FOLDERS
-from routers_v2.common_map_file_functions_v2 import SharePointMapRow, FilesMapRow, VectorStoreMapRow, ChangeDetectionResult, MapFileWriter, read_sharepoint_map, read_files_map, read_vectorstore_map, detect_changes, is_file_changed, is_file_changed_for_embed, sharepoint_map_row_to_files_map_row, files_map_row_to_vectorstore_map_row
-from routers_v2.common_sharepoint_functions_v2 import SharePointFile, connect_to_site_using_client_id_and_certificate, try_get_document_library, get_document_library_files, download_file_from_sharepoint, get_list_items, get_list_items_as_sharepoint_files, export_list_to_csv, get_site_pages, download_site_page_html, create_document_library, add_number_field_to_list, add_text_field_to_list, upload_file_to_library, upload_file_to_folder, update_file_content, rename_file, move_file, delete_file, create_folder_in_library, delete_document_library, create_list, add_list_item, update_list_item, delete_list_item, delete_list, create_site_page, update_site_page, rename_site_page, delete_site_page, file_exists_in_library, get_list_items_with_fields, export_list_items_to_csv_string, export_list_items_to_markdown_string, ListExportResult
-from routers_v2.common_embed_functions_v2 import upload_file_to_openai, delete_file_from_openai, add_file_to_vector_store, remove_file_from_vector_store, list_vector_store_files, wait_for_vector_store_ready, get_failed_embeddings, upload_and_embed_file, remove_and_delete_file
+from routers_v2.common_map_store_functions_v2 import SqliteMapStore, export_outdated_map_csvs, open_map_store
+from routers_v2.common_map_file_functions_v2 import SharePointMapRow, FilesMapRow, VectorStoreMapRow, ChangeDetectionResult, MapFileWriter, map_file_exists, read_sharepoint_map, read_files_map, read_vectorstore_map, detect_changes, apply_sharepoint_changes, read_change_token, write_change_token, delete_change_token, is_file_changed, is_file_changed_for_embed, sharepoint_map_row_to_files_map_row, files_map_row_to_vectorstore_map_row
+from routers_v2.common_sharepoint_functions_v2 import SharePointFile, list_item_to_sharepoint_file, connect_to_site_using_client_id_and_certificate, try_get_document_library, get_list_items, get_list_items_as_sharepoint_files, export_list_to_csv, download_site_page_html, create_document_library, add_number_field_to_list, add_text_field_to_list, upload_file_to_library, upload_file_to_folder, update_file_content, rename_file, move_file, delete_file, create_folder_in_library, delete_document_library, create_list, add_list_item, update_list_item, delete_list_item, delete_list, create_site_page, update_site_page, rename_site_page, delete_site_page, file_exists_in_library, export_list_items_to_csv_string, export_list_items_to_markdown_string, ListExportResult
+from routers_v2.common_sharepoint_client_v2 import SharePointRestClient, create_sharepoint_client, get_document_library_async, get_document_library_files_async, get_site_pages_async, get_list_items_with_fields_async, get_list_change_token_async, get_list_item_changes_async, get_document_library_items_by_ids_async
+from routers_v2.common_download_functions_v2 import DownloadTask, ParallelDownloader, get_max_parallel_downloads
+from routers_v2.common_embed_functions_v2 import upload_file_to_openai, delete_file_from_openai, add_file_to_vector_store, remove_file_from_vector_store, list_vector_store_files, wait_for_vector_store_ready, get_failed_embeddings, remove_and_delete_file, EmbedOutcome, EmbedTask, EmbeddingPipeline
 from routers_v2.common_openai_functions_v2 import create_vector_store, try_get_vector_store_by_id
 
 router = APIRouter()
@@ -37,8 +42,11 @@ def get_persistent_storage_path(request: Request) -> str:
   return getattr(config, 'LOCAL_PERSISTENT_STORAGE_PATH', None) or ''
 
 def get_crawler_config(request: Request) -> dict:
+  return _get_crawler_config(get_persistent_storage_path(request))
+
+def _get_crawler_config(storage_path: str) -> dict:
   cert_filename = getattr(config, 'CRAWLER_CLIENT_CERTIFICATE_PFX_FILE', '') or ''
-  cert_path = os.path.join(get_persistent_storage_path(request), cert_filename) if cert_filename else ''
+  cert_path = os.path.join(storage_path, cert_filename) if cert_filename else ''
   return {"client_id": getattr(config, 'CRAWLER_CLIENT_ID', '') or '', "tenant_id": getattr(config, 'CRAWLER_TENANT_ID', '') or '', "cert_path": cert_path, "cert_password": getattr(config, 'CRAWLER_CLIENT_CERTIFICATE_PASSWORD', '') or ''}
 
 @dataclass
@@ -85,7 +93,7 @@ def _get_utc_now() -> tuple[str, int]:
 def _sharepoint_file_to_map_row(sp_file: SharePointFile) -> SharePointMapRow:
   return SharePointMapRow(sharepoint_listitem_id=sp_file.sharepoint_listitem_id, sharepoint_unique_file_id=sp_file.sharepoint_unique_file_id, filename=sp_file.filename, file_type=sp_file.file_type, file_size=sp_file.file_size, url=sp_file.url, raw_url=sp_file.raw_url, server_relative_url=sp_file.server_relative_url, last_modified_utc=sp_file.last_modified_utc, last_modified_timestamp=sp_file.last_modified_timestamp)
 
-def _export_list_to_files(ctx, list_name: str, filter_query: str, target_folder: str, logger: MiddlewareLogger, dry_run: bool = False) -> tuple[bool, str, int, int]:
+async def _export_list_to_files(sp_client, list_name: str, filter_query: str, target_folder: str, logger: MiddlewareLogger, dry_run: bool = False) -> tuple[bool, str, int, int]:
   """
   Export entire SharePoint list to MD and CSV files with full field data.
   Returns (success, error, item_count, field_count).
@@ -94,7 +102,7 @@ def _export_list_to_files(ctx, list_name: str, filter_query: str, target_folder:
   if dry_run:
     return True, "", 0, 0
   try:
-    items, fields = get_list_items_with_fields(ctx, list_name, filter_query, logger)
+    items, fields = await get_list_items_with_fields_async(sp_client, list_name, filter_query, logger)
     if not items:
       return True, "", 0, len(fields)
     
@@ -120,6 +128,62 @@ def _export_list_to_files(ctx, list_name: str, filter_query: str, target_folder:
   except Exception as e:
     return False, str(e), 0, 0
 
+def _open_map_store(source_folder: str, logger: MiddlewareLogger) -> Optional[SqliteMapStore]:
+  """
+  Map store of a source folder (CRAWLER_MAP_STORE_BACKEND="sqlite"), None for the csv backend or errors.
+  Dry runs read from it but write job-suffixed map CSV files (MapFileWriter without store).
+  """
+  try: return open_map_store(source_folder)
+  except Exception as e:
+    logger.log_function_output(f"  WARNING: Could not open map store, using map files only -> {str(e)}")
+    return None
+
+async def _get_library_map_rows_from_changes(sp_client: SharePointRestClient, library: dict, source_filter: str, source_folder: str, current_token: str, logger: MiddlewareLogger, map_store: Optional[SqliteMapStore] = None) -> Optional[list]:
+  """
+  Incremental mode: rebuild the library state from the last sharepoint_map.csv and the list change log since the stored change token.
+  Returns list[SharePointMapRow], or None if a full enumeration is needed (no/stale/mismatching token, folder renamed/moved/deleted, request failed).
+  """
+  token_data = read_change_token(os.path.join(source_folder, CRAWLER_HARDCODED_CONFIG.SHAREPOINT_CHANGE_TOKEN_JSON))
+  previous_map_path = os.path.join(source_folder, CRAWLER_HARDCODED_CONFIG.SHAREPOINT_MAP_CSV)
+  if not current_token or not token_data or not map_file_exists(previous_map_path, map_store): return None
+  if token_data.get("list_id") != library.get("Id") or token_data.get("filter", "") != (source_filter or ""):
+    logger.log_function_output("  Change token belongs to another library or filter, enumerating all files.")
+    return None
+  try:
+    modified_ids, deleted_ids, moved_ids = await get_list_item_changes_async(sp_client, library.get("Id"), token_data["change_token"], current_token)
+  except Exception as e:
+    logger.log_function_output(f"  Change token expired or invalid, enumerating all files -> {str(e)}")
+    return None
+  previous_items = read_sharepoint_map(previous_map_path, map_store)
+  previous_ids = {item.sharepoint_listitem_id for item in previous_items}
+  # Deleted ids we never tracked are folders (or items excluded by the filter); a deleted folder takes its files with it
+  if any(item_id not in previous_ids for item_id in deleted_ids):
+    logger.log_function_output("  Untracked item deleted (folder), enumerating all files.")
+    return None
+  try:
+    if moved_ids:
+      moved_items = await get_document_library_items_by_ids_async(sp_client, library, sorted(moved_ids))
+      if any(int(item.get("FSObjType", 0)) == 1 for item in moved_items):
+        logger.log_function_output("  Folder renamed, moved or restored, enumerating all files.")
+        return None
+    # Same item selection as get_document_library_files_async(): a custom filter replaces 'FSObjType eq 0'
+    effective_filter = source_filter if source_filter and source_filter.strip() else "FSObjType eq 0"
+    changed_items = await get_document_library_items_by_ids_async(sp_client, library, sorted(modified_ids), effective_filter) if modified_ids else []
+  except Exception as e:
+    logger.log_function_output(f"  ERROR: Failed to read changed items, enumerating all files -> {str(e)}")
+    return None
+  changed_rows = []
+  for item in changed_items:
+    try: changed_rows.append(_sharepoint_file_to_map_row(list_item_to_sharepoint_file(item, sp_client.base_url, logger)))
+    except Exception as item_error:
+      logger.log_function_output(f"  WARNING: File '{item.get('FileRef') or UNKNOWN}' (ID={item.get('Id') or UNKNOWN}) - failed to process -> {item_error}")
+      return None
+  # Modified items not returned by the filtered query were moved to the recycle bin in between or no longer match the filter
+  changed_ids = {row.sharepoint_listitem_id for row in changed_rows}
+  removed_ids = deleted_ids | (modified_ids - changed_ids)
+  logger.log_function_output(f"  Change log: {len(modified_ids)} modified, {len(deleted_ids)} deleted item{'' if len(deleted_ids) == 1 else 's'} since last crawl ({token_data.get('saved_utc') or UNKNOWN}).")
+  return apply_sharepoint_changes(previous_items, changed_rows, removed_ids)
+
 def clear_domain_vectorstore_maps(storage_path: str, domain_id: str, logger: MiddlewareLogger) -> int:
   """Clear all vectorstore_map.csv files for a domain (stale references after VS recreation per edge case C4)."""
   crawler_folder = os.path.join(storage_path, CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_PATH_CRAWLER_SUBFOLDER, domain_id)
@@ -128,7 +192,16 @@ def clear_domain_vectorstore_maps(storage_path: str, domain_id: str, logger: Mid
   cleared_count = 0
   for root, dirs, files in os.walk(crawler_folder):
     for filename in files:
-      if filename == CRAWLER_HARDCODED_CONFIG.VECTOR_STORE_MAP_CSV or filename.startswith("vectorstore_map_"):
+      if filename == CRAWLER_HARDCODED_CONFIG.MAP_STORE_SQLITE:
+        # Map store (sqlite backend): vectorstore_map rows are cleared like the CSV file
+        try:
+          store = SqliteMapStore(os.path.join(root, filename))
+          if store.has_map(CRAWLER_HARDCODED_CONFIG.VECTOR_STORE_MAP_CSV):
+            store.drop_map(CRAWLER_HARDCODED_CONFIG.VECTOR_STORE_MAP_CSV)
+            if CRAWLER_HARDCODED_CONFIG.VECTOR_STORE_MAP_CSV not in files: cleared_count += 1
+        except Exception as e:
+          logger.log_function_output(f"  WARNING: Could not clear vectorstore_map in {os.path.join(root, filename)}: {str(e)}")
+      elif filename == CRAWLER_HARDCODED_CONFIG.VECTOR_STORE_MAP_CSV or filename.startswith("vectorstore_map_"):
         file_path = os.path.join(root, filename)
         try:
           os.remove(file_path)
@@ -137,8 +210,11 @@ def clear_domain_vectorstore_maps(storage_path: str, domain_id: str, logger: Mid
           logger.log_function_output(f"  WARNING: Could not delete {file_path}: {str(e)}")
   return cleared_count
 
-async def step_download_source(storage_path: str, domain: DomainConfig, source, source_type: str, mode: str, dry_run: bool, retry_batches: int, writer: StreamingJobWriter, logger: MiddlewareLogger, crawler_config: dict, job_id: str = None) -> AsyncGenerator[str, None]:
-  """Async generator that yields SSE events during execution. Result stored in writer.get_step_result()."""
+async def step_download_source(storage_path: str, domain: DomainConfig, source, source_type: str, mode: str, dry_run: bool, retry_batches: int, writer: StreamingJobWriter, logger: MiddlewareLogger, crawler_config: dict, job_id: str = None, on_file_downloaded: Optional[Callable[[FilesMapRow], None]] = None) -> AsyncGenerator[str, None]:
+  """
+  Async generator that yields SSE events during execution. Result stored in writer.get_step_result().
+  on_file_downloaded: called with the files_map row of each successfully downloaded file (used by crawl_source_streaming).
+  """
   source_id = source.source_id
   logger.log_function_output(f"Download source '{source_id}' (type={source_type}, mode={mode}, dry_run={dry_run})")
   result = DownloadResult(source_id=source_id, source_type=source_type, total_files=0, downloaded=0, skipped=0, errors=0, removed=0)
@@ -150,26 +226,35 @@ async def step_download_source(storage_path: str, domain: DomainConfig, source,
   sp_map_path = os.path.join(source_folder, sp_map_name)
   files_map_path = os.path.join(source_folder, files_map_name)
   existing_files_map_path = os.path.join(source_folder, CRAWLER_HARDCODED_CONFIG.FILE_MAP_CSV)
-  local_items = read_files_map(existing_files_map_path) if mode == "incremental" and os.path.exists(existing_files_map_path) else []
+  map_store = _open_map_store(source_folder, logger)
+  local_items = read_files_map(existing_files_map_path, map_store) if mode == "incremental" and map_file_exists(existing_files_map_path, map_store) else []
   try:
-    ctx = connect_to_site_using_client_id_and_certificate(source.site_url, crawler_config['client_id'], crawler_config['tenant_id'], crawler_config['cert_path'], crawler_config['cert_password'])
-    sp_files = []
+    # SharePoint calls go through the async REST client (pooled connections, shared token cache) so the event loop is never blocked
+    sp_client = create_sharepoint_client(source.site_url, crawler_config['client_id'], crawler_config['tenant_id'], crawler_config['cert_path'], crawler_config['cert_password'])
+    sp_files, sp_items, library, change_token = [], None, None, ""
     if source_type == "file_sources":
-      library, error = try_get_document_library(ctx, source.site_url, source.sharepoint_url_part)
+      library, error = await get_document_library_async(sp_client, source.site_url, source.sharepoint_url_part)
       if error:
         logger.log_function_output(f"  ERROR: {error}")
         result.errors = 1
         for sse in writer.drain_sse_queue(): yield sse
         writer.set_step_result(result)
         return
-      sp_files = get_document_library_files(ctx, library, source.filter, logger, dry_run)
+      # Take the change token before reading items so changes made during this crawl are picked up by the next one
+      try: change_token = await get_list_change_token_async(sp_client, library.get("Id"))
+      except Exception as e: logger.log_function_output(f"  WARNING: Could not read change token -> {str(e)}")
+      if mode == "incremental": sp_items = await _get_library_map_rows_from_changes(sp_client, library, source.filter, source_folder, change_token, logger, map_store)
+      if sp_items is None:
+        # Full enumeration (mode=full or no usable token): drop the stored token so a stale or rejected one is never used again
+        if not dry_run: delete_change_token(os.path.join(source_folder, CRAWLER_HARDCODED_CONFIG.SHAREPOINT_CHANGE_TOKEN_JSON))
+        sp_files = await get_document_library_files_async(sp_client, library, source.filter, logger, dry_run)
     elif source_type == "sitepage_sources":
-      sp_files = get_site_pages(ctx, source.site_url, source.sharepoint_url_part, source.filter, logger, dry_run)
+      sp_files = await get_site_pages_async(sp_client, source.site_url, source.sharepoint_url_part, source.filter, logger, dry_run)
     elif source_type == "list_sources":
       # For list_sources: export entire list as single MD file (with CSV backup) per V2CR-SP01
       target_folder = get_originals_folder_path(storage_path, domain.domain_id, source_type, source_id)
       logger.log_function_output(f"Exporting list '{source.list_name}' with full field data...")
-      success, error, item_count, field_count = _export_list_to_files(ctx, source.list_name, source.filter, target_folder, logger, dry_run)
+      success, error, item_count, field_count = await _export_list_to_files(sp_client, source.list_name, source.filter, target_folder, logger, dry_run)
       for sse in writer.drain_sse_queue(): yield sse
       if not success:
         logger.log_function_output(f"  ERROR: {error}")
@@ -185,7 +270,7 @@ async def step_download_source(storage_path: str, domain: DomainConfig, source,
         # FIX: Use EMBEDDED subfolder - step_process_source copies to 02_embedded, step_embed_source reads from file_relative_path
         subfolder = CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_PATH_EMBEDDED_SUBFOLDER
         file_rel_path = get_file_relative_path(domain.domain_id, source_type, source_id, subfolder, md_filename)
-        files_writer = MapFileWriter(files_map_path, FilesMapRow)
+        files_writer = MapFileWriter(files_map_path, FilesMapRow, store=None if dry_run else map_store)
         files_writer.write_header()
         # Create a synthetic map row for the exported MD file
         md_row = FilesMapRow(sharepoint_listitem_id=0, sharepoint_unique_file_id=source.list_name, filename=md_filename, file_type="md", server_relative_url="", file_relative_path=file_rel_path, file_size=0, last_modified_utc=utc_now, last_modified_timestamp=ts_now, downloaded_utc=utc_now, downloaded_timestamp=ts_now, sharepoint_error="", processing_error="")
@@ -197,18 +282,21 @@ async def step_download_source(storage_path: str, domain: DomainConfig, source,
       return
     # Drain SSE queue after SharePoint operations (realtime streaming)
     for sse in writer.drain_sse_queue(): yield sse
-    sp_items = [_sharepoint_file_to_map_row(f) for f in sp_files]
+    if sp_items is None: sp_items = [_sharepoint_file_to_map_row(f) for f in sp_files]
     result.total_files = len(sp_items)
-    sp_writer = MapFileWriter(sp_map_path, SharePointMapRow)
+    sp_writer = MapFileWriter(sp_map_path, SharePointMapRow, store=None if dry_run else map_store)
     sp_writer.write_header()
     for item in sp_items: sp_writer.append_row(item)
     sp_writer.finalize()
+    # Token is written after sharepoint_map.csv (an older token with a newer map only re-reads changes). Empty results are not trusted (listing errors return []).
+    if change_token and sp_items and not dry_run:
+      write_change_token(os.path.join(source_folder, CRAWLER_HARDCODED_CONFIG.SHAREPOINT_CHANGE_TOKEN_JSON), library.get("Id"), source.filter, change_token, _get_utc_now()[0])
     changes = detect_changes(sp_items, local_items)
     logger.log_function_output(f"  {len(changes.added)} added, {len(changes.changed)} changed, {len(changes.removed)} removed, {len(changes.unchanged)} unchanged.")
     for sse in writer.drain_sse_queue(): yield sse
     target_folder = get_embedded_folder_path(storage_path, domain.domain_id, source_type, source_id) if source_type == "file_sources" else get_originals_folder_path(storage_path, domain.domain_id, source_type, source_id)
     os.makedirs(target_folder, exist_ok=True)
-    files_writer = MapFileWriter(files_map_path, FilesMapRow)
+    files_writer = MapFileWriter(files_map_path, FilesMapRow, store=None if dry_run else map_store)
     files_writer.write_header()
     # FIX-05: Filter to embeddable files only (non-embeddable tracked in sharepoint_map.csv only)
     to_download_all = changes.added + changes.changed
@@ -217,31 +305,39 @@ async def step_download_source(storage_path: str, domain: DomainConfig, source,
     if non_embeddable_count > 0:
       logger.log_function_output(f"  Skipping {non_embeddable_count} non-embeddable file{'' if non_embeddable_count == 1 else 's'}.")
     total = len(to_download)
+    subfolder = CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_PATH_EMBEDDED_SUBFOLDER if source_type == "file_sources" else CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_PATH_ORIGINALS_SUBFOLDER
+    tasks = []
     for i, sp_item in enumerate(to_download):
-      async for control in writer.check_control():
-        if control == ControlAction.CANCEL:
-          files_writer.finalize()
-          writer.set_step_result(result)
-          return
       local_path = server_relative_url_to_local_path(sp_item.server_relative_url, source.sharepoint_url_part)
-      target_path = os.path.join(target_folder, local_path)
-      utc_now, ts_now = _get_utc_now()
-      logger.log_function_output(f"[ {i+1} / {total} ] Downloading '{sp_item.filename}'...")
-      subfolder = CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_PATH_EMBEDDED_SUBFOLDER if source_type == "file_sources" else CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_PATH_ORIGINALS_SUBFOLDER
-      success, error = download_file_from_sharepoint(ctx, sp_item.server_relative_url, target_path, True, sp_item.last_modified_timestamp, dry_run)
-      if success:
+      tasks.append(DownloadTask(index=i, sp_item=sp_item, target_path=os.path.join(target_folder, local_path), file_relative_path=get_file_relative_path(domain.domain_id, source_type, source_id, subfolder, local_path)))
+    max_workers = get_max_parallel_downloads(crawler_config.get('max_parallel_downloads'))
+    if total > 0: logger.log_function_output(f"  Downloading {total} file{'' if total == 1 else 's'} with {min(max_workers, total)} parallel worker{'' if min(max_workers, total) == 1 else 's'}...")
+    for sse in writer.drain_sse_queue(): yield sse
+    downloader = ParallelDownloader(sp_client, domain.domain_id, max_workers, dry_run)
+    # Outcomes arrive in completion order; rows are held back until all earlier rows are written so files_map.csv keeps to_download order
+    completed_rows, next_row_index, completed_count = {}, 0, 0
+    async for outcome in downloader.run(tasks, writer):
+      completed_count += 1
+      sp_item = outcome.task.sp_item
+      logger.log_function_output(f"[ {completed_count} / {total} ] Downloading '{sp_item.filename}'...")
+      if outcome.success:
         logger.log_function_output("  OK.")
-        file_rel_path = get_file_relative_path(domain.domain_id, source_type, source_id, subfolder, local_path)
-        files_row = sharepoint_map_row_to_files_map_row(sp_item, file_rel_path, utc_now, ts_now)
-        files_writer.append_row(files_row)
+        completed_rows[outcome.task.index] = sharepoint_map_row_to_files_map_row(sp_item, outcome.task.file_relative_path, outcome.downloaded_utc, outcome.downloaded_timestamp)
         result.downloaded += 1
+        if on_file_downloaded is not None: on_file_downloaded(completed_rows[outcome.task.index])
       else:
-        logger.log_function_output(f"  ERROR: {error}")
-        files_row = sharepoint_map_row_to_files_map_row(sp_item, "", utc_now, ts_now, sharepoint_error=error)
-        files_writer.append_row(files_row)
+        logger.log_function_output(f"  ERROR: {outcome.error}")
+        completed_rows[outcome.task.index] = sharepoint_map_row_to_files_map_row(sp_item, "", outcome.downloaded_utc, outcome.downloaded_timestamp, sharepoint_error=outcome.error)
         result.errors += 1
+      while next_row_index in completed_rows:
+        files_writer.append_row(completed_rows.pop(next_row_index))
+        next_row_index += 1
       # Drain SSE queue after each file download (realtime streaming)
       for sse in writer.drain_sse_queue(): yield sse
+    if downloader.cancelled:
+      files_writer.finalize()
+      writer.set_step_result(result)
+      return
     for local_item in changes.unchanged:
       files_writer.append_row(local_item)
       result.skipped += 1
@@ -267,12 +363,13 @@ async def step_integrity_check(storage_path: str, domain_id: str, source, source
   temp_job_id = job_id if dry_run else None
   files_map_name = get_map_filename(CRAWLER_HARDCODED_CONFIG.FILE_MAP_CSV, temp_job_id)
   files_map_path = os.path.join(source_folder, files_map_name)
-  if not os.path.exists(files_map_path):
+  map_store = _open_map_store(source_folder, logger)
+  if not map_file_exists(files_map_path, map_store):
     logger.log_function_output(f"  No files_map.csv found")
     for sse in writer.drain_sse_queue(): yield sse
     writer.set_step_result(result)
     return
-  local_items = read_files_map(files_map_path)
+  local_items = read_files_map(files_map_path, map_store)
   target_folder = get_embedded_folder_path(storage_path, domain_id, source_type, source_id) if source_type == "file_sources" else get_originals_folder_path(storage_path, domain_id, source_type, source_id)
   for item in local_items:
     if not item.file_relative_path: continue
@@ -369,8 +466,20 @@ def _scan_disk_for_embeddable_files(folder: str, domain_id: str, source_type: st
       results.append(row)
   return results
 
-async def step_embed_source(storage_path: str, domain: DomainConfig, source, source_type: str, mode: str, dry_run: bool, retry_batches: int, writer: StreamingJobWriter, logger: MiddlewareLogger, openai_client, job_id: str = None) -> AsyncGenerator[str, None]:
-  """Async generator that yields SSE events during execution. Result stored in writer.get_step_result()."""
+def _embed_outcome_to_rows(files_item: FilesMapRow, outcome: EmbedOutcome, vector_store_id: str, source_id: str, source_type: str) -> tuple[VectorStoreMapRow, Optional[dict]]:
+  """Convert an EmbeddingPipeline outcome to (vectorstore_map row, files_metadata entry or None on error)."""
+  if outcome.error:
+    return files_map_row_to_vectorstore_map_row(files_item, "", vector_store_id, outcome.uploaded_utc, outcome.uploaded_timestamp, "", 0, embedding_error=outcome.error), None
+  vs_row = files_map_row_to_vectorstore_map_row(files_item, outcome.file_id, vector_store_id, outcome.uploaded_utc, outcome.uploaded_timestamp, outcome.embedded_utc, outcome.embedded_timestamp)
+  metadata_entry = {"sharepoint_listitem_id": files_item.sharepoint_listitem_id, "sharepoint_unique_file_id": files_item.sharepoint_unique_file_id, "openai_file_id": outcome.file_id, "file_relative_path": files_item.file_relative_path, "filename": files_item.filename, "file_type": files_item.file_type, "file_size": files_item.file_size, "last_modified_utc": files_item.last_modified_utc, "embedded_utc": outcome.embedded_utc, "source_id": source_id, "source_type": source_type}
+  return vs_row, metadata_entry
+
+async def step_embed_source(storage_path: str, domain: DomainConfig, source, source_type: str, mode: str, dry_run: bool, retry_batches: int, writer: StreamingJobWriter, logger: MiddlewareLogger, openai_client, job_id: str = None, streamed_outcomes: Optional[dict] = None) -> AsyncGenerator[str, None]:
+  """
+  Async generator that yields SSE events during execution. Result stored in writer.get_step_result().
+  streamed_outcomes: sharepoint_unique_file_id -> EmbedOutcome for files already embedded by crawl_source_streaming().
+  These are recorded as-is (also after cancel) instead of being uploaded again.
+  """
   source_id = source.source_id
   vector_store_id = domain.vector_store_id
   logger.log_function_output(f"Embed source '{source_id}' to vector store '{vector_store_id}'")
@@ -383,10 +492,11 @@ async def step_embed_source(storage_path: str, domain: DomainConfig, source, sou
   files_map_name = get_map_filename(CRAWLER_HARDCODED_CONFIG.FILE_MAP_CSV, temp_job_id)
   files_map_path = os.path.join(source_folder, files_map_name)
   if not os.path.exists(files_map_path): files_map_path = os.path.join(source_folder, CRAWLER_HARDCODED_CONFIG.FILE_MAP_CSV)
+  map_store = _open_map_store(source_folder, logger)
   
   # Fallback: If files_map.csv missing, scan disk for embeddable files
   use_disk_fallback = False
-  if not os.path.exists(files_map_path):
+  if not map_file_exists(files_map_path, map_store):
     logger.log_function_output(f"  WARNING: files_map.csv not found, using disk fallback mode")
     disk_files = _scan_disk_for_embeddable_files(embedded_folder, domain.domain_id, source_type, source_id, storage_path)
     if not disk_files:
@@ -398,64 +508,109 @@ async def step_embed_source(storage_path: str, domain: DomainConfig, source, sou
     files_items = disk_files
     use_disk_fallback = True
   else:
-    files_items = read_files_map(files_map_path)
+    files_items = read_files_map(files_map_path, map_store)
   embeddable, skipped = filter_embeddable_files(files_items)
   result.total_files = len(embeddable)
   vs_map_path = os.path.join(source_folder, CRAWLER_HARDCODED_CONFIG.VECTOR_STORE_MAP_CSV)
-  existing_vs_items = read_vectorstore_map(vs_map_path) if mode == "incremental" and os.path.exists(vs_map_path) else []
+  existing_vs_items = read_vectorstore_map(vs_map_path, map_store) if mode == "incremental" and map_file_exists(vs_map_path, map_store) else []
   vs_by_uid = {item.sharepoint_unique_file_id: item for item in existing_vs_items}
   vs_map_name = get_map_filename(CRAWLER_HARDCODED_CONFIG.VECTOR_STORE_MAP_CSV, temp_job_id)
   new_vs_map_path = os.path.join(source_folder, vs_map_name)
-  vs_writer = MapFileWriter(new_vs_map_path, VectorStoreMapRow)
+  vs_writer = MapFileWriter(new_vs_map_path, VectorStoreMapRow, store=None if dry_run else map_store)
   vs_writer.write_header()
   metadata_entries = []
   total = len(embeddable)
+  # Rows are held back until all earlier rows are written so vectorstore_map.csv and files_metadata.json keep embeddable order
+  # completed_rows: index -> (vs_row or None, metadata_entry or None)
+  completed_rows, next_row_index, completed_count = {}, 0, 0
+  tasks, items_by_index, cancelled = [], {}, False
+  streamed_outcomes = dict(streamed_outcomes or {})
   for i, files_item in enumerate(embeddable):
-    async for control in writer.check_control():
-      if control == ControlAction.CANCEL:
-        vs_writer.finalize()
-        writer.set_step_result(result)
-        return
-    logger.log_function_output(f"[ {i+1} / {total} ] Embedding '{files_item.filename}'...")
+    streamed = streamed_outcomes.pop(files_item.sharepoint_unique_file_id, None)
+    if streamed is not None:
+      # Already uploaded and attached while downloading: record without control check so nothing is left untracked on cancel
+      completed_count += 1
+      logger.log_function_output(f"[ {completed_count} / {total} ] Embedding '{files_item.filename}'...")
+      if streamed.task.replaces_file_id: result.removed += 1
+      completed_rows[i] = _embed_outcome_to_rows(files_item, streamed, vector_store_id, source_id, source_type)
+      if streamed.error:
+        logger.log_function_output(f"  ERROR: {streamed.error}")
+        result.failed += 1
+      else:
+        logger.log_function_output("  OK (embedded during download).")
+        result.uploaded += 1
+        result.embedded += 1
+      continue
+    if cancelled: continue
     existing_vs = vs_by_uid.get(files_item.sharepoint_unique_file_id)
-    if existing_vs and not is_file_changed_for_embed(files_item, existing_vs):
+    file_path = os.path.join(storage_path, CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_PATH_CRAWLER_SUBFOLDER, files_item.file_relative_path)
+    unchanged = existing_vs is not None and not is_file_changed_for_embed(files_item, existing_vs)
+    # Files that need an upload go through the embedding pipeline (which checks pause/cancel before each upload)
+    if not unchanged and not dry_run and os.path.exists(file_path):
+      tasks.append(EmbedTask(index=i, filepath=file_path, replaces_file_id=existing_vs.openai_file_id if existing_vs else ""))
+      items_by_index[i] = files_item
+      continue
+    async for control in writer.check_control():
+      if control == ControlAction.CANCEL: cancelled = True
+    if cancelled: continue
+    completed_count += 1
+    logger.log_function_output(f"[ {completed_count} / {total} ] Embedding '{files_item.filename}'...")
+    if unchanged:
       logger.log_function_output("  Skipped (unchanged)")
-      vs_writer.append_row(existing_vs)
+      completed_rows[i] = (existing_vs, None)
       result.uploaded += 1
       result.embedded += 1
-      continue
-    file_path = os.path.join(storage_path, CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_PATH_CRAWLER_SUBFOLDER, files_item.file_relative_path)
-    if not os.path.exists(file_path):
+    elif not os.path.exists(file_path):
       logger.log_function_output(f"  ERROR: File not found")
+      completed_rows[i] = (None, None)
       result.failed += 1
-      continue
-    utc_now, ts_now = _get_utc_now()
-    if dry_run:
-      vs_row = files_map_row_to_vectorstore_map_row(files_item, "dry_run_file_id", vector_store_id, utc_now, ts_now, utc_now, ts_now)
-      vs_writer.append_row(vs_row)
+    else:
+      utc_now, ts_now = _get_utc_now()
+      completed_rows[i] = (files_map_row_to_vectorstore_map_row(files_item, "dry_run_file_id", vector_store_id, utc_now, ts_now, utc_now, ts_now), None)
       result.uploaded += 1
       result.embedded += 1
       logger.log_function_output("  OK.")
-    else:
-      if existing_vs and existing_vs.openai_file_id:
-        await remove_and_delete_file(openai_client, vector_store_id, existing_vs.openai_file_id, logger)
-        result.removed += 1
-      file_id, error = await upload_and_embed_file(openai_client, vector_store_id, file_path, logger)
-      if error:
-        logger.log_function_output(f"  ERROR: {error}")
-        vs_row = files_map_row_to_vectorstore_map_row(files_item, "", vector_store_id, utc_now, ts_now, "", 0, embedding_error=error)
-        vs_writer.append_row(vs_row)
+    for sse in writer.drain_sse_queue(): yield sse
+  # Streamed files that are not in files_map.csv would not be tracked anywhere: delete them from OpenAI
+  for orphan in streamed_outcomes.values():
+    if orphan.file_id: await remove_and_delete_file(openai_client, vector_store_id, orphan.file_id, logger)
+  pipeline = EmbeddingPipeline(openai_client, vector_store_id, logger=logger)
+  if tasks and not cancelled:
+    logger.log_function_output(f"  Uploading {len(tasks)} file{'' if len(tasks) == 1 else 's'} to vector store...")
+    for sse in writer.drain_sse_queue(): yield sse
+    async for outcome in pipeline.run(tasks, writer):
+      completed_count += 1
+      files_item = items_by_index[outcome.task.index]
+      logger.log_function_output(f"[ {completed_count} / {total} ] Embedding '{files_item.filename}'...")
+      if outcome.task.replaces_file_id: result.removed += 1
+      completed_rows[outcome.task.index] = _embed_outcome_to_rows(files_item, outcome, vector_store_id, source_id, source_type)
+      if outcome.error:
+        logger.log_function_output(f"  ERROR: {outcome.error}")
         result.failed += 1
       else:
         logger.log_function_output("  OK.")
-        embed_utc, embed_ts = _get_utc_now()
-        vs_row = files_map_row_to_vectorstore_map_row(files_item, file_id, vector_store_id, utc_now, ts_now, embed_utc, embed_ts)
-        vs_writer.append_row(vs_row)
         result.uploaded += 1
         result.embedded += 1
-        metadata_entries.append({"sharepoint_listitem_id": files_item.sharepoint_listitem_id, "sharepoint_unique_file_id": files_item.sharepoint_unique_file_id, "openai_file_id": file_id, "file_relative_path": files_item.file_relative_path, "filename": files_item.filename, "file_type": files_item.file_type, "file_size": files_item.file_size, "last_modified_utc": files_item.last_modified_utc, "embedded_utc": embed_utc, "source_id": source_id, "source_type": source_type})
-    # Drain SSE queue after each embed operation (realtime streaming)
-    for sse in writer.drain_sse_queue(): yield sse
+      while next_row_index in completed_rows:
+        vs_row, metadata_entry = completed_rows.pop(next_row_index)
+        if vs_row: vs_writer.append_row(vs_row)
+        if metadata_entry: metadata_entries.append(metadata_entry)
+        next_row_index += 1
+      # Drain SSE queue after each embed operation (realtime streaming)
+      for sse in writer.drain_sse_queue(): yield sse
+  # Write remaining rows (all of them, or the ones completed before cancel) in embeddable order
+  for index in sorted(completed_rows):
+    vs_row, metadata_entry = completed_rows[index]
+    if vs_row: vs_writer.append_row(vs_row)
+    if metadata_entry: metadata_entries.append(metadata_entry)
+  if cancelled or pipeline.cancelled:
+    vs_writer.finalize()
+    writer.set_step_result(result)
+    return
+  if pipeline.processing_failed_file_ids:
+    logger.log_function_output(f"  WARNING: {len(pipeline.processing_failed_file_ids)} file{'' if len(pipeline.processing_failed_file_ids) == 1 else 's'} failed vector store processing: {', '.join(pipeline.processing_failed_file_ids)}")
+  if pipeline.backoff.rate_limit_hits > 0:
+    logger.log_function_output(f"  Rate limited {pipeline.backoff.rate_limit_hits} time{'' if pipeline.backoff.rate_limit_hits == 1 else 's'} (HTTP 429), backed off.")
   vs_writer.finalize()
   if metadata_entries and not dry_run:
     domain_path = get_domain_path(storage_path, domain.domain_id)
@@ -464,6 +619,139 @@ async def step_embed_source(storage_path: str, domain: DomainConfig, source, sou
   for sse in writer.drain_sse_queue(): yield sse
   writer.set_step_result(result)
 
+# ----------------------------------------- START: Source Scheduling --------------------------------------------------
+
+def get_max_parallel_sources(requested: Optional[int] = None) -> int:
+  """Number of sources crawled at the same time. None or 0 = CRAWLER_MAX_PARALLEL_SOURCES, 1 = sequential."""
+  if not requested: return max(1, CRAWLER_HARDCODED_CONFIG.CRAWLER_MAX_PARALLEL_SOURCES)
+  return max(1, int(requested))
+
+async def crawl_source(storage_path: str, domain: DomainConfig, source, source_type: str, mode: str, dry_run: bool, retry_batches: int, skip_embedding: bool, writer: StreamingJobWriter, logger: MiddlewareLogger, crawler_config: dict, openai_client, job_id: str = None) -> AsyncGenerator[str, None]:
+  """Download, integrity check, process and embed one source. Result (DownloadResult, EmbedResult or None) stored in writer.get_step_result()."""
+  if crawler_config.get('streaming') and source_type == "file_sources" and not dry_run and not skip_embedding:
+    async for sse in crawl_source_streaming(storage_path, domain, source, source_type, mode, dry_run, retry_batches, writer, logger, crawler_config, openai_client, job_id):
+      yield sse
+    return
+  async for sse in step_download_source(storage_path, domain, source, source_type, mode, dry_run, retry_batches, writer, logger, crawler_config, job_id):
+    yield sse
+  download_result = writer.get_step_result()
+  async for sse in step_integrity_check(storage_path, domain.domain_id, source, source_type, dry_run, writer, logger, crawler_config, job_id):
+    yield sse
+  if source_type in ("list_sources", "sitepage_sources"):
+    async for sse in step_process_source(storage_path, domain.domain_id, source, source_type, dry_run, writer, logger, job_id):
+      yield sse
+  embed_result = None
+  if not skip_embedding:
+    async for sse in step_embed_source(storage_path, domain, source, source_type, mode, dry_run, retry_batches, writer, logger, openai_client, job_id):
+      yield sse
+    embed_result = writer.get_step_result()
+  writer.set_step_result((download_result, embed_result))
+
+async def crawl_source_streaming(storage_path: str, domain: DomainConfig, source, source_type: str, mode: str, dry_run: bool, retry_batches: int, writer: StreamingJobWriter, logger: MiddlewareLogger, crawler_config: dict, openai_client, job_id: str = None) -> AsyncGenerator[str, None]:
+  """
+  Streaming variant of crawl_source() for file_sources: each downloaded file is queued for embedding right away,
+  so uploads to OpenAI overlap with the remaining SharePoint downloads.
+  step_embed_source() runs at the end with the streamed outcomes and writes vectorstore_map.csv and files_metadata.json
+  the same way as the non-streaming path (unchanged files, order, counters).
+  Cancel reaches both the download and the embedding stage; every streamed file is recorded in vectorstore_map.csv.
+  Result (DownloadResult, EmbedResult) stored in writer.get_step_result().
+  """
+  source_id = source.source_id
+  # Download and embed stage both check control: the SourceStepWriter view hands a cancel to both
+  source_writer = writer if isinstance(writer, SourceStepWriter) else SourceStepWriter(writer)
+  source_folder = get_source_folder_path(storage_path, domain.domain_id, source_type, source_id)
+  vs_map_path = os.path.join(source_folder, CRAWLER_HARDCODED_CONFIG.VECTOR_STORE_MAP_CSV)
+  map_store = _open_map_store(source_folder, logger)
+  existing_vs_items = read_vectorstore_map(vs_map_path, map_store) if mode == "incremental" and map_file_exists(vs_map_path, map_store) else []
+  vs_by_uid = {item.sharepoint_unique_file_id: item for item in existing_vs_items}
+  embed_queue: asyncio.Queue = asyncio.Queue()
+  sse_queue: asyncio.Queue = asyncio.Queue()
+  files_items_by_index, streamed_outcomes = {}, {}
+
+  def on_file_downloaded(files_item: FilesMapRow) -> None:
+    existing_vs = vs_by_uid.get(files_item.sharepoint_unique_file_id)
+    if existing_vs and not is_file_changed_for_embed(files_item, existing_vs): return
+    index = len(files_items_by_index)
+    files_items_by_index[index] = files_item
+    file_path = os.path.join(storage_path, CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_PATH_CRAWLER_SUBFOLDER, files_item.file_relative_path)
+    embed_queue.put_nowait(EmbedTask(index=index, filepath=file_path, replaces_file_id=existing_vs.openai_file_id if existing_vs else ""))
+
+  async def queued_tasks():
+    while True:
+      task = await embed_queue.get()
+      if task is None: return
+      yield task
+
+  async def run_download() -> None:
+    try:
+      async for sse in step_download_source(storage_path, domain, source, source_type, mode, dry_run, retry_batches, source_writer, logger, crawler_config, job_id, on_file_downloaded=on_file_downloaded):
+        sse_queue.put_nowait(sse)
+    finally:
+      embed_queue.put_nowait(None)
+
+  async def run_embed() -> None:
+    pipeline = EmbeddingPipeline(openai_client, domain.vector_store_id, logger=logger)
+    async for outcome in pipeline.run(queued_tasks(), source_writer):
+      files_item = files_items_by_index[outcome.task.index]
+      streamed_outcomes[files_item.sharepoint_unique_file_id] = outcome
+      if outcome.error: logger.log_function_output(f"  Embedding '{files_item.filename}' failed: {outcome.error}")
+      else: logger.log_function_output(f"  Embedded '{files_item.filename}'.")
+      for sse in source_writer.drain_sse_queue(): sse_queue.put_nowait(sse)
+
+  logger.log_function_output(f"Streaming crawl for source '{source_id}': embedding files as they are downloaded")
+  for sse in source_writer.drain_sse_queue(): yield sse
+  async for sse in _yield_sse_until_done(sse_queue, [asyncio.ensure_future(run_download()), asyncio.ensure_future(run_embed())]):
+    yield sse
+  download_result = source_writer.get_step_result()
+  async for sse in step_integrity_check(storage_path, domain.domain_id, source, source_type, dry_run, source_writer, logger, crawler_config, job_id):
+    yield sse
+  async for sse in step_embed_source(storage_path, domain, source, source_type, mode, dry_run, retry_batches, source_writer, logger, openai_client, job_id, streamed_outcomes=streamed_outcomes):
+    yield sse
+  embed_result = source_writer.get_step_result()
+  writer.set_step_result((download_result, embed_result))
+
+async def crawl_sources_concurrently(sources: list, max_parallel_sources: int, storage_path: str, domain: DomainConfig, mode: str, dry_run: bool, retry_batches: int, skip_embedding: bool, writer: StreamingJobWriter, logger: MiddlewareLogger, crawler_config: dict, openai_client, job_id: str = None) -> AsyncGenerator[str, None]:
+  """
+  Run crawl_source() for up to max_parallel_sources sources at the same time and interleave their SSE output.
+  Each source logs with a '[source_id] ' prefix and stores its step results in its own SourceStepWriter.
+  Pause/cancel applies to all sources; after cancel no further sources are started.
+  Result: list of (DownloadResult, EmbedResult or None) in source order, stored in writer.get_step_result().
+  Sources that were not started because of cancel are left out.
+  """
+  sse_queue: asyncio.Queue = asyncio.Queue()
+  slots = asyncio.Semaphore(max_parallel_sources)
+  results: list = [None] * len(sources)
+
+  async def run_source(index: int, source_type: str, source) -> None:
+    async with slots:
+      if writer.source_cancel_received: return
+      source_writer = SourceStepWriter(writer)
+      source_logger = logger.create_prefixed(f"[{source.source_id}] ", stream_job_writer=source_writer)
+      async for sse in crawl_source(storage_path, domain, source, source_type, mode, dry_run, retry_batches, skip_embedding, source_writer, source_logger, crawler_config, openai_client, job_id):
+        sse_queue.put_nowait(sse)
+      results[index] = source_writer.get_step_result()
+
+  runners = [asyncio.ensure_future(run_source(i, source_type, source)) for i, (source_type, source) in enumerate(sources)]
+  async for sse in _yield_sse_until_done(sse_queue, runners): yield sse
+  for sse in writer.drain_sse_queue(): yield sse
+  writer.set_step_result([result for result in results if result is not None])
+
+async def _yield_sse_until_done(sse_queue: asyncio.Queue, runners: list) -> AsyncGenerator[str, None]:
+  """Yield SSE events from sse_queue until all runner tasks finished. Re-raises the first runner exception, cancels the rest on exit."""
+  all_done = asyncio.ensure_future(asyncio.gather(*runners))
+  try:
+    while not all_done.done() or not sse_queue.empty():
+      get_next = asyncio.ensure_future(sse_queue.get())
+      await asyncio.wait([get_next, all_done], return_when=asyncio.FIRST_COMPLETED)
+      if get_next.done(): yield get_next.result()
+      else: get_next.cancel()
+    all_done.result()
+  finally:
+    for runner in runners:
+      if not runner.done(): runner.cancel()
+
+# ----------------------------------------- END: Source Scheduling ----------------------------------------------------
+
 # FIX-04: Convert to async generator for real-time SSE streaming
 async def crawl_domain(storage_path: str, domain: DomainConfig, mode: str, scope: str, source_id: Optional[str], dry_run: bool, retry_batches: int, writer: StreamingJobWriter, logger: MiddlewareLogger, crawler_config: dict, openai_client) -> AsyncGenerator[str, None]:
   sources = get_sources_for_scope(domain, scope, source_id)
@@ -519,20 +807,23 @@ async def crawl_domain(storage_path: str, domain: DomainConfig, mode: str, scope
   logger.log_function_output(f"Crawling {len(sources)} source(s)")
   for sse in writer.drain_sse_queue(): yield sse  # FIX-04: Drain after initial logs
   job_id = writer.job_id if dry_run else None
+  max_parallel_sources = get_max_parallel_sources(crawler_config.get('max_parallel_sources'))
   download_results, embed_results = [], []
-  for source_type, source in sources:
-    async for sse in step_download_source(storage_path, domain, source, source_type, mode, dry_run, retry_batches, writer, logger, crawler_config, job_id):
-      yield sse
-    download_results.append(writer.get_step_result())
-    async for sse in step_integrity_check(storage_path, domain.domain_id, source, source_type, dry_run, writer, logger, crawler_config, job_id):
-      yield sse
-    if source_type in ("list_sources", "sitepage_sources"):
-      async for sse in step_process_source(storage_path, domain.domain_id, source, source_type, dry_run, writer, logger, job_id):
+  if max_parallel_sources <= 1 or len(sources) <= 1:
+    for source_type, source in sources:
+      async for sse in crawl_source(storage_path, domain, source, source_type, mode, dry_run, retry_batches, skip_embedding, writer, logger, crawler_config, openai_client, job_id):
         yield sse
-    if not skip_embedding:
-      async for sse in step_embed_source(storage_path, domain, source, source_type, mode, dry_run, retry_batches, writer, logger, openai_client, job_id):
-        yield sse
-      embed_results.append(writer.get_step_result())
+      download_result, embed_result = writer.get_step_result()
+      download_results.append(download_result)
+      if embed_result is not None: embed_results.append(embed_result)
+  else:
+    logger.log_function_output(f"Running up to {max_parallel_sources} sources in parallel")
+    for sse in writer.drain_sse_queue(): yield sse
+    async for sse in crawl_sources_concurrently(sources, max_parallel_sources, storage_path, domain, mode, dry_run, retry_batches, skip_embedding, writer, logger, crawler_config, openai_client, job_id):
+      yield sse
+    for download_result, embed_result in writer.get_step_result():
+      download_results.append(download_result)
+      if embed_result is not None: embed_results.append(embed_result)
   total_downloaded = sum(r.downloaded for r in download_results)
   total_embedded = sum(r.embedded for r in embed_results)
   total_errors = sum(r.errors for r in download_results) + sum(r.failed for r in embed_results)
@@ -553,6 +844,14 @@ def create_crawl_report(storage_path: str, domain_id: str, mode: str, scope: str
   crawler_folder = os.path.join(storage_path, CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_PATH_CRAWLER_SUBFOLDER, domain_id)
   map_file_names = [CRAWLER_HARDCODED_CONFIG.SHAREPOINT_MAP_CSV, CRAWLER_HARDCODED_CONFIG.FILE_MAP_CSV, CRAWLER_HARDCODED_CONFIG.VECTOR_STORE_MAP_CSV]
   
+  # Map store (sqlite backend): CSV files are exported on demand. Fails before the zip is written, so a report never holds outdated map files.
+  if os.path.exists(crawler_folder):
+    for source_type in os.listdir(crawler_folder):
+      source_type_path = os.path.join(crawler_folder, source_type)
+      if not os.path.isdir(source_type_path): continue
+      for source_id in os.listdir(source_type_path):
+        if os.path.isdir(os.path.join(source_type_path, source_id)): export_outdated_map_csvs(os.path.join(source_type_path, source_id))
+  
   # Collect files with metadata per V2RP-IG-02
   files_list = []
   
@@ -624,7 +923,7 @@ async def crawler_root(request: Request):
     ]
     description = (
       "SharePoint crawl operations. "
-      "Params: domain_id (required), mode=full|incremental, scope=all|files|lists|sitepages, source_id, dry_run, retry_batches. "
+      "Params: domain_id (required), mode=full|incremental, scope=all|files|lists|sitepages, source_id, dry_run, retry_batches, max_parallel_downloads, max_parallel_sources, streaming. "
       "Modes: full=re-crawl everything, incremental=only process changes. "
       "Scopes: all=all source types, files=file_sources, lists=list_sources, sitepages=sitepage_sources."
     )
@@ -669,17 +968,28 @@ Query params:
 - source_id: Process only a single source within the scope
 - dry_run: false (default) | true
 - retry_batches: 2 (default) - number of retry batches for failed items
-- format: stream (required for this endpoint)
+- max_parallel_downloads: 4 (default) - parallel file downloads per source (capped at CRAWLER_MAX_PARALLEL_DOWNLOADS_PER_DOMAIN)
+- max_parallel_sources: 4 (default) - sources crawled at the same time, log lines are prefixed with [source_id] (1 = sequential)
+- streaming: false (default) | true - file_sources only: embed each file as soon as it is downloaded
+- priority: 0 (default) - queue order if the crawler job limit is reached, higher first
+- background: false (default) | true - return the job_id as JSON immediately, follow the job via monitor_url
+- format: stream (required for this endpoint unless background=true)
 
 Notes:
 - mode=full: re-crawl everything, delete existing local files first
 - mode=incremental: only process changes since last crawl (uses map file comparison)
 - Creates crawl report after completion (not created for dry_run or cancelled jobs)
+- The crawl runs as background job: it continues if the client disconnects. If JOB_RUNNER_MAX_CONCURRENT_JOBS crawler
+  jobs are running, the job is queued (state 'paused' until started, can be cancelled)
 
 Examples:
 - GET /v2/crawler/crawl?domain_id=MyDomain&format=stream
 - GET /v2/crawler/crawl?domain_id=MyDomain&mode=incremental&format=stream
 - GET /v2/crawler/crawl?domain_id=MyDomain&scope=files&source_id=docs_main&format=stream
+- GET /v2/crawler/crawl?domain_id=MyDomain&mode=incremental&background=true&priority=10
+
+Return (background=true):
+  {"ok": true, "error": "", "data": {"job_id": "jb_001", "state": "running", "queue_position": null, "monitor_url": "/v2/jobs/monitor?job_id=jb_001&format=stream"}}
 
 Return (SSE stream):
   event: start_json
@@ -737,19 +1047,39 @@ Return (SSE stream):
   format_param = params.get("format", "json")
   dry_run = params.get("dry_run", "false").lower() == "true"
   retry_batches = int(params.get("retry_batches", "2"))
-  if format_param == "stream":
-    openai_client = getattr(request.app.state, 'openai_client', None)
-    return StreamingResponse(stream_with_flush(_crawl_stream(get_persistent_storage_path(request), domain, mode, scope, source_id, dry_run, retry_batches, logger, openai_client, get_crawler_config(request))), media_type="text/event-stream")
+  background = params.get("background", "false").lower() == "true"
+  for name in ("max_parallel_downloads", "max_parallel_sources"):
+    if params.get(name) and not params[name].isdigit():
+      logger.log_function_footer()
+      return json_result(False, f"Invalid value '{params[name]}' for '{name}' param. Use a positive number.", {})
+  priority = params.get("priority", "0")
+  if not priority.removeprefix("-").isdigit():
+    logger.log_function_footer()
+    return json_result(False, f"Invalid value '{priority}' for 'priority' param. Use a whole number.", {})
+  if format_param == "stream" or background:
+    job_params = {"domain_id": domain.domain_id, "mode": mode, "scope": scope, "source_id": source_id, "dry_run": dry_run, "retry_batches": retry_batches, "max_parallel_downloads": int(params.get("max_parallel_downloads") or "0"), "max_parallel_sources": int(params.get("max_parallel_sources") or "0"), "streaming": params.get("streaming", "false").lower() == "true"}
+    source_url = f"{router_prefix}/{router_name}/crawl?domain_id={domain.domain_id}&mode={mode}&scope={scope}&dry_run={dry_run}"
+    runner = get_job_runner(get_persistent_storage_path(request), request.app.state)
+    writer = runner.submit("crawler.crawl", job_params, domain.domain_id, source_url, router_prefix, priority=int(priority))
+    if background:
+      logger.log_function_footer()
+      return json_result(True, "", {"job_id": writer.job_id, "state": "running" if runner.get_queue_position(writer.job_id) is None else "queued", "queue_position": runner.get_queue_position(writer.job_id), "monitor_url": writer.monitor_url})
+    return StreamingResponse(stream_with_flush(follow_job_log(writer.job_file_path)), media_type="text/event-stream")
   logger.log_function_footer()
-  return json_result(False, "Use format=stream for crawl operations.", {})
+  return json_result(False, "Use format=stream or background=true for crawl operations.", {})
 
 # FIX-04: Updated to iterate over crawl_domain generator for real-time streaming
-async def _crawl_stream(storage_path: str, domain: DomainConfig, mode: str, scope: str, source_id: Optional[str], dry_run: bool, retry_batches: int, logger: MiddlewareLogger, openai_client, crawler_cfg: dict):
-  writer = StreamingJobWriter(persistent_storage_path=storage_path, router_name=router_name, action="crawl", object_id=domain.domain_id, source_url=f"{router_prefix}/{router_name}/crawl?domain_id={domain.domain_id}&mode={mode}&scope={scope}&dry_run={dry_run}", router_prefix=router_prefix)
-  logger.stream_job_writer = writer
+async def _crawl_job(writer: StreamingJobWriter, params: dict, context: JobContext):
+  """Job function 'crawler.crawl' of the job runner. params: see crawler_crawl."""
+  storage_path = context.storage_path
+  logger = MiddlewareLogger.create(stream_job_writer=writer)
+  domain_id, mode, scope, source_id, dry_run, retry_batches = params["domain_id"], params["mode"], params["scope"], params.get("source_id"), params["dry_run"], params["retry_batches"]
+  crawler_cfg = {**_get_crawler_config(storage_path), "max_parallel_downloads": params.get("max_parallel_downloads", 0), "max_parallel_sources": params.get("max_parallel_sources", 0), "streaming": params.get("streaming", False)}
+  openai_client = getattr(context.app_state, 'openai_client', None)
   started_utc, _ = _get_utc_now()
+  domain = None
   try:
-    yield writer.emit_start()
+    domain = load_domain(storage_path, domain_id, logger)
     logger.log_function_output(f"Starting crawl for domain '{domain.domain_id}'")
     # FIX-04: Iterate over async generator for real-time SSE streaming
     async for sse in crawl_domain(storage_path, domain, mode, scope, source_id, dry_run, retry_batches, writer, logger, crawler_cfg, openai_client):
@@ -757,8 +1087,12 @@ async def _crawl_stream(storage_path: str, domain: DomainConfig, mode: str, scop
     results = writer.get_crawl_results()  # FIX-04: Retrieve results from writer
     finished_utc, _ = _get_utc_now()
     if not dry_run:
-      report_id = create_crawl_report(storage_path, domain.domain_id, mode, scope, results, started_utc, finished_utc)
-      results["data"]["report_id"] = report_id
+      try:
+        report_id = await run_cpu_bound(create_crawl_report, storage_path, domain.domain_id, mode, scope, results, started_utc, finished_utc)
+        results["data"]["report_id"] = report_id
+      except Exception as e:
+        yield logger.log_function_output(f"ERROR: Failed to create crawl report -> {str(e)}")
+        results["ok"], results["error"] = False, "; ".join(filter(None, [results.get("error", ""), f"Crawl report failed: {str(e)}"]))
     total_embedded = results.get('data', {}).get('total_embedded', 0)
     yield logger.log_function_output(f"{total_embedded} file{'' if total_embedded == 1 else 's'} embedded.")
     yield writer.emit_end(ok=results.get("ok", False), error=results.get("error", ""), data=results.get("data", {}))
@@ -766,11 +1100,13 @@ async def _crawl_stream(storage_path: str, domain: DomainConfig, mode: str, scop
     yield logger.log_function_output(f"ERROR: Crawl failed -> {str(e)}")
     yield writer.emit_end(ok=False, error=str(e), data={})
   finally:
-    if dry_run:
+    if dry_run and domain is not None:
       for source_type, source in get_sources_for_scope(domain, scope, source_id):
         cleanup_temp_map_files(get_source_folder_path(storage_path, domain.domain_id, source_type, source.source_id), writer.job_id)
     writer.finalize()
 
+register_job_type("crawler.crawl", router_name, "crawl", _crawl_job)
+
 @router.get(f"/{router_name}/download_data")
 async def crawler_download_data(request: Request):
   """Download step only. Params: domain_id (required), mode, scope, source_id, format, dry_run, retry_batches"""
@@ -789,10 +1125,11 @@ Query params:
 - source_id: Download only a single source within the scope
 - dry_run: false (default) | true
 - retry_batches: 2 (default) - number of retry batches for failed downloads
+- max_parallel_downloads: 4 (default) - parallel file downloads per source (capped at CRAWLER_MAX_PARALLEL_DOWNLOADS_PER_DOMAIN)
 - format: stream (required for this endpoint)
 
 Notes:
-- mode=incremental: only download added/changed files (compares sharepoint_map.csv)
+- mode=incremental: only download added/changed files (compares sharepoint_map.csv; file sources read only the SharePoint change log since the change token in sharepoint_change_token.json)
 - dry_run=true: creates temp map files, no actual downloads
 - Updates: sharepoint_map.csv, files_map.csv
 
@@ -848,8 +1185,14 @@ Return (SSE stream):
     return JSONResponse({"ok": False, "error": f"Invalid value '{scope}' for 'scope' param. Valid: {VALID_SCOPES}", "data": {}}, status_code=400)
   format_param, dry_run = params.get("format", "json"), params.get("dry_run", "false").lower() == "true"
   retry_batches = int(params.get("retry_batches", "2"))
+  crawler_cfg = get_crawler_config(request)
+  max_parallel_downloads = params.get("max_parallel_downloads") or "0"
+  if not max_parallel_downloads.isdigit():
+    logger.log_function_footer()
+    return json_result(False, f"Invalid value '{max_parallel_downloads}' for 'max_parallel_downloads' param. Use a positive number.", {})
+  crawler_cfg["max_parallel_downloads"] = int(max_parallel_downloads)
   if format_param == "stream":
-    return StreamingResponse(stream_with_flush(_download_stream(get_persistent_storage_path(request), domain, mode, scope, source_id, dry_run, retry_batches, logger, get_crawler_config(request))), media_type="text/event-stream")
+    return StreamingResponse(stream_with_flush(_download_stream(get_persistent_storage_path(request), domain, mode, scope, source_id, dry_run, retry_batches, logger, crawler_cfg)), media_type="text/event-stream")
   logger.log_function_footer()
   return json_result(False, "Use format=stream.", {})
 
@@ -1200,6 +1543,11 @@ def _selftest_verify_snapshot(storage_path: str, domain_id: str, expected: dict)
   for source_path, expected_vals in expected.items():
     files_map_path = os.path.join(domain_path, source_path, CRAWLER_HARDCODED_CONFIG.FILE_MAP_CSV)
     expected_rows = expected_vals.get("files_map_rows", 0)
+    # Map store (sqlite backend): CSV files are exported on demand
+    try: export_outdated_map_csvs(os.path.dirname(files_map_path))
+    except Exception as e:
+      failures.append(f"{source_path}: map CSV export failed -> {str(e)}")
+      continue
     if not os.path.exists(files_map_path):
       if expected_rows > 0: failures.append(f"{source_path}: files_map.csv missing, expected {expected_rows} rows")
       continue
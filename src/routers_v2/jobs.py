@@ -10,7 +10,9 @@ from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Str
 
 from routers_v2.common_ui_functions_v2 import generate_router_docs_page, generate_endpoint_docs, json_result, html_result, generate_html_head, generate_toast_container, generate_modal_structure, generate_console_panel, generate_core_js, generate_console_js, generate_form_js, generate_endpoint_caller_js
 from routers_v2.common_logging_functions_v2 import MiddlewareLogger, UNKNOWN
-from routers_v2.common_job_functions_v2 import list_jobs, find_job_by_id, find_job_file, read_job_log, read_job_result, create_control_file, delete_job, force_cancel_job, JobMetadata, StreamingJobWriter, ControlAction, stream_with_flush
+from routers_v2.common_job_functions_v2 import list_jobs, find_job_by_id, find_job_file, read_job_log, read_job_last_log, read_job_result, create_control_file, delete_job, force_cancel_job, rebuild_job_catalog, JobMetadata, StreamingJobWriter, ControlAction, stream_with_flush
+from routers_v2.common_job_monitor_functions_v2 import follow_job_log
+from routers_v2.common_job_retention_functions_v2 import apply_job_retention, get_job_retention_metrics
 
 router = APIRouter()
 config = None
@@ -45,16 +47,6 @@ def _job_to_dict(job: JobMetadata) -> dict:
   """Convert JobMetadata dataclass to dict for JSON serialization."""
   return asdict(job)
 
-def _extract_last_log_line(log_content: str) -> str:
-  """Extract the last log line data from SSE log content."""
-  if not log_content:
-    return ""
-  lines = log_content.strip().split('\n')
-  for line in reversed(lines):
-    if line.startswith('data: '):
-      return line[6:]
-  return ""
-
 
 # ----------------------------------------- START: Router-specific JS ------------------------------------------------------
 
@@ -361,6 +353,8 @@ async def jobs_root(request: Request):
       {"path": "/control", "desc": "Pause/Resume/Cancel job", "formats": ["json"]},
       {"path": "/results", "desc": "Get job result", "formats": ["json", "html"]},
       {"path": "/delete", "desc": "Delete job file (DELETE/GET)", "formats": []},
+      {"path": "/rebuild_catalog", "desc": "Rebuild job catalog from job files", "formats": ["json"]},
+      {"path": "/retention", "desc": "Job retention metrics, apply retention now (run=true)", "formats": ["json"]},
       {"path": "/selftest", "desc": "Self-test", "formats": ["stream"]}
     ]
     return HTMLResponse(generate_router_docs_page(
@@ -374,8 +368,14 @@ async def jobs_root(request: Request):
   format_param = request_params.get("format", "json")
   router_filter = request_params.get("router", None)
   state_filter = request_params.get("state", None)
+  try:
+    offset = int(request_params.get("offset", 0))
+    limit = int(request_params["limit"]) if request_params.get("limit") else None
+  except ValueError:
+    logger.log_function_footer()
+    return json_result(False, "Parameters 'offset' and 'limit' must be integers.", {})
   
-  jobs = list_jobs(get_persistent_storage_path(request), router_filter, state_filter)
+  jobs = list_jobs(get_persistent_storage_path(request), router_filter, state_filter, offset, limit)
   jobs_data = [_job_to_dict(job) for job in jobs]
   
   if format_param == "json":
@@ -562,47 +562,24 @@ async def jobs_monitor(request: Request):
     if format_param == "html": return html_result("Not Found", {"error": f"Job '{job_id}' does not exist."}, f'<a href="{router_prefix}/{router_name}">Back</a> | {main_page_nav_html.replace("{router_prefix}", router_prefix)}')
     return JSONResponse({"ok": False, "error": f"Job '{job_id}' does not exist.", "data": {}}, status_code=404)
   
-  log_content = read_job_log(get_persistent_storage_path(request), job_id)
-  
   if format_param == "stream":
     logger.log_function_footer()
-    async def stream_log():
-      # Yield existing content
-      last_len = 0
-      if log_content:
-        yield log_content
-        last_len = len(log_content)
-      
-      # For running/paused jobs, poll for new content
-      while True:
-        current_job = find_job_by_id(get_persistent_storage_path(request), job_id)
-        if current_job is None or current_job.state in ["completed", "cancelled"]:
-          # Job finished - yield any remaining content and exit
-          final_content = read_job_log(get_persistent_storage_path(request), job_id) or ""
-          if len(final_content) > last_len:
-            yield final_content[last_len:]
-          break
-        
-        # Check for new content
-        current_content = read_job_log(get_persistent_storage_path(request), job_id) or ""
-        if len(current_content) > last_len:
-          yield current_content[last_len:]
-          last_len = len(current_content)
-        
-        await asyncio.sleep(0.5)
-    
-    return StreamingResponse(stream_with_flush(stream_log()), media_type="text/event-stream")
+    job_file_path = find_job_file(get_persistent_storage_path(request), job_id)
+    if job_file_path is None: return JSONResponse({"ok": False, "error": f"Job '{job_id}' does not exist.", "data": {}}, status_code=404)
+    # Existing content, then appended content until the job is completed/cancelled (one shared reader per job)
+    return StreamingResponse(stream_with_flush(follow_job_log(job_file_path)), media_type="text/event-stream")
+  
+  # Finished jobs: last log line from the job catalog summary (job file may be compressed)
+  last_log = read_job_last_log(get_persistent_storage_path(request), job_id)
   
   if format_param == "json":
     job_data = _job_to_dict(job)
-    last_log = _extract_last_log_line(log_content) if log_content else ""
     job_data["log"] = last_log
     logger.log_function_footer()
     return json_result(True, "", job_data)
   
   if format_param == "html":
     job_data = _job_to_dict(job)
-    last_log = _extract_last_log_line(log_content) if log_content else ""
     job_data["log"] = last_log
     logger.log_function_footer()
     return html_result(f"Monitor: {job_id}", job_data, f'<a href="{router_prefix}/{router_name}?format=ui">Back</a> | {main_page_nav_html.replace("{router_prefix}", router_prefix)}')
@@ -773,6 +750,86 @@ async def jobs_results(request: Request):
 # ----------------------------------------- END: Results endpoint ----------------------------------------------------------
 
 
+# ----------------------------------------- START: Rebuild catalog endpoint ------------------------------------------------
+
+@router.get(f"/{router_name}/rebuild_catalog")
+async def jobs_rebuild_catalog(request: Request):
+  """
+  Rebuild the job catalog by re-reading all job files.
+  
+  The catalog is kept up to date automatically. Use this after restoring or editing job files by hand.
+  
+  Parameters:
+  - format: Response format - json (default)
+  
+  Examples:
+  {router_prefix}/{router_name}/rebuild_catalog?format=json
+  
+  Example Response:
+  {"ok": true, "error": "", "data": {"jobs": 1234, "changes": 2}}
+  """
+  logger = MiddlewareLogger.create()
+  logger.log_function_header("jobs_rebuild_catalog")
+  
+  if len(request.query_params) == 0:
+    logger.log_function_footer()
+    doc = textwrap.dedent(jobs_rebuild_catalog.__doc__).replace("{router_prefix}", router_prefix).replace("{router_name}", router_name)
+    return PlainTextResponse(generate_endpoint_docs(doc, router_prefix), media_type="text/plain; charset=utf-8")
+  
+  try:
+    result = await asyncio.to_thread(rebuild_job_catalog, get_persistent_storage_path(request))
+  except Exception as e:
+    logger.log_function_footer()
+    return json_result(False, f"Rebuild failed -> {type(e).__name__}: {str(e)}", {})
+  
+  logger.log_function_footer()
+  return json_result(True, "", result)
+
+# ----------------------------------------- END: Rebuild catalog endpoint --------------------------------------------------
+
+
+# ----------------------------------------- START: Retention endpoint ------------------------------------------------------
+
+@router.get(f"/{router_name}/retention")
+async def jobs_retention(request: Request):
+  """
+  Job retention settings and metrics, or apply job retention now.
+  
+  Retention runs automatically every JOB_RETENTION_INTERVAL_MINUTES: deletes completed and cancelled jobs beyond the
+  max age, max jobs per router and max total size, and gzip-compresses the job files of the remaining finished jobs.
+  
+  Parameters:
+  - run: true = apply job retention now and return the result of this run (default: false)
+  - format: Response format - json (default)
+  
+  Examples:
+  {router_prefix}/{router_name}/retention?format=json
+  {router_prefix}/{router_name}/retention?run=true
+  
+  Example Response (run=true):
+  {"ok": true, "error": "", "data": {"jobs_deleted": 12, "jobs_compressed": 40, "bytes_before": 73400320, "bytes_after": 9437184, "bytes_reclaimed": 63963136, ...}}
+  """
+  logger = MiddlewareLogger.create()
+  logger.log_function_header("jobs_retention")
+  
+  if len(request.query_params) == 0:
+    logger.log_function_footer()
+    doc = textwrap.dedent(jobs_retention.__doc__).replace("{router_prefix}", router_prefix).replace("{router_name}", router_name)
+    return PlainTextResponse(generate_endpoint_docs(doc, router_prefix), media_type="text/plain; charset=utf-8")
+  
+  run = str(request.query_params.get("run", "false")).lower() == "true"
+  try:
+    result = await asyncio.to_thread(apply_job_retention if run else get_job_retention_metrics, get_persistent_storage_path(request))
+  except Exception as e:
+    logger.log_function_footer()
+    return json_result(False, f"Job retention failed -> {type(e).__name__}: {str(e)}", {})
+  
+  logger.log_function_footer()
+  return json_result(True, "", result)
+
+# ----------------------------------------- END: Retention endpoint --------------------------------------------------------
+
+
 # ----------------------------------------- START: D(j) - Delete -----------------------------------------------------------
 
 @router.get(f"/{router_name}/delete")
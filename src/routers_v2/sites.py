@@ -11,6 +11,8 @@ from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Str
 from routers_v2.common_ui_functions_v2 import generate_ui_page, generate_router_docs_page, generate_endpoint_docs, json_result, html_result
 from routers_v2.common_logging_functions_v2 import MiddlewareLogger, UNKNOWN
 from routers_v2.common_job_functions_v2 import StreamingJobWriter, stream_with_flush
+from routers_v2.common_job_monitor_functions_v2 import follow_job_log
+from routers_v2.common_job_runner_functions_v2 import JobContext, get_job_runner, register_job_type
 from hardcoded_config import CRAWLER_HARDCODED_CONFIG
 
 router = APIRouter()
@@ -1213,15 +1215,21 @@ async def sites_security_scan(request: Request):
   Run security scan on a SharePoint site.
   
   Parameters:
-  - site_id: ID of the site to scan (required)
+  - site_id: ID of the site to scan (required). Several sites: comma-separated IDs, or * for all sites
   - scope: Scan scope - all (default), site, lists, items
   - include_subsites: Include subsites in scan (default: false)
+  - max_parallel: Sites and subsites scanned at the same time (default: SECURITY_SCAN_MAX_PARALLEL_WEBS, 1 = sequential)
   - delete_caches: Delete Entra ID group caches before scan (default: false)
-  - format: Response format - stream (required for scan)
+  - priority: Queue order if the sites job limit is reached, higher first (default: 0)
+  - background: Return the job_id as JSON immediately, follow the job via monitor_url (default: false)
+  - format: Response format - stream (required for scan unless background=true)
   
   Output:
   - SSE stream with progress, log, and end_json events
-  - Creates report archive in reports/site_scans/
+  - background=true: {"job_id", "state" (running | queued), "queue_position", "monitor_url"}
+  - Creates report archive in reports/site_scans/ (one per site)
+  - The scan runs as background job and continues if the client disconnects
+  - Several sites run in one job, log lines are prefixed with [site_id]
   """
   logger = MiddlewareLogger.create()
   logger.log_function_header("sites_security_scan")
@@ -1238,10 +1246,11 @@ async def sites_security_scan(request: Request):
   include_subsites = request_params.get("include_subsites", "false").lower() == "true"
   delete_caches = request_params.get("delete_caches", "false").lower() == "true"
   format_param = request_params.get("format", "")
+  background = request_params.get("background", "false").lower() == "true"
   
-  if format_param != "stream":
+  if format_param != "stream" and not background:
     logger.log_function_footer()
-    return json_result(False, "Security scan only supports format=stream", {})
+    return json_result(False, "Security scan only supports format=stream or background=true", {})
   
   if not site_id:
     logger.log_function_footer()
@@ -1256,104 +1265,196 @@ async def sites_security_scan(request: Request):
     logger.log_function_footer()
     return json_result(False, "PERSISTENT_STORAGE_PATH not configured", {})
   
-  # Load site to get URL
+  # Load sites to check they exist (URLs are loaded again when the job starts)
   try:
-    site = load_site(storage_path, site_id, logger)
-  except FileNotFoundError:
+    get_security_scan_site_ids(storage_path, site_id, logger)
+  except FileNotFoundError as e:
     logger.log_function_footer()
-    return JSONResponse({"ok": False, "error": f"Site '{site_id}' not found", "data": {}}, status_code=404)
+    return JSONResponse({"ok": False, "error": str(e), "data": {}}, status_code=404)
   except Exception as e:
     logger.log_function_footer()
     return json_result(False, str(e), {})
   
+  max_parallel = request_params.get("max_parallel", "")
+  if max_parallel and not max_parallel.isdigit():
+    logger.log_function_footer()
+    return json_result(False, f"Invalid max_parallel '{max_parallel}'. Use a positive number", {})
+  priority = request_params.get("priority", "0")
+  if not priority.removeprefix("-").isdigit():
+    logger.log_function_footer()
+    return json_result(False, f"Invalid priority '{priority}'. Use a whole number", {})
+  
   # Get credentials from config (matches .env variable names and crawler.py pattern)
   client_id = getattr(config, 'CRAWLER_CLIENT_ID', None) or os.environ.get('CRAWLER_CLIENT_ID', '')
   tenant_id = getattr(config, 'CRAWLER_TENANT_ID', None) or os.environ.get('CRAWLER_TENANT_ID', '')
   cert_filename = getattr(config, 'CRAWLER_CLIENT_CERTIFICATE_PFX_FILE', None) or os.environ.get('CRAWLER_CLIENT_CERTIFICATE_PFX_FILE', '')
-  cert_path = os.path.join(storage_path, cert_filename) if cert_filename else ''
-  cert_password = getattr(config, 'CRAWLER_CLIENT_CERTIFICATE_PASSWORD', None) or os.environ.get('CRAWLER_CLIENT_CERTIFICATE_PASSWORD', '')
   
   if not all([client_id, tenant_id, cert_filename]):
     logger.log_function_footer()
     return json_result(False, "Missing SharePoint credentials (CRAWLER_CLIENT_ID, CRAWLER_TENANT_ID, CRAWLER_CLIENT_CERTIFICATE_PFX_FILE)", {})
   
-  writer = StreamingJobWriter(
-    persistent_storage_path=storage_path,
-    router_name=router_name,
-    action="security_scan",
-    object_id=site_id,
-    source_url=str(request.url),
-    router_prefix=router_prefix
-  )
+  runner = get_job_runner(storage_path, request.app.state)
+  job_params = {"site_id": site_id, "scope": scope, "include_subsites": include_subsites, "delete_caches": delete_caches, "max_parallel": int(max_parallel or "0")}
+  writer = runner.submit("sites.security_scan", job_params, site_id, str(request.url), router_prefix, priority=int(priority))
+  if background:
+    logger.log_function_footer()
+    queue_position = runner.get_queue_position(writer.job_id)
+    return json_result(True, "", {"job_id": writer.job_id, "state": "running" if queue_position is None else "queued", "queue_position": queue_position, "monitor_url": writer.monitor_url})
+  return StreamingResponse(stream_with_flush(follow_job_log(writer.job_file_path)), media_type="text/event-stream")
+
+def get_security_scan_site_ids(storage_path: str, site_id_param: str, logger=None) -> list[str]:
+  """Site IDs of the site_id parameter: 'SITE01', 'SITE01,SITE02' or '*' (all sites). Raises FileNotFoundError if a site does not exist."""
+  if site_id_param.strip() == "*":
+    site_ids = [site.site_id for site in load_all_sites(storage_path, logger)]
+    if not site_ids: raise FileNotFoundError("No sites found")
+    return site_ids
+  site_ids = list(dict.fromkeys(site_id.strip() for site_id in site_id_param.split(",") if site_id.strip()))
+  for site_id in site_ids:
+    if not os.path.exists(get_site_json_path(storage_path, site_id)): raise FileNotFoundError(f"Site '{site_id}' not found")
+  return site_ids
+
+def save_security_scan_result(storage_path: str, site: SiteConfig, result: dict, logger=None) -> None:
+  """Store the summary and report of a finished security scan in site.json. result: {"report_path", "stats"}"""
+  stats = result.get("stats", {})
+  parts = [f"{stats.get('groups_found', 0)} groups", f"{stats.get('users_found', 0)} users"]
+  if stats.get('external_users_found', 0) > 0:
+    parts.append(f"{stats.get('external_users_found', 0)} external")
+  if stats.get('subsites_scanned', 0) > 0:
+    parts.append(f"{stats.get('subsites_scanned', 0)} subsites")
+  if stats.get('items_with_individual_permissions', 0) > 0:
+    parts.append(f"{stats.get('items_with_individual_permissions', 0)} individual permissions")
+  if stats.get('items_shared_with_everyone', 0) > 0:
+    parts.append(f"{stats.get('items_shared_with_everyone', 0)} shared with everyone")
+  site.security_scan_result = ", ".join(parts)
+  site.last_security_scan_report_id = result.get("report_path", "")
+  site.last_security_scan_date = datetime.datetime.now(datetime.timezone.utc).isoformat()
+  save_site_to_file(storage_path, site, logger)
+
+async def _security_scan_job(writer: StreamingJobWriter, params: dict, context: JobContext):
+  """Job function 'sites.security_scan' of the job runner. params: site_id (one, comma-separated or *), scope, include_subsites, delete_caches, max_parallel"""
+  from routers_v2.common_security_scan_functions_v2 import get_max_parallel_webs, run_security_scan
+  storage_path = context.storage_path
+  site_id, scope, include_subsites, delete_caches = params["site_id"], params["scope"], params["include_subsites"], params["delete_caches"]
+  if "," in site_id or site_id.strip() == "*":
+    async for event in _multi_site_security_scan_job(writer, params, context): yield event
+    return
   stream_logger = MiddlewareLogger.create(stream_job_writer=writer)
   stream_logger.log_function_header("sites_security_scan")
   
-  from routers_v2.common_security_scan_functions_v2 import run_security_scan
+  # Get credentials from config (matches .env variable names and crawler.py pattern)
+  client_id = getattr(config, 'CRAWLER_CLIENT_ID', None) or os.environ.get('CRAWLER_CLIENT_ID', '')
+  tenant_id = getattr(config, 'CRAWLER_TENANT_ID', None) or os.environ.get('CRAWLER_TENANT_ID', '')
+  cert_filename = getattr(config, 'CRAWLER_CLIENT_CERTIFICATE_PFX_FILE', None) or os.environ.get('CRAWLER_CLIENT_CERTIFICATE_PFX_FILE', '')
+  cert_path = os.path.join(storage_path, cert_filename) if cert_filename else ''
+  cert_password = getattr(config, 'CRAWLER_CLIENT_CERTIFICATE_PASSWORD', None) or os.environ.get('CRAWLER_CLIENT_CERTIFICATE_PASSWORD', '')
   
-  async def run_scan():
-    try:
-      yield writer.emit_start()
-      
-      def log(msg: str):
-        sse = stream_logger.log_function_output(msg)
-        writer.drain_sse_queue()
-        return sse
-      
-      import asyncio
-      
-      yield log(f"Starting security scan for site '{site_id}'...")
-      yield log(f"  Site URL: {site.site_url}")
-      yield log(f"  Scope: {scope}")
-      yield log(f"  Include subsites: {include_subsites}")
-      yield log(f"  Delete caches: {delete_caches}")
-      
-      async for event in run_security_scan(
-        site_url=site.site_url,
-        site_id=site_id,
-        scope=scope,
-        include_subsites=include_subsites,
-        delete_caches=delete_caches,
-        storage_path=storage_path,
-        client_id=client_id,
-        tenant_id=tenant_id,
-        cert_path=cert_path,
-        cert_password=cert_password,
-        writer=writer,
-        logger=stream_logger
-      ):
-        yield event
-      
-      # Get results
-      result = writer._step_result or {}
-      stats = result.get("stats", {})
-      report_path = result.get("report_path", "")
-      
-      # Update site with scan result
-      parts = [f"{stats.get('groups_found', 0)} groups", f"{stats.get('users_found', 0)} users"]
-      if stats.get('external_users_found', 0) > 0:
-        parts.append(f"{stats.get('external_users_found', 0)} external")
-      if stats.get('subsites_scanned', 0) > 0:
-        parts.append(f"{stats.get('subsites_scanned', 0)} subsites")
-      if stats.get('items_with_individual_permissions', 0) > 0:
-        parts.append(f"{stats.get('items_with_individual_permissions', 0)} individual permissions")
-      if stats.get('items_shared_with_everyone', 0) > 0:
-        parts.append(f"{stats.get('items_shared_with_everyone', 0)} shared with everyone")
-      site.security_scan_result = ", ".join(parts)
-      site.last_security_scan_report_id = report_path
-      site.last_security_scan_date = datetime.datetime.now(datetime.timezone.utc).isoformat()
-      save_site_to_file(storage_path, site, stream_logger)
-      
-      stream_logger.log_function_footer()
-      yield writer.emit_end(ok=True, data=result)
-      
-    except Exception as e:
-      stream_logger.log_function_output(f"ERROR: Security scan failed -> {e}")
-      stream_logger.log_function_footer()
-      yield writer.emit_end(ok=False, error=str(e), data={})
-    finally:
-      writer.finalize()
+  try:
+    # Site is loaded when the job starts (job may have been queued)
+    site = load_site(storage_path, site_id, stream_logger)
+    
+    def log(msg: str):
+      sse = stream_logger.log_function_output(msg)
+      writer.drain_sse_queue()
+      return sse
+    
+    yield log(f"Starting security scan for site '{site_id}'...")
+    yield log(f"  Site URL: {site.site_url}")
+    yield log(f"  Scope: {scope}")
+    yield log(f"  Include subsites: {include_subsites}")
+    yield log(f"  Delete caches: {delete_caches}")
+    
+    async for event in run_security_scan(
+      site_url=site.site_url,
+      site_id=site_id,
+      scope=scope,
+      include_subsites=include_subsites,
+      delete_caches=delete_caches,
+      storage_path=storage_path,
+      client_id=client_id,
+      tenant_id=tenant_id,
+      cert_path=cert_path,
+      cert_password=cert_password,
+      writer=writer,
+      logger=stream_logger,
+      scan_slots=asyncio.Semaphore(get_max_parallel_webs(params.get("max_parallel", 0)))
+    ):
+      yield event
+    
+    # Update site with scan result
+    result = writer._step_result or {}
+    save_security_scan_result(storage_path, site, result, stream_logger)
+    
+    stream_logger.log_function_footer()
+    yield writer.emit_end(ok=True, data=result)
+
+  except Exception as e:
+    stream_logger.log_function_output(f"ERROR: Security scan failed -> {e}")
+    stream_logger.log_function_footer()
+    yield writer.emit_end(ok=False, error=str(e), data={})
+  finally:
+    writer.finalize()
+
+async def _multi_site_security_scan_job(writer: StreamingJobWriter, params: dict, context: JobContext):
+  """Several sites of 'sites.security_scan' in one job: sites and subsites run concurrently, each site gets its own report and site.json result."""
+  from routers_v2.common_security_scan_functions_v2 import run_multi_site_security_scan
+  storage_path = context.storage_path
+  scope, include_subsites, delete_caches = params["scope"], params["include_subsites"], params["delete_caches"]
+  stream_logger = MiddlewareLogger.create(stream_job_writer=writer)
+  stream_logger.log_function_header("sites_security_scan")
   
-  return StreamingResponse(stream_with_flush(run_scan()), media_type="text/event-stream")
+  client_id = getattr(config, 'CRAWLER_CLIENT_ID', None) or os.environ.get('CRAWLER_CLIENT_ID', '')
+  tenant_id = getattr(config, 'CRAWLER_TENANT_ID', None) or os.environ.get('CRAWLER_TENANT_ID', '')
+  cert_filename = getattr(config, 'CRAWLER_CLIENT_CERTIFICATE_PFX_FILE', None) or os.environ.get('CRAWLER_CLIENT_CERTIFICATE_PFX_FILE', '')
+  cert_path = os.path.join(storage_path, cert_filename) if cert_filename else ''
+  cert_password = getattr(config, 'CRAWLER_CLIENT_CERTIFICATE_PASSWORD', None) or os.environ.get('CRAWLER_CLIENT_CERTIFICATE_PASSWORD', '')
+  
+  try:
+    # Sites are loaded when the job starts (job may have been queued)
+    sites = {site_id: load_site(storage_path, site_id, stream_logger) for site_id in get_security_scan_site_ids(storage_path, params["site_id"], stream_logger)}
+    
+    def log(msg: str):
+      sse = stream_logger.log_function_output(msg)
+      writer.drain_sse_queue()
+      return sse
+    
+    yield log(f"Starting security scan for {len(sites)} sites: {', '.join(sites)}")
+    yield log(f"  Scope: {scope}")
+    yield log(f"  Include subsites: {include_subsites}")
+    yield log(f"  Delete caches: {delete_caches}")
+    
+    def site_scanned(site_id: str, result: dict) -> None:
+      if result["ok"]: save_security_scan_result(storage_path, sites[site_id], result, stream_logger)
+    
+    async for event in run_multi_site_security_scan(
+      sites=[(site_id, site.site_url) for site_id, site in sites.items()],
+      scope=scope,
+      include_subsites=include_subsites,
+      delete_caches=delete_caches,
+      storage_path=storage_path,
+      client_id=client_id,
+      tenant_id=tenant_id,
+      cert_path=cert_path,
+      cert_password=cert_password,
+      writer=writer,
+      logger=stream_logger,
+      max_parallel_webs=params.get("max_parallel", 0),
+      site_scanned=site_scanned
+    ):
+      yield event
+    
+    results = writer._step_result or {}
+    failed = [site_id for site_id, result in results.items() if not result["ok"]]
+    stream_logger.log_function_footer()
+    yield writer.emit_end(ok=not failed, error=f"{len(failed)} of {len(sites)} sites failed: {', '.join(failed)}" if failed else "", data={"sites": results})
+  
+  except Exception as e:
+    stream_logger.log_function_output(f"ERROR: Security scan failed -> {e}")
+    stream_logger.log_function_footer()
+    yield writer.emit_end(ok=False, error=str(e), data={})
+  finally:
+    writer.finalize()
+
+register_job_type("sites.security_scan", router_name, "security_scan", _security_scan_job)
 
 # ----------------------------------------- START: Security Scan Selftest -----------------------------------------------------
 
@@ -0,0 +1,227 @@
+# Benchmark script for EmbeddingPipeline in common_embed_functions_v2.py
+#
+# Compares the sequential upload_and_embed_file() loop (previous step_embed_source behavior) with EmbeddingPipeline
+# against a local fake OpenAI server implementing the files and vector_stores endpoints used by the crawler:
+#   POST   /v1/files                                         -> upload
+#   DELETE /v1/files/{file_id}                               -> delete
+#   POST   /v1/vector_stores/{vs_id}/files                   -> attach single file
+#   POST   /v1/vector_stores/{vs_id}/file_batches            -> attach file batch
+#   GET    /v1/vector_stores/{vs_id}/file_batches/{batch_id} -> batch status (completed after a processing delay)
+# Each request is delayed by a fixed latency. Every Nth request is answered with HTTP 429 (retry-after-ms header)
+# to exercise the rate limit backoff. The OpenAI client is created with max_retries=0 so only the pipeline retries.
+#
+# Run: python tests/benchmark_embedding_pipeline_v2.py [FILE_COUNT] [LATENCY_MS]
+#
+# No credentials or network access required.
+#
+# Output: Script-level logging per LOGGING-RULES-SCRIPT-LEVEL.md
+# - One line per mode with elapsed time, files/sec, HTTP request and 429 counts
+# - Final: RESULT: PASSED if all files were embedded and the pipeline is faster, else RESULT: FAILED
+
+import asyncio, http.server, itertools, json, logging, os, shutil, sys, tempfile, threading, time
+from pathlib import Path
+
+# Project root is parent of tests/
+project_root = Path(__file__).parent.parent
+
+# Add src to path for imports
+sys.path.insert(0, str(project_root / 'src'))
+
+from openai import AsyncOpenAI
+
+from routers_v2.common_embed_functions_v2 import EmbeddingPipeline, EmbedTask, upload_and_embed_file
+
+# httpx logs every request at INFO level
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# ----------------------------------------- START: Configuration -----------------------------------------------------
+
+file_count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+latency_ms = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+batch_processing_seconds = 0.5
+rate_limit_every_nth_request = 25
+vector_store_id = "vs_benchmark"
+# Minimum speedup of the pipeline vs the sequential loop to pass
+minimum_expected_speedup = 5.0
+
+# ----------------------------------------- END: Configuration -------------------------------------------------------
+
+
+# ----------------------------------------- START: Fake OpenAI Server ------------------------------------------------
+
+class FakeOpenAIState:
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.file_ids = itertools.count(1)
+    self.batch_ids = itertools.count(1)
+    self.request_count = 0
+    self.rate_limited_count = 0
+    self.files: set[str] = set()
+    self.attached: set[str] = set()
+    self.batches: dict[str, tuple[float, list[str]]] = {}
+
+  def reset(self):
+    with self.lock:
+      self.request_count, self.rate_limited_count = 0, 0
+      self.files, self.attached, self.batches = set(), set(), {}
+
+state = FakeOpenAIState()
+
+class FakeOpenAIHandler(http.server.BaseHTTPRequestHandler):
+  protocol_version = "HTTP/1.1"
+
+  def _send_json(self, status: int, payload: dict, headers: dict = None):
+    body = json.dumps(payload).encode("utf-8")
+    self.send_response(status)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("Content-Length", str(len(body)))
+    for name, value in (headers or {}).items(): self.send_header(name, value)
+    self.end_headers()
+    self.wfile.write(body)
+
+  def _read_body(self) -> bytes:
+    length = int(self.headers.get("Content-Length", "0") or 0)
+    return self.rfile.read(length) if length else b""
+
+  def _begin(self) -> bool:
+    """Apply latency and rate limiting. Returns False if the request was answered with 429."""
+    time.sleep(latency_ms / 1000.0)
+    with state.lock:
+      state.request_count += 1
+      limited = state.request_count % rate_limit_every_nth_request == 0
+      if limited: state.rate_limited_count += 1
+    if limited:
+      self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}, {"retry-after-ms": "200"})
+    return not limited
+
+  def do_POST(self):
+    body = self._read_body()
+    if not self._begin(): return
+    parts = self.path.split("?")[0].strip("/").split("/")
+    now = int(time.time())
+    if parts == ["v1", "files"]:
+      with state.lock: file_id = f"file-{next(state.file_ids):06d}"; state.files.add(file_id)
+      self._send_json(200, {"id": file_id, "object": "file", "bytes": len(body), "created_at": now, "filename": "upload", "purpose": "assistants", "status": "processed"})
+    elif len(parts) == 4 and parts[1] == "vector_stores" and parts[3] == "files":
+      file_id = json.loads(body)["file_id"]
+      with state.lock: state.attached.add(file_id)
+      self._send_json(200, {"id": file_id, "object": "vector_store.file", "created_at": now, "vector_store_id": parts[2], "status": "in_progress", "usage_bytes": 0, "last_error": None})
+    elif len(parts) == 4 and parts[1] == "vector_stores" and parts[3] == "file_batches":
+      file_ids = json.loads(body)["file_ids"]
+      with state.lock:
+        batch_id = f"vsfb_{next(state.batch_ids):06d}"
+        state.batches[batch_id] = (time.monotonic() + batch_processing_seconds, file_ids)
+        state.attached.update(file_ids)
+      self._send_json(200, self._batch_payload(batch_id, parts[2]))
+    else:
+      self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+  def do_GET(self):
+    if not self._begin(): return
+    parts = self.path.split("?")[0].strip("/").split("/")
+    if len(parts) == 5 and parts[1] == "vector_stores" and parts[3] == "file_batches":
+      self._send_json(200, self._batch_payload(parts[4], parts[2]))
+    else:
+      self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+  def do_DELETE(self):
+    if not self._begin(): return
+    parts = self.path.split("?")[0].strip("/").split("/")
+    file_id = parts[-1]
+    with state.lock: state.files.discard(file_id); state.attached.discard(file_id)
+    self._send_json(200, {"id": file_id, "object": "file", "deleted": True})
+
+  def _batch_payload(self, batch_id: str, vs_id: str) -> dict:
+    with state.lock: ready_at, file_ids = state.batches.get(batch_id, (0.0, []))
+    done = time.monotonic() >= ready_at
+    counts = {"in_progress": 0 if done else len(file_ids), "completed": len(file_ids) if done else 0, "failed": 0, "cancelled": 0, "total": len(file_ids)}
+    return {"id": batch_id, "object": "vector_store.files_batch", "created_at": int(time.time()), "vector_store_id": vs_id, "status": "completed" if done else "in_progress", "file_counts": counts}
+
+  def log_message(self, format, *args): pass
+
+def start_fake_openai_server() -> tuple[http.server.ThreadingHTTPServer, str]:
+  server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAIHandler)
+  server.daemon_threads = True
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+# ----------------------------------------- END: Fake OpenAI Server --------------------------------------------------
+
+
+# ----------------------------------------- START: Benchmark ---------------------------------------------------------
+
+def create_files(folder: str) -> list[str]:
+  paths = []
+  for i in range(file_count):
+    path = os.path.join(folder, f"document_{i:05d}.md")
+    with open(path, "w", encoding="utf-8") as f: f.write(f"# Document {i}\n\n" + "Lorem ipsum dolor sit amet. " * 40)
+    paths.append(path)
+  return paths
+
+async def run_sequential(base_url: str, paths: list[str]) -> tuple[float, int, int]:
+  """Previous step_embed_source behavior: one upload + attach at a time. Returns (elapsed_seconds, ok_count, error_count)."""
+  client = AsyncOpenAI(api_key="benchmark", base_url=base_url, max_retries=0)
+  ok_count, error_count = 0, 0
+  start = time.perf_counter()
+  for path in paths:
+    file_id, error = await upload_and_embed_file(client, vector_store_id, path)
+    if error: error_count += 1
+    else: ok_count += 1
+  elapsed = time.perf_counter() - start
+  await client.close()
+  return elapsed, ok_count, error_count
+
+async def run_pipeline(base_url: str, paths: list[str]) -> tuple[float, int, int, int, bool]:
+  """Returns (elapsed_seconds, ok_count, error_count, batches_created, indices_complete)."""
+  client = AsyncOpenAI(api_key="benchmark", base_url=base_url, max_retries=0)
+  pipeline = EmbeddingPipeline(client, vector_store_id, poll_interval_seconds=0.2)
+  tasks = [EmbedTask(index=i, filepath=path) for i, path in enumerate(paths)]
+  ok_count, error_count, seen_indices = 0, 0, set()
+  start = time.perf_counter()
+  async for outcome in pipeline.run(tasks, None):
+    seen_indices.add(outcome.task.index)
+    if outcome.error: error_count += 1
+    else: ok_count += 1
+  elapsed = time.perf_counter() - start
+  await client.close()
+  return elapsed, ok_count, error_count, pipeline.batches_created, seen_indices == set(range(len(paths)))
+
+def main():
+  print("=" * 100)
+  print(f"START: Embedding pipeline benchmark ({file_count} files, {latency_ms} ms latency per request, HTTP 429 every {rate_limit_every_nth_request}th request)")
+  print("=" * 100)
+  server, base_url = start_fake_openai_server()
+  folder = tempfile.mkdtemp(prefix="embed_benchmark_")
+  failures = []
+  try:
+    paths = create_files(folder)
+
+    state.reset()
+    seq_elapsed, seq_ok, seq_errors = asyncio.run(run_sequential(base_url, paths))
+    seq_rate = seq_ok / seq_elapsed if seq_elapsed > 0 else 0.0
+    print(f"  sequential: {seq_elapsed:6.2f} secs, {seq_rate:7.1f} files/sec, {seq_ok} OK, {seq_errors} error{'' if seq_errors == 1 else 's'}, {state.request_count} requests, {state.rate_limited_count} rate limited")
+
+    state.reset()
+    pipe_elapsed, pipe_ok, pipe_errors, batches, indices_complete = asyncio.run(run_pipeline(base_url, paths))
+    pipe_rate = pipe_ok / pipe_elapsed if pipe_elapsed > 0 else 0.0
+    print(f"  pipeline:   {pipe_elapsed:6.2f} secs, {pipe_rate:7.1f} files/sec, {pipe_ok} OK, {pipe_errors} error{'' if pipe_errors == 1 else 's'}, {state.request_count} requests, {state.rate_limited_count} rate limited, {batches} batch{'' if batches == 1 else 'es'}")
+
+    speedup = pipe_rate / seq_rate if seq_rate else 0.0
+    print(f"  speedup:    {speedup:.1f}x")
+    if pipe_errors > 0 or pipe_ok != file_count: failures.append(f"Pipeline embedded {pipe_ok} of {file_count} files, {pipe_errors} errors")
+    if not indices_complete: failures.append("Pipeline did not return exactly one outcome per task")
+    if len(state.attached) != file_count: failures.append(f"Fake server has {len(state.attached)} attached files, expected {file_count}")
+    if speedup < minimum_expected_speedup: failures.append(f"Speedup is {speedup:.1f}x, expected at least {minimum_expected_speedup:.1f}x")
+  finally:
+    server.shutdown()
+    shutil.rmtree(folder, ignore_errors=True)
+  print("=" * 100)
+  for failure in failures: print(f"  FAIL: {failure}")
+  print(f"RESULT: {'FAILED' if failures else 'PASSED'}")
+  print("=" * 100)
+  sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+  main()
+
+# ----------------------------------------- END: Benchmark -----------------------------------------------------------
@@ -0,0 +1,262 @@
+# Benchmark script for change-token based incremental change detection in crawler.py (_get_library_map_rows_from_changes)
+#
+# Compares full library enumeration (get_document_library_files_async + detect_changes) with the change log path
+# (GetChanges since the stored change token + re-reading changed items by id + apply_sharepoint_changes + detect_changes)
+# against a local stand-in SharePoint server with one large document library:
+#   GET  /sites/bench/_api/web/lists(guid'...')?$select=CurrentChangeToken  -> current change token
+#   POST /sites/bench/_api/web/lists(guid'...')/GetChanges                  -> change log between two tokens (RowLimit paging)
+#   GET  /sites/bench/_api/web/lists(guid'...')/items?$filter=...            -> items, 5000 per page (odata.nextLink) or by 'Id eq' filter
+# Between the two crawls a few files are modified, added, renamed and deleted. Both paths must produce the same
+# ChangeDetectionResult. A second scenario renames a folder, which must fall back to full enumeration.
+#
+# Run: python tests/benchmark_incremental_change_detection_v2.py [ITEM_COUNT] [LATENCY_MS]
+#
+# No credentials or network access required.
+#
+# Output: Script-level logging per LOGGING-RULES-SCRIPT-LEVEL.md
+# - One line per mode with elapsed time and request count
+# - Final: RESULT: PASSED if both modes agree and the change log path is faster, else RESULT: FAILED
+
+import asyncio, bisect, datetime, http.server, json, logging, os, re, shutil, sys, tempfile, threading, time
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+# Project root is parent of tests/
+project_root = Path(__file__).parent.parent
+
+# Add src to path for imports
+sys.path.insert(0, str(project_root / 'src'))
+
+from hardcoded_config import CRAWLER_HARDCODED_CONFIG
+from routers_v2.common_logging_functions_v2 import MiddlewareLogger
+from routers_v2.common_map_file_functions_v2 import FilesMapRow, MapFileWriter, SharePointMapRow, detect_changes, read_files_map, sharepoint_map_row_to_files_map_row, write_change_token
+from routers_v2.common_sharepoint_client_v2 import SharePointRestClient, get_document_library_files_async, get_list_change_token_async
+from routers_v2.crawler import _get_library_map_rows_from_changes, _sharepoint_file_to_map_row
+
+# httpx logs every request at INFO level, MiddlewareLogger logs every page
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logging.getLogger("routers_v2.common_logging_functions_v2").setLevel(logging.WARNING)
+
+# ----------------------------------------- START: Configuration -----------------------------------------------------
+
+item_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+# SharePoint Online typically needs well over 250 ms for a 5000 item page with $expand=File
+latency_ms = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+library_id = "11111111-2222-3333-4444-555555555555"
+modified_count, added_count, deleted_count, renamed_count = 12, 5, 3, 2
+# Minimum speedup of the change log path vs full enumeration to pass (the change log path still reads the previous sharepoint_map.csv)
+minimum_expected_speedup = 2.5
+
+# ----------------------------------------- END: Configuration -------------------------------------------------------
+
+
+# ----------------------------------------- START: Stand-in SharePoint Server ----------------------------------------
+
+class StandInLibrary:
+  """Document library with one folder level and a change log. Item 1 is the folder '/sites/bench/Docs/Folder'."""
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.items: dict[int, dict] = {}
+    self.changes: list[tuple[int, int, int]] = []  # (sequence, item_id, change_type)
+    self.sequence = 0
+    self.request_count = 0
+    self.next_id = 1
+    self._add_item("Folder", folder=True)
+    for i in range(item_count): self._add_item(f"Folder/document_{i:06d}.pdf")
+
+  def _add_item(self, leaf_path: str, folder: bool = False) -> int:
+    item_id = self.next_id
+    self.next_id += 1
+    self.items[item_id] = {"Id": item_id, "UniqueId": f"00000000-0000-0000-0000-{item_id:012d}", "FileLeafRef": leaf_path.rsplit("/", 1)[-1], "FileRef": f"/sites/bench/Docs/{leaf_path}", "File": None if folder else {"Length": 1000 + item_id}, "Modified": "2026-01-01T00:00:00Z", "FSObjType": 1 if folder else 0}
+    return item_id
+
+  def _log(self, item_id: int, change_type: int):
+    self.sequence += 1
+    self.changes.append((self.sequence, item_id, change_type))
+
+  def current_token(self) -> str:
+    return f"1;3;{library_id};{self.sequence};-1"
+
+  def apply_edits(self):
+    """Modify, add, rename and delete a few files (Update=2, Add=1, Rename=4, DeleteObject=3)."""
+    with self.lock:
+      for item_id in range(2, 2 + modified_count):
+        self.items[item_id]["Modified"] = "2026-02-01T00:00:00Z"
+        self.items[item_id]["File"]["Length"] += 1
+        self._log(item_id, 2)
+      for i in range(added_count): self._log(self._add_item(f"Folder/new_{i:03d}.docx"), 1)
+      for item_id in range(100, 100 + renamed_count):
+        item = self.items[item_id]
+        item["FileLeafRef"] = "renamed_" + item["FileLeafRef"]
+        item["FileRef"] = item["FileRef"].rsplit("/", 1)[0] + "/" + item["FileLeafRef"]
+        self._log(item_id, 4)
+      for item_id in range(200, 200 + deleted_count):
+        del self.items[item_id]
+        self._log(item_id, 3)
+
+  def rename_folder(self):
+    """Rename the folder: every file path changes, only the folder rename is logged."""
+    with self.lock:
+      for item in self.items.values(): item["FileRef"] = item["FileRef"].replace("/Docs/Folder", "/Docs/Renamed")
+      self.items[1]["FileLeafRef"] = "Renamed"
+      self._log(1, 4)
+
+library: StandInLibrary = None
+
+def _token_sequence(token: str) -> int:
+  return int(token.split(";")[3])
+
+def query_items(filter_expr: str, top: int, after_id: int) -> tuple[list[dict], bool]:
+  """Items matching an 'FSObjType eq 0' and/or 'Id eq N or ...' filter with Id > after_id. Returns (page, has_more)."""
+  ids = sorted(int(x) for x in re.findall(r"Id eq (\d+)", filter_expr))
+  files_only = "FSObjType eq 0" in filter_expr
+  with library.lock:
+    candidate_ids = ids if ids else sorted(library.items)
+    start = bisect.bisect_right(candidate_ids, after_id)
+    page, index = [], start
+    while index < len(candidate_ids) and len(page) <= top:
+      item = library.items.get(candidate_ids[index])
+      if item is not None and not (files_only and item["FSObjType"] != 0): page.append(dict(item))
+      index += 1
+  return page[:top], len(page) > top
+
+class StandInSharePointHandler(http.server.BaseHTTPRequestHandler):
+  protocol_version = "HTTP/1.1"
+
+  def _send_json(self, payload: dict, status: int = 200):
+    body = json.dumps(payload).encode("utf-8")
+    self.send_response(status)
+    self.send_header("Content-Type", "application/json;odata=nometadata;charset=utf-8")
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def _begin(self):
+    time.sleep(latency_ms / 1000.0)
+    with library.lock: library.request_count += 1
+
+  def do_GET(self):
+    self._begin()
+    parsed = urlparse(self.path)
+    query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+    if parsed.path.endswith("/items"):
+      filter_expr, top = query.get("$filter", ""), int(query.get("$top", "100"))
+      page, has_more = query_items(filter_expr, top, int(query.get("p_ID", "0")))
+      payload = {"value": page}
+      if has_more: payload["odata.nextLink"] = f"http://{self.headers['Host']}{parsed.path}?$filter={filter_expr}&$top={top}&p_ID={page[-1]['Id']}"
+      self._send_json(payload)
+    else:
+      with library.lock: token = library.current_token()
+      self._send_json({"CurrentChangeToken": {"StringValue": token}})
+
+  def do_POST(self):
+    body = self.rfile.read(int(self.headers.get("Content-Length", "0") or 0))
+    self._begin()
+    query = json.loads(body)["query"]
+    start, end, row_limit = _token_sequence(query["ChangeTokenStart"]["StringValue"]), _token_sequence(query["ChangeTokenEnd"]["StringValue"]), query["RowLimit"]
+    with library.lock:
+      if start < 0:
+        self._send_json({"odata.error": {"code": "-2146232832, Microsoft.SharePoint.SPInvalidChangeTokenException", "message": {"lang": "en-US", "value": "The change token refers to a time before the start of the current change log."}}}, 500)
+        return
+      page = [c for c in library.changes if start < c[0] <= end][:row_limit]
+    self._send_json({"value": [{"ChangeType": change_type, "ItemId": item_id, "ChangeToken": {"StringValue": f"1;3;{library_id};{seq};-1"}} for seq, item_id, change_type in page]})
+
+  def log_message(self, format, *args): pass
+
+class StandInServer(http.server.ThreadingHTTPServer):
+  request_queue_size = 64
+
+def start_stand_in_server() -> tuple[http.server.ThreadingHTTPServer, str]:
+  server = StandInServer(("127.0.0.1", 0), StandInSharePointHandler)
+  server.daemon_threads = True
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  return server, f"http://127.0.0.1:{server.server_address[1]}/sites/bench"
+
+# ----------------------------------------- END: Stand-in SharePoint Server ------------------------------------------
+
+
+# ----------------------------------------- START: Benchmark ---------------------------------------------------------
+
+def create_client(site_url: str) -> SharePointRestClient:
+  async def token_provider() -> str: return "benchmark"
+  return SharePointRestClient(site_url, token_provider)
+
+async def full_enumeration(site_url: str, logger: MiddlewareLogger) -> list:
+  sp_client = create_client(site_url)
+  sp_files = await get_document_library_files_async(sp_client, {"Id": library_id, "Title": "Docs"}, None, logger)
+  return [_sharepoint_file_to_map_row(f) for f in sp_files]
+
+async def initial_crawl(site_url: str, source_folder: str, logger: MiddlewareLogger) -> list:
+  """Write sharepoint_map.csv, files_map.csv and the change token like a full crawl. Returns the files_map rows."""
+  token = await get_list_change_token_async(create_client(site_url), library_id)
+  sp_items = await full_enumeration(site_url, logger)
+  for filename, row_class, rows in [(CRAWLER_HARDCODED_CONFIG.SHAREPOINT_MAP_CSV, SharePointMapRow, sp_items), (CRAWLER_HARDCODED_CONFIG.FILE_MAP_CSV, FilesMapRow, [sharepoint_map_row_to_files_map_row(i, i.filename) for i in sp_items])]:
+    map_writer = MapFileWriter(os.path.join(source_folder, filename), row_class)
+    map_writer.write_header()
+    for row in rows: map_writer.append_row(row)
+    map_writer.finalize()
+  write_change_token(os.path.join(source_folder, CRAWLER_HARDCODED_CONFIG.SHAREPOINT_CHANGE_TOKEN_JSON), library_id, None, token, datetime.datetime.now(datetime.timezone.utc).isoformat())
+  return read_files_map(os.path.join(source_folder, CRAWLER_HARDCODED_CONFIG.FILE_MAP_CSV))
+
+async def change_log_detection(site_url: str, source_folder: str, logger: MiddlewareLogger):
+  sp_client = create_client(site_url)
+  token = await get_list_change_token_async(sp_client, library_id)
+  return await _get_library_map_rows_from_changes(sp_client, {"Id": library_id, "Title": "Docs"}, None, source_folder, token, logger)
+
+def summarize(result) -> tuple:
+  key = lambda rows: sorted((r.sharepoint_unique_file_id, r.server_relative_url, r.file_size, r.last_modified_utc) for r in rows)
+  return key(result.added), key(result.changed), key(result.removed), key(result.unchanged)
+
+def timed(coro_factory) -> tuple[float, int, object]:
+  """Returns (elapsed_seconds, request_count, result)."""
+  with library.lock: library.request_count = 0
+  start = time.perf_counter()
+  value = asyncio.run(coro_factory())
+  return time.perf_counter() - start, library.request_count, value
+
+def main():
+  global library
+  print("=" * 100)
+  print(f"START: Incremental change detection benchmark ({item_count} items, {latency_ms} ms latency per request)")
+  print("=" * 100)
+  library = StandInLibrary()
+  server, site_url = start_stand_in_server()
+  source_folder = tempfile.mkdtemp(prefix="change_detection_benchmark_")
+  logger = MiddlewareLogger.create()
+  failures = []
+  try:
+    local_items = asyncio.run(initial_crawl(site_url, source_folder, logger))
+    library.apply_edits()
+
+    full_elapsed, full_requests, full_items = timed(lambda: full_enumeration(site_url, logger))
+    print(f"  full enumeration: {full_elapsed:6.2f} secs, {full_requests:>3} requests")
+    delta_elapsed, delta_requests, delta_items = timed(lambda: change_log_detection(site_url, source_folder, logger))
+    print(f"  change log:       {delta_elapsed:6.2f} secs, {delta_requests:>3} requests")
+    if delta_items is None:
+      failures.append("Change log path fell back to full enumeration")
+    else:
+      full_result, delta_result = detect_changes(full_items, local_items), detect_changes(delta_items, local_items)
+      print(f"  changes:          {len(delta_result.added)} added, {len(delta_result.changed)} changed, {len(delta_result.removed)} removed, {len(delta_result.unchanged)} unchanged")
+      if summarize(full_result) != summarize(delta_result): failures.append("ChangeDetectionResult differs between full enumeration and change log")
+      if (len(delta_result.added), len(delta_result.changed), len(delta_result.removed)) != (added_count, modified_count + renamed_count, deleted_count): failures.append("Unexpected number of added/changed/removed files")
+      speedup = full_elapsed / delta_elapsed if delta_elapsed > 0 else 0.0
+      print(f"  speedup:          {speedup:.1f}x")
+      if speedup < minimum_expected_speedup: failures.append(f"Speedup is {speedup:.1f}x, expected at least {minimum_expected_speedup:.1f}x")
+
+    library.rename_folder()
+    _, _, after_rename = timed(lambda: change_log_detection(site_url, source_folder, logger))
+    print(f"  folder renamed:   {'full enumeration fallback' if after_rename is None else 'change log used'}")
+    if after_rename is not None: failures.append("Folder rename did not fall back to full enumeration")
+  finally:
+    server.shutdown()
+    shutil.rmtree(source_folder, ignore_errors=True)
+  print("=" * 100)
+  for failure in failures: print(f"  FAIL: {failure}")
+  print(f"RESULT: {'FAILED' if failures else 'PASSED'}")
+  print("=" * 100)
+  sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+  main()
+
+# ----------------------------------------- END: Benchmark -----------------------------------------------------------
@@ -0,0 +1,126 @@
+# Benchmark script for the job catalog in common_job_functions_v2.py / common_job_catalog_functions_v2.py
+#
+# Creates JOB_COUNT completed jobs with StreamingJobWriter (spread over 3 routers) and compares the previous
+# glob-and-parse implementations (_scan_job_number, _scan_job_file, _scan_jobs) with the catalog:
+#   - generate_job_number, find_job_file / find_job_by_id for LOOKUP_COUNT jobs, list_jobs (all jobs and one page)
+# Both must return the same jobs. Then changes made outside the catalog (job file deleted, renamed, moved out and
+# restored) must show up in list_jobs / find_job_file, and rebuild_job_catalog() must reproduce the catalog.
+#
+# Run: python tests/benchmark_job_catalog_v2.py [JOB_COUNT]     e.g. python tests/benchmark_job_catalog_v2.py 500
+#
+# No credentials or network access required.
+#
+# Output: Script-level logging per LOGGING-RULES-SCRIPT-LEVEL.md
+# - One line per operation with elapsed time of the scan and the catalog implementation
+# - Final: RESULT: PASSED if both return the same jobs and the catalog is faster, else RESULT: FAILED
+
+import os, random, shutil, sys, tempfile, time
+from dataclasses import replace
+from pathlib import Path
+
+# Project root is parent of tests/
+project_root = Path(__file__).parent.parent
+
+# Add src to path for imports
+sys.path.insert(0, str(project_root / 'src'))
+
+from routers_v2.common_job_functions_v2 import StreamingJobWriter, _parse_job_file, _scan_job_file, _scan_job_number, _scan_jobs, find_job_by_id, find_job_file, generate_job_number, list_jobs, rebuild_job_catalog
+
+# ----------------------------------------- START: Configuration -----------------------------------------------------
+
+job_count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+lookup_count = 50
+routers = ["crawler", "sites", "jobs"]
+
+# ----------------------------------------- END: Configuration -------------------------------------------------------
+
+
+# ----------------------------------------- START: Benchmark ---------------------------------------------------------
+
+def create_job(storage_path: str, i: int) -> str:
+  writer = StreamingJobWriter(storage_path, routers[i % len(routers)], "crawl", f"DOMAIN{i:05d}", f"/v2/crawler/crawl?domain_id=DOMAIN{i:05d}&format=stream", "/v2", buffer_size=100)
+  writer.emit_start()
+  for n in range(20): writer.emit_log(f"[ {n + 1} / 20 ] Processing item {n} of job {i}")
+  writer.emit_end(ok=i % 7 != 0, error="" if i % 7 else "Failed", data={"count": i})
+  writer.finalize()
+  return writer.job_id
+
+def timed(func) -> tuple[float, object]:
+  start = time.perf_counter()
+  value = func()
+  return time.perf_counter() - start, value
+
+def comparable(jobs: list) -> list:
+  """Jobs sorted by job_id, last_modified_utc ignored (file mtime vs catalog time)."""
+  return sorted((replace(job, last_modified_utc=None) for job in jobs), key=lambda job: job.job_id)
+
+def print_comparison(label: str, scan_elapsed: float, catalog_elapsed: float) -> float:
+  speedup = scan_elapsed / catalog_elapsed if catalog_elapsed > 0 else 0.0
+  print(f"  {label:<28} scan {scan_elapsed:8.3f} secs | catalog {catalog_elapsed:8.4f} secs | {speedup:8.0f}x")
+  return speedup
+
+def main():
+  print("=" * 100)
+  print(f"START: Job catalog benchmark ({job_count:,} jobs in {len(routers)} routers)")
+  print("=" * 100)
+  failures = []
+  storage_path = tempfile.mkdtemp(prefix="job_catalog_benchmark_")
+  try:
+    create_elapsed, job_ids = timed(lambda: [create_job(storage_path, i) for i in range(job_count)])
+    print(f"  created {len(job_ids):,} jobs in {create_elapsed:.1f} secs")
+    if len(set(job_ids)) != len(job_ids): failures.append("Duplicate job ids")
+
+    scan_elapsed, scan_number = timed(lambda: _scan_job_number(storage_path))
+    catalog_elapsed, catalog_number = timed(lambda: generate_job_number(storage_path))
+    speedups = [print_comparison("generate_job_number:", scan_elapsed, catalog_elapsed)]
+    if catalog_number != scan_number: failures.append(f"generate_job_number returned {catalog_number}, scan {scan_number}")
+
+    lookup_ids = random.Random(1).sample(job_ids, min(lookup_count, len(job_ids)))
+    scan_elapsed, scan_jobs = timed(lambda: [_parse_job_file(_scan_job_file(storage_path, job_id)) for job_id in lookup_ids])
+    catalog_elapsed, catalog_jobs = timed(lambda: [find_job_by_id(storage_path, job_id) for job_id in lookup_ids])
+    speedups.append(print_comparison(f"find_job_by_id x {len(lookup_ids)}:", scan_elapsed, catalog_elapsed))
+    if comparable(catalog_jobs) != comparable(scan_jobs): failures.append("find_job_by_id returned different jobs than the scan")
+
+    scan_elapsed, scan_jobs = timed(lambda: _scan_jobs(storage_path))
+    catalog_elapsed, catalog_jobs = timed(lambda: list_jobs(storage_path))
+    speedups.append(print_comparison("list_jobs (all):", scan_elapsed, catalog_elapsed))
+    if comparable(catalog_jobs) != comparable(scan_jobs): failures.append("list_jobs returned different jobs than the scan")
+
+    scan_elapsed, scan_page = timed(lambda: _scan_jobs(storage_path, "crawler", "completed")[:50])
+    catalog_elapsed, catalog_page = timed(lambda: list_jobs(storage_path, "crawler", "completed", 0, 50))
+    speedups.append(print_comparison("list_jobs (router, 50):", scan_elapsed, catalog_elapsed))
+    if len(catalog_page) != len(scan_page) or any(job.job_id not in {j.job_id for j in _scan_jobs(storage_path, "crawler")} for job in catalog_page): failures.append("list_jobs page returned jobs of other routers")
+
+    # Changes made outside the catalog
+    deleted_id, renamed_id = job_ids[0], job_ids[1]
+    os.unlink(find_job_file(storage_path, deleted_id))
+    renamed_path = find_job_file(storage_path, renamed_id)
+    os.rename(renamed_path, renamed_path.replace(".completed", ".cancelled"))
+    restored_id = job_ids[2]
+    restored_path = find_job_file(storage_path, restored_id)
+    backup_path = os.path.join(storage_path, os.path.basename(restored_path))
+    os.rename(restored_path, backup_path)
+    if restored_id in {job.job_id for job in list_jobs(storage_path)}: failures.append("Job file moved out of the jobs folder is still listed")
+    os.rename(backup_path, restored_path)
+    listed = {job.job_id: job for job in list_jobs(storage_path)}
+    if deleted_id in listed or find_job_file(storage_path, deleted_id) is not None: failures.append("Deleted job file is still in the catalog")
+    if listed.get(renamed_id) is None or not find_job_file(storage_path, renamed_id).endswith(".cancelled"): failures.append("Renamed job file not picked up by the catalog")
+    if restored_id not in listed: failures.append("Restored job file not picked up by the catalog")
+    if len(listed) != len(job_ids) - 1: failures.append(f"list_jobs returned {len(listed)} jobs, expected {len(job_ids) - 1}")
+
+    rebuild_elapsed, rebuild_result = timed(lambda: rebuild_job_catalog(storage_path))
+    print(f"  rebuild_job_catalog:         {rebuild_elapsed:8.3f} secs ({rebuild_result['jobs']:,} jobs, {rebuild_result['changes']:,} records re-read)")
+    if comparable(list_jobs(storage_path)) != comparable(_scan_jobs(storage_path)): failures.append("Catalog after rebuild differs from the job files")
+    if min(speedups) < 1.0: failures.append(f"Catalog slower than scanning (minimum speedup {min(speedups):.2f}x)")
+  finally:
+    shutil.rmtree(storage_path, ignore_errors=True)
+  print("=" * 100)
+  for failure in failures: print(f"  FAIL: {failure}")
+  print(f"RESULT: {'FAILED' if failures else 'PASSED'}")
+  print("=" * 100)
+  sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+  main()
+
+# ----------------------------------------- END: Benchmark -----------------------------------------------------------
@@ -0,0 +1,134 @@
+# Benchmark script for job control (pause/resume/cancel) in common_job_functions_v2.py / common_job_control_v2.py
+#
+# Creates JOB_COUNT completed job files in the 'crawler' jobs folder and one running job, then compares:
+#   - per-item cost: CHECK_COUNT calls of check_control() without control request vs the previous implementation
+#                    (flush + 2x glob.glob of the jobs folder per call)
+#   - latency:       pause -> resume -> cancel via create_control_file() (API, same worker process) and via control
+#                    files written directly (other worker process), from file creation until the job reacts
+#
+# Run: python tests/benchmark_job_control_v2.py [JOB_COUNT]     e.g. python tests/benchmark_job_control_v2.py 3000
+#
+# No credentials or network access required.
+#
+# Output: Script-level logging per LOGGING-RULES-SCRIPT-LEVEL.md
+# - One line per measurement
+# - Final: RESULT: PASSED if check_control() is faster and all control requests are handled, else RESULT: FAILED
+
+import asyncio, glob, os, shutil, sys, tempfile, time
+from pathlib import Path
+
+# Project root is parent of tests/
+project_root = Path(__file__).parent.parent
+
+# Add src to path for imports
+sys.path.insert(0, str(project_root / 'src'))
+
+import routers_v2.common_job_control_v2 as job_control
+from routers_v2.common_job_functions_v2 import ControlAction, StreamingJobWriter, create_control_file
+
+# ----------------------------------------- START: Configuration -----------------------------------------------------
+
+job_count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+check_count = 500
+# Maximum delay until a control file written by another process is picked up
+max_external_delay = job_control.CONTROL_POLL_SECONDS if sys.platform != "linux" else 0.5
+
+# ----------------------------------------- END: Configuration -------------------------------------------------------
+
+
+# ----------------------------------------- START: Benchmark ---------------------------------------------------------
+
+def legacy_check_control(writer: StreamingJobWriter) -> bool:
+  """Previous check_control() without control file: flush + cancel and pause glob."""
+  writer._flush_buffer()
+  found = False
+  for control_type in ["cancel_requested", "pause_requested"]:
+    found = found or bool(glob.glob(os.path.join(writer._jobs_folder, f"*[[]{writer.job_id}[]]*.{control_type}")) or glob.glob(os.path.join(writer._jobs_folder, f"[[]{writer.job_id}[]].{control_type}")))
+  return found
+
+async def timed_checks(writer: StreamingJobWriter) -> float:
+  start = time.perf_counter()
+  for i in range(check_count):
+    writer.emit_log(f"item {i}")
+    async for _ in writer.check_control(): pass
+  return time.perf_counter() - start
+
+def write_control_file(writer: StreamingJobWriter, action: str) -> None:
+  """Control file as written by create_control_file() of another worker process (no in-process signal)."""
+  with open(os.path.join(writer._jobs_folder, f"[{writer.job_id}].{action}_requested"), 'w', encoding='utf-8') as f: f.write(f"{action}\n")
+
+async def measure_control(writer: StreamingJobWriter, request_control) -> tuple[list[float], bool]:
+  """pause -> resume -> cancel. Returns delays of the 3 requests and whether the job was cancelled."""
+  delays = []
+  async def job():
+    while True:
+      await asyncio.sleep(0.005)
+      async for control in writer.check_control():
+        if control == ControlAction.CANCEL: return True
+        if isinstance(control, str) and '"state": "paused"' in control: delays.append(time.perf_counter() - requested[0])
+        if isinstance(control, str) and '"state": "running"' in control: delays.append(time.perf_counter() - requested[0])
+  requested = [0.0]
+  task = asyncio.create_task(job())
+  for action in ["pause", "resume", "cancel"]:
+    await asyncio.sleep(0.1)
+    requested[0] = time.perf_counter()
+    request_control(writer, action)
+    if action == "cancel":
+      try: cancelled = await asyncio.wait_for(task, 10)
+      except asyncio.TimeoutError: cancelled = False
+      delays.append(time.perf_counter() - requested[0])
+    else:
+      await asyncio.sleep(max_external_delay + 0.2)
+  return delays, cancelled
+
+async def run_checks(storage_path: str, failures: list) -> None:
+  writer = StreamingJobWriter(storage_path, "crawler", "crawl", "DOMAIN01", "/v2/benchmark", "/v2")
+  writer.emit_start()
+  legacy_start = time.perf_counter()
+  for i in range(check_count):
+    writer.emit_log(f"item {i}")
+    legacy_check_control(writer)
+  legacy_elapsed = time.perf_counter() - legacy_start
+  new_elapsed = await timed_checks(writer)
+  speedup = legacy_elapsed / new_elapsed if new_elapsed > 0 else 0.0
+  print(f"  check_control x {check_count}:  glob {legacy_elapsed:8.3f} secs ({1e6 * legacy_elapsed / check_count:8.1f} us per item) | control {new_elapsed:8.4f} secs ({1e6 * new_elapsed / check_count:6.1f} us per item) | {speedup:6.0f}x")
+  if speedup < 1.0: failures.append(f"check_control() slower than the glob implementation ({speedup:.2f}x)")
+  writer.emit_end(ok=True, data={})
+  writer.finalize()
+
+  watcher = "inotify" if sys.platform == "linux" else f"polling every {job_control.CONTROL_POLL_SECONDS} secs"
+  for label, request_control, max_delay in [("API (same process)", lambda w, action: create_control_file(storage_path, w.job_id, action), 0.05), (f"file, {watcher}", write_control_file, max_external_delay + 0.1)]:
+    writer = StreamingJobWriter(storage_path, "crawler", "crawl", "DOMAIN02", "/v2/benchmark", "/v2")
+    writer.emit_start()
+    delays, cancelled = await measure_control(writer, request_control)
+    writer.emit_end(ok=False, error="Cancelled by user.", data={}, cancelled=True)
+    writer.finalize()
+    print(f"  {label + ':':<32} pause {1000 * delays[0] if len(delays) > 0 else -1:7.1f} ms | resume {1000 * delays[1] if len(delays) > 1 else -1:7.1f} ms | cancel {1000 * delays[2] if len(delays) > 2 else -1:7.1f} ms")
+    if len(delays) != 3 or not cancelled: failures.append(f"{label}: control requests not handled")
+    elif max(delays) > max_delay: failures.append(f"{label}: control request took {1000 * max(delays):.0f} ms")
+    if glob.glob(os.path.join(writer._jobs_folder, "*_requested")): failures.append(f"{label}: control files left in the jobs folder")
+
+def main():
+  print("=" * 100)
+  print(f"START: Job control benchmark ({job_count:,} job files, {check_count:,} checks)")
+  print("=" * 100)
+  failures = []
+  storage_path = tempfile.mkdtemp(prefix="job_control_benchmark_")
+  try:
+    jobs_folder = os.path.join(storage_path, "jobs", "crawler")
+    os.makedirs(jobs_folder)
+    for i in range(job_count):
+      with open(os.path.join(jobs_folder, f"2025-01-01_00-00-00_[crawl]_[jb_{100000 + i}]_[DOMAIN{i:05d}].completed"), 'w', encoding='utf-8') as f: f.write("")
+    asyncio.run(run_checks(storage_path, failures))
+  finally:
+    shutil.rmtree(storage_path, ignore_errors=True)
+  print("=" * 100)
+  for failure in failures: print(f"  FAIL: {failure}")
+  print(f"RESULT: {'FAILED' if failures else 'PASSED'}")
+  print("=" * 100)
+  sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+  main()
+
+# ----------------------------------------- END: Benchmark -----------------------------------------------------------
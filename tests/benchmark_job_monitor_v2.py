@@ -0,0 +1,176 @@
+# Benchmark script for common_job_monitor_functions_v2.py (/v2/jobs/monitor?format=stream)
+#
+# Runs a StreamingJobWriter job with a large existing log (PREFILL_MB) that appends one log event every 50 ms, pauses and
+# resumes once and then completes. Several monitors follow the job at the same time:
+#   - legacy: previous monitor loop (find_job_by_id + read_job_log every 0.5 s, kept below as legacy_monitor)
+#   - file:   tail-follow of the job file (JobLogFollower, used for jobs of other worker processes)
+#   - bus:    follow_job_log() of a job running in this process (job event channel, common_job_event_bus_v2)
+#   - lag:    bus with a 2 event ring and slow monitors (re-join from the job file after each overflow)
+# Compares process CPU time, bytes read per monitor and the delay between writing an event and a monitor receiving it.
+# Every monitor must receive exactly the final job file content.
+#
+# Run: python tests/benchmark_job_monitor_v2.py [MONITOR_COUNT] [PREFILL_MB]
+#
+# No credentials or network access required.
+#
+# Output: Script-level logging per LOGGING-RULES-SCRIPT-LEVEL.md
+# - One line per implementation with CPU time, bytes read and delivery delay
+# - Final: RESULT: PASSED if all monitors receive the full job log, the followers use less CPU than the legacy loop
+#   and the bus delivers faster than the file follower, else RESULT: FAILED
+
+import asyncio, os, re, shutil, sys, tempfile, time
+from pathlib import Path
+
+# Project root is parent of tests/
+project_root = Path(__file__).parent.parent
+
+# Add src to path for imports
+sys.path.insert(0, str(project_root / 'src'))
+
+from routers_v2.common_job_functions_v2 import StreamingJobWriter, create_control_file, find_job_by_id, find_job_file, read_job_log
+from hardcoded_config import CRAWLER_HARDCODED_CONFIG
+import routers_v2.common_job_event_bus_v2 as job_event_bus
+from routers_v2.common_job_monitor_functions_v2 import _follow_job_file, follow_job_log
+
+# ----------------------------------------- START: Configuration -----------------------------------------------------
+
+monitor_count = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+prefill_mb = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+live_event_count = 60
+live_event_interval_seconds = 0.05
+# Other jobs in the jobs folders (find_job_file globs all of them)
+other_job_count = 300
+
+# ----------------------------------------- END: Configuration -------------------------------------------------------
+
+
+# ----------------------------------------- START: Legacy Implementation ---------------------------------------------
+
+legacy_bytes_read = 0
+
+def legacy_read_job_log(storage_path: str, job_id: str) -> str:
+  global legacy_bytes_read
+  content = read_job_log(storage_path, job_id)
+  legacy_bytes_read += len(content)
+  return content
+
+def legacy_find_job_by_id(storage_path: str, job_id: str):
+  """find_job_by_id() reads the whole job file to parse start_json/end_json."""
+  global legacy_bytes_read
+  job_file_path = find_job_file(storage_path, job_id)
+  if job_file_path: legacy_bytes_read += os.path.getsize(job_file_path)
+  return find_job_by_id(storage_path, job_id)
+
+async def legacy_monitor(storage_path: str, job_id: str):
+  """Previous jobs_monitor stream loop."""
+  log_content = legacy_read_job_log(storage_path, job_id)
+  last_len = 0
+  if log_content:
+    yield log_content
+    last_len = len(log_content)
+  while True:
+    current_job = legacy_find_job_by_id(storage_path, job_id)
+    if current_job is None or current_job.state in ["completed", "cancelled"]:
+      final_content = legacy_read_job_log(storage_path, job_id) or ""
+      if len(final_content) > last_len: yield final_content[last_len:]
+      break
+    current_content = legacy_read_job_log(storage_path, job_id) or ""
+    if len(current_content) > last_len:
+      yield current_content[last_len:]
+      last_len = len(current_content)
+    await asyncio.sleep(0.5)
+
+# ----------------------------------------- END: Legacy Implementation -----------------------------------------------
+
+
+# ----------------------------------------- START: Benchmark ---------------------------------------------------------
+
+mark_pattern = re.compile(r"MARK (\d+\.\d+)")
+
+def create_other_jobs(storage_path: str) -> None:
+  for i in range(other_job_count):
+    writer = StreamingJobWriter(storage_path, "crawler" if i % 2 else "sites", "crawl", f"OTHER{i}", "/v2/other", "/v2")
+    writer.emit_start()
+    writer.emit_end(ok=True)
+    writer.finalize()
+
+async def run_job(writer: StreamingJobWriter, storage_path: str) -> None:
+  for i in range(live_event_count):
+    writer.emit_log(f"MARK {time.perf_counter():.6f} live event {i}")
+    writer.drain_sse_queue()
+    if i == live_event_count // 2:
+      create_control_file(storage_path, writer.job_id, "pause")
+      asyncio.get_running_loop().call_later(0.3, create_control_file, storage_path, writer.job_id, "resume")
+      async for _ in writer.check_control(): pass
+    await asyncio.sleep(live_event_interval_seconds)
+  writer.emit_end(ok=True, data={"count": live_event_count})
+  writer.finalize()
+
+async def collect(stream, delays: list, slow: bool = False) -> str:
+  chunks = []
+  async for chunk in stream:
+    received = time.perf_counter()
+    delays.extend(received - float(sent) for sent in mark_pattern.findall(chunk))
+    chunks.append(chunk)
+    if slow: await asyncio.sleep(live_event_interval_seconds * 4)
+  return "".join(chunks)
+
+async def run_mode(mode: str, storage_path: str) -> dict:
+  writer = StreamingJobWriter(storage_path, "crawler", "crawl", "BENCH", "/v2/crawler/crawl?domain_id=BENCH&format=stream", "/v2", buffer_size=1000)
+  writer.emit_start()
+  filler = "x" * 200
+  for i in range((prefill_mb * 1024 * 1024) // 230): writer.emit_log(f"prefill {i:07d} {filler}")
+  writer._flush_buffer()
+  writer.drain_sse_queue()
+  # Live events are written to the job file every PERSISTENT_STORAGE_LOG_EVENTS_PER_WRITE events, like in a crawl
+  writer._buffer_size = CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_LOG_EVENTS_PER_WRITE
+  job_id = writer.job_id
+  delays: list = []
+  cpu_start, wall_start = time.process_time(), time.perf_counter()
+  if mode == "legacy": streams = [legacy_monitor(storage_path, job_id) for _ in range(monitor_count)]
+  elif mode == "file": streams = [_follow_job_file(find_job_file(storage_path, job_id)) for _ in range(monitor_count)]
+  else: streams = [follow_job_log(find_job_file(storage_path, job_id)) for _ in range(monitor_count)]
+  results = await asyncio.gather(run_job(writer, storage_path), *[collect(stream, delays, slow=mode == "lag") for stream in streams])
+  cpu_elapsed, wall_elapsed = time.process_time() - cpu_start, time.perf_counter() - wall_start
+  with open(find_job_file(storage_path, job_id), 'r', encoding='utf-8') as f: final_content = f.read()
+  live_delays = [delay for delay in delays if delay < 60]
+  return {"cpu": cpu_elapsed, "wall": wall_elapsed, "complete": all(content == final_content for content in results[1:]), "file_bytes": len(final_content), "avg_delay_ms": 1000 * sum(live_delays) / max(1, len(live_delays)), "max_delay_ms": 1000 * max(live_delays, default=0)}
+
+def main():
+  global legacy_bytes_read
+  print("=" * 100)
+  print(f"START: Job monitor benchmark ({monitor_count} monitors, {prefill_mb} MB job log, {live_event_count} live events, {other_job_count} other jobs)")
+  print("=" * 100)
+  failures = []
+  storage_path = tempfile.mkdtemp(prefix="job_monitor_benchmark_")
+  try:
+    create_other_jobs(storage_path)
+    results = {}
+    ring_size = job_event_bus.SUBSCRIBER_RING_SIZE
+    for mode in ["legacy", "file", "bus", "lag"]:
+      legacy_bytes_read = 0
+      job_event_bus.SUBSCRIBER_RING_SIZE = 2 if mode == "lag" else ring_size
+      result = asyncio.run(run_mode(mode, storage_path))
+      # file: whole job file, bus: content written before joining (the prefill), lag: re-joins read more
+      bytes_read = legacy_bytes_read / monitor_count if mode == "legacy" else result["file_bytes"] if mode == "file" else prefill_mb * 1048576
+      results[mode] = result
+      print(f"  {mode:<7} cpu {result['cpu']:7.2f} secs | wall {result['wall']:6.2f} secs | read per monitor {bytes_read / 1048576:8.1f} MB | delay avg {result['avg_delay_ms']:6.1f} ms, max {result['max_delay_ms']:6.1f} ms")
+      if not result["complete"]: failures.append(f"{mode}: a monitor did not receive the full job log")
+    job_event_bus.SUBSCRIBER_RING_SIZE = ring_size
+    for mode in ["file", "bus"]:
+      cpu_ratio = results["legacy"]["cpu"] / results[mode]["cpu"] if results[mode]["cpu"] > 0 else 0.0
+      print(f"  CPU time: {cpu_ratio:.1f}x less with {mode}")
+      if results[mode]["cpu"] >= results["legacy"]["cpu"]: failures.append(f"{mode} used more CPU than the legacy monitor loop")
+    if results["bus"]["avg_delay_ms"] > results["file"]["avg_delay_ms"]: failures.append("bus delivered events slower than the file follower")
+  finally:
+    shutil.rmtree(storage_path, ignore_errors=True)
+  print("=" * 100)
+  for failure in failures: print(f"  FAIL: {failure}")
+  print(f"RESULT: {'FAILED' if failures else 'PASSED'}")
+  print("=" * 100)
+  sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+  main()
+
+# ----------------------------------------- END: Benchmark -----------------------------------------------------------
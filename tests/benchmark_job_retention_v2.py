@@ -0,0 +1,163 @@
+# Benchmark script for job retention in common_job_retention_functions_v2.py
+#
+# Creates JOB_COUNT completed jobs with StreamingJobWriter (LOG_LINES log lines each, spread over 3 routers, finished
+# between 0 and 120 days ago) plus one running job, then applies job retention with test limits and checks:
+#   - max age, max jobs per router and max total bytes are applied to completed/cancelled jobs only
+#   - remaining finished job files are gzip-compressed: bytes reclaimed, compression ratio, duration
+#   - compressed jobs read transparently: read_job_log, follow_job_log, list_jobs, find_job_by_id return the same as before
+#   - the monitor summary (read_job_last_log) comes from the job catalog and matches the job file
+#   - the job catalog equals a rebuild from the job files
+#   - run_scheduled_job_retention runs once per interval across concurrent callers (worker processes)
+#
+# Run: python tests/benchmark_job_retention_v2.py [JOB_COUNT]     e.g. python tests/benchmark_job_retention_v2.py 600
+#
+# No credentials or network access required.
+#
+# Output: Script-level logging per LOGGING-RULES-SCRIPT-LEVEL.md
+# - One line per check with sizes and elapsed time
+# - Final: RESULT: PASSED if all checks pass, else RESULT: FAILED
+
+import asyncio, os, shutil, sys, tempfile, threading, time
+from dataclasses import replace
+from pathlib import Path
+
+# Project root is parent of tests/
+project_root = Path(__file__).parent.parent
+
+# Add src to path for imports
+sys.path.insert(0, str(project_root / 'src'))
+
+from hardcoded_config import CRAWLER_HARDCODED_CONFIG
+from routers_v2.common_job_functions_v2 import StreamingJobWriter, _scan_jobs, find_job_by_id, find_job_file, get_last_log_line, list_jobs, read_job_last_log, read_job_log, rebuild_job_catalog
+from routers_v2.common_job_monitor_functions_v2 import follow_job_log
+from routers_v2.common_job_retention_functions_v2 import apply_job_retention, get_job_retention_metrics, run_scheduled_job_retention
+
+# ----------------------------------------- START: Configuration -----------------------------------------------------
+
+job_count = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+log_lines = 400
+routers = ["crawler", "sites", "jobs"]
+max_age_days = 90
+# At least 1: JOB_RETENTION_MAX_JOBS_PER_ROUTER = 0 means no limit
+max_jobs_per_router = max(1, job_count // len(routers) - 20)
+
+# ----------------------------------------- END: Configuration -------------------------------------------------------
+
+
+# ----------------------------------------- START: Benchmark ---------------------------------------------------------
+
+def create_job(storage_path: str, i: int, now: float) -> str:
+  writer = StreamingJobWriter(storage_path, routers[i % len(routers)], "crawl", f"DOMAIN{i:05d}", f"/v2/crawler/crawl?domain_id=DOMAIN{i:05d}&format=stream", "/v2", buffer_size=100)
+  writer.emit_start()
+  for n in range(log_lines): writer.emit_log(f"[2025-01-15 12:00:{n % 60:02d}] [ {n + 1} / {log_lines} ] Processing 'Document{n}.docx' of job {i}...")
+  writer.emit_end(ok=i % 7 != 0, error="" if i % 7 else "Failed", data={"count": i}, cancelled=i % 11 == 0)
+  writer.finalize()
+  # Job i finished (job_count - i) * 120 / job_count days ago: the oldest jobs are beyond max_age_days
+  finished = now - (job_count - i) * 120 * 86400 / job_count
+  os.utime(writer.job_file_path, (finished, finished))
+  return writer.job_id
+
+def comparable(jobs: list) -> list:
+  """Jobs sorted by job_id, last_modified_utc ignored (file mtime vs catalog time)."""
+  return sorted((replace(job, last_modified_utc=None) for job in jobs), key=lambda job: job.job_id)
+
+async def read_stream(job_file_path: str) -> str:
+  return "".join([text async for text in follow_job_log(job_file_path)])
+
+def main():
+  print("=" * 100)
+  print(f"START: Job retention benchmark ({job_count:,} jobs x {log_lines} log lines in {len(routers)} routers)")
+  print("=" * 100)
+  failures = []
+  storage_path = tempfile.mkdtemp(prefix="job_retention_benchmark_")
+  try:
+    now = time.time()
+    job_ids = [create_job(storage_path, i, now) for i in range(job_count)]
+    running = StreamingJobWriter(storage_path, "crawler", "crawl", "RUNNING", "/v2/benchmark", "/v2")
+    running.emit_start()
+    old = now - 200 * 86400
+    os.utime(running.job_file_path, (old, old))
+    logs_before = {job_id: read_job_log(storage_path, job_id) for job_id in job_ids}
+    jobs_before = {job.job_id: job for job in list_jobs(storage_path)}
+    metrics_before = get_job_retention_metrics(storage_path)
+
+    # Limits: max age and max jobs per router, max total bytes applied separately below
+    CRAWLER_HARDCODED_CONFIG.JOB_RETENTION_MAX_AGE_DAYS = max_age_days
+    CRAWLER_HARDCODED_CONFIG.JOB_RETENTION_MAX_JOBS_PER_ROUTER = max_jobs_per_router
+    CRAWLER_HARDCODED_CONFIG.JOB_RETENTION_MAX_TOTAL_MB = 0
+    CRAWLER_HARDCODED_CONFIG.JOB_RETENTION_COMPRESS_AFTER_MINUTES = 60
+    result = apply_job_retention(storage_path)
+    print(f"  retention:    {result['jobs_deleted']:,} jobs deleted, {result['jobs_compressed']:,} compressed in {result['duration_secs']:.2f} secs")
+    print(f"  bytes:        {result['bytes_before']:,} -> {result['bytes_after']:,} ({result['bytes_reclaimed']:,} reclaimed, {result['bytes_reclaimed_by_compression']:,} by compression)")
+    remaining = {job.job_id: job for job in list_jobs(storage_path)}
+    expected_deleted = set()
+    for router_index in range(len(routers)):
+      router_jobs = [i for i in reversed(range(job_count)) if i % len(routers) == router_index]  # newest first
+      for rank, i in enumerate(router_jobs):
+        if (job_count - i) * 120 / job_count > max_age_days + 0.01 or rank >= max_jobs_per_router: expected_deleted.add(job_ids[i])
+    actually_deleted = set(jobs_before) - set(remaining)
+    if running.job_id not in remaining or find_job_file(storage_path, running.job_id) != running.job_file_path: failures.append("Running job was deleted or compressed")
+    if not expected_deleted <= actually_deleted: failures.append(f"{len(expected_deleted - actually_deleted)} jobs beyond max age / max jobs per router were not deleted")
+    for router in routers:
+      finished_count = sum(1 for job_id in remaining if job_id != running.job_id and job_ids.index(job_id) % len(routers) == routers.index(router))
+      if finished_count > max_jobs_per_router: failures.append(f"Router '{router}' has {finished_count} finished jobs, limit {max_jobs_per_router}")
+    compressed_paths = [find_job_file(storage_path, job_id) for job_id in remaining if job_id != running.job_id]
+    if not all(path and path.endswith(".gz") for path in compressed_paths): failures.append("Not all remaining finished job files are compressed")
+    ratio = sum(len(logs_before[job_id].encode("utf-8")) for job_id in remaining if job_id in logs_before) / max(1, sum(os.path.getsize(path) for path in compressed_paths if path))
+    print(f"  compression:  {len(compressed_paths):,} job files, ratio {ratio:.1f}x")
+
+    # Transparent reads
+    read_start = time.perf_counter()
+    mismatches = [job_id for job_id in remaining if job_id in logs_before and read_job_log(storage_path, job_id) != logs_before[job_id]]
+    read_elapsed = time.perf_counter() - read_start
+    print(f"  read_job_log: {len(remaining) - 1:,} compressed job logs in {read_elapsed:.2f} secs, {len(mismatches)} mismatches")
+    if mismatches: failures.append(f"read_job_log returned different content for {len(mismatches)} compressed jobs")
+    sample = [job_id for job_id in remaining if job_id in logs_before][:20]
+    streamed = {job_id: asyncio.run(read_stream(find_job_file(storage_path, job_id))) for job_id in sample}
+    if any(streamed[job_id] != logs_before[job_id] for job_id in sample): failures.append("follow_job_log returned different content for compressed jobs")
+    if comparable(remaining[job_id] for job_id in sample) != comparable(jobs_before[job_id] for job_id in sample): failures.append("list_jobs returned different metadata for compressed jobs")
+    if comparable(find_job_by_id(storage_path, job_id) for job_id in sample) != comparable(jobs_before[job_id] for job_id in sample): failures.append("find_job_by_id returned different metadata for compressed jobs")
+    summary_start = time.perf_counter()
+    summaries = {job_id: read_job_last_log(storage_path, job_id) for job_id in remaining if job_id in logs_before}
+    summary_elapsed = time.perf_counter() - summary_start
+    print(f"  last log:     {len(summaries):,} summaries from the job catalog in {summary_elapsed:.2f} secs")
+    if any(summaries[job_id] != get_last_log_line(logs_before[job_id]) for job_id in summaries): failures.append("read_job_last_log differs from the last log line of the job file")
+    if comparable(list_jobs(storage_path)) != comparable(_scan_jobs(storage_path)): failures.append("Job catalog differs from the job files after retention")
+    rebuild_job_catalog(storage_path)
+    if any(summaries[job_id] != read_job_last_log(storage_path, job_id) for job_id in summaries): failures.append("Job catalog summary differs after rebuild")
+
+    # Max total bytes
+    metrics = get_job_retention_metrics(storage_path)
+    CRAWLER_HARDCODED_CONFIG.JOB_RETENTION_MAX_TOTAL_MB = 1
+    result = apply_job_retention(storage_path)
+    metrics_after = get_job_retention_metrics(storage_path)
+    print(f"  max total:    {metrics['bytes_total']:,} -> {metrics_after['bytes_total']:,} bytes (limit 1 MB), {result['jobs_deleted']:,} jobs deleted")
+    if metrics["bytes_total"] > 1024 * 1024 and result["jobs_deleted"] == 0: failures.append("No jobs deleted for JOB_RETENTION_MAX_TOTAL_MB")
+    if metrics_after["bytes_total"] > 1024 * 1024 and metrics_after["job_files"] > 1: failures.append("Job files exceed JOB_RETENTION_MAX_TOTAL_MB")
+    if running.job_id not in {job.job_id for job in list_jobs(storage_path)}: failures.append("Running job was deleted for JOB_RETENTION_MAX_TOTAL_MB")
+    print(f"  totals:       {metrics_after['totals']}")
+    if metrics_after["totals"].get("bytes_reclaimed") != metrics_before["bytes_total"] - metrics_after["bytes_total"]: failures.append("Total bytes reclaimed does not match the job files")
+
+    # Scheduled runs: 4 concurrent worker processes, one run
+    CRAWLER_HARDCODED_CONFIG.JOB_RETENTION_INTERVAL_MINUTES = 60
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(run_scheduled_job_retention(storage_path))) for _ in range(4)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    runs = sum(1 for result in results if result is not None)
+    print(f"  scheduled:    {runs} of {len(threads)} concurrent callers ran job retention")
+    if runs != 1: failures.append(f"Scheduled retention ran {runs} times, expected 1")
+    running.emit_end(ok=True, data={})
+    running.finalize()
+  finally:
+    shutil.rmtree(storage_path, ignore_errors=True)
+  print("=" * 100)
+  for failure in failures: print(f"  FAIL: {failure}")
+  print(f"RESULT: {'FAILED' if failures else 'PASSED'}")
+  print("=" * 100)
+  sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+  main()
+
+# ----------------------------------------- END: Benchmark -----------------------------------------------------------
@@ -0,0 +1,176 @@
+# Benchmark script for the job runner in common_job_runner_functions_v2.py
+#
+# Registers a test job type (JOB_STEPS steps of STEP_SECONDS with check_control() per step) in the 'crawler' router and checks:
+#   - submit:    returns the job_id immediately, at most JOB_RUNNER_MAX_CONCURRENT_JOBS['crawler'] jobs run at the same time
+#   - priority:  queued jobs start in priority order (higher first, then oldest first)
+#   - cancel:    create_control_file(cancel) on a queued job ends it as .cancelled without running it
+#   - resume:    create_control_file(resume) on a queued job starts it regardless of the limit
+#   - detach:    a job keeps running when the client stops reading the SSE stream (previous request-bound stream: job
+#                file stays .running forever)
+#   - take over: jobs queued by a runner that stopped (no heartbeat) are run by another runner
+#
+# Run: python tests/benchmark_job_runner_v2.py [JOB_COUNT]
+#
+# No credentials or network access required.
+#
+# Output: Script-level logging per LOGGING-RULES-SCRIPT-LEVEL.md
+# - One line per check
+# - Final: RESULT: PASSED if all checks pass, else RESULT: FAILED
+
+import asyncio, shutil, sys, tempfile, time
+from pathlib import Path
+
+# Project root is parent of tests/
+project_root = Path(__file__).parent.parent
+
+# Add src to path for imports
+sys.path.insert(0, str(project_root / 'src'))
+
+from hardcoded_config import CRAWLER_HARDCODED_CONFIG
+import routers_v2.common_job_runner_functions_v2 as job_runner
+from routers_v2.common_job_functions_v2 import ControlAction, StreamingJobWriter, create_control_file, find_job_by_id, get_job_catalog
+from routers_v2.common_job_monitor_functions_v2 import follow_job_log
+from routers_v2.common_job_runner_functions_v2 import JobRunner, register_job_type
+
+# ----------------------------------------- START: Configuration -----------------------------------------------------
+
+job_count = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+job_steps = 5
+step_seconds = 0.1
+job_limit = CRAWLER_HARDCODED_CONFIG.JOB_RUNNER_MAX_CONCURRENT_JOBS["crawler"]
+
+# ----------------------------------------- END: Configuration -------------------------------------------------------
+
+
+# ----------------------------------------- START: Test Job ----------------------------------------------------------
+
+running_now = 0
+max_running = 0
+start_order: list[str] = []
+
+async def _test_job(writer: StreamingJobWriter, params: dict, context):
+  global running_now, max_running
+  running_now += 1
+  max_running = max(max_running, running_now)
+  start_order.append(params["name"])
+  try:
+    for step in range(job_steps):
+      await asyncio.sleep(step_seconds)
+      yield writer.emit_log(f"[ {step + 1} / {job_steps} ] {params['name']}")
+      async for control in writer.check_control():
+        if control == ControlAction.CANCEL:
+          yield writer.emit_end(ok=False, error="Cancelled by user.", data={}, cancelled=True)
+          return
+    yield writer.emit_end(ok=True, data={"name": params["name"]})
+  finally:
+    running_now -= 1
+
+register_job_type("benchmark.test", "crawler", "test", _test_job)
+
+async def legacy_stream(storage_path: str):
+  """Previous endpoint pattern: the job runs inside the StreamingResponse generator."""
+  writer = StreamingJobWriter(storage_path, "crawler", "test", "LEGACY", "/v2/benchmark", "/v2")
+  try:
+    yield writer.emit_start()
+    async for sse in _test_job(writer, {"name": "legacy"}, None): yield sse
+  finally:
+    writer.finalize()
+
+# ----------------------------------------- END: Test Job ------------------------------------------------------------
+
+
+# ----------------------------------------- START: Benchmark ---------------------------------------------------------
+
+def job_state(storage_path: str, job_id: str) -> str:
+  job = find_job_by_id(storage_path, job_id)
+  return job.state if job else "missing"
+
+async def wait_for(check, timeout: float = 30.0) -> bool:
+  deadline = time.perf_counter() + timeout
+  while time.perf_counter() < deadline:
+    if check(): return True
+    await asyncio.sleep(0.05)
+  return False
+
+async def run_checks(storage_path: str, failures: list) -> None:
+  runner = job_runner.get_job_runner(storage_path)
+
+  # Submit + limit + priority
+  submit_start = time.perf_counter()
+  writers = [runner.submit("benchmark.test", {"name": f"job{i}"}, f"JOB{i}", "/v2/benchmark", "/v2", priority=i % 3) for i in range(job_count)]
+  submit_elapsed = time.perf_counter() - submit_start
+  print(f"  submit:    {job_count} jobs in {1000 * submit_elapsed:.1f} ms ({1000 * submit_elapsed / job_count:.1f} ms per job)")
+  queued = [w for w in writers if runner.get_queue_position(w.job_id) is not None]
+  if len(queued) != max(0, job_count - job_limit): failures.append(f"{len(queued)} jobs queued, expected {job_count - job_limit}")
+  if any(job_state(storage_path, w.job_id) != "paused" for w in queued): failures.append("Queued jobs do not have a .paused job file")
+  cancel_writer, resume_writer = queued[-1], queued[-2]
+  create_control_file(storage_path, cancel_writer.job_id, "cancel")
+  create_control_file(storage_path, resume_writer.job_id, "resume")
+  done = await wait_for(lambda: all(job_state(storage_path, w.job_id) in ["completed", "cancelled"] for w in writers))
+  if not done: failures.append("Not all jobs finished")
+  print(f"  limit:     max {max_running} jobs running at the same time (limit {job_limit}, +1 resumed queued job)")
+  if max_running > job_limit + 1: failures.append(f"{max_running} jobs ran at the same time, limit {job_limit}")
+  if job_state(storage_path, cancel_writer.job_id) != "cancelled" or f"job{writers.index(cancel_writer)}" in start_order: failures.append("Cancelled queued job ran or is not .cancelled")
+  print(f"  cancel:    queued job {cancel_writer.job_id} -> {job_state(storage_path, cancel_writer.job_id)}")
+  resumed_name = f"job{writers.index(resume_writer)}"
+  resumed_position = start_order.index(resumed_name) if resumed_name in start_order else -1
+  print(f"  resume:    queued job {resume_writer.job_id} started as #{resumed_position + 1} of {len(start_order)}")
+  if resumed_position < 0 or resumed_position > job_limit: failures.append("Resumed queued job did not start immediately")
+  # Jobs queued before cancel/resume: priority order
+  expected = [f"job{i}" for i in sorted(range(job_limit, job_count), key=lambda i: (-(i % 3), i)) if writers[i] not in (cancel_writer, resume_writer)]
+  actual = [name for name in start_order[job_limit:] if name != resumed_name]
+  print(f"  priority:  start order {actual}")
+  if actual != expected: failures.append(f"Queued jobs started in order {actual}, expected {expected}")
+
+  # Detach: client reads the first event only
+  start_order.clear()
+  stream = legacy_stream(storage_path)
+  first = await stream.__anext__()
+  legacy_job_id = first.split('"job_id": "')[1].split('"')[0]
+  await stream.aclose()
+  writer = runner.submit("benchmark.test", {"name": "detached"}, "DETACHED", "/v2/benchmark", "/v2")
+  stream = follow_job_log(writer.job_file_path)
+  await stream.__anext__()
+  await stream.aclose()
+  await wait_for(lambda: job_state(storage_path, writer.job_id) == "completed", 10)
+  print(f"  detach:    request-bound job -> {job_state(storage_path, legacy_job_id)}, runner job -> {job_state(storage_path, writer.job_id)}")
+  if job_state(storage_path, writer.job_id) != "completed": failures.append("Runner job did not complete after the client disconnected")
+
+async def run_take_over(storage_path: str, failures: list) -> None:
+  # Runner A queues jobs and stops (process exit: no maintenance, job files closed)
+  stopped = JobRunner(storage_path)
+  stopped._running["crawler"] = {f"busy{i}" for i in range(job_limit)}
+  writers = [stopped.submit("benchmark.test", {"name": f"orphan{i}"}, f"ORPHAN{i}", "/v2/benchmark", "/v2") for i in range(3)]
+  stopped._maintenance_task.cancel()
+  for job in stopped._jobs.values(): job.writer._close_file()
+  catalog = get_job_catalog(storage_path)
+  catalog.touch_queued_jobs(stopped.owner, time.time() - job_runner.STALE_AFTER_SECONDS - 1)
+  # Runner B takes the jobs over on its first heartbeat
+  take_over_start = time.perf_counter()
+  JobRunner(storage_path).start()
+  done = await wait_for(lambda: all(job_state(storage_path, w.job_id) == "completed" for w in writers))
+  print(f"  take over: {len(writers)} orphaned queued jobs completed by another runner in {time.perf_counter() - take_over_start:.1f} secs")
+  if not done: failures.append("Orphaned queued jobs were not taken over")
+  if catalog.list_queued_jobs(): failures.append("job_queue table not empty after all jobs finished")
+
+def main():
+  print("=" * 100)
+  print(f"START: Job runner benchmark ({job_count} jobs, limit {job_limit} per router)")
+  print("=" * 100)
+  failures = []
+  storage_path = tempfile.mkdtemp(prefix="job_runner_benchmark_")
+  try:
+    asyncio.run(run_checks(storage_path, failures))
+    asyncio.run(run_take_over(storage_path, failures))
+  finally:
+    shutil.rmtree(storage_path, ignore_errors=True)
+  print("=" * 100)
+  for failure in failures: print(f"  FAIL: {failure}")
+  print(f"RESULT: {'FAILED' if failures else 'PASSED'}")
+  print("=" * 100)
+  sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+  main()
+
+# ----------------------------------------- END: Benchmark -----------------------------------------------------------
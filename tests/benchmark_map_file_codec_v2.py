@@ -0,0 +1,168 @@
+# Benchmark script for the map row codec in common_map_file_functions_v2.py (MapFileWriter, read_files_map)
+#
+# Compares the previous per-row implementation (kept below as legacy_*) with the current one on a synthetic files_map.csv:
+#   - write: legacy = fields() + asdict() per row, flush every 10 rows | current = MapRowCodec tuples, flush every APPEND_TO_MAP_FILES_EVERY_X_BYTES
+#   - read:  legacy = csv.DictReader + per-cell type check            | current = csv.reader + precomputed int columns
+#   - memory of the parsed rows: legacy = dataclass with __dict__      | current = slotted FilesMapRow
+# Both writers must produce identical files and both readers identical rows.
+#
+# Run: python tests/benchmark_map_file_codec_v2.py [ROW_COUNT]     e.g. python tests/benchmark_map_file_codec_v2.py 50000
+#
+# No credentials or network access required.
+#
+# Output: Script-level logging per LOGGING-RULES-SCRIPT-LEVEL.md
+# - One line per measurement with elapsed time (or memory) of both paths and the speedup
+# - Final: RESULT: PASSED if outputs match and the current paths are faster, else RESULT: FAILED
+
+import csv, filecmp, gc, os, shutil, sys, tempfile, time, tracemalloc
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+
+# Project root is parent of tests/
+project_root = Path(__file__).parent.parent
+
+# Add src to path for imports
+sys.path.insert(0, str(project_root / 'src'))
+
+from routers_v2.common_map_file_functions_v2 import FilesMapRow, MapFileWriter, read_files_map
+
+# ----------------------------------------- START: Configuration -----------------------------------------------------
+
+row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 250000
+# Minimum speedup of the current write and read paths vs the legacy paths
+minimum_expected_speedup = 1.5
+
+# ----------------------------------------- END: Configuration -------------------------------------------------------
+
+
+# ----------------------------------------- START: Legacy Implementation ---------------------------------------------
+
+@dataclass
+class LegacyFilesMapRow:
+  sharepoint_listitem_id: int
+  sharepoint_unique_file_id: str
+  filename: str
+  file_type: str
+  server_relative_url: str
+  file_relative_path: str
+  file_size: int
+  last_modified_utc: str
+  last_modified_timestamp: int
+  downloaded_utc: str
+  downloaded_timestamp: int
+  sharepoint_error: str
+  processing_error: str
+
+def legacy_write_map(filepath: str, rows: list, row_class: type = FilesMapRow, buffer_size: int = 10) -> None:
+  with open(filepath, 'w', newline='', encoding='utf-8') as f:
+    csv.writer(f).writerow([f.name for f in fields(row_class)])
+  file_handle = open(filepath, 'a', newline='', encoding='utf-8')
+  csv_writer = csv.writer(file_handle)
+  buffer = []
+  def flush():
+    for row in buffer:
+      row_dict = asdict(row) if hasattr(row, '__dataclass_fields__') else row
+      field_names = [f.name for f in fields(row_class)]
+      csv_writer.writerow([row_dict.get(name, '') for name in field_names])
+    file_handle.flush()
+    buffer.clear()
+  for row in rows:
+    buffer.append(row)
+    if len(buffer) >= buffer_size: flush()
+  flush()
+  file_handle.close()
+
+def _legacy_parse_int(value: str, default: int = 0) -> int:
+  if not value or value.strip() == '': return default
+  try: return int(value)
+  except (ValueError, TypeError): return default
+
+def legacy_read_map(filepath: str, row_class: type) -> list:
+  result = []
+  field_info = {f.name: f.type for f in fields(row_class)}
+  with open(filepath, 'r', newline='', encoding='utf-8') as f:
+    for row in csv.DictReader(f):
+      kwargs = {}
+      for name, ftype in field_info.items():
+        value = row.get(name, '')
+        if ftype == int: kwargs[name] = _legacy_parse_int(value)
+        else: kwargs[name] = value if value is not None else ''
+      result.append(row_class(**kwargs))
+  return result
+
+# ----------------------------------------- END: Legacy Implementation -----------------------------------------------
+
+
+# ----------------------------------------- START: Benchmark ---------------------------------------------------------
+
+def create_row(i: int) -> FilesMapRow:
+  return FilesMapRow(sharepoint_listitem_id=i + 1, sharepoint_unique_file_id=f"00000000-0000-0000-0000-{i:012d}", filename=f"document_{i:07d}.pdf", file_type="pdf", server_relative_url=f"/sites/bench/Docs/Folder {i % 100}/document_{i:07d}.pdf", file_relative_path=f"bench/01_files/docs/02_embedded/Folder {i % 100}/document_{i:07d}.pdf", file_size=1000 + i, last_modified_utc="2026-01-01T00:00:00.000Z", last_modified_timestamp=1767225600, downloaded_utc="2026-01-02T00:00:00.000Z", downloaded_timestamp=1767312000, sharepoint_error="" if i % 50 else "403 Forbidden, \"quoted\"", processing_error="")
+
+def write_map(filepath: str, rows: list) -> None:
+  map_writer = MapFileWriter(filepath, FilesMapRow)
+  map_writer.write_header()
+  for row in rows: map_writer.append_row(row)
+  map_writer.finalize()
+
+def timed(func) -> tuple[float, object]:
+  gc.collect()
+  start = time.perf_counter()
+  value = func()
+  return time.perf_counter() - start, value
+
+def measure_memory(func) -> tuple[int, object]:
+  """Bytes still allocated by the result of func()."""
+  gc.collect()
+  tracemalloc.start()
+  value = func()
+  current, _ = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  return current, value
+
+def print_comparison(label: str, legacy_elapsed: float, current_elapsed: float) -> float:
+  speedup = legacy_elapsed / current_elapsed if current_elapsed > 0 else 0.0
+  print(f"  {label:<8} legacy {legacy_elapsed:8.3f} secs | current {current_elapsed:8.3f} secs | speedup {speedup:.1f}x")
+  return speedup
+
+def main():
+  print("=" * 100)
+  print(f"START: Map file codec benchmark ({row_count:,} files_map rows)")
+  print("=" * 100)
+  failures = []
+  folder = tempfile.mkdtemp(prefix="map_file_codec_benchmark_")
+  try:
+    rows = [create_row(i) for i in range(row_count)]
+    legacy_path, current_path = os.path.join(folder, "files_map_legacy.csv"), os.path.join(folder, "files_map.csv")
+
+    legacy_write_elapsed, _ = timed(lambda: legacy_write_map(legacy_path, rows))
+    current_write_elapsed, _ = timed(lambda: write_map(current_path, rows))
+    write_speedup = print_comparison("write:", legacy_write_elapsed, current_write_elapsed)
+    if not filecmp.cmp(legacy_path, current_path, shallow=False): failures.append("Current MapFileWriter output differs from the legacy output")
+
+    legacy_read_elapsed, legacy_rows = timed(lambda: legacy_read_map(current_path, FilesMapRow))
+    current_read_elapsed, current_rows = timed(lambda: read_files_map(current_path))
+    read_speedup = print_comparison("read:", legacy_read_elapsed, current_read_elapsed)
+    if current_rows != legacy_rows or current_rows != rows: failures.append("read_files_map() returned different rows than the legacy reader")
+    del legacy_rows, current_rows
+
+    legacy_bytes, legacy_rows = measure_memory(lambda: legacy_read_map(current_path, LegacyFilesMapRow))
+    del legacy_rows
+    current_bytes, current_rows = measure_memory(lambda: read_files_map(current_path))
+    del current_rows
+    print(f"  memory:  legacy {legacy_bytes / 1048576:8.1f} MB   | current {current_bytes / 1048576:8.1f} MB   | {legacy_bytes / current_bytes:.2f}x smaller")
+
+    if write_speedup < minimum_expected_speedup: failures.append(f"Write speedup is {write_speedup:.1f}x, expected at least {minimum_expected_speedup:.1f}x")
+    if read_speedup < minimum_expected_speedup: failures.append(f"Read speedup is {read_speedup:.1f}x, expected at least {minimum_expected_speedup:.1f}x")
+    if current_bytes >= legacy_bytes: failures.append("Slotted rows do not use less memory than dataclass rows with __dict__")
+  finally:
+    shutil.rmtree(folder, ignore_errors=True)
+  print("=" * 100)
+  for failure in failures: print(f"  FAIL: {failure}")
+  print(f"RESULT: {'FAILED' if failures else 'PASSED'}")
+  print("=" * 100)
+  sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+  main()
+
+# ----------------------------------------- END: Benchmark -----------------------------------------------------------
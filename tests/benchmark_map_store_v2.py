@@ -0,0 +1,169 @@
+# Benchmark script for the SQLite map store in common_map_store_functions_v2.py (CRAWLER_MAP_STORE_BACKEND="sqlite")
+#
+# Writes a synthetic files_map.csv with MapFileWriter (with and without store) for each row count and compares:
+#   - full read:   read_files_map() parsing the CSV file vs serving the rows from the store
+#   - lookup:      finding rows by sharepoint_unique_file_id (CSV: parse the file + dict, store: indexed get_rows)
+#   - first write: MapFileWriter with all rows (CSV: write the file, store: insert all rows and indexes, one-time cost per
+#                  map, about 1.5x the CSV file write)
+#   - next crawl:  MapFileWriter with a few changed, removed and added rows (CSV: rewrite the whole file, store: unchanged
+#                  rows are skipped by row hash, only the differences are upserted/deleted, no CSV file is written;
+#                  hashing every row in Python bounds the gain to about 1.5x)
+#   - export:      export_outdated_map_csvs() must write the same rows as the store, and nothing when nothing changed
+# Also checks that rows with duplicate ids are kept and that a CSV file changed outside the store (manual edit) is read
+# from the CSV file again. Speedups are checked at the largest row count if it has at least minimum_rows_for_speedup_checks
+# rows (below that, parsing a small CSV file is as fast as a database round trip).
+#
+# Run: python tests/benchmark_map_store_v2.py [ROW_COUNTS]     e.g. python tests/benchmark_map_store_v2.py 10000,100000
+#
+# No credentials or network access required.
+#
+# Output: Script-level logging per LOGGING-RULES-SCRIPT-LEVEL.md
+# - One block per row count with elapsed times of both backends
+# - Final: RESULT: PASSED if the store returns the same rows, writes only differences and lookups/next crawl writes are faster, else RESULT: FAILED
+
+import os, random, shutil, sys, tempfile, time
+from pathlib import Path
+
+# Project root is parent of tests/
+project_root = Path(__file__).parent.parent
+
+# Add src to path for imports
+sys.path.insert(0, str(project_root / 'src'))
+
+from hardcoded_config import CRAWLER_HARDCODED_CONFIG
+from routers_v2.common_map_file_functions_v2 import FilesMapRow, MapFileWriter, read_files_map
+from routers_v2.common_map_store_functions_v2 import SqliteMapStore, export_outdated_map_csvs
+
+# ----------------------------------------- START: Configuration -----------------------------------------------------
+
+row_counts = [int(x) for x in sys.argv[1].split(",")] if len(sys.argv) > 1 else [10000, 100000, 1000000]
+lookup_count = 1000
+update_count = 100
+# Minimum speedups vs the CSV file at the largest row count: store lookups, next crawl write (differences only vs rewriting the file)
+minimum_expected_speedup = 10.0
+minimum_expected_rewrite_speedup = 1.25
+minimum_rows_for_speedup_checks = 10000
+
+# ----------------------------------------- END: Configuration -------------------------------------------------------
+
+
+# ----------------------------------------- START: Benchmark ---------------------------------------------------------
+
+def create_row(i: int, version: int = 0) -> FilesMapRow:
+  return FilesMapRow(sharepoint_listitem_id=i + 1, sharepoint_unique_file_id=f"00000000-0000-0000-0000-{i:012d}", filename=f"document_{i:07d}.pdf", file_type="pdf", server_relative_url=f"/sites/bench/Docs/Folder {i % 100}/document_{i:07d}.pdf", file_relative_path=f"bench/01_files/docs/02_embedded/Folder {i % 100}/document_{i:07d}.pdf", file_size=1000 + i + version, last_modified_utc="2026-01-01T00:00:00.000Z", last_modified_timestamp=1767225600 + version, downloaded_utc="2026-01-02T00:00:00.000Z", downloaded_timestamp=1767312000, sharepoint_error="", processing_error="")
+
+def write_map(filepath: str, rows: list, store: SqliteMapStore = None) -> MapFileWriter:
+  map_writer = MapFileWriter(filepath, FilesMapRow, store=store)
+  map_writer.write_header()
+  for row in rows: map_writer.append_row(row)
+  map_writer.finalize()
+  return map_writer
+
+def timed(func) -> tuple[float, object]:
+  start = time.perf_counter()
+  value = func()
+  return time.perf_counter() - start, value
+
+def run_row_count(row_count: int, folder: str) -> tuple[list, float, float]:
+  """Returns (failures, lookup_speedup, rewrite_speedup)."""
+  failures = []
+  map_name = CRAWLER_HARDCODED_CONFIG.FILE_MAP_CSV
+  csv_folder, store_folder = os.path.join(folder, "csv"), os.path.join(folder, "store")
+  csv_path, store_csv_path = os.path.join(csv_folder, map_name), os.path.join(store_folder, map_name)
+  store = SqliteMapStore(os.path.join(store_folder, CRAWLER_HARDCODED_CONFIG.MAP_STORE_SQLITE))
+  rows = [create_row(i) for i in range(row_count)]
+  print(f"  {row_count:,} rows")
+
+  csv_write_elapsed, _ = timed(lambda: write_map(csv_path, rows))
+  store_write_elapsed, _ = timed(lambda: write_map(store_csv_path, rows, store))
+  print(f"    first write:            csv {csv_write_elapsed:8.3f} secs | store       {store_write_elapsed:8.3f} secs")
+  if os.path.exists(store_csv_path): failures.append(f"{row_count}: MapFileWriter with store wrote the CSV file")
+
+  csv_read_elapsed, csv_rows = timed(lambda: read_files_map(csv_path))
+  store_read_elapsed, store_rows = timed(lambda: read_files_map(store_csv_path, store))
+  print(f"    full read:              csv {csv_read_elapsed:8.3f} secs | store       {store_read_elapsed:8.3f} secs")
+  if store_rows != csv_rows or store_rows != rows: failures.append(f"{row_count}: store rows differ from CSV rows")
+
+  lookup_ids = [rows[i].sharepoint_unique_file_id for i in random.Random(1).sample(range(row_count), min(lookup_count, row_count))]
+  def csv_lookup():
+    by_uid = {row.sharepoint_unique_file_id: row for row in read_files_map(csv_path)}
+    return {uid: by_uid[uid] for uid in lookup_ids}
+  csv_lookup_elapsed, csv_found = timed(csv_lookup)
+  store_lookup_elapsed, store_found = timed(lambda: store.get_rows(map_name, lookup_ids))
+  single_elapsed, single_row = timed(lambda: store.get_row(map_name, lookup_ids[0]))
+  print(f"    lookup {len(lookup_ids)} ids:        csv {csv_lookup_elapsed:8.3f} secs | store       {store_lookup_elapsed:8.3f} secs (single get_row {single_elapsed * 1000:.2f} ms)")
+  if csv_found != store_found or single_row != csv_found[lookup_ids[0]]: failures.append(f"{row_count}: store lookup returned different rows")
+
+  # Next crawl: update_count rows changed, update_count removed, update_count added (appended, as the store keeps positions)
+  sample = random.Random(2).sample(range(row_count), min(2 * update_count, row_count))
+  changed_indexes, removed_indexes = set(sample[:len(sample) // 2]), set(sample[len(sample) // 2:])
+  added = [create_row(row_count + i) for i in range(update_count)]
+  next_rows = [create_row(i, version=1) if i in changed_indexes else row for i, row in enumerate(rows) if i not in removed_indexes] + added
+  csv_rewrite_elapsed, _ = timed(lambda: write_map(csv_path, next_rows))
+  store_rewrite_elapsed, store_writer = timed(lambda: write_map(store_csv_path, next_rows, store))
+  print(f"    next crawl (MapFileWriter, {len(changed_indexes)} changed, {len(removed_indexes)} removed, {len(added)} added): csv {csv_rewrite_elapsed:8.3f} secs | store {store_rewrite_elapsed:8.3f} secs ({store_writer.rows_upserted} upserted, {store_writer.rows_deleted} deleted)")
+  if (store_writer.rows_upserted, store_writer.rows_deleted) != (len(changed_indexes) + len(added), len(removed_indexes)): failures.append(f"{row_count}: store wrote {store_writer.rows_upserted} rows and deleted {store_writer.rows_deleted}, expected only the differences")
+  if read_files_map(store_csv_path, store) != next_rows: failures.append(f"{row_count}: store rows after the next crawl differ")
+
+  single_changed = {row.sharepoint_unique_file_id: row for row in added[:1]}
+  single_elapsed, _ = timed(lambda: store.upsert_rows(map_name, single_changed.values()))
+  print(f"    upsert_rows 1 row:      {single_elapsed * 1000:8.2f} ms")
+
+  export_elapsed, exported = timed(lambda: export_outdated_map_csvs(store_folder, store))
+  print(f"    export on demand:       {export_elapsed:8.3f} secs ({exported.get(map_name, 0):,} rows)")
+  if read_files_map(store_csv_path) != next_rows: failures.append(f"{row_count}: exported CSV does not match the store rows")
+  if export_outdated_map_csvs(store_folder, store): failures.append(f"{row_count}: CSV file exported again without changes")
+
+  # The CSV file was changed outside the store: reads must come from the CSV file again
+  with open(store_csv_path, 'a', encoding='utf-8') as f: f.write("")
+  os.utime(store_csv_path, ns=(time.time_ns(), time.time_ns()))
+  if store.read_rows(map_name, store_csv_path) is not None: failures.append(f"{row_count}: store served rows for a CSV file changed outside the store")
+
+  lookup_speedup = csv_lookup_elapsed / store_lookup_elapsed if store_lookup_elapsed > 0 else 0.0
+  rewrite_speedup = csv_rewrite_elapsed / store_rewrite_elapsed if store_rewrite_elapsed > 0 else 0.0
+  print(f"    speedup:                lookup {lookup_speedup:,.0f}x, next crawl write {rewrite_speedup:.1f}x, full read {csv_read_elapsed / store_read_elapsed:.1f}x")
+  return failures, lookup_speedup, rewrite_speedup
+
+def check_duplicate_ids(folder: str) -> list:
+  """Rows with the same sharepoint_unique_file_id are kept in write order, as in the CSV file."""
+  failures = []
+  csv_path = os.path.join(folder, CRAWLER_HARDCODED_CONFIG.FILE_MAP_CSV)
+  store = SqliteMapStore(os.path.join(folder, CRAWLER_HARDCODED_CONFIG.MAP_STORE_SQLITE))
+  rows = [create_row(i) for i in range(10)] + [create_row(3, version=1), create_row(3, version=2)]
+  for expected in (rows, rows[:-1]):
+    write_map(csv_path, expected, store)
+    if read_files_map(csv_path, store) != expected: failures.append(f"Store did not keep {len(expected) - 10} duplicate id rows")
+  export_outdated_map_csvs(folder, store)
+  if read_files_map(csv_path) != rows[:-1]: failures.append("Exported CSV file does not keep duplicate id rows")
+  print(f"  duplicate ids: {'kept' if not failures else 'NOT kept'}")
+  return failures
+
+def main():
+  print("=" * 100)
+  print(f"START: Map store benchmark ({', '.join(f'{n:,}' for n in row_counts)} rows)")
+  print("=" * 100)
+  failures, speedups = [], (0.0, 0.0)
+  for row_count in row_counts:
+    folder = tempfile.mkdtemp(prefix="map_store_benchmark_")
+    try:
+      row_failures, *speedups = run_row_count(row_count, folder)
+      failures.extend(row_failures)
+    finally:
+      shutil.rmtree(folder, ignore_errors=True)
+  folder = tempfile.mkdtemp(prefix="map_store_benchmark_")
+  try: failures.extend(check_duplicate_ids(folder))
+  finally: shutil.rmtree(folder, ignore_errors=True)
+  lookup_speedup, rewrite_speedup = speedups
+  if row_counts[-1] < minimum_rows_for_speedup_checks: print(f"  Speedups not checked below {minimum_rows_for_speedup_checks:,} rows")
+  elif lookup_speedup < minimum_expected_speedup: failures.append(f"Lookup speedup is {lookup_speedup:.1f}x, expected at least {minimum_expected_speedup:.1f}x")
+  if row_counts[-1] >= minimum_rows_for_speedup_checks and rewrite_speedup < minimum_expected_rewrite_speedup: failures.append(f"Next crawl write speedup is {rewrite_speedup:.1f}x, expected at least {minimum_expected_rewrite_speedup:.1f}x")
+  print("=" * 100)
+  for failure in failures: print(f"  FAIL: {failure}")
+  print(f"RESULT: {'FAILED' if failures else 'PASSED'}")
+  print("=" * 100)
+  sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+  main()
+
+# ----------------------------------------- END: Benchmark -----------------------------------------------------------
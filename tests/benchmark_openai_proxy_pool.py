@@ -0,0 +1,165 @@
+# Load test for the pooled HTTP client of the OpenAI proxy in routers_static/openai_proxy.py
+#
+# Starts a local fake Azure OpenAI endpoint (uvicorn, plain HTTP, UPSTREAM_LATENCY secs per request) and sends
+# REQUEST_COUNT chat completions through proxy_request() with CONCURRENCY requests at a time:
+#   - per request:  new httpx.AsyncClient per proxied request (previous proxy_request)
+#   - pooled:       shared app-scoped client (get_openai_proxy_http_client)
+# Measures p50 / p99 latency, requests/s and the number of TCP connections the upstream saw.
+# Checks:
+#   - event streams are passed through completely and return their connection to the pool when they end
+#   - a stream the client stops reading early is closed (no connection left active)
+#
+# Run: python tests/benchmark_openai_proxy_pool.py [REQUEST_COUNT]     e.g. python tests/benchmark_openai_proxy_pool.py 1000
+#
+# No credentials or network access required. TLS is not part of the local test: against the real endpoint the pooled
+# client also saves the TLS handshake of every request.
+#
+# Output: Script-level logging per LOGGING-RULES-SCRIPT-LEVEL.md
+# - One line per mode with latency, throughput and upstream connections
+# - Final: RESULT: PASSED if the pooled client is faster, reuses connections and all checks pass, else RESULT: FAILED
+
+import asyncio, contextvars, json, logging, socket, sys, threading, time
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx, uvicorn
+
+# Project root is parent of tests/
+project_root = Path(__file__).parent.parent
+
+# Add src to path for imports
+sys.path.insert(0, str(project_root / 'src'))
+
+from routers_static import openai_proxy
+
+# ----------------------------------------- START: Configuration -----------------------------------------------------
+
+request_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+concurrency = 10
+upstream_latency = 0.005
+stream_events = 20
+
+# ----------------------------------------- END: Configuration -------------------------------------------------------
+
+
+# ----------------------------------------- START: Benchmark ---------------------------------------------------------
+
+upstream_connections = set()
+
+async def fake_upstream(scope, receive, send):
+  """Azure OpenAI chat completions: JSON, or an event stream if the request body has "stream": true."""
+  if scope["type"] != "http": return
+  upstream_connections.add(tuple(scope["client"]))
+  body = b""
+  while True:
+    message = await receive()
+    body += message.get("body", b"")
+    if not message.get("more_body"): break
+  request_data = json.loads(body or b"{}")
+  await asyncio.sleep(upstream_latency)
+  if request_data.get("stream"):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/event-stream")]})
+    for n in range(stream_events):
+      await send({"type": "http.response.body", "body": f"data: {{\"delta\": \"token {n}\"}}\n\n".encode(), "more_body": True})
+      await asyncio.sleep(0.001)
+    await send({"type": "http.response.body", "body": b"data: [DONE]\n\n"})
+    return
+  response_body = json.dumps({"id": "chatcmpl-1", "model": request_data.get("model"), "choices": [{"message": {"role": "assistant", "content": "Hello"}}]}).encode()
+  await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(response_body)).encode())]})
+  await send({"type": "http.response.body", "body": response_body})
+
+def start_upstream() -> tuple[uvicorn.Server, int]:
+  sock = socket.socket()
+  sock.bind(("127.0.0.1", 0))
+  server = uvicorn.Server(uvicorn.Config(fake_upstream, log_level="warning", lifespan="off"))
+  threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True).start()
+  while not server.started: time.sleep(0.01)
+  return server, sock.getsockname()[1]
+
+class ProxyRequest:
+  """Incoming request of a proxy endpoint."""
+  def __init__(self, obj: dict): self._body = json.dumps(obj).encode("utf-8")
+  async def body(self): return self._body
+  @property
+  def headers(self): return {"Content-Type": "application/json"}
+
+# Clients created by the per-request mode for the current request (closed after the request like the previous 'async with')
+_request_clients = contextvars.ContextVar("request_clients")
+
+def per_request_client() -> httpx.AsyncClient:
+  client = httpx.AsyncClient(timeout=httpx.Timeout(300.0))
+  _request_clients.get().append(client)
+  return client
+
+async def proxied_chat_completion(stream: bool = False):
+  return await openai_proxy.proxy_request(ProxyRequest({"model": "gpt-4o-mini", "stream": stream, "messages": [{"role": "user", "content": "Hi"}]}), "chat/completions?api-version=2025-04-01-preview", "POST")
+
+async def run_load(mode: str) -> tuple[list, float]:
+  """(latencies, elapsed secs) of REQUEST_COUNT proxied requests, CONCURRENCY at a time."""
+  latencies, semaphore = [], asyncio.Semaphore(concurrency)
+  async def one():
+    async with semaphore:
+      _request_clients.set([])
+      start = time.perf_counter()
+      response, _ = await proxied_chat_completion()
+      latencies.append(time.perf_counter() - start)
+      if response.status_code != 200: raise RuntimeError(f"HTTP {response.status_code}")
+      for client in _request_clients.get(): await client.aclose()
+  start = time.perf_counter()
+  await asyncio.gather(*(one() for _ in range(request_count)))
+  return latencies, time.perf_counter() - start
+
+def active_connections() -> int:
+  pool = openai_proxy.get_openai_proxy_http_client()._transport._pool
+  return sum(1 for connection in pool.connections if not connection.is_idle())
+
+async def check_streams(failures: list) -> None:
+  response, _ = await proxied_chat_completion(stream=True)
+  chunks = [chunk async for chunk in response.body_iterator]
+  text = b"".join(chunk if isinstance(chunk, bytes) else chunk.encode() for chunk in chunks).decode()
+  if text.count("data: ") != stream_events + 1 or not text.endswith("data: [DONE]\n\n"): failures.append("Event stream was not passed through completely")
+  if active_connections(): failures.append("Connection still active after the event stream ended")
+  response, _ = await proxied_chat_completion(stream=True)
+  await response.body_iterator.__anext__()
+  await response.body_iterator.aclose()
+  if active_connections(): failures.append("Connection still active after the client stopped reading the event stream")
+  print(f"  streams:      {len(chunks)} chunks passed through, {len(openai_proxy.get_openai_proxy_http_client()._transport._pool.connections)} pooled connections, {active_connections()} active")
+
+async def run_benchmark(failures: list) -> dict:
+  results = {}
+  get_pooled_client = openai_proxy.get_openai_proxy_http_client
+  for mode, factory in (("per request", per_request_client), ("pooled", get_pooled_client)):
+    openai_proxy.get_openai_proxy_http_client = factory
+    upstream_connections.clear()
+    latencies, elapsed = await run_load(mode)
+    latencies.sort()
+    results[mode] = (latencies[len(latencies) // 2], latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))], request_count / elapsed, len(upstream_connections))
+    p50, p99, requests_per_second, connections = results[mode]
+    print(f"  {mode + ':':13} p50 {1000 * p50:6.1f} ms | p99 {1000 * p99:6.1f} ms | {requests_per_second:7.1f} requests/s | {connections:,} upstream connections")
+  await check_streams(failures)
+  await openai_proxy.close_openai_proxy_http_client()
+  return results
+
+def main():
+  for logger_name in ("routers_v1.common_logging_functions_v1", "httpx"): logging.getLogger(logger_name).setLevel(logging.WARNING)
+  server, port = start_upstream()
+  openai_proxy.set_config(SimpleNamespace(OPENAI_SERVICE_TYPE="azure_openai", AZURE_OPENAI_ENDPOINT=f"http://127.0.0.1:{port}", AZURE_OPENAI_USE_KEY_AUTHENTICATION=True, AZURE_OPENAI_API_KEY="benchmark-key", AZURE_OPENAI_API_VERSION="2025-04-01-preview"))
+  print("=" * 100)
+  print(f"START: OpenAI proxy HTTP client load test ({request_count:,} requests, concurrency {concurrency}, upstream latency {1000 * upstream_latency:.0f} ms)")
+  print("=" * 100)
+  failures = []
+  try: results = asyncio.run(run_benchmark(failures))
+  finally: server.should_exit = True
+  before, after = results["per request"], results["pooled"]
+  if after[2] <= before[2]: failures.append(f"Pooled client is not faster ({after[2]:.1f} vs {before[2]:.1f} requests/s)")
+  if after[3] > concurrency + 2: failures.append(f"Pooled client opened {after[3]} upstream connections for {concurrency} concurrent requests")
+  print("=" * 100)
+  for failure in failures: print(f"  FAIL: {failure}")
+  print(f"RESULT: {'FAILED' if failures else 'PASSED'}")
+  print("=" * 100)
+  sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+  main()
+
+# ----------------------------------------- END: Benchmark -----------------------------------------------------------
@@ -0,0 +1,188 @@
+# Benchmark script for streaming request and response bodies through proxy_request() in routers_static/openai_proxy.py
+#
+# Starts a local fake Azure OpenAI endpoint (uvicorn, plain HTTP) that hashes request bodies chunk by chunk and sends
+# generated response bodies, then proxies with PAYLOAD_MB payloads:
+#   - request:   POST chat/completions with a large JSON body (model must still select the deployment URL)
+#   - response:  GET files/{file_id}/content with a large response body
+#   - upload:    POST /files with a large UploadFile (upload_file endpoint)
+# For buffered (stream_body=False, previous behavior) and streamed (stream_body=True) bodies it measures the peak Python
+# memory (tracemalloc) and the elapsed time, and checks that the upstream / client received identical bytes.
+#
+# Run: python tests/benchmark_openai_proxy_streaming.py [PAYLOAD_MB]     e.g. python tests/benchmark_openai_proxy_streaming.py 32
+#
+# No credentials or network access required.
+#
+# Output: Script-level logging per LOGGING-RULES-SCRIPT-LEVEL.md
+# - One line per payload and mode with peak memory and elapsed time
+# - Final: RESULT: PASSED if streamed bodies keep memory bounded and all bytes arrive unchanged, else RESULT: FAILED
+
+import asyncio, hashlib, json, logging, socket, sys, tempfile, threading, time, tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+
+import uvicorn
+from fastapi import Request, UploadFile
+from starlette.datastructures import Headers
+
+# Project root is parent of tests/
+project_root = Path(__file__).parent.parent
+
+# Add src to path for imports
+sys.path.insert(0, str(project_root / 'src'))
+
+from hardcoded_config import CRAWLER_HARDCODED_CONFIG
+from routers_static import openai_proxy
+
+# ----------------------------------------- START: Configuration -----------------------------------------------------
+
+payload_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+chunk_size = 64 * 1024
+# Peak memory of a streamed body may not exceed this, independent of PAYLOAD_MB
+max_streamed_peak_mb = 4.0
+
+# ----------------------------------------- END: Configuration -------------------------------------------------------
+
+
+# ----------------------------------------- START: Benchmark ---------------------------------------------------------
+
+upstream_requests = {}   # path -> (sha256 of the request body, bytes)
+
+def response_chunks():
+  chunk = bytes(range(256)) * (chunk_size // 256)
+  for _ in range(payload_mb * 1024 * 1024 // chunk_size): yield chunk
+
+def expected_response_hash() -> str:
+  digest = hashlib.sha256()
+  for chunk in response_chunks(): digest.update(chunk)
+  return digest.hexdigest()
+
+async def fake_upstream(scope, receive, send):
+  """Hashes the request body without keeping it, file content responses are PAYLOAD_MB of generated bytes."""
+  if scope["type"] != "http": return
+  digest, size = hashlib.sha256(), 0
+  while True:
+    message = await receive()
+    digest.update(message.get("body", b""))
+    size += len(message.get("body", b""))
+    if not message.get("more_body"): break
+  upstream_requests[scope["path"]] = (digest.hexdigest(), size)
+  if scope["path"].endswith("/content"):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/octet-stream"), (b"content-length", str(payload_mb * 1024 * 1024).encode())]})
+    for chunk in response_chunks(): await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+    return
+  response_body = json.dumps({"id": "file-1" if scope["path"].endswith("/files") else "chatcmpl-1", "bytes": size}).encode()
+  await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+  await send({"type": "http.response.body", "body": response_body})
+
+def start_upstream() -> tuple[uvicorn.Server, int]:
+  sock = socket.socket()
+  sock.bind(("127.0.0.1", 0))
+  server = uvicorn.Server(uvicorn.Config(fake_upstream, log_level="warning", lifespan="off", h11_max_incomplete_event_size=1024 * 1024))
+  threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True).start()
+  while not server.started: time.sleep(0.01)
+  return server, sock.getsockname()[1]
+
+def request_body_chunks():
+  """JSON chat completion with a PAYLOAD_MB message, in CHUNK_SIZE pieces as the ASGI server receives it."""
+  content_size = payload_mb * 1024 * 1024
+  yield b'{"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "'
+  for offset in range(0, content_size, chunk_size): yield b"x" * min(chunk_size, content_size - offset)
+  yield b'"}]}'
+
+def create_request(path: str, method: str, body_chunks=None) -> Request:
+  """Starlette request that receives the body of body_chunks() chunk by chunk."""
+  body_size = sum(len(chunk) for chunk in body_chunks()) if body_chunks else 0
+  chunks = body_chunks() if body_chunks else iter(())
+  async def receive():
+    chunk = next(chunks, None)
+    return {"type": "http.request", "body": chunk or b"", "more_body": chunk is not None}
+  headers = [(b"content-type", b"application/json")] + ([(b"content-length", str(body_size).encode())] if body_size else [])
+  return Request({"type": "http", "method": method, "path": path, "query_string": b"", "headers": headers}, receive)
+
+async def read_response(response) -> tuple[str, int]:
+  digest, size = hashlib.sha256(), 0
+  if hasattr(response, "body_iterator"):
+    async for chunk in response.body_iterator:
+      digest.update(chunk)
+      size += len(chunk)
+  else:
+    digest.update(response.body)
+    size = len(response.body)
+  return digest.hexdigest(), size
+
+async def proxy_large_request(stream_body: bool) -> tuple[str, int]:
+  response, _ = await openai_proxy.proxy_request(create_request("/openai/chat/completions", "POST", request_body_chunks), "chat/completions?api-version=2025-04-01-preview", "POST", stream_body=stream_body)
+  return await read_response(response)
+
+async def proxy_large_response(stream_body: bool) -> tuple[str, int]:
+  response, _ = await openai_proxy.proxy_request(create_request("/openai/files/file-1/content", "GET"), "files/file-1/content?api-version=2025-04-01-preview", "GET", stream_body=stream_body)
+  return await read_response(response)
+
+async def upload_large_file(stream_body: bool) -> tuple[str, int]:
+  spooled_file = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+  for chunk in response_chunks(): spooled_file.write(chunk)
+  spooled_file.seek(0)
+  upload = UploadFile(spooled_file, filename="large.bin", headers=Headers({"content-type": "application/octet-stream"}))
+  if not stream_body:
+    # Previous upload_file(): whole file in memory
+    files = {"file": (upload.filename, await upload.read(), upload.content_type), "purpose": (None, "assistants")}
+    response, _ = await openai_proxy.proxy_request(SimpleNamespace(headers={}), "files?api-version=2025-04-01-preview", "POST", files=files)
+  else:
+    response = await openai_proxy.upload_file(file=upload, purpose="assistants")
+  spooled_file.close()
+  return await read_response(response)
+
+async def measure(coroutine_function, *args) -> tuple[float, float, tuple]:
+  """(peak MB, elapsed secs, result)."""
+  tracemalloc.start()
+  start = time.perf_counter()
+  result = await coroutine_function(*args)
+  elapsed = time.perf_counter() - start
+  peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+  tracemalloc.stop()
+  return peak, elapsed, result
+
+async def run_benchmark(failures: list) -> None:
+  request_hash = hashlib.sha256(b"".join(request_body_chunks())).hexdigest()
+  response_hash = expected_response_hash()
+  cases = [
+    ("request", proxy_large_request, "/openai/deployments/gpt-4o-mini/chat/completions", request_hash),
+    ("response", proxy_large_response, None, response_hash),
+    ("upload", upload_large_file, "/openai/files", None)
+  ]
+  for name, function, upstream_path, expected_hash in cases:
+    peaks = {}
+    for mode in ("buffered", "streamed"):
+      upstream_requests.clear()
+      await openai_proxy.get_openai_proxy_http_client().get(f"{openai_proxy.config.AZURE_OPENAI_ENDPOINT}/warmup")
+      peak, elapsed, (received_hash, received_size) = await measure(function, mode == "streamed")
+      peaks[mode] = peak
+      print(f"  {name + ':':10} {mode:9} peak {peak:8.1f} MB | {elapsed:6.2f} secs | {received_size / 1024 / 1024:6.1f} MB returned")
+      if upstream_path and upstream_path not in upstream_requests: failures.append(f"{name} {mode}: upstream did not receive {upstream_path} (got {list(upstream_requests)})")
+      elif upstream_path and expected_hash and upstream_requests[upstream_path][0] != expected_hash: failures.append(f"{name} {mode}: upstream received a different request body")
+      if name == "response" and received_hash != expected_hash: failures.append(f"{name} {mode}: client received a different response body")
+      if name == "upload" and upstream_requests.get(upstream_path, (None, 0))[1] < payload_mb * 1024 * 1024: failures.append(f"{name} {mode}: upstream received an incomplete file")
+    if peaks["streamed"] > max_streamed_peak_mb: failures.append(f"{name}: streamed peak memory {peaks['streamed']:.1f} MB exceeds {max_streamed_peak_mb} MB")
+  await openai_proxy.close_openai_proxy_http_client()
+
+def main():
+  for logger_name in ("routers_v1.common_logging_functions_v1", "httpx"): logging.getLogger(logger_name).setLevel(logging.WARNING)
+  server, port = start_upstream()
+  openai_proxy.set_config(SimpleNamespace(OPENAI_SERVICE_TYPE="azure_openai", AZURE_OPENAI_ENDPOINT=f"http://127.0.0.1:{port}", AZURE_OPENAI_USE_KEY_AUTHENTICATION=True, AZURE_OPENAI_API_KEY="benchmark-key", AZURE_OPENAI_API_VERSION="2025-04-01-preview"))
+  print("=" * 100)
+  print(f"START: OpenAI proxy streaming benchmark ({payload_mb} MB payloads, peek {CRAWLER_HARDCODED_CONFIG.OPENAI_PROXY_BODY_PEEK_BYTES:,} bytes)")
+  print("=" * 100)
+  failures = []
+  try: asyncio.run(run_benchmark(failures))
+  finally: server.should_exit = True
+  print("=" * 100)
+  for failure in failures: print(f"  FAIL: {failure}")
+  print(f"RESULT: {'FAILED' if failures else 'PASSED'}")
+  print("=" * 100)
+  sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+  main()
+
+# ----------------------------------------- END: Benchmark -----------------------------------------------------------
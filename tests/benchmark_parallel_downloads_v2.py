@@ -0,0 +1,144 @@
+# Benchmark script for common_download_functions_v2.py
+#
+# Measures download throughput of ParallelDownloader against a local stand-in SharePoint server.
+# The stand-in answers the REST call SharePointRestClient.download_file() makes:
+#   GET /sites/bench/_api/web/GetFileByServerRelativePath(decodedurl='...')/$value  -> file bytes
+# Each request is delayed by a fixed latency to emulate SharePoint Online round trips.
+#
+# Run: python tests/benchmark_parallel_downloads_v2.py [FILE_COUNT] [LATENCY_MS]
+#
+# No credentials or network access required.
+#
+# Output: Script-level logging per LOGGING-RULES-SCRIPT-LEVEL.md
+# - One line per worker count with elapsed time, files/sec and speedup vs 1 worker
+# - Final: RESULT: PASSED if throughput scales with worker count, else RESULT: FAILED
+
+import asyncio, http.server, logging, os, shutil, sys, tempfile, threading, time
+from pathlib import Path
+
+# Project root is parent of tests/
+project_root = Path(__file__).parent.parent
+
+# Add src to path for imports
+sys.path.insert(0, str(project_root / 'src'))
+
+from hardcoded_config import CRAWLER_HARDCODED_CONFIG
+from routers_v2.common_download_functions_v2 import DownloadTask, ParallelDownloader
+from routers_v2.common_job_functions_v2 import StreamingJobWriter
+from routers_v2.common_map_file_functions_v2 import SharePointMapRow
+from routers_v2.common_sharepoint_client_v2 import SharePointRestClient
+
+# httpx logs every request at INFO level
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# ----------------------------------------- START: Configuration -----------------------------------------------------
+
+file_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+latency_ms = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+file_size_bytes = 64 * 1024
+worker_counts = [1, 2, 4, 8, 16]
+# Minimum speedup of the largest worker count vs 1 worker to pass
+minimum_expected_speedup = 4.0
+
+# ----------------------------------------- END: Configuration -------------------------------------------------------
+
+
+# ----------------------------------------- START: Stand-in SharePoint Server ----------------------------------------
+
+class StandInSharePointHandler(http.server.BaseHTTPRequestHandler):
+  protocol_version = "HTTP/1.1"
+  file_content = b"x" * file_size_bytes
+
+  def do_GET(self):
+    time.sleep(latency_ms / 1000.0)
+    if self.path.endswith("/$value"):
+      self._send(200, self.file_content, "application/octet-stream")
+      return
+    self._send(404, b'{"odata.error": {"code": "-1", "message": {"value": "Not found"}}}', "application/json;odata=nometadata;charset=utf-8")
+
+  def _send(self, status: int, body: bytes, content_type: str):
+    self.send_response(status)
+    self.send_header("Content-Type", content_type)
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, format, *args): pass
+
+class StandInServer(http.server.ThreadingHTTPServer):
+  # Default listen backlog (5) drops SYNs when all workers connect at once, adding 1 sec retransmit stalls
+  request_queue_size = 64
+
+def start_stand_in_server() -> tuple[http.server.ThreadingHTTPServer, str]:
+  server = StandInServer(("127.0.0.1", 0), StandInSharePointHandler)
+  server.daemon_threads = True
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  return server, f"http://127.0.0.1:{server.server_address[1]}/sites/bench"
+
+def create_stand_in_client(site_url: str) -> SharePointRestClient:
+  async def token_provider() -> str: return "benchmark"
+  return SharePointRestClient(site_url, token_provider)
+
+# ----------------------------------------- END: Stand-in SharePoint Server ------------------------------------------
+
+
+# ----------------------------------------- START: Benchmark ---------------------------------------------------------
+
+def create_tasks(target_folder: str) -> list[DownloadTask]:
+  tasks = []
+  for i in range(file_count):
+    filename = f"document_{i:05d}.pdf"
+    sp_item = SharePointMapRow(sharepoint_listitem_id=i + 1, sharepoint_unique_file_id=f"uid-{i:05d}", filename=filename, file_type="pdf", file_size=file_size_bytes, url="", raw_url="", server_relative_url=f"/sites/bench/Shared Documents/{filename}", last_modified_utc="2026-01-01T00:00:00.000000Z", last_modified_timestamp=1767225600)
+    tasks.append(DownloadTask(index=i, sp_item=sp_item, target_path=os.path.join(target_folder, filename), file_relative_path=filename))
+  return tasks
+
+async def run_downloads(site_url: str, storage_path: str, workers: int) -> tuple[float, int, int, bool]:
+  """Returns (elapsed_seconds, ok_count, error_count, indices_complete)."""
+  CRAWLER_HARDCODED_CONFIG.CRAWLER_MAX_PARALLEL_DOWNLOADS_PER_DOMAIN = workers
+  CRAWLER_HARDCODED_CONFIG.CRAWLER_MAX_PARALLEL_DOWNLOADS_GLOBAL = workers
+  target_folder = os.path.join(storage_path, f"workers_{workers}")
+  tasks = create_tasks(target_folder)
+  writer = StreamingJobWriter(persistent_storage_path=storage_path, router_name="benchmark", action="download", object_id="BENCH", source_url="/benchmark", router_prefix="/v2")
+  downloader = ParallelDownloader(create_stand_in_client(site_url), "BENCH", workers, dry_run=False)
+  ok_count, error_count, seen_indices = 0, 0, set()
+  start = time.perf_counter()
+  async for outcome in downloader.run(tasks, writer):
+    seen_indices.add(outcome.task.index)
+    if outcome.success: ok_count += 1
+    else: error_count += 1
+  elapsed = time.perf_counter() - start
+  writer.emit_end(ok=True)
+  writer.finalize()
+  return elapsed, ok_count, error_count, seen_indices == set(range(file_count))
+
+def main():
+  print("=" * 100)
+  print(f"START: Parallel download benchmark ({file_count} files, {file_size_bytes // 1024} KB each, {latency_ms} ms latency per request)")
+  print("=" * 100)
+  server, site_url = start_stand_in_server()
+  storage_path = tempfile.mkdtemp(prefix="download_benchmark_")
+  baseline_rate = None
+  failures = []
+  try:
+    for workers in worker_counts:
+      elapsed, ok_count, error_count, indices_complete = asyncio.run(run_downloads(site_url, storage_path, workers))
+      rate = ok_count / elapsed if elapsed > 0 else 0.0
+      if baseline_rate is None: baseline_rate = rate
+      speedup = rate / baseline_rate if baseline_rate else 0.0
+      print(f"  workers={workers:>2}: {elapsed:6.2f} secs, {rate:7.1f} files/sec, speedup {speedup:4.1f}x, {ok_count} OK, {error_count} error{'' if error_count == 1 else 's'}")
+      if error_count > 0 or not indices_complete: failures.append(f"workers={workers}: {error_count} errors, all indices returned={indices_complete}")
+      last_speedup = speedup
+    if last_speedup < minimum_expected_speedup: failures.append(f"Speedup with {worker_counts[-1]} workers is {last_speedup:.1f}x, expected at least {minimum_expected_speedup:.1f}x")
+  finally:
+    server.shutdown()
+    shutil.rmtree(storage_path, ignore_errors=True)
+  print("=" * 100)
+  for failure in failures: print(f"  FAIL: {failure}")
+  print(f"RESULT: {'FAILED' if failures else 'PASSED'}")
+  print("=" * 100)
+  sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+  main()
+
+# ----------------------------------------- END: Benchmark -----------------------------------------------------------
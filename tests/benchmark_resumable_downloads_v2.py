@@ -0,0 +1,178 @@
+# Benchmark script for resumable downloads in common_sharepoint_client_v2.py (SharePointRestClient.download_file)
+#
+# Downloads one large file from a local stand-in SharePoint server that drops the connection after a fixed number
+# of bytes for the first N requests:
+#   GET /sites/bench/_api/web/GetFileByServerRelativePath(decodedurl='...')/$value  -> file bytes (honors Range / If-Range)
+# Two modes are compared:
+#   - no ranges: server ignores Range headers, so every retry restarts from byte 0 (previous download behavior)
+#   - ranges:    server answers Range requests with 206, so every retry resumes from the .partial file offset
+# Checks that the final file is complete (SHA-256), no .partial file is left, and that Python heap usage stays flat.
+#
+# Run: python tests/benchmark_resumable_downloads_v2.py [FILE_SIZE_MB] [DROPPED_CONNECTIONS]
+#
+# No credentials or network access required.
+#
+# Output: Script-level logging per LOGGING-RULES-SCRIPT-LEVEL.md
+# - One line per mode with elapsed time, bytes served, requests and peak Python heap usage
+# - Final: RESULT: PASSED if the resumed download transfers less data with flat memory, else RESULT: FAILED
+
+import asyncio, hashlib, http.server, logging, os, shutil, sys, tempfile, threading, time, tracemalloc
+from pathlib import Path
+
+# Project root is parent of tests/
+project_root = Path(__file__).parent.parent
+
+# Add src to path for imports
+sys.path.insert(0, str(project_root / 'src'))
+
+from routers_v2.common_sharepoint_client_v2 import PARTIAL_FILE_SUFFIX, SharePointRestClient
+
+# httpx logs every request at INFO level
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# ----------------------------------------- START: Configuration -----------------------------------------------------
+
+file_size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+dropped_connections = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+file_size_bytes = file_size_mb * 1024 * 1024
+# Each dropped response sends this share of the remaining bytes before closing the connection
+drop_after_fraction = 0.6
+# Peak Python heap usage during the download must stay below this, regardless of file size
+maximum_peak_heap_bytes = 16 * 1024 * 1024
+
+# ----------------------------------------- END: Configuration -------------------------------------------------------
+
+
+# ----------------------------------------- START: Stand-in SharePoint Server ----------------------------------------
+
+class StandInState:
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.supports_ranges = True
+    self.drops_remaining = 0
+    self.request_count = 0
+    self.bytes_served = 0
+
+  def reset(self, supports_ranges: bool):
+    with self.lock:
+      self.supports_ranges, self.drops_remaining, self.request_count, self.bytes_served = supports_ranges, dropped_connections, 0, 0
+
+state = StandInState()
+# Deterministic content: 1 MB blocks whose first byte is the block index, so misplaced ranges change the hash
+block = bytes(range(256)) * 4096
+
+def file_slice(start: int, end: int) -> bytes:
+  """Bytes [start, end) of the stand-in file."""
+  out, pos = bytearray(), start
+  while pos < end:
+    block_index, block_offset = divmod(pos, len(block))
+    take = min(len(block) - block_offset, end - pos)
+    out += (bytes([block_index % 256]) + block[1:])[block_offset:block_offset + take]
+    pos += take
+  return bytes(out)
+
+def expected_sha256() -> str:
+  digest = hashlib.sha256()
+  for start in range(0, file_size_bytes, len(block)): digest.update(file_slice(start, min(start + len(block), file_size_bytes)))
+  return digest.hexdigest()
+
+class StandInSharePointHandler(http.server.BaseHTTPRequestHandler):
+  protocol_version = "HTTP/1.1"
+
+  def do_GET(self):
+    if not self.path.endswith("/$value"):
+      self.send_response(404); self.send_header("Content-Length", "0"); self.end_headers()
+      return
+    start = 0
+    range_header = self.headers.get("Range", "")
+    with state.lock:
+      state.request_count += 1
+      use_range = state.supports_ranges and range_header.startswith("bytes=")
+      drop = state.drops_remaining > 0
+      if drop: state.drops_remaining -= 1
+    if use_range: start = int(range_header[len("bytes="):].split("-")[0])
+    self.send_response(206 if use_range else 200)
+    self.send_header("Content-Type", "application/octet-stream")
+    self.send_header("Content-Length", str(file_size_bytes - start))
+    self.send_header("ETag", '"{00000000-0000-0000-0000-000000000001},1"')
+    if use_range: self.send_header("Content-Range", f"bytes {start}-{file_size_bytes - 1}/{file_size_bytes}")
+    if drop: self.send_header("Connection", "close")
+    self.end_headers()
+    stop = start + int((file_size_bytes - start) * drop_after_fraction) if drop else file_size_bytes
+    try:
+      for pos in range(start, stop, len(block)):
+        chunk = file_slice(pos, min(pos + len(block), stop))
+        self.wfile.write(chunk)
+        with state.lock: state.bytes_served += len(chunk)
+    except (BrokenPipeError, ConnectionResetError):
+      pass
+    if drop: self.close_connection = True
+
+  def log_message(self, format, *args): pass
+
+def start_stand_in_server() -> tuple[http.server.ThreadingHTTPServer, str]:
+  server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StandInSharePointHandler)
+  server.daemon_threads = True
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  return server, f"http://127.0.0.1:{server.server_address[1]}/sites/bench"
+
+# ----------------------------------------- END: Stand-in SharePoint Server ------------------------------------------
+
+
+# ----------------------------------------- START: Benchmark ---------------------------------------------------------
+
+async def run_download(site_url: str, target_path: str) -> tuple[float, int, str]:
+  """Returns (elapsed_seconds, peak_heap_bytes, error)."""
+  async def token_provider() -> str: return "benchmark"
+  sp_client = SharePointRestClient(site_url, token_provider)
+  tracemalloc.start()
+  start = time.perf_counter()
+  error = ""
+  try:
+    await sp_client.download_file("/sites/bench/Shared Documents/large.pptx", target_path, expected_size=file_size_bytes, max_retries=dropped_connections + 1, delay_seconds=0.05, max_total_retries=dropped_connections + 1)
+  except Exception as e:
+    error = str(e)
+  elapsed = time.perf_counter() - start
+  _, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  return elapsed, peak, error
+
+def file_sha256(path: str) -> str:
+  digest = hashlib.sha256()
+  with open(path, 'rb') as f:
+    for chunk in iter(lambda: f.read(1024 * 1024), b""): digest.update(chunk)
+  return digest.hexdigest()
+
+def main():
+  print("=" * 100)
+  print(f"START: Resumable download benchmark ({file_size_mb} MB file, {dropped_connections} dropped connection{'' if dropped_connections == 1 else 's'})")
+  print("=" * 100)
+  server, site_url = start_stand_in_server()
+  folder = tempfile.mkdtemp(prefix="resumable_benchmark_")
+  expected_hash = expected_sha256()
+  failures, served = [], {}
+  try:
+    for mode, supports_ranges in [("no ranges", False), ("ranges", True)]:
+      state.reset(supports_ranges)
+      target_path = os.path.join(folder, f"large_{'ranges' if supports_ranges else 'full'}.pptx")
+      elapsed, peak, error = asyncio.run(run_download(site_url, target_path))
+      served[mode] = state.bytes_served
+      print(f"  {mode:<9}: {elapsed:6.2f} secs, {state.bytes_served / 1024 / 1024:7.1f} MB served ({state.bytes_served / file_size_bytes:.2f}x file size), {state.request_count} requests, peak heap {peak / 1024 / 1024:5.1f} MB")
+      if error: failures.append(f"{mode}: download failed -> {error}"); continue
+      if file_sha256(target_path) != expected_hash: failures.append(f"{mode}: downloaded content does not match")
+      if os.path.exists(target_path + PARTIAL_FILE_SUFFIX): failures.append(f"{mode}: partial file left behind")
+      if peak > maximum_peak_heap_bytes: failures.append(f"{mode}: peak heap {peak / 1024 / 1024:.1f} MB exceeds {maximum_peak_heap_bytes / 1024 / 1024:.0f} MB")
+    if served.get("ranges", 0) >= served.get("no ranges", 0): failures.append("Resumed download did not transfer less data than restarting from byte 0")
+  finally:
+    server.shutdown()
+    shutil.rmtree(folder, ignore_errors=True)
+  print("=" * 100)
+  for failure in failures: print(f"  FAIL: {failure}")
+  print(f"RESULT: {'FAILED' if failures else 'PASSED'}")
+  print("=" * 100)
+  sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+  main()
+
+# ----------------------------------------- END: Benchmark -----------------------------------------------------------
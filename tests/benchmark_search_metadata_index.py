@@ -0,0 +1,161 @@
+# Benchmark script for the /query metadata index in routers_static/sharepoint_search_metadata_index.py
+#
+# Creates DOMAIN_COUNT domain folders with ENTRIES_PER_DOMAIN files_metadata.json entries each (one domain in V2 format)
+# and measures:
+#   - full load:      first reload() = what the app did at every startup and what a restart costs after a crawl
+#   - check:          reload() without changed files (stat of domain.json / files_metadata.json per domain)
+#   - one domain:     reload() after update_files_metadata() added entries to one domain (what a V2 crawl does)
+#   - consistency:    lookups from another thread during reloads never miss an entry (atomic snapshot swap)
+#   - watch:          start_watching() in an event loop picks up update_files_metadata() without calling reload()
+# Also checks that the reloaded index equals a full load of the same files.
+#
+# Run: python tests/benchmark_search_metadata_index.py [ENTRIES_PER_DOMAIN]     e.g. python tests/benchmark_search_metadata_index.py 20000
+#
+# No credentials or network access required.
+#
+# Output: Script-level logging per LOGGING-RULES-SCRIPT-LEVEL.md
+# - One line per measurement
+# - Final: RESULT: PASSED if incremental reloads are faster than a full load and all checks pass, else RESULT: FAILED
+
+import asyncio, json, logging, os, shutil, sys, tempfile, threading, time
+from pathlib import Path
+
+# Project root is parent of tests/
+project_root = Path(__file__).parent.parent
+
+# Add src to path for imports
+sys.path.insert(0, str(project_root / 'src'))
+
+from hardcoded_config import CRAWLER_HARDCODED_CONFIG
+from routers_static.sharepoint_search_metadata_index import SearchMetadataIndex
+from routers_v2.common_crawler_functions_v2 import update_files_metadata
+
+# ----------------------------------------- START: Configuration -----------------------------------------------------
+
+entries_per_domain = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+domain_count = 8
+added_entries = 100
+# Maximum delay until the watching index serves entries added by update_files_metadata()
+max_watch_delay = 1.0 if sys.platform == "linux" else CRAWLER_HARDCODED_CONFIG.SEARCH_METADATA_RELOAD_CHECK_SECONDS + 2.0
+
+# ----------------------------------------- END: Configuration -------------------------------------------------------
+
+
+# ----------------------------------------- START: Benchmark ---------------------------------------------------------
+
+def v3_entry(domain: int, i: int) -> dict:
+  return {
+    "sharepoint_listitem_id": i, "sharepoint_unique_file_id": f"{domain:02d}{i:08d}-uid", "openai_file_id": f"assistant-D{domain:02d}F{i:08d}",
+    "file_relative_path": f"01_files/src/02_embedded/Shared Documents/Folder {i % 50}/Document {i}.docx",
+    "url": f"https://contoso.sharepoint.com/sites/site{domain}/Shared Documents/Folder {i % 50}/Document {i}.docx",
+    "raw_url": f"https://contoso.sharepoint.com/sites/site{domain}/Shared%20Documents/Folder%20{i % 50}/Document%20{i}.docx",
+    "server_relative_url": f"/sites/site{domain}/Shared Documents/Folder {i % 50}/Document {i}.docx", "filename": f"Document {i}.docx",
+    "file_type": "docx", "file_size": 10000 + i, "last_modified_utc": "2025-01-15T12:00:00.000000Z", "last_modified_timestamp": 1736942400,
+    "embedded_utc": "2025-01-16T08:00:00.000000Z", "source_id": "src", "source_type": "file_sources"
+  }
+
+def v2_entry(domain: int, i: int) -> dict:
+  v3 = v3_entry(domain, i)
+  return {"file_id": v3["openai_file_id"], "embedded_file_relative_path": v3["file_relative_path"], "file_metadata": {"source": v3["url"], "filename": v3["filename"], "file_type": "docx", "file_size": v3["file_size"], "sharepoint_listitem_id": i, "sharepoint_unique_file_id": v3["sharepoint_unique_file_id"]}}
+
+def create_domains(domains_folder: str) -> None:
+  for domain in range(domain_count):
+    domain_path = os.path.join(domains_folder, f"DOMAIN{domain:02d}")
+    os.makedirs(domain_path)
+    with open(os.path.join(domain_path, CRAWLER_HARDCODED_CONFIG.DOMAIN_JSON), 'w', encoding='utf-8') as f: json.dump({"name": f"DOMAIN{domain:02d}", "description": f"Domain {domain}", "vector_store_id": f"vs_{domain}"}, f)
+    entry = v2_entry if domain == domain_count - 1 else v3_entry
+    with open(os.path.join(domain_path, CRAWLER_HARDCODED_CONFIG.FILES_METADATA_JSON), 'w', encoding='utf-8') as f: json.dump([entry(domain, i) for i in range(entries_per_domain)], f, indent=2)
+
+def snapshot_of(index: SearchMetadataIndex) -> tuple:
+  """All entries and domains of an index, for comparing two indexes."""
+  entries = {}
+  for entry_map in reversed(index._snapshot.entry_maps): entries.update(entry_map.items())
+  return entries, index.domains
+
+def timed(function) -> tuple:
+  start = time.perf_counter()
+  result = function()
+  return result, time.perf_counter() - start
+
+async def measure_watch(index: SearchMetadataIndex, domain_path: str, new_entries: list) -> float:
+  index.start_watching()
+  await asyncio.sleep(0.1)
+  await asyncio.to_thread(update_files_metadata, domain_path, new_entries)
+  start = time.perf_counter()
+  while index.get(new_entries[-1]["openai_file_id"]) is None and time.perf_counter() - start < max_watch_delay + 5: await asyncio.sleep(0.01)
+  return time.perf_counter() - start
+
+def main():
+  logging.getLogger("routers_v1.common_logging_functions_v1").setLevel(logging.WARNING)
+  print("=" * 100)
+  print(f"START: Search metadata index benchmark ({domain_count} domains x {entries_per_domain:,} entries)")
+  print("=" * 100)
+  failures = []
+  storage_path = tempfile.mkdtemp(prefix="search_metadata_index_benchmark_")
+  try:
+    domains_folder = os.path.join(storage_path, CRAWLER_HARDCODED_CONFIG.PERSISTENT_STORAGE_PATH_DOMAINS_SUBFOLDER)
+    create_domains(domains_folder)
+    index = SearchMetadataIndex(domains_folder)
+    _, full_elapsed = timed(index.reload)
+    print(f"  full load:    {len(index):,} entries, {len(index.domains)} domains in {full_elapsed:.3f} secs")
+    if len(index) != domain_count * entries_per_domain: failures.append(f"Full load has {len(index):,} entries, expected {domain_count * entries_per_domain:,}")
+    if index.errors: failures.append(f"Errors on full load: {index.errors}")
+    reloaded, check_elapsed = timed(index.reload)
+    print(f"  check:        {len(reloaded)} domains reloaded in {1000 * check_elapsed:.2f} ms")
+    if reloaded: failures.append(f"Unchanged domains were reloaded: {reloaded}")
+
+    # One domain changed, lookups from another thread during the reload
+    domain_path = os.path.join(domains_folder, "DOMAIN03")
+    new_entries = [v3_entry(3, entries_per_domain + i) for i in range(added_entries)]
+    update_files_metadata(domain_path, new_entries)
+    lookup_ids = [f"assistant-D{domain:02d}F{i:08d}" for domain in range(domain_count) for i in range(0, entries_per_domain, max(1, entries_per_domain // 200))]
+    misses, lookups, stop = [0], [0], threading.Event()
+    def lookup_loop():
+      while not stop.is_set():
+        for file_id in lookup_ids:
+          if index.get(file_id) is None: misses[0] += 1
+        lookups[0] += len(lookup_ids)
+    lookup_thread = threading.Thread(target=lookup_loop)
+    lookup_thread.start()
+    reloaded, one_elapsed = timed(index.reload)
+    stop.set()
+    lookup_thread.join()
+    speedup = full_elapsed / one_elapsed if one_elapsed > 0 else 0.0
+    print(f"  one domain:   {reloaded} reloaded in {one_elapsed:.3f} secs ({speedup:.1f}x faster than full load) | {lookups[0]:,} concurrent lookups, {misses[0]} misses")
+    if reloaded != ["DOMAIN03"]: failures.append(f"Expected DOMAIN03 to be reloaded, got {reloaded}")
+    if speedup < 2.0: failures.append(f"Reloading one domain is only {speedup:.1f}x faster than a full load")
+    if misses[0]: failures.append(f"{misses[0]} lookups missed existing entries during the reload")
+    metadata = index.get(new_entries[0]["openai_file_id"])
+    if not metadata or metadata.get("url") != new_entries[0]["url"]: failures.append("Added entry not served after reload")
+    fresh = SearchMetadataIndex(domains_folder)
+    fresh.reload()
+    if snapshot_of(index) != snapshot_of(fresh): failures.append("Reloaded index differs from a full load")
+
+    # Invalid JSON keeps the previous entries
+    metadata_path = os.path.join(domain_path, CRAWLER_HARDCODED_CONFIG.FILES_METADATA_JSON)
+    with open(metadata_path, 'r', encoding='utf-8') as f: valid_content = f.read()
+    with open(metadata_path, 'w', encoding='utf-8') as f: f.write(valid_content[:len(valid_content) // 2])
+    index.reload()
+    if index.get(new_entries[0]["openai_file_id"]) is None or not index.errors: failures.append("Invalid files_metadata.json dropped the previous entries or was not reported")
+    with open(metadata_path, 'w', encoding='utf-8') as f: f.write(valid_content)
+    index.reload()
+    if index.errors: failures.append(f"Errors after restoring files_metadata.json: {index.errors}")
+
+    # Watch: update_files_metadata() without calling reload()
+    watch_entries = [v3_entry(5, 2 * entries_per_domain + i) for i in range(added_entries)]
+    watch_elapsed = asyncio.run(measure_watch(index, os.path.join(domains_folder, "DOMAIN05"), watch_entries))
+    stats = index.get_stats()
+    print(f"  watch:        entries served {watch_elapsed:.3f} secs after update_files_metadata() returned ({stats['watching']}, {stats['reloads']} reloads, {stats['checks']} checks)")
+    if watch_elapsed > max_watch_delay: failures.append(f"Watching index served the added entries after {watch_elapsed:.1f} secs")
+  finally:
+    shutil.rmtree(storage_path, ignore_errors=True)
+  print("=" * 100)
+  for failure in failures: print(f"  FAIL: {failure}")
+  print(f"RESULT: {'FAILED' if failures else 'PASSED'}")
+  print("=" * 100)
+  sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+  main()
+
+# ----------------------------------------- END: Benchmark -----------------------------------------------------------
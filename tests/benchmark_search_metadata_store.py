@@ -0,0 +1,153 @@
+# Benchmark script for CompactMetadataStore in routers_static/sharepoint_search_metadata_index.py
+#
+# Parses synthetic files_metadata.json entries (V3 format, as json.loads returns them) for each entry count and compares
+# the previous metadata_cache (one dict per openai_file_id) with CompactMetadataStore:
+#   - memory:  retained size after loading (sys.getsizeof of all objects reachable from the dict / the store), per entry
+#   - load:    time to build the dict / the store from the parsed entries
+#   - lookup:  metadata of QUERY_RESULTS random files as build_data_object() needs it (dict: get + copy, store: get)
+# Both must return the same metadata for every file, also for files with custom properties and duplicate file ids.
+#
+# Run: python tests/benchmark_search_metadata_store.py [ENTRY_COUNTS]     e.g. python tests/benchmark_search_metadata_store.py 100000,1000000
+#
+# No credentials or network access required.
+#
+# Output: Script-level logging per LOGGING-RULES-SCRIPT-LEVEL.md
+# - One block per entry count with memory, load time and lookup latency of both representations
+# - Final: RESULT: PASSED if the store returns the same metadata with less memory, else RESULT: FAILED
+
+import gc, json, random, sys, time
+from array import array
+from pathlib import Path
+
+# Project root is parent of tests/
+project_root = Path(__file__).parent.parent
+
+# Add src to path for imports
+sys.path.insert(0, str(project_root / 'src'))
+
+from routers_static.sharepoint_search_metadata_index import CompactMetadataStore
+
+# ----------------------------------------- START: Configuration -----------------------------------------------------
+
+entry_counts = [int(x) for x in sys.argv[1].split(",")] if len(sys.argv) > 1 else [100000, 1000000]
+query_results = 20
+query_count = 2000
+chunk_size = 10000
+# Minimum memory saving of the store vs one dict per file
+minimum_expected_memory_ratio = 2.0
+
+# ----------------------------------------- END: Configuration -------------------------------------------------------
+
+
+# ----------------------------------------- START: Benchmark ---------------------------------------------------------
+
+def v3_entry(i: int) -> dict:
+  site, folder = i % 20, i % 500
+  return {
+    "sharepoint_listitem_id": i, "sharepoint_unique_file_id": f"{i:08d}-7a3c-4d1e-9b2f-000000000000", "openai_file_id": f"assistant-F{i:010d}XyZ",
+    "file_relative_path": f"01_files/src/02_embedded/Shared Documents/Folder {folder}/Document {i}.docx",
+    "url": f"https://contoso.sharepoint.com/sites/site{site}/Shared Documents/Folder {folder}/Document {i}.docx",
+    "raw_url": f"https://contoso.sharepoint.com/sites/site{site}/Shared%20Documents/Folder%20{folder}/Document%20{i}.docx",
+    "server_relative_url": f"/sites/site{site}/Shared Documents/Folder {folder}/Document {i}.docx", "filename": f"Document {i}.docx",
+    "file_type": "docx", "file_size": 10000 + i * 7, "last_modified_utc": f"2025-01-{1 + i % 28:02d}T12:00:00.000000Z", "last_modified_timestamp": 1735732800 + (i % 28) * 86400,
+    "embedded_utc": f"2025-02-{1 + i % 28:02d}T08:00:00.000000Z", "source_id": f"src{i % 4}", "source_type": "file_sources"
+  }
+
+def parsed_entries(count: int):
+  """Entries as json.loads() returns them from files_metadata.json (no shared string objects), parsed in chunks."""
+  for start in range(0, count, chunk_size):
+    yield from json.loads(json.dumps([v3_entry(i) for i in range(start, min(count, start + chunk_size))]))
+
+def legacy_metadata_cache(entries) -> dict:
+  """Previous build_domains_and_metadata_cache(): one dict per openai_file_id."""
+  metadata_cache = {}
+  for file_data in entries:
+    file_id = file_data.get('openai_file_id', '').strip()
+    if file_id: metadata_cache[file_id] = file_data
+  return metadata_cache
+
+def deep_size(root) -> int:
+  """Bytes of all objects reachable from root (each object counted once)."""
+  seen, stack, total = set(), [root], 0
+  while stack:
+    obj = stack.pop()
+    if id(obj) in seen: continue
+    seen.add(id(obj))
+    total += sys.getsizeof(obj)
+    if isinstance(obj, dict):
+      stack.extend(obj.keys())
+      stack.extend(obj.values())
+    elif isinstance(obj, (list, tuple)): stack.extend(obj)
+    elif hasattr(obj, '__slots__') and not isinstance(obj, array): stack.extend(getattr(obj, name) for name in obj.__slots__)
+  return total
+
+def measure(build, count: int) -> tuple:
+  """(object, retained bytes, load secs)."""
+  entries = list(parsed_entries(count))
+  start = time.perf_counter()
+  result = build(entries)
+  elapsed = time.perf_counter() - start
+  del entries
+  gc.collect()
+  return result, deep_size(result), elapsed
+
+def lookup_secs(lookup, file_ids: list) -> float:
+  """Average secs to look up the metadata of one query result set."""
+  random.seed(1)
+  queries = [random.sample(file_ids, query_results) for _ in range(query_count)]
+  start = time.perf_counter()
+  for query in queries:
+    for file_id in query: lookup(file_id)
+  return (time.perf_counter() - start) / query_count
+
+def check_irregular_entries(failures: list) -> None:
+  """Custom properties (sparse columns), duplicate file ids (last wins), mixed value types: same result as the dict."""
+  entries = [v3_entry(i) for i in range(100)]
+  entries[5]["custom_owner"] = "Team A"
+  entries[7]["custom_flag"] = True
+  entries[8]["custom_flag"] = 1
+  entries[9]["custom_tags"] = ["a", "b"]
+  entries.append({**v3_entry(3), "url": "https://contoso.sharepoint.com/sites/moved/Document 3.docx"})
+  entries.append({"openai_file_id": "  ", "url": "ignored"})
+  del entries[11]["raw_url"]
+  legacy, store = legacy_metadata_cache(json.loads(json.dumps(entries))), CompactMetadataStore(json.loads(json.dumps(entries)))
+  if len(store) != len(legacy) or any(store.get(file_id) != metadata or list(store.get(file_id)) != list(metadata) for file_id, metadata in legacy.items()):
+    failures.append("Store differs from the dict for entries with custom properties or duplicate file ids")
+  if type(store.get(entries[7]["openai_file_id"])["custom_flag"]) is not bool: failures.append("Store changed the type of a value")
+
+def main():
+  print("=" * 100)
+  print(f"START: Search metadata store benchmark ({', '.join(f'{count:,}' for count in entry_counts)} entries)")
+  print("=" * 100)
+  failures = []
+  check_irregular_entries(failures)
+  for count in entry_counts:
+    print(f"  {count:,} entries:")
+    legacy, legacy_bytes, legacy_load = measure(legacy_metadata_cache, count)
+    file_ids = list(legacy)
+    legacy_lookup = lookup_secs(lambda file_id, legacy=legacy: legacy.get(file_id).copy(), file_ids)
+    sample = {file_id: legacy[file_id] for file_id in random.sample(file_ids, 1000)}
+    del legacy
+    gc.collect()
+    store, store_bytes, store_load = measure(CompactMetadataStore, count)
+    store_lookup = lookup_secs(store.get, file_ids)
+    mismatches = sum(1 for file_id, metadata in sample.items() if store.get(file_id) != metadata)
+    ratio = legacy_bytes / store_bytes if store_bytes else 0.0
+    print(f"    memory:  dict {legacy_bytes / 1024 / 1024:8.1f} MB ({legacy_bytes / count:6.0f} bytes per entry) | store {store_bytes / 1024 / 1024:8.1f} MB ({store_bytes / count:6.0f} bytes per entry) | {ratio:.1f}x smaller")
+    print(f"    load:    dict {legacy_load:8.3f} secs | store {store_load:8.3f} secs")
+    print(f"    lookup:  dict {1e6 * legacy_lookup:8.1f} us | store {1e6 * store_lookup:8.1f} us per query ({query_results} results) | {mismatches} mismatches in {len(sample)} files")
+    if len(store) != count: failures.append(f"{count:,} entries: store has {len(store):,} entries")
+    if mismatches: failures.append(f"{count:,} entries: store returned different metadata for {mismatches} files")
+    if ratio < minimum_expected_memory_ratio: failures.append(f"{count:,} entries: store is only {ratio:.1f}x smaller (expected {minimum_expected_memory_ratio}x)")
+    del store
+    gc.collect()
+  print("=" * 100)
+  for failure in failures: print(f"  FAIL: {failure}")
+  print(f"RESULT: {'FAILED' if failures else 'PASSED'}")
+  print("=" * 100)
+  sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+  main()
+
+# ----------------------------------------- END: Benchmark -----------------------------------------------------------
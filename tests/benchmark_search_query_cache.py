@@ -0,0 +1,167 @@
+# Benchmark script for the /query search result cache in routers_static/sharepoint_search_query_cache.py
+#
+# Runs _internal_request_to_llm() (used by /query and /query2) against a fake OpenAI client that answers
+# vector_stores.search after UPSTREAM_LATENCY secs. Workload: QUESTION_COUNT questions, each sent RETRIES times the way
+# a Copilot agent retries (2 concurrent requests, then 1 more later, with different case / whitespace / punctuation).
+# Measures without and with cache:
+#   - upstream calls, mean / p95 latency of all requests and p50 latency of the later retries
+# Checks:
+#   - concurrent identical queries share one upstream call, the response keeps the query as sent
+#   - failed upstream calls are not cached, different vsid / results are different cache entries
+#   - a reload of a changed domain by SearchMetadataIndex invalidates the cached results of its vector store only
+#
+# Run: python tests/benchmark_search_query_cache.py [QUESTION_COUNT]     e.g. python tests/benchmark_search_query_cache.py 50
+#
+# No credentials or network access required.
+#
+# Output: Script-level logging per LOGGING-RULES-SCRIPT-LEVEL.md
+# - One line per measurement
+# - Final: RESULT: PASSED if the cache saves upstream calls and latency and all checks pass, else RESULT: FAILED
+
+import asyncio, json, logging, os, shutil, sys, tempfile, time
+from pathlib import Path
+from types import SimpleNamespace
+
+# Project root is parent of tests/
+project_root = Path(__file__).parent.parent
+
+# Add src to path for imports
+sys.path.insert(0, str(project_root / 'src'))
+
+from hardcoded_config import CRAWLER_HARDCODED_CONFIG
+from routers_static import sharepoint_search
+from routers_static.sharepoint_search_metadata_index import SearchMetadataIndex
+from routers_static.sharepoint_search_query_cache import QueryResultCache
+from routers_v1.common_logging_functions_v1 import log_function_header
+from routers_v2.common_crawler_functions_v2 import update_files_metadata
+
+# ----------------------------------------- START: Configuration -----------------------------------------------------
+
+question_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+retry_delay = 0.5
+upstream_latency = 0.3
+global_vsid, domain_vsid, other_vsid = "vs_global", "vs_domain", "vs_other"
+
+# ----------------------------------------- END: Configuration -------------------------------------------------------
+
+
+# ----------------------------------------- START: Benchmark ---------------------------------------------------------
+
+class FakeVectorStores:
+  """vector_stores.search / retrieve of the OpenAI client: search takes UPSTREAM_LATENCY secs, returns 3 results, counts calls."""
+  def __init__(self):
+    self.calls, self.fail_next = 0, False
+
+  async def search(self, vector_store_id: str, query: str, ranking_options: dict, max_num_results: int, **kwargs):
+    self.calls += 1
+    await asyncio.sleep(upstream_latency)
+    if self.fail_next:
+      self.fail_next = False
+      raise RuntimeError("Upstream error")
+    data = [SimpleNamespace(attributes={}, content=[SimpleNamespace(text=f"Chunk {n} for {query}", type="text")], file_id=f"assistant-F{n:04d}", filename=f"Document {n}.docx", score=0.9 - n / 10) for n in range(min(3, max_num_results))]
+    return SimpleNamespace(data=data)
+
+  async def retrieve(self, vector_store_id: str):
+    file_counts = SimpleNamespace(cancelled=0, completed=3, failed=0, in_progress=0, total=3)
+    return SimpleNamespace(id=vector_store_id, created_at=0, file_counts=file_counts, name=vector_store_id, status="completed", usage_bytes=0, last_active_at=0, metadata={}, expires_after=None, expires_at=None)
+
+def create_request(domains_folder: str) -> SimpleNamespace:
+  metadata_index = SearchMetadataIndex(domains_folder, global_vsid)
+  metadata_index.add_reload_listener(lambda vector_store_ids: sharepoint_search.query_result_cache.invalidate(vector_store_ids))
+  metadata_index.reload()
+  openai_client = SimpleNamespace(vector_stores=FakeVectorStores())
+  return SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(openai_client=openai_client, metadata_cache=metadata_index)))
+
+def create_domain(domains_folder: str) -> str:
+  domain_path = os.path.join(domains_folder, "DOMAIN01")
+  os.makedirs(domain_path)
+  with open(os.path.join(domain_path, CRAWLER_HARDCODED_CONFIG.DOMAIN_JSON), 'w', encoding='utf-8') as f: json.dump({"name": "DOMAIN01", "description": "Domain 1", "vector_store_id": domain_vsid}, f)
+  with open(os.path.join(domain_path, CRAWLER_HARDCODED_CONFIG.FILES_METADATA_JSON), 'w', encoding='utf-8') as f: json.dump([{"openai_file_id": f"assistant-F{n:04d}", "url": f"https://contoso.sharepoint.com/Document {n}.docx", "filename": f"Document {n}.docx"} for n in range(3)], f)
+  return domain_path
+
+async def timed_query(request, params: dict, latencies: list) -> tuple:
+  start = time.perf_counter()
+  result = await sharepoint_search._internal_request_to_llm(request, params, log_function_header("benchmark"))
+  latencies.append(time.perf_counter() - start)
+  return result
+
+def variants(question: str) -> list[str]:
+  """How a retrying agent sends the same question."""
+  return [question, f"  {question.lower()}  ", question.replace(" ", "  ") + "?"]
+
+async def run_workload(request) -> tuple[list, list, int]:
+  """All questions with retries. Returns (latencies of all requests, latencies of the later retries, upstream calls)."""
+  latencies, retry_latencies, calls_before = [], [], request.app.state.openai_client.vector_stores.calls
+  async def ask(question: str):
+    first, second, third = variants(question)
+    await asyncio.gather(timed_query(request, {"query": first, "vsid": domain_vsid}, latencies), timed_query(request, {"query": second, "vsid": domain_vsid}, latencies))
+    await asyncio.sleep(retry_delay)
+    await timed_query(request, {"query": third, "vsid": domain_vsid}, retry_latencies)
+  await asyncio.gather(*(ask(f"What is the travel policy for project {i}") for i in range(question_count)))
+  return latencies + retry_latencies, retry_latencies, request.app.state.openai_client.vector_stores.calls - calls_before
+
+def percentile(values: list, p: float) -> float:
+  return sorted(values)[min(len(values) - 1, int(p * len(values)))]
+
+async def check_behavior(request, domain_path: str, failures: list) -> None:
+  cache, fake = sharepoint_search.query_result_cache, request.app.state.openai_client.vector_stores
+  _, data, _ = await sharepoint_search._internal_request_to_llm(request, {"query": "  WHO is Arilena Drovik?", "vsid": domain_vsid}, log_function_header("benchmark"))
+  if data["query"] != "  WHO is Arilena Drovik?": failures.append("Cached response does not keep the query as sent")
+  if data["sources"][0]["source"] != "https://contoso.sharepoint.com/Document 0.docx": failures.append("Cached response has no file metadata")
+  calls = fake.calls
+  await sharepoint_search._internal_request_to_llm(request, {"query": "who is arilena drovik", "vsid": other_vsid}, log_function_header("benchmark"))
+  await sharepoint_search._internal_request_to_llm(request, {"query": "who is arilena drovik", "vsid": domain_vsid, "results": 5}, log_function_header("benchmark"))
+  if fake.calls != calls + 2: failures.append("Different vsid or results reused a cached result")
+
+  # Failed upstream calls are not cached
+  fake.fail_next, calls = True, fake.calls
+  _, failed_data, _ = await sharepoint_search._internal_request_to_llm(request, {"query": "failing question", "vsid": domain_vsid}, log_function_header("benchmark"))
+  _, data, _ = await sharepoint_search._internal_request_to_llm(request, {"query": "failing question", "vsid": domain_vsid}, log_function_header("benchmark"))
+  if failed_data["sources"] or not data["sources"] or fake.calls != calls + 2: failures.append("Failed upstream call was cached")
+
+  # Crawl changes the domain: reload invalidates its vector store (and the global one), not other vector stores
+  entries_before = cache.get_stats()["entries"]
+  update_files_metadata(domain_path, [{"openai_file_id": "assistant-F9999", "url": "https://contoso.sharepoint.com/New.docx", "filename": "New.docx"}])
+  reloaded = await asyncio.to_thread(request.app.state.metadata_cache.reload)
+  stats = cache.get_stats()
+  print(f"  invalidation: {reloaded} reloaded -> {entries_before - stats['entries']} of {entries_before} cached results dropped")
+  calls = fake.calls
+  await sharepoint_search._internal_request_to_llm(request, {"query": "who is arilena drovik", "vsid": domain_vsid}, log_function_header("benchmark"))
+  await sharepoint_search._internal_request_to_llm(request, {"query": "who is arilena drovik", "vsid": other_vsid}, log_function_header("benchmark"))
+  if fake.calls != calls + 1: failures.append(f"Reload of the domain did not invalidate exactly its vector store ({fake.calls - calls} upstream calls, expected 1)")
+
+def main():
+  logging.getLogger("routers_v1.common_logging_functions_v1").setLevel(logging.WARNING)
+  sharepoint_search.set_config(SimpleNamespace(SEARCH_DEFAULT_MAX_NUM_RESULTS=20, SEARCH_DEFAULT_TEMPERATURE=0, SEARCH_DEFAULT_GLOBAL_VECTOR_STORE_ID=global_vsid, SEARCH_DEFAULT_INSTRUCTIONS="", LOG_QUERIES_AND_RESPONSES=False, OPENAI_SERVICE_TYPE="openai", OPENAI_DEFAULT_MODEL_NAME="gpt-4o-mini", AZURE_OPENAI_DEFAULT_MODEL_DEPLOYMENT_NAME="", AZURE_MANAGED_IDENTITY_CLIENT_ID=""))
+  print("=" * 100)
+  print(f"START: Search query cache benchmark ({question_count} questions x {len(variants(''))} requests, upstream latency {upstream_latency} secs)")
+  print("=" * 100)
+  failures = []
+  storage_path = tempfile.mkdtemp(prefix="search_query_cache_benchmark_")
+  try:
+    domain_path = create_domain(storage_path)
+    request = create_request(storage_path)
+    results = {}
+    for name, max_entries in (("no cache", 0), ("cache", CRAWLER_HARDCODED_CONFIG.SEARCH_QUERY_CACHE_MAX_ENTRIES)):
+      sharepoint_search.query_result_cache = QueryResultCache(max_entries, CRAWLER_HARDCODED_CONFIG.SEARCH_QUERY_CACHE_TTL_SECONDS)
+      latencies, retry_latencies, calls = asyncio.run(run_workload(request))
+      results[name] = (sum(latencies) / len(latencies), percentile(retry_latencies, 0.5), calls)
+      print(f"  {name + ':':13} {len(latencies):,} requests, {calls:,} upstream calls | mean {1000 * results[name][0]:7.1f} ms | p95 {1000 * percentile(latencies, 0.95):7.1f} ms | retries p50 {1000 * results[name][1]:7.1f} ms")
+    stats = sharepoint_search.query_result_cache.get_stats()
+    print(f"  stats:        {stats['hits']} hits, {stats['shared']} shared, {stats['misses']} misses, hit ratio {stats['hit_ratio']}")
+    if results["cache"][2] != question_count: failures.append(f"Cache made {results['cache'][2]} upstream calls, expected {question_count} (one per question)")
+    if results["cache"][1] >= upstream_latency / 10: failures.append(f"Retries took {1000 * results['cache'][1]:.1f} ms with cache (p50)")
+    if results["cache"][0] >= results["no cache"][0] * 0.8: failures.append("Cache did not lower the mean latency")
+    asyncio.run(check_behavior(request, domain_path, failures))
+  finally:
+    shutil.rmtree(storage_path, ignore_errors=True)
+  print("=" * 100)
+  for failure in failures: print(f"  FAIL: {failure}")
+  print(f"RESULT: {'FAILED' if failures else 'PASSED'}")
+  print("=" * 100)
+  sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+  main()
+
+# ----------------------------------------- END: Benchmark -----------------------------------------------------------
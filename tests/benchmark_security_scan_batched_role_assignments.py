@@ -0,0 +1,187 @@
+# Benchmark script for batched role assignment retrieval in scan_broken_inheritance_items() (routers_v2/common_security_scan_functions_v2.py)
+#
+# Starts a local stand-in for the SharePoint REST API (uvicorn, plain HTTP, ROUND_TRIP_LATENCY secs per HTTP request plus
+# SERVER_TIME secs per (sub-)request) with LIST_COUNT lists of ITEMS_PER_LIST items, every BROKEN_EVERY-th item has broken
+# inheritance. Role assignments mix users, SharePoint groups (every 5th item), Entra groups, 'Everyone except external users' and Limited Access.
+# One item always fails (404), one item fails inside $batch responses only (429).
+# Scans with SECURITY_SCAN_ROLE_ASSIGNMENTS_BATCH_SIZE = 1 (one request per item, previous behavior) and the BATCH_SIZES,
+# measures scan time and HTTP requests, and checks that the 04/05 CSVs and the ERROR lines are identical.
+#
+# Run: python tests/benchmark_security_scan_batched_role_assignments.py [ITEMS_PER_LIST]     e.g. python tests/benchmark_security_scan_batched_role_assignments.py 400
+#
+# No credentials or network access required.
+#
+# Output: Script-level logging per LOGGING-RULES-SCRIPT-LEVEL.md
+# - One line per batch size with scan time, HTTP requests and speedup
+# - Final: RESULT: PASSED if batching is faster and all CSVs / errors are identical, else RESULT: FAILED
+
+import asyncio, json, logging, re, shutil, socket, sys, tempfile, threading, time
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import uvicorn
+
+# Project root is parent of tests/
+project_root = Path(__file__).parent.parent
+
+# Add src to path for imports
+sys.path.insert(0, str(project_root / 'src'))
+
+from hardcoded_config import CRAWLER_HARDCODED_CONFIG
+from routers_v2 import common_security_scan_functions_v2 as scanner
+from routers_v2.common_sharepoint_client_v2 import SharePointRestClient, close_sharepoint_http_client
+
+# ----------------------------------------- START: Configuration -----------------------------------------------------
+
+items_per_list = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+list_count = 2
+broken_every = 4
+batch_sizes = [1, 5, 20, 50, 100]
+round_trip_latency = 0.02
+server_time = 0.001
+failing_item_id, throttled_in_batch_item_id = 13, 17
+
+# ----------------------------------------- END: Configuration -------------------------------------------------------
+
+
+# ----------------------------------------- START: Benchmark ---------------------------------------------------------
+
+site_path = "/sites/benchmark"
+counters = {"http_requests": 0}
+
+def get_lists() -> list[dict]:
+  lists = [{"Id": f"00000000-0000-0000-0000-00000000000{n}", "Title": f"Documents {n}", "BaseTemplate": 101 if n % 2 else 100, "Hidden": False, "DefaultViewUrl": f"{site_path}/Lists/List{n}/AllItems.aspx"} for n in range(1, list_count + 1)]
+  return lists + [{"Id": "00000000-0000-0000-0000-0000000000ff", "Title": "Hidden", "BaseTemplate": 101, "Hidden": True, "DefaultViewUrl": ""}]
+
+def get_role_assignments(item_id: int) -> list[dict]:
+  role_assignments = [
+    {"PrincipalId": 10 + item_id % 7, "Member": {"Id": 10 + item_id % 7, "Title": f"User, {item_id % 7}", "LoginName": f"i:0#.f|membership|user{item_id % 7}@contoso.com", "PrincipalType": 1}, "RoleDefinitionBindings": [{"Name": "Limited Access"}, {"Name": "Contribute"}]},
+    {"PrincipalId": 20, "Member": {"Id": 20, "Title": "Guest \"External\"", "LoginName": "i:0#.f|membership|guest_fabrikam.com#ext#@contoso.onmicrosoft.com", "PrincipalType": 1}, "RoleDefinitionBindings": [{"Name": "Read"}]},
+    {"PrincipalId": 30, "Member": {"Id": 30, "Title": "Project Team", "LoginName": "c:0o.c|federateddirectoryclaimprovider|11111111-2222-3333-4444-555555555555", "PrincipalType": 4}, "RoleDefinitionBindings": [{"Name": "Edit"}]}
+  ]
+  if item_id % 5 == 0: role_assignments.insert(0, {"PrincipalId": 3, "Member": {"Id": 3, "Title": "Site Owners", "LoginName": "Site Owners", "PrincipalType": 8}, "RoleDefinitionBindings": [{"Name": "Full Control"}]})
+  if item_id % 3 == 0: role_assignments.append({"PrincipalId": 40, "Member": {"Id": 40, "Title": "Everyone except external users", "LoginName": "c:0-.f|rolemanager|spo-grid-all-users/tenant", "PrincipalType": 4}, "RoleDefinitionBindings": [{"Name": "Read"}]})
+  return role_assignments
+
+def handle_get(path: str, query: dict, in_batch: bool) -> tuple[int, dict]:
+  """(status code, JSON body) of a GET request to the stand-in."""
+  path = unquote(path)[len(site_path):]
+  if path == "/_api/web/lists": return 200, {"value": get_lists()}
+  if match := re.fullmatch(r"/_api/web/lists\(guid'([^']+)'\)/items", path):
+    last_id = int(query.get("$filter", "ID gt 0").rsplit(" ", 1)[1])
+    top = int(query.get("$top", "5000"))
+    file_refs = {lst["Id"]: lst["DefaultViewUrl"].rsplit("/", 1)[0] for lst in get_lists()}
+    items = [{"ID": item_id, "FileRef": f"{file_refs[match.group(1)]}/Document {item_id}, v1.docx", "FileLeafRef": f"Document {item_id}, v1.docx", "FSObjType": 1 if item_id % 10 == 0 else 0, "HasUniqueRoleAssignments": item_id % broken_every == 1} for item_id in range(last_id + 1, min(items_per_list, last_id + top) + 1)]
+    return 200, {"value": items}
+  if match := re.fullmatch(r"/_api/web/lists\(guid'[^']+'\)/items\((\d+)\)/roleassignments", path):
+    item_id = int(match.group(1))
+    if item_id == failing_item_id: return 404, {"odata.error": {"code": "-2147024809, System.ArgumentException", "message": {"lang": "en-US", "value": "Item does not exist. It may have been deleted by another user."}}}
+    if item_id == throttled_in_batch_item_id and in_batch: return 429, {"odata.error": {"code": "-2147024860, Microsoft.SharePoint.SPQueryThrottledException", "message": {"lang": "en-US", "value": "The request has been throttled."}}}
+    return 200, {"value": get_role_assignments(item_id)}
+  if match := re.fullmatch(r"/_api/web/sitegroups/getbyid\((\d+)\)", path): return 200, {"Id": int(match.group(1)), "Title": "Site Owners"}
+  if re.fullmatch(r"/_api/web/sitegroups/getbyid\((\d+)\)/users", path):
+    return 200, {"value": [{"Id": 5, "Title": "Owner, One", "LoginName": "i:0#.f|membership|owner1@contoso.com", "Email": "owner1@contoso.com", "PrincipalType": 1}, {"Id": 6, "Title": "Owner, Two", "LoginName": "i:0#.f|membership|owner2@contoso.com", "Email": "", "PrincipalType": 1}]}
+  return 404, {"odata.error": {"code": "404", "message": {"lang": "en-US", "value": f"Not found: {path}"}}}
+
+def handle_batch(content_type: str, body: bytes) -> bytes:
+  """multipart/mixed $batch response with one application/http part per GET request of the body."""
+  boundary = re.search(r"boundary=([^;]+)", content_type).group(1)
+  parts = []
+  for part in body.decode("utf-8").split(f"--{boundary}")[1:]:
+    if part.startswith("--"): break
+    request_line = next(line for line in part.split("\r\n") if line.startswith("GET "))
+    url = urlsplit(request_line.split(" ")[1])
+    status_code, data = handle_get(url.path, {key: values[0] for key, values in parse_qs(url.query).items()}, True)
+    reason_phrase = {200: "OK", 404: "Not Found", 429: "Too Many Requests"}[status_code]
+    parts.append(f"--batchresponse_1\r\nContent-Type: application/http\r\nContent-Transfer-Encoding: binary\r\n\r\nHTTP/1.1 {status_code} {reason_phrase}\r\nCONTENT-TYPE: application/json;odata=nometadata;streaming=true;charset=utf-8\r\n\r\n{json.dumps(data)}\r\n")
+  return ("".join(parts) + "--batchresponse_1--\r\n").encode("utf-8")
+
+async def fake_sharepoint(scope, receive, send):
+  if scope["type"] != "http": return
+  counters["http_requests"] += 1
+  body = b""
+  while True:
+    message = await receive()
+    body += message.get("body", b"")
+    if not message.get("more_body"): break
+  headers = {key.decode(): value.decode() for key, value in scope["headers"]}
+  if scope["path"].endswith("/_api/$batch"):
+    response_body = handle_batch(headers["content-type"], body)
+    await asyncio.sleep(round_trip_latency + server_time * response_body.count(b"HTTP/1.1 "))
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"multipart/mixed; boundary=batchresponse_1")]})
+    await send({"type": "http.response.body", "body": response_body})
+    return
+  status_code, data = handle_get(scope["path"], {key: values[0] for key, values in parse_qs(scope["query_string"].decode()).items()}, False)
+  await asyncio.sleep(round_trip_latency + server_time)
+  await send({"type": "http.response.start", "status": status_code, "headers": [(b"content-type", b"application/json;odata=nometadata")]})
+  await send({"type": "http.response.body", "body": json.dumps(data).encode()})
+
+def start_fake_sharepoint() -> tuple[uvicorn.Server, int]:
+  sock = socket.socket()
+  sock.bind(("127.0.0.1", 0))
+  server = uvicorn.Server(uvicorn.Config(fake_sharepoint, log_level="warning", lifespan="off"))
+  threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True).start()
+  while not server.started: time.sleep(0.01)
+  return server, sock.getsockname()[1]
+
+class LogWriter:
+  """SSE writer of the scan: keeps the emitted log lines."""
+  def __init__(self): self.lines, self._step_result = [], None
+  def emit_log(self, message: str) -> str:
+    self.lines.append(message)
+    return message
+
+async def run_scan(site_url: str, output_folder: str) -> tuple[float, int, list]:
+  """(elapsed secs, HTTP requests, ERROR lines without timestamps) of one scan_broken_inheritance_items() run."""
+  async def token_provider() -> str: return "benchmark-token"
+  sp_client, writer = SharePointRestClient(site_url, token_provider), LogWriter()
+  requests_before, start = counters["http_requests"], time.perf_counter()
+  async for _ in scanner.scan_broken_inheritance_items(sp_client, output_folder, output_folder, None, writer, None, 1, 1, {"do_not_resolve_these_groups": []}, site_url): pass
+  elapsed = time.perf_counter() - start
+  await close_sharepoint_http_client()
+  return elapsed, counters["http_requests"] - requests_before, [line.split("] ", 1)[1] for line in writer.lines if "ERROR" in line]
+
+def main():
+  logging.getLogger("httpx").setLevel(logging.WARNING)
+  server, port = start_fake_sharepoint()
+  site_url = f"http://127.0.0.1:{port}{site_path}"
+  broken_count = list_count * len(range(1, items_per_list + 1, broken_every))
+  print("=" * 100)
+  print(f"START: Security scan batched role assignments benchmark ({list_count} lists x {items_per_list:,} items, {broken_count:,} with broken inheritance, latency {1000 * round_trip_latency:.0f} ms)")
+  print("=" * 100)
+  failures, results = [], {}
+  storage_path = tempfile.mkdtemp(prefix="security_scan_batch_benchmark_")
+  original_batch_size = CRAWLER_HARDCODED_CONFIG.SECURITY_SCAN_ROLE_ASSIGNMENTS_BATCH_SIZE
+  try:
+    for batch_size in batch_sizes:
+      CRAWLER_HARDCODED_CONFIG.SECURITY_SCAN_ROLE_ASSIGNMENTS_BATCH_SIZE = batch_size
+      output_folder = str(Path(storage_path) / f"batch_{batch_size}")
+      Path(output_folder).mkdir()
+      elapsed, http_requests, errors = asyncio.run(run_scan(site_url, output_folder))
+      csv_bytes = tuple((Path(output_folder) / name).read_bytes() for name in ("04_IndividualPermissionItems.csv", "05_IndividualPermissionItemAccess.csv"))
+      results[batch_size] = (elapsed, http_requests, errors, csv_bytes)
+      item_count, access_count = (data.count(b"\n") - 1 for data in csv_bytes)
+      print(f"  batch size {batch_size:3}: {elapsed:6.2f} secs | {http_requests:5,} HTTP requests | {results[1][0] / elapsed:5.1f}x | {item_count:,} items, {access_count:,} access rows, {len(errors)} error(s)")
+  finally:
+    CRAWLER_HARDCODED_CONFIG.SECURITY_SCAN_ROLE_ASSIGNMENTS_BATCH_SIZE = original_batch_size
+    server.should_exit = True
+    shutil.rmtree(storage_path, ignore_errors=True)
+  baseline = results[1]
+  if len(baseline[2]) != list_count or any(f"item_id={failing_item_id}" not in error for error in baseline[2]): failures.append(f"Expected one error per list for item_id={failing_item_id}, got {baseline[2]}")
+  if baseline[3][1].count(b"\n") < broken_count: failures.append("Too few rows in 05_IndividualPermissionItemAccess.csv")
+  for batch_size in batch_sizes[1:]:
+    elapsed, http_requests, errors, csv_bytes = results[batch_size]
+    if csv_bytes[0] != baseline[3][0]: failures.append(f"Batch size {batch_size}: 04_IndividualPermissionItems.csv differs")
+    if csv_bytes[1] != baseline[3][1]: failures.append(f"Batch size {batch_size}: 05_IndividualPermissionItemAccess.csv differs")
+    if errors != baseline[2]: failures.append(f"Batch size {batch_size}: errors differ ({errors})")
+    if http_requests >= baseline[1] or elapsed >= baseline[0]: failures.append(f"Batch size {batch_size} is not faster than one request per item")
+  print("=" * 100)
+  for failure in failures: print(f"  FAIL: {failure}")
+  print(f"RESULT: {'FAILED' if failures else 'PASSED'}")
+  print("=" * 100)
+  sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+  main()
+
+# ----------------------------------------- END: Benchmark -----------------------------------------------------------
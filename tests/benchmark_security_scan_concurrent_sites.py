@@ -0,0 +1,201 @@
+# Benchmark script for concurrent multi-site and subsite security scans in routers_v2/common_security_scan_functions_v2.py
+#
+# Starts a local stand-in for the SharePoint REST API (uvicorn, plain HTTP, ROUND_TRIP_LATENCY secs per request) with
+# SITE_COUNT site collections, each with nested subsites (/sub1, /sub1/sub1a, /sub2), lists with broken-inheritance items,
+# site groups and role assignments. Runs run_multi_site_security_scan() (scope=all, include_subsites=true) with
+# MAX_PARALLEL = 1 (sequential) and the PARALLEL_LIMITS, measures scan time and the most requests in flight at once.
+# Checks:
+#   - the report CSVs of every site are byte-identical to the sequential scan
+#   - every site and subsite was scanned, log lines carry the [site_id] prefix, a failing site does not stop the others
+#
+# Run: python tests/benchmark_security_scan_concurrent_sites.py [SITE_COUNT]     e.g. python tests/benchmark_security_scan_concurrent_sites.py 6
+#
+# No credentials or network access required.
+#
+# Output: Script-level logging per LOGGING-RULES-SCRIPT-LEVEL.md
+# - One line per parallel limit with scan time, requests in flight and speedup
+# - Final: RESULT: PASSED if concurrent scans are faster with identical CSVs and all checks pass, else RESULT: FAILED
+
+import asyncio, json, logging, re, shutil, socket, sys, tempfile, threading, time, zipfile
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import uvicorn
+
+# Project root is parent of tests/
+project_root = Path(__file__).parent.parent
+
+# Add src to path for imports
+sys.path.insert(0, str(project_root / 'src'))
+
+from routers_v2 import common_security_scan_functions_v2 as scanner
+from routers_v2.common_logging_functions_v2 import MiddlewareLogger
+from routers_v2.common_report_functions_v2 import get_report_archive_path
+from routers_v2.common_sharepoint_client_v2 import SharePointRestClient, close_sharepoint_http_client
+
+# ----------------------------------------- START: Configuration -----------------------------------------------------
+
+site_count = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+parallel_limits = [4, 8]
+round_trip_latency = 0.02
+items_per_list = 40
+broken_every = 4
+subsite_tree = {"": ["sub1", "sub2"], "/sub1": ["sub1a"], "/sub2": [], "/sub1/sub1a": []}
+failing_site_id = "SITE_FAILING"
+
+# ----------------------------------------- END: Configuration -------------------------------------------------------
+
+
+# ----------------------------------------- START: Benchmark ---------------------------------------------------------
+
+counters = {"in_flight": 0, "max_in_flight": 0}
+
+def split_web_path(path: str) -> tuple[str, str, str]:
+  """'/sites/site1/sub1/_api/web/lists' -> ('/sites/site1', '/sub1', '/_api/web/lists')."""
+  web_path, _, api_path = unquote(path).partition("/_api")
+  site_path = "/".join(web_path.split("/")[:3])
+  return site_path, web_path[len(site_path):], "/_api" + api_path
+
+def get_lists(web_path: str) -> list[dict]:
+  return [{"Id": f"00000000-0000-0000-0000-00000000000{n}", "Title": f"Documents {n}", "BaseTemplate": 101 if n % 2 else 100, "Hidden": n == 3, "DefaultViewUrl": f"{web_path}/Lists/List{n}/AllItems.aspx", "RootFolder": {"ServerRelativeUrl": f"{web_path}/Lists/List{n}"}} for n in (1, 2, 3)]
+
+def get_item_role_assignments(item_id: int) -> list[dict]:
+  role_assignments = [{"PrincipalId": 10 + item_id % 7, "Member": {"Id": 10 + item_id % 7, "Title": f"User {item_id % 7}", "LoginName": f"i:0#.f|membership|user{item_id % 7}@contoso.com", "PrincipalType": 1}, "RoleDefinitionBindings": [{"Name": "Limited Access"}, {"Name": "Contribute"}]}]
+  if item_id % 5 == 0: role_assignments.insert(0, {"PrincipalId": 3, "Member": {"Id": 3, "Title": "Owners", "LoginName": "Owners", "PrincipalType": 8}, "RoleDefinitionBindings": [{"Name": "Full Control"}]})
+  return role_assignments
+
+def handle_get(path: str, query: dict, host: str) -> tuple[int, dict]:
+  """(status code, JSON body) of a GET request to the stand-in."""
+  site_path, subsite_path, api_path = split_web_path(path)
+  web_path = site_path + subsite_path
+  if failing_site_id.lower() in site_path: return 403, {"odata.error": {"code": "-2147024891, System.UnauthorizedAccessException", "message": {"lang": "en-US", "value": "Access denied."}}}
+  if api_path == "/_api/web": return 200, {"Title": f"Web {web_path}", "Url": f"http://{host}{web_path}"}
+  if api_path == "/_api/web/webs": return 200, {"value": [{"Id": f"web-{web_path}/{name}", "Title": f"Subsite {name}", "Url": f"http://{host}{web_path}/{name}", "HasUniqueRoleAssignments": name == "sub2"} for name in subsite_tree.get(subsite_path, [])]}
+  if api_path == "/_api/web/lists": return 200, {"value": get_lists(web_path)}
+  if api_path == "/_api/web/roleassignments":
+    return 200, {"value": [{"PrincipalId": 3, "Member": {"Id": 3, "Title": "Owners", "LoginName": "Owners", "PrincipalType": 8}, "RoleDefinitionBindings": [{"Name": "Full Control"}]}, {"PrincipalId": 20, "Member": {"Id": 20, "Title": "Guest", "LoginName": "i:0#.f|membership|guest_fabrikam.com#ext#@contoso.onmicrosoft.com", "PrincipalType": 1}, "RoleDefinitionBindings": [{"Name": "Read"}]}]}
+  if api_path == "/_api/web/sitegroups": return 200, {"value": [{"Id": 3, "Title": "Owners", "OwnerTitle": "Owners"}, {"Id": 4, "Title": "Visitors", "OwnerTitle": "Owners"}]}
+  if re.fullmatch(r"/_api/web/sitegroups/getbyid\((\d+)\)", api_path): return 200, {"Id": 3, "Title": "Owners"}
+  if re.fullmatch(r"/_api/web/sitegroups/getbyid\((\d+)\)/users", api_path):
+    return 200, {"value": [{"Id": 5, "Title": f"Owner of {web_path}", "LoginName": f"i:0#.f|membership|owner{len(web_path)}@contoso.com", "Email": "", "PrincipalType": 1}]}
+  if re.fullmatch(r"/_api/web/lists\(guid'[^']+'\)/items", api_path):
+    last_id = int(query.get("$filter", "ID gt 0").rsplit(" ", 1)[1])
+    items = [{"ID": item_id, "FileRef": f"{web_path}/Lists/Document {item_id}.docx", "FileLeafRef": f"Document {item_id}.docx", "FSObjType": 0, "HasUniqueRoleAssignments": item_id % broken_every == 1} for item_id in range(last_id + 1, items_per_list + 1)]
+    return 200, {"value": items}
+  if match := re.fullmatch(r"/_api/web/lists\(guid'[^']+'\)/items\((\d+)\)/roleassignments", api_path): return 200, {"value": get_item_role_assignments(int(match.group(1)))}
+  return 404, {"odata.error": {"code": "404", "message": {"lang": "en-US", "value": f"Not found: {api_path}"}}}
+
+def handle_batch(content_type: str, body: bytes, host: str) -> bytes:
+  boundary = re.search(r"boundary=([^;]+)", content_type).group(1)
+  parts = []
+  for part in body.decode("utf-8").split(f"--{boundary}")[1:]:
+    if part.startswith("--"): break
+    url = urlsplit(next(line for line in part.split("\r\n") if line.startswith("GET ")).split(" ")[1])
+    status_code, data = handle_get(url.path, {key: values[0] for key, values in parse_qs(url.query).items()}, host)
+    parts.append(f"--batchresponse_1\r\nContent-Type: application/http\r\nContent-Transfer-Encoding: binary\r\n\r\nHTTP/1.1 {status_code} {'OK' if status_code == 200 else 'Error'}\r\nCONTENT-TYPE: application/json;odata=nometadata\r\n\r\n{json.dumps(data)}\r\n")
+  return ("".join(parts) + "--batchresponse_1--\r\n").encode("utf-8")
+
+async def fake_sharepoint(scope, receive, send):
+  if scope["type"] != "http": return
+  counters["in_flight"] += 1
+  counters["max_in_flight"] = max(counters["max_in_flight"], counters["in_flight"])
+  try:
+    body = b""
+    while True:
+      message = await receive()
+      body += message.get("body", b"")
+      if not message.get("more_body"): break
+    headers = {key.decode(): value.decode() for key, value in scope["headers"]}
+    await asyncio.sleep(round_trip_latency)
+    if scope["path"].endswith("/_api/$batch"):
+      await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"multipart/mixed; boundary=batchresponse_1")]})
+      await send({"type": "http.response.body", "body": handle_batch(headers["content-type"], body, headers["host"])})
+      return
+    status_code, data = handle_get(scope["path"], {key: values[0] for key, values in parse_qs(scope["query_string"].decode()).items()}, headers["host"])
+    await send({"type": "http.response.start", "status": status_code, "headers": [(b"content-type", b"application/json;odata=nometadata")]})
+    await send({"type": "http.response.body", "body": json.dumps(data).encode()})
+  finally:
+    counters["in_flight"] -= 1
+
+def start_fake_sharepoint() -> tuple[uvicorn.Server, int]:
+  sock = socket.socket()
+  sock.bind(("127.0.0.1", 0))
+  server = uvicorn.Server(uvicorn.Config(fake_sharepoint, log_level="warning", lifespan="off"))
+  threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True).start()
+  while not server.started: time.sleep(0.01)
+  return server, sock.getsockname()[1]
+
+class LogWriter:
+  """Job stream of the scan: keeps the emitted log lines."""
+  def __init__(self): self.lines, self._step_result = [], None
+  def emit_log(self, message: str) -> str:
+    self.lines.append(message)
+    return message
+  def drain_sse_queue(self) -> list: return []
+
+def create_test_client(site_url: str, client_id: str, tenant_id: str, cert_path: str, cert_password: str) -> SharePointRestClient:
+  async def token_provider() -> str: return "benchmark-token"
+  return SharePointRestClient(site_url, token_provider)
+
+def read_report_csvs(report_id: str, storage_path: str) -> dict:
+  with zipfile.ZipFile(get_report_archive_path(report_id, storage_path)) as archive:
+    return {name: archive.read(name) for name in sorted(archive.namelist()) if name.endswith(".csv")}
+
+async def run_scan(sites: list, max_parallel: int, storage_path: str) -> tuple[float, dict, LogWriter]:
+  """(elapsed secs, {site_id: result with 'csvs'}, writer) of one run_multi_site_security_scan() run."""
+  writer, logger = LogWriter(), MiddlewareLogger.create()
+  counters["max_in_flight"] = 0
+  start = time.perf_counter()
+  async for _ in scanner.run_multi_site_security_scan(sites, "all", True, False, storage_path, "", "", "", "", writer, logger, max_parallel_webs=max_parallel): pass
+  elapsed = time.perf_counter() - start
+  await close_sharepoint_http_client()
+  results = writer._step_result
+  for result in results.values():
+    if result["ok"]: result["csvs"] = read_report_csvs(result["report_path"], storage_path)
+  return elapsed, results, writer
+
+def main():
+  for logger_name in ("httpx", "routers_v2.common_logging_functions_v2"): logging.getLogger(logger_name).setLevel(logging.WARNING)
+  scanner.create_sharepoint_client = create_test_client
+  server, port = start_fake_sharepoint()
+  sites = [(f"SITE{n:02d}", f"http://127.0.0.1:{port}/sites/site{n:02d}") for n in range(1, site_count + 1)] + [(failing_site_id, f"http://127.0.0.1:{port}/sites/{failing_site_id.lower()}")]
+  webs_per_site = len(subsite_tree)
+  print("=" * 100)
+  print(f"START: Concurrent security scan benchmark ({site_count} sites x {webs_per_site} webs + 1 failing site, latency {1000 * round_trip_latency:.0f} ms)")
+  print("=" * 100)
+  failures, runs = [], {}
+  temp_folder = tempfile.mkdtemp(prefix="security_scan_concurrent_benchmark_")
+  try:
+    for max_parallel in [1] + parallel_limits:
+      storage_path = str(Path(temp_folder) / f"parallel_{max_parallel}")
+      elapsed, results, writer = asyncio.run(run_scan(sites, max_parallel, storage_path))
+      runs[max_parallel] = (elapsed, results, writer, counters["max_in_flight"])
+      print(f"  max parallel {max_parallel:2}: {elapsed:6.2f} secs | {counters['max_in_flight']:2} requests in flight at most | {runs[1][0] / elapsed:4.1f}x | {sum(1 for r in results.values() if r['ok'])} sites ok, {sum(1 for r in results.values() if not r['ok'])} failed")
+  finally:
+    server.should_exit = True
+    shutil.rmtree(temp_folder, ignore_errors=True)
+  baseline = runs[1][1]
+  for site_id, _ in sites[:-1]:
+    if not baseline[site_id]["ok"]: failures.append(f"Sequential scan of {site_id} failed: {baseline[site_id]['error']}")
+    elif baseline[site_id]["stats"].get("subsites_scanned") != webs_per_site - 1: failures.append(f"{site_id}: {baseline[site_id]['stats'].get('subsites_scanned')} subsites scanned, expected {webs_per_site - 1}")
+  for max_parallel in parallel_limits:
+    elapsed, results, writer, _ = runs[max_parallel]
+    if elapsed >= runs[1][0]: failures.append(f"Max parallel {max_parallel} is not faster than sequential ({elapsed:.2f} vs {runs[1][0]:.2f} secs)")
+    if results[failing_site_id]["ok"]: failures.append("Failing site did not fail")
+    for site_id, _ in sites[:-1]:
+      if not results[site_id]["ok"]: failures.append(f"Max parallel {max_parallel}: {site_id} failed: {results[site_id]['error']}")
+      elif results[site_id]["csvs"] != baseline[site_id]["csvs"]: failures.append(f"Max parallel {max_parallel}: CSVs of {site_id} differ from the sequential scan ({[name for name in results[site_id]['csvs'] if results[site_id]['csvs'][name] != baseline[site_id]['csvs'].get(name)]})")
+      elif results[site_id]["stats"] != baseline[site_id]["stats"]: failures.append(f"Max parallel {max_parallel}: stats of {site_id} differ from the sequential scan")
+    if not any("] [SITE01/sub1/sub1a] " in line for line in writer.lines): failures.append("No log lines with the [SITE01/sub1/sub1a] prefix")
+  rows = sum(csv.count(b"\n") for result in baseline.values() if result["ok"] for csv in result["csvs"].values())
+  print(f"  CSV rows per run: {rows:,}")
+  print("=" * 100)
+  for failure in failures: print(f"  FAIL: {failure}")
+  print(f"RESULT: {'FAILED' if failures else 'PASSED'}")
+  print("=" * 100)
+  sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+  main()
+
+# ----------------------------------------- END: Benchmark -----------------------------------------------------------
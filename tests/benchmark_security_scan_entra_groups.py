@@ -0,0 +1,216 @@
+# Benchmark script for Entra ID group resolution in routers_v2/common_entra_group_functions_v2.py
+#
+# Uses a fake Graph client whose groups/{id}/transitiveMembers answers after GRAPH_LATENCY secs with pages of at most
+# $top members (+ @odata.nextLink). GROUP_COUNT groups with 10 to 2,500 members, each looked up LOOKUPS_PER_GROUP times
+# (the same group is assigned to many items and SharePoint groups).
+# Measures:
+#   - sequential:  one lookup at a time (SECURITY_SCAN_ENTRA_GROUP_MAX_PARALLEL=1), cold cache
+#   - concurrent:  all lookups at once with resolve_many(), cold cache
+#   - warm:        lookups from memory, and from the SQLite store by a new resolver (next app worker process)
+#   - per-group JSON file read per lookup (previous cache) vs memory lookup
+# Checks:
+#   - groups with more than one page return all members, concurrent lookups of a group share one fetch
+#   - failed fetches are not cached, expired entries are fetched again
+#   - invalidate([ids]) drops only those groups, delete_all_entra_caches() drops all (and JSON files of the previous cache)
+#   - resolve_entra_group_members() returns new rows per call (callers change them)
+#
+# Run: python tests/benchmark_security_scan_entra_groups.py [GROUP_COUNT]     e.g. python tests/benchmark_security_scan_entra_groups.py 40
+#
+# No credentials or network access required.
+#
+# Output: Script-level logging per LOGGING-RULES-SCRIPT-LEVEL.md
+# - One line per measurement
+# - Final: RESULT: PASSED if concurrent resolution is faster, caches hit and all checks pass, else RESULT: FAILED
+
+import asyncio, json, logging, os, shutil, sys, tempfile, time
+from pathlib import Path
+from types import SimpleNamespace
+
+# Project root is parent of tests/
+project_root = Path(__file__).parent.parent
+
+# Add src to path for imports
+sys.path.insert(0, str(project_root / 'src'))
+
+from msgraph.generated.groups.item.transitive_members.transitive_members_request_builder import TransitiveMembersRequestBuilder
+from routers_v2 import common_entra_group_functions_v2 as entra
+from routers_v2.common_logging_functions_v2 import MiddlewareLogger
+from routers_v2.common_security_scan_functions_v2 import delete_all_entra_caches, get_entra_cache_folder, resolve_entra_group_members
+
+# ----------------------------------------- START: Configuration -----------------------------------------------------
+
+group_count = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+lookups_per_group = 5
+graph_latency = 0.05
+max_parallel = 4
+failing_group_id = "group-failing"
+
+# ----------------------------------------- END: Configuration -------------------------------------------------------
+
+
+# ----------------------------------------- START: Benchmark ---------------------------------------------------------
+
+def get_group_size(group_id: str) -> int:
+  n = int(group_id.rsplit("-", 1)[1])
+  return 2500 if n % 10 == 0 else 10 + 37 * n % 400
+
+class FakeTransitiveMembers:
+  """groups/{id}/transitiveMembers of the Graph client: pages of $top members, users and nested groups, counts requests."""
+  TransitiveMembersRequestBuilderGetQueryParameters = TransitiveMembersRequestBuilder.TransitiveMembersRequestBuilderGetQueryParameters
+
+  def __init__(self, graph, group_id: str, skip: int = 0, top: int = 100):
+    self.graph, self.group_id, self.skip, self.top = graph, group_id, skip, top
+
+  def with_url(self, raw_url: str) -> "FakeTransitiveMembers":
+    skip, top = (int(value) for value in raw_url.rsplit("?", 1)[1].split(","))
+    return FakeTransitiveMembers(self.graph, self.group_id, skip, top)
+
+  async def get(self, request_configuration=None):
+    top = request_configuration.query_parameters.top if request_configuration else self.top
+    self.graph.requests += 1
+    self.graph.in_flight += 1
+    self.graph.max_in_flight = max(self.graph.max_in_flight, self.graph.in_flight)
+    try:
+      await asyncio.sleep(graph_latency)
+      if self.group_id == failing_group_id or self.group_id in self.graph.failing: raise RuntimeError("Request_ResourceNotFound")
+      size = get_group_size(self.group_id)
+      members = []
+      for n in range(self.skip, min(size, self.skip + top)):
+        if n % 50 == 49: members.append(SimpleNamespace(odata_type="#microsoft.graph.group", display_name=f"Nested {n}"))
+        else: members.append(SimpleNamespace(odata_type="#microsoft.graph.user", user_principal_name=f"user{n}@contoso.com" if n % 7 else f"guest{n}_fabrikam.com#EXT#@contoso.onmicrosoft.com", display_name=f"User {n}", mail=f"user{n}@contoso.com" if n % 3 else None))
+      next_link = f"https://graph.microsoft.com/v1.0/groups/{self.group_id}/transitiveMembers?{self.skip + top},{top}" if self.skip + top < size else None
+      return SimpleNamespace(value=members, odata_next_link=next_link)
+    finally:
+      self.graph.in_flight -= 1
+
+class FakeGraphClient:
+  def __init__(self):
+    self.requests, self.in_flight, self.max_in_flight, self.failing = 0, 0, 0, set()
+    self.groups = SimpleNamespace(by_group_id=lambda group_id: SimpleNamespace(transitive_members=FakeTransitiveMembers(self, group_id)))
+
+def expected_user_count(group_id: str) -> int:
+  return sum(1 for n in range(get_group_size(group_id)) if n % 50 != 49)
+
+class LogWriter:
+  def __init__(self): self.lines = []
+  def emit_log(self, message: str) -> str:
+    self.lines.append(message)
+    return message
+
+def create_resolver(storage_path: str, parallel: int, ttl_seconds: float = 3600) -> entra.EntraGroupResolver:
+  store = entra.EntraGroupStore(os.path.join(entra.get_entra_group_cache_folder(storage_path), entra.ENTRA_GROUP_STORE_FILENAME))
+  return entra.EntraGroupResolver(store, 1000, ttl_seconds, parallel)
+
+async def lookup_sequential(resolver, graph, group_ids: list) -> dict:
+  results = {}
+  for group_id in group_ids: results[group_id] = (await resolver.get_users(graph, group_id, group_id))[0]
+  return results
+
+async def lookup_concurrent(resolver, graph, group_ids: list) -> dict:
+  results = await asyncio.gather(*(resolver.get_users(graph, group_id, group_id) for group_id in group_ids))
+  return {group_id: users for group_id, (users, _) in zip(group_ids, results)}
+
+def run_mode(name: str, resolver, lookup, group_ids: list, failures: list) -> float:
+  graph = FakeGraphClient()
+  start = time.perf_counter()
+  results = asyncio.run(lookup(resolver, graph, group_ids))
+  elapsed = time.perf_counter() - start
+  print(f"  {name + ':':12} {len(group_ids):,} lookups, {graph.requests:,} Graph requests ({graph.max_in_flight} at most at once) | {elapsed:6.2f} secs")
+  wrong = [group_id for group_id, users in results.items() if len(users) != expected_user_count(group_id)]
+  if wrong: failures.append(f"{name}: wrong member count for {len(wrong)} groups, e.g. {wrong[0]}: {len(results[wrong[0]])} instead of {expected_user_count(wrong[0])}")
+  return elapsed
+
+async def check_behavior(storage_path: str, group_ids: list, failures: list) -> None:
+  graph, resolver = FakeGraphClient(), entra.get_entra_group_resolver(storage_path)
+  # Failed fetches are not cached, other groups of resolve_many() still resolve
+  results = await resolver.resolve_many(graph, {failing_group_id: "Failing", group_ids[0]: "Group 0"})
+  if not isinstance(results[failing_group_id], Exception) or isinstance(results[group_ids[0]], Exception): failures.append("resolve_many() did not return the failed fetch as exception next to the resolved group")
+  if resolver.get_cached(failing_group_id) is not None: failures.append("Failed fetch was cached")
+  writer = LogWriter()
+  rows = await resolve_entra_group_members(storage_path, graph, failing_group_id, "Failing", 1, "", writer, MiddlewareLogger.create())
+  if rows or not any("ERROR: Failed to resolve Entra group_name='Failing'" in line for line in writer.lines): failures.append("Failed fetch was not logged as error by resolve_entra_group_members()")
+
+  # Rows are new per call: changing them does not change the cache
+  rows = await resolve_entra_group_members(storage_path, graph, group_ids[1], "Group 1", 2, "Site Members", writer, MiddlewareLogger.create())
+  for row in rows: row["ViaGroupType"], row["NestingLevel"] = "EntraGroup", 99
+  rows = await resolve_entra_group_members(storage_path, graph, group_ids[1], "Group 1", 1, "", writer, MiddlewareLogger.create())
+  if any(row["ViaGroupType"] != "SecurityGroup" or row["NestingLevel"] != 1 for row in rows): failures.append("Changed member rows changed the cached group")
+
+  # Expired entries are fetched again
+  expiring = create_resolver(storage_path + "_ttl", 1, ttl_seconds=0.2)
+  await expiring.get_users(graph, group_ids[2])
+  requests = graph.requests
+  await asyncio.sleep(0.3)
+  _, cache_status = await expiring.get_users(graph, group_ids[2])
+  if cache_status != "fetched" or graph.requests == requests: failures.append(f"Expired group was not fetched again (cache status '{cache_status}')")
+  if expiring.delete_expired() != 0: failures.append("delete_expired() deleted a group that was just fetched")
+
+  # invalidate([ids]) drops only those groups (memory and disk), delete_all_entra_caches() drops all
+  stored = resolver.store.count()
+  if resolver.invalidate(group_ids[:3]) != 3 or resolver.store.count() != stored - 3: failures.append("invalidate([ids]) did not drop exactly those groups from disk")
+  if resolver.get_cached(group_ids[0]) is not None or resolver.get_cached(group_ids[3]) is None: failures.append("invalidate([ids]) did not drop exactly those groups from memory")
+  with open(os.path.join(get_entra_cache_folder(storage_path), "legacy-group.json"), 'w', encoding='utf-8') as f: json.dump({"members": []}, f)
+  deleted = delete_all_entra_caches(storage_path)
+  print(f"  invalidate:   3 groups dropped, then delete_all_entra_caches() deleted {deleted} (incl. 1 JSON file of the previous cache)")
+  if deleted != stored - 3 + 1 or resolver.store.count() != 0 or resolver.get_cached(group_ids[3]) is not None: failures.append(f"delete_all_entra_caches() deleted {deleted} groups, expected {stored - 3 + 1}")
+  if os.path.exists(os.path.join(get_entra_cache_folder(storage_path), "legacy-group.json")): failures.append("delete_all_entra_caches() kept a JSON file of the previous cache")
+
+def measure_lookups(storage_path: str, group_ids: list) -> tuple[float, float]:
+  """(mean secs per lookup from per-group JSON files as before, from memory) over all groups."""
+  resolver = entra.get_entra_group_resolver(storage_path)
+  folder = tempfile.mkdtemp(dir=storage_path)
+  for group_id in group_ids:
+    with open(os.path.join(folder, f"{group_id}.json"), 'w', encoding='utf-8') as f: json.dump({"group_id": group_id, "members": resolver.get_cached(group_id)[0]}, f, indent=2)
+  start = time.perf_counter()
+  for _ in range(lookups_per_group):
+    for group_id in group_ids:
+      with open(os.path.join(folder, f"{group_id}.json"), 'r', encoding='utf-8') as f: json.load(f)
+  json_secs = (time.perf_counter() - start) / (lookups_per_group * len(group_ids))
+  start = time.perf_counter()
+  for _ in range(lookups_per_group):
+    for group_id in group_ids: resolver.get_cached(group_id)
+  memory_secs = (time.perf_counter() - start) / (lookups_per_group * len(group_ids))
+  shutil.rmtree(folder)
+  return json_secs, memory_secs
+
+def main():
+  logging.getLogger("routers_v2.common_logging_functions_v2").setLevel(logging.WARNING)
+  group_ids = [f"group-{n}" for n in range(1, group_count + 1)]
+  # Lookups in scan order: every group again and again (items and SharePoint groups sharing Entra ID groups)
+  lookups = [group_id for _ in range(lookups_per_group) for group_id in group_ids]
+  print("=" * 100)
+  print(f"START: Entra ID group resolution benchmark ({group_count} groups x {lookups_per_group} lookups, Graph latency {1000 * graph_latency:.0f} ms, {max_parallel} fetches at once)")
+  print("=" * 100)
+  failures = []
+  temp_folder = tempfile.mkdtemp(prefix="entra_group_benchmark_")
+  try:
+    sequential = run_mode("sequential", create_resolver(os.path.join(temp_folder, "sequential"), 1), lookup_sequential, lookups, failures)
+    storage_path = os.path.join(temp_folder, "concurrent")
+    resolver = entra.get_entra_group_resolver(storage_path)
+    resolver.max_parallel = max_parallel
+    concurrent = run_mode("concurrent", resolver, lookup_concurrent, lookups, failures)
+    stats = resolver.get_stats()
+    if stats["fetches"] != group_count: failures.append(f"Concurrent lookups made {stats['fetches']} fetches, expected {group_count} (one per group)")
+    if concurrent >= sequential / 2: failures.append(f"Concurrent resolution is not at least 2x faster ({concurrent:.2f} vs {sequential:.2f} secs)")
+    run_mode("warm memory", resolver, lookup_sequential, lookups, failures)
+    disk_resolver = create_resolver(storage_path, max_parallel)
+    run_mode("warm disk", disk_resolver, lookup_sequential, lookups, failures)
+    stats, disk_stats = resolver.get_stats(), disk_resolver.get_stats()
+    print(f"  stats:        memory {stats['memory_hits']} hits, {stats['shared']} shared, {stats['fetches']} fetches | new resolver: {disk_stats['disk_hits']} disk hits, {disk_stats['memory_hits']} memory hits, {disk_stats['fetches']} fetches")
+    if stats["fetches"] != group_count or disk_stats["fetches"] != 0 or disk_stats["disk_hits"] != group_count: failures.append("Warm lookups were not served from memory and disk")
+    json_secs, memory_secs = measure_lookups(storage_path, group_ids)
+    print(f"  lookup:       per-group JSON file {1000 * json_secs:7.3f} ms | memory {1000 * memory_secs:7.3f} ms")
+    if memory_secs >= json_secs: failures.append("Memory lookup is not faster than reading the per-group JSON file")
+    asyncio.run(check_behavior(storage_path, group_ids, failures))
+  finally:
+    shutil.rmtree(temp_folder, ignore_errors=True)
+  print("=" * 100)
+  for failure in failures: print(f"  FAIL: {failure}")
+  print(f"RESULT: {'FAILED' if failures else 'PASSED'}")
+  print("=" * 100)
+  sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+  main()
+
+# ----------------------------------------- END: Benchmark -----------------------------------------------------------
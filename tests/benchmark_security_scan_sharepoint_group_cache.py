@@ -0,0 +1,221 @@
+# Benchmark script for the per-scan SharePoint group cache (SharePointGroupCache) in routers_v2/common_security_scan_functions_v2.py
+#
+# Starts a local stand-in for the SharePoint REST API (uvicorn, plain HTTP, ROUND_TRIP_LATENCY secs per request) with one
+# site: site groups Owners / Members / Visitors and a library with ITEM_COUNT items with broken inheritance that grant
+# access through the Members group (every item) and the Owners group (every 3rd item).
+# Runs scan_site_groups() and scan_broken_inheritance_items() like run_security_scan() does:
+#   - uncached:  group and its members requested again for every item (previous behavior)
+#   - cached:    one SharePointGroupCache per scan, pre-warmed by scan_site_groups()
+# Measures scan time and SharePoint requests.
+# Checks:
+#   - the CSVs of both modes are byte-identical
+#   - the item step makes no group requests with the cache, the hit ratio is reported in the scan summary
+#   - a failed member request is not cached
+#   - concurrent lookups of the same group share one group request and one member request
+#
+# Run: python tests/benchmark_security_scan_sharepoint_group_cache.py [ITEM_COUNT]     e.g. python tests/benchmark_security_scan_sharepoint_group_cache.py 300
+#
+# No credentials or network access required.
+#
+# Output: Script-level logging per LOGGING-RULES-SCRIPT-LEVEL.md
+# - One line per mode with scan time and requests
+# - Final: RESULT: PASSED if the cache saves requests and time with identical CSVs and all checks pass, else RESULT: FAILED
+
+import asyncio, json, logging, os, re, shutil, socket, sys, tempfile, threading, time
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import uvicorn
+
+# Project root is parent of tests/
+project_root = Path(__file__).parent.parent
+
+# Add src to path for imports
+sys.path.insert(0, str(project_root / 'src'))
+
+from routers_v2 import common_security_scan_functions_v2 as scanner
+from routers_v2.common_logging_functions_v2 import MiddlewareLogger
+from routers_v2.common_sharepoint_client_v2 import SharePointRestClient, close_sharepoint_http_client
+
+# ----------------------------------------- START: Configuration -----------------------------------------------------
+
+item_count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+round_trip_latency = 0.01
+group_sizes = {3: 5, 4: 30, 5: 10}
+group_titles = {3: "Site Owners", 4: "Site Members", 5: "Site Visitors"}
+
+# ----------------------------------------- END: Configuration -------------------------------------------------------
+
+
+# ----------------------------------------- START: Benchmark ---------------------------------------------------------
+
+counters = {"requests": 0, "group_requests": 0}
+failing_group_ids = set()
+
+def get_sp_group_member(group_id: int) -> dict:
+  return {"PrincipalId": group_id, "Member": {"Id": group_id, "Title": group_titles[group_id], "LoginName": group_titles[group_id], "PrincipalType": 8}, "RoleDefinitionBindings": [{"Name": "Full Control" if group_id == 3 else "Edit"}]}
+
+def get_item_role_assignments(item_id: int) -> list[dict]:
+  role_assignments = [get_sp_group_member(4), {"PrincipalId": 100 + item_id, "Member": {"Id": 100 + item_id, "Title": f"Author {item_id}", "LoginName": f"i:0#.f|membership|author{item_id}@contoso.com", "PrincipalType": 1}, "RoleDefinitionBindings": [{"Name": "Contribute"}]}]
+  if item_id % 3 == 0: role_assignments.insert(0, get_sp_group_member(3))
+  return role_assignments
+
+def handle_get(path: str, query: dict) -> tuple[int, dict]:
+  """(status code, JSON body) of a GET request to the stand-in."""
+  api_path = "/_api" + unquote(path).partition("/_api")[2]
+  if api_path == "/_api/web/roleassignments": return 200, {"value": [get_sp_group_member(3), get_sp_group_member(4)]}
+  if api_path == "/_api/web/sitegroups": return 200, {"value": [{"Id": group_id, "Title": title, "OwnerTitle": "Site Owners"} for group_id, title in group_titles.items()]}
+  if match := re.fullmatch(r"/_api/web/sitegroups/getbyid\((\d+)\)", api_path):
+    counters["group_requests"] += 1
+    return 200, {"Id": int(match.group(1)), "Title": group_titles[int(match.group(1))]}
+  if match := re.fullmatch(r"/_api/web/sitegroups/getbyid\((\d+)\)/users", api_path):
+    counters["group_requests"] += 1
+    group_id = int(match.group(1))
+    if group_id in failing_group_ids: return 500, {"odata.error": {"code": "-1, Microsoft.SharePoint.SPException", "message": {"lang": "en-US", "value": "Server error."}}}
+    return 200, {"value": [{"Id": 1000 * group_id + n, "Title": f"{group_titles[group_id]} user {n}", "LoginName": f"i:0#.f|membership|g{group_id}u{n}@contoso.com", "Email": f"g{group_id}u{n}@contoso.com", "PrincipalType": 1} for n in range(group_sizes[group_id])]}
+  if api_path == "/_api/web/lists":
+    return 200, {"value": [{"Id": "00000000-0000-0000-0000-000000000001", "Title": "Documents", "BaseTemplate": 101, "Hidden": False, "DefaultViewUrl": "/sites/site01/Shared Documents/Forms/AllItems.aspx"}]}
+  if re.fullmatch(r"/_api/web/lists\(guid'[^']+'\)/items", api_path):
+    last_id = int(query.get("$filter", "ID gt 0").rsplit(" ", 1)[1])
+    return 200, {"value": [{"ID": item_id, "FileRef": f"/sites/site01/Shared Documents/Document {item_id}.docx", "FileLeafRef": f"Document {item_id}.docx", "FSObjType": 0, "HasUniqueRoleAssignments": True} for item_id in range(last_id + 1, item_count + 1)]}
+  if match := re.fullmatch(r"/_api/web/lists\(guid'[^']+'\)/items\((\d+)\)/roleassignments", api_path): return 200, {"value": get_item_role_assignments(int(match.group(1)))}
+  return 404, {"odata.error": {"code": "404", "message": {"lang": "en-US", "value": f"Not found: {api_path}"}}}
+
+def handle_batch(content_type: str, body: bytes) -> bytes:
+  boundary = re.search(r"boundary=([^;]+)", content_type).group(1)
+  parts = []
+  for part in body.decode("utf-8").split(f"--{boundary}")[1:]:
+    if part.startswith("--"): break
+    url = urlsplit(next(line for line in part.split("\r\n") if line.startswith("GET ")).split(" ")[1])
+    status_code, data = handle_get(url.path, {key: values[0] for key, values in parse_qs(url.query).items()})
+    parts.append(f"--batchresponse_1\r\nContent-Type: application/http\r\nContent-Transfer-Encoding: binary\r\n\r\nHTTP/1.1 {status_code} {'OK' if status_code == 200 else 'Error'}\r\nCONTENT-TYPE: application/json;odata=nometadata\r\n\r\n{json.dumps(data)}\r\n")
+  return ("".join(parts) + "--batchresponse_1--\r\n").encode("utf-8")
+
+async def fake_sharepoint(scope, receive, send):
+  if scope["type"] != "http": return
+  counters["requests"] += 1
+  body = b""
+  while True:
+    message = await receive()
+    body += message.get("body", b"")
+    if not message.get("more_body"): break
+  await asyncio.sleep(round_trip_latency)
+  if scope["path"].endswith("/_api/$batch"):
+    headers = {key.decode(): value.decode() for key, value in scope["headers"]}
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"multipart/mixed; boundary=batchresponse_1")]})
+    await send({"type": "http.response.body", "body": handle_batch(headers["content-type"], body)})
+    return
+  status_code, data = handle_get(scope["path"], {key: values[0] for key, values in parse_qs(scope["query_string"].decode()).items()})
+  await send({"type": "http.response.start", "status": status_code, "headers": [(b"content-type", b"application/json;odata=nometadata")]})
+  await send({"type": "http.response.body", "body": json.dumps(data).encode()})
+
+def start_fake_sharepoint() -> tuple[uvicorn.Server, int]:
+  sock = socket.socket()
+  sock.bind(("127.0.0.1", 0))
+  server = uvicorn.Server(uvicorn.Config(fake_sharepoint, log_level="warning", lifespan="off"))
+  threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True).start()
+  while not server.started: time.sleep(0.01)
+  return server, sock.getsockname()[1]
+
+class LogWriter:
+  """Job stream of the scan: keeps the emitted log lines."""
+  def __init__(self): self.lines, self._step_result = [], None
+  def emit_log(self, message: str) -> str:
+    self.lines.append(message)
+    return message
+  def drain_sse_queue(self) -> list: return []
+
+class UncachedGroups(scanner.SharePointGroupCache):
+  """Previous behavior: the group and its members are requested again for every lookup."""
+  async def get_group(self, sp_client, group_id) -> dict:
+    self._groups.clear()
+    return await super().get_group(sp_client, group_id)
+  async def get_members(self, *args, **kwargs) -> list:
+    self._members.clear()
+    return await super().get_members(*args, **kwargs)
+
+async def run_steps(site_url: str, group_cache, output_folder: str, storage_path: str) -> tuple[float, int, int]:
+  """(elapsed secs, requests, group requests of the item step) of the site groups and items steps."""
+  async def token_provider() -> str: return "benchmark-token"
+  sp_client, writer, logger = SharePointRestClient(site_url, token_provider), LogWriter(), MiddlewareLogger.create()
+  counters["requests"] = 0
+  start = time.perf_counter()
+  async for _ in scanner.scan_site_groups(sp_client, storage_path, output_folder, None, writer, logger, 1, 2, {}, site_url=site_url, group_cache=group_cache): pass
+  group_requests_before_items = counters["group_requests"]
+  async for _ in scanner.scan_broken_inheritance_items(sp_client, storage_path, output_folder, None, writer, logger, 2, 2, {}, site_url=site_url, group_cache=group_cache): pass
+  elapsed = time.perf_counter() - start
+  await close_sharepoint_http_client()
+  return elapsed, counters["requests"], counters["group_requests"] - group_requests_before_items
+
+def read_csvs(folder: str) -> dict:
+  return {name: open(os.path.join(folder, name), 'rb').read() for name in sorted(os.listdir(folder)) if name.endswith(".csv")}
+
+async def check_failed_members(site_url: str, storage_path: str, failures: list) -> None:
+  async def token_provider() -> str: return "benchmark-token"
+  sp_client, writer, group_cache = SharePointRestClient(site_url, token_provider), LogWriter(), scanner.SharePointGroupCache()
+  failing_group_ids.add(5)
+  group = await group_cache.get_group(sp_client, 5)
+  members = await group_cache.get_members(sp_client, group, storage_path, None, writer, 1, "", MiddlewareLogger.create())
+  failing_group_ids.clear()
+  if members or not any("ERROR: Failed to get users for group_title='Site Visitors'" in line for line in writer.lines): failures.append("Failed member request was not logged as error")
+  members = await group_cache.get_members(sp_client, group, storage_path, None, writer, 1, "", MiddlewareLogger.create())
+  if len(members) != group_sizes[5]: failures.append("Failed member request was cached")
+  await close_sharepoint_http_client()
+
+async def check_concurrent_lookups(site_url: str, storage_path: str, failures: list) -> None:
+  async def token_provider() -> str: return "benchmark-token"
+  sp_client, writer, group_cache, lookups = SharePointRestClient(site_url, token_provider), LogWriter(), scanner.SharePointGroupCache(), 20
+  counters["group_requests"] = 0
+  groups = await asyncio.gather(*(group_cache.get_group(sp_client, 4) for _ in range(lookups)))
+  member_lists = await asyncio.gather(*(group_cache.get_members(sp_client, groups[0], storage_path, None, writer, 1, "", MiddlewareLogger.create()) for _ in range(lookups)))
+  stats = group_cache.get_stats()
+  print(f"  concurrent: {lookups} lookups of one group -> {counters['group_requests']} group requests | shared {stats['group_shared']} group, {stats['shared']} member lookups")
+  if counters["group_requests"] != 2: failures.append(f"{lookups} concurrent lookups of one group made {counters['group_requests']} group requests, expected 2")
+  if any(group != groups[0] for group in groups) or any(len(members) != group_sizes[4] for members in member_lists): failures.append("Concurrent lookups returned different results")
+  # A failed request fails all lookups that waited for it and is not cached
+  failing_group_ids.add(5)
+  group = await group_cache.get_group(sp_client, 5)
+  member_lists = await asyncio.gather(*(group_cache.get_members(sp_client, group, storage_path, None, writer, 1, "", MiddlewareLogger.create()) for _ in range(lookups)))
+  failing_group_ids.clear()
+  if any(member_lists): failures.append("Lookups sharing a failed member request returned members")
+  if len(await group_cache.get_members(sp_client, group, storage_path, None, writer, 1, "", MiddlewareLogger.create())) != group_sizes[5]: failures.append("Failed shared member request was cached")
+  await close_sharepoint_http_client()
+
+def main():
+  for logger_name in ("httpx", "routers_v2.common_logging_functions_v2"): logging.getLogger(logger_name).setLevel(logging.WARNING)
+  server, port = start_fake_sharepoint()
+  site_url = f"http://127.0.0.1:{port}/sites/site01"
+  print("=" * 100)
+  print(f"START: SharePoint group cache benchmark ({item_count:,} broken-inheritance items, latency {1000 * round_trip_latency:.0f} ms)")
+  print("=" * 100)
+  failures, results, csvs = [], {}, {}
+  temp_folder = tempfile.mkdtemp(prefix="security_scan_group_cache_benchmark_")
+  try:
+    for mode, group_cache in (("uncached", UncachedGroups()), ("cached", scanner.SharePointGroupCache())):
+      output_folder = os.path.join(temp_folder, mode)
+      os.makedirs(output_folder)
+      results[mode] = asyncio.run(run_steps(site_url, group_cache, output_folder, temp_folder))
+      csvs[mode] = read_csvs(output_folder)
+      elapsed, requests, item_group_requests = results[mode]
+      stats = group_cache.get_stats()
+      print(f"  {mode + ':':10} {elapsed:6.2f} secs | {requests:5,} requests, {item_group_requests:5,} group requests in the items step | hit ratio {stats['hit_ratio']}, group hit ratio {stats['group_hit_ratio']}")
+    asyncio.run(check_failed_members(site_url, temp_folder, failures))
+    asyncio.run(check_concurrent_lookups(site_url, temp_folder, failures))
+  finally:
+    server.should_exit = True
+    shutil.rmtree(temp_folder, ignore_errors=True)
+  if csvs["cached"] != csvs["uncached"]: failures.append(f"CSVs differ: {[name for name in csvs['cached'] if csvs['cached'][name] != csvs['uncached'].get(name)]}")
+  if results["cached"][2] != 0: failures.append(f"Items step made {results['cached'][2]} group requests with the cache")
+  if results["cached"][1] >= results["uncached"][1]: failures.append("Cache did not save requests")
+  if results["cached"][0] >= results["uncached"][0]: failures.append(f"Cached scan is not faster ({results['cached'][0]:.2f} vs {results['uncached'][0]:.2f} secs)")
+  print(f"  speedup:    {results['uncached'][0] / results['cached'][0]:.1f}x, {results['uncached'][1] - results['cached'][1]:,} requests saved")
+  print("=" * 100)
+  for failure in failures: print(f"  FAIL: {failure}")
+  print(f"RESULT: {'FAILED' if failures else 'PASSED'}")
+  print("=" * 100)
+  sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+  main()
+
+# ----------------------------------------- END: Benchmark -----------------------------------------------------------
@@ -0,0 +1,164 @@
+# Benchmark script for streaming CSV output of scan_broken_inheritance_items() in routers_v2/common_security_scan_functions_v2.py
+#
+# Scans a synthetic library with ITEM_COUNT items (every BROKEN_EVERY-th item with broken inheritance, granting access
+# through a SharePoint group with GROUP_SIZE members and one direct user) with an in-process SharePoint client stand-in,
+# each mode in its own process to measure its peak RSS:
+#   - collected:  all 04/05 rows kept as dicts until the step ends, then written (previous behavior)
+#   - streamed:   rows formatted and appended while produced (CsvStreamWriter, CSV_WRITE_BUFFER_ROWS rows buffered)
+# Measures peak RSS above the RSS before the scan, and the scan time.
+# Checks:
+#   - both modes write byte-identical CSVs, streamed peak RSS stays below MAX_STREAMED_PEAK_MB
+#   - the memoizing row formatter produces the output of csv_escape() for special values (quotes, commas, newlines, None,
+#     numbers, True vs 1) and formats access rows faster than one csv_escape() call per value
+#
+# Run: python tests/benchmark_security_scan_streaming_csv.py [ITEM_COUNT]     e.g. python tests/benchmark_security_scan_streaming_csv.py 500000
+#
+# No credentials or network access required.
+#
+# Output: Script-level logging per LOGGING-RULES-SCRIPT-LEVEL.md
+# - One line per mode with peak RSS, scan time and rows, one line for the row formatter
+# - Final: RESULT: PASSED if streaming bounds memory with identical CSVs and all checks pass, else RESULT: FAILED
+
+import asyncio, hashlib, json, logging, os, resource, shutil, subprocess, sys, tempfile, time
+from pathlib import Path
+
+# Project root is parent of tests/
+project_root = Path(__file__).parent.parent
+
+# Add src to path for imports
+sys.path.insert(0, str(project_root / 'src'))
+
+from routers_v2 import common_security_scan_functions_v2 as scanner
+from routers_v2.common_logging_functions_v2 import MiddlewareLogger
+
+# ----------------------------------------- START: Configuration -----------------------------------------------------
+
+item_count = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1] != "--child" else 500000
+broken_every = 10
+group_size = 5
+formatter_rows = 200000
+# Peak RSS above the RSS before the scan may not exceed this in streamed mode, independent of ITEM_COUNT
+max_streamed_peak_mb = 100.0
+
+# ----------------------------------------- END: Configuration -------------------------------------------------------
+
+
+# ----------------------------------------- START: Benchmark ---------------------------------------------------------
+
+site_url = "https://contoso.sharepoint.com/sites/site01"
+
+class FakeSharePointClient:
+  """SharePointRestClient stand-in for one library: items pages, $batch role assignments, site group and its users."""
+  def __init__(self, item_count: int): self.site_url, self.item_count = site_url, item_count
+
+  def get_role_assignments(self, item_id: int) -> list[dict]:
+    return [
+      {"PrincipalId": 4, "Member": {"Id": 4, "Title": "Site Members", "LoginName": "Site Members", "PrincipalType": 8}, "RoleDefinitionBindings": [{"Name": "Edit"}]},
+      {"PrincipalId": 100 + item_id % 97, "Member": {"Id": 100 + item_id % 97, "Title": f"Author, {item_id % 97}", "LoginName": f"i:0#.f|membership|author{item_id % 97}@contoso.com", "PrincipalType": 1}, "RoleDefinitionBindings": [{"Name": "Contribute"}]}
+    ]
+
+  async def get_all(self, path: str, params: dict = None) -> list:
+    if path == "/_api/web/lists": return [{"Id": "00000000-0000-0000-0000-000000000001", "Title": "Documents", "BaseTemplate": 101, "Hidden": False, "DefaultViewUrl": "/sites/site01/Shared Documents/Forms/AllItems.aspx"}]
+    if path.endswith("/users"): return [{"Id": 1000 + n, "Title": f"Member \"{n}\"", "LoginName": f"i:0#.f|membership|member{n}@contoso.com", "Email": f"member{n}@contoso.com", "PrincipalType": 1} for n in range(group_size)]
+    return self.get_role_assignments(int(path.rsplit("(", 1)[1].split(")")[0]))
+
+  async def get_json(self, path: str, params: dict = None) -> dict:
+    if "sitegroups/getbyid" in path: return {"Id": 4, "Title": "Site Members"}
+    last_id, top = int(params["$filter"].rsplit(" ", 1)[1]), int(params["$top"])
+    return {"value": [{"ID": item_id, "FileRef": f"/sites/site01/Shared Documents/Folder {item_id % 100}/Document {item_id}.docx", "FileLeafRef": f"Document {item_id}.docx", "FSObjType": 0, "HasUniqueRoleAssignments": item_id % broken_every == 0} for item_id in range(last_id + 1, min(self.item_count, last_id + top) + 1)]}
+
+  async def batch_get_json(self, requests: list) -> list:
+    return [{"value": self.get_role_assignments(int(path.rsplit("(", 1)[1].split(")")[0]))} for path, _ in requests]
+
+class CountingWriter:
+  """Job stream of the scan: counts log lines."""
+  def __init__(self): self.lines, self._step_result = 0, None
+  def emit_log(self, message: str) -> str:
+    self.lines += 1
+    return message
+
+class CollectedCsvWriter:
+  """Previous behavior: rows kept as dicts until the step ends, then written with append_csv_rows()."""
+  def __init__(self, file_path: str, columns: list):
+    self.file_path, self.columns, self.rows = file_path, columns, []
+  def write_row(self, row: dict) -> None: self.rows.append(row)
+  def flush(self) -> None: scanner.append_csv_rows(self.file_path, self.rows, self.columns)
+
+def get_peak_rss_mb() -> float:
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_child(mode: str, item_count: int, output_folder: str) -> None:
+  """Scan in this process, print {peak_mb, elapsed, rows} as JSON."""
+  logging.getLogger("routers_v2.common_logging_functions_v2").setLevel(logging.WARNING)
+  if mode == "collected": scanner.CsvStreamWriter = CollectedCsvWriter
+  for file_name, columns in (("04_IndividualPermissionItems.csv", scanner.CSV_COLUMNS_INDIVIDUAL_ITEMS), ("05_IndividualPermissionItemAccess.csv", scanner.CSV_COLUMNS_INDIVIDUAL_ACCESS)): scanner.write_csv_header(os.path.join(output_folder, file_name), columns)
+  async def scan():
+    async for _ in scanner.scan_broken_inheritance_items(FakeSharePointClient(item_count), output_folder, output_folder, None, writer, MiddlewareLogger.create(), 0, 0, {}, site_url=site_url): pass
+  writer = CountingWriter()
+  rss_before = get_peak_rss_mb()
+  start = time.perf_counter()
+  asyncio.run(scan())
+  elapsed = time.perf_counter() - start
+  print(json.dumps({"peak_mb": get_peak_rss_mb() - rss_before, "elapsed": elapsed, "stats": writer._step_result}))
+
+def hash_csvs(folder: str) -> dict:
+  return {name: (hashlib.sha256(open(os.path.join(folder, name), 'rb').read()).hexdigest(), os.path.getsize(os.path.join(folder, name))) for name in sorted(os.listdir(folder)) if name.endswith(".csv")}
+
+def check_row_formatter(failures: list) -> None:
+  """Memoizing formatter vs csv_escape() on special values, and its speed on access rows."""
+  def reference_row(row: dict, columns: list) -> str: return ','.join(scanner.csv_escape(row.get(col, ''), is_numeric=col in scanner.NUMERIC_COLUMNS) for col in columns)
+  columns = scanner.CSV_COLUMNS_INDIVIDUAL_ACCESS
+  values = ["", None, 0, 1, 42, True, False, "plain", "a,b", 'say "hi"', "line\nbreak", "carriage\rreturn", "tab\tvalue", "ünïcödé", " spaced ", '"', ",", "\n"]
+  rows = [{col: values[(n + i) % len(values)] for i, col in enumerate(columns) if (n + i) % 7} for n in range(len(values) * 7)]
+  format_row = scanner.get_csv_row_formatter(columns)
+  rows = rows + [dict(row) for row in rows]
+  mismatches = [row for row in rows if format_row(row) != reference_row(row, columns)]
+  if mismatches: failures.append(f"Row formatter differs from csv_escape() for {len(mismatches)} rows, e.g. {mismatches[0]}")
+  access_rows = [{"Job": 1, "SiteUrl": site_url, "Id": str(n), "Type": "File", "Url": f"https://contoso.sharepoint.com/sites/site01/Shared Documents/Document {n}.docx", "LoginName": f"member{n % 5}@contoso.com", "DisplayName": f"Member, {n % 5}" if n % 10 == 0 else f"Member {n % 5}", "Email": "", "PermissionLevel": "Edit", "IsGuest": "false", "SharedDateTime": "", "SharedByDisplayName": "", "SharedByLoginName": "", "ViaGroup": "Site Members", "ViaGroupId": "4", "ViaGroupType": "SharePointGroup", "AssignmentType": "Group", "NestingLevel": 1, "ParentGroup": ""} for n in range(formatter_rows)]
+  start = time.perf_counter()
+  for row in access_rows: reference_row(row, columns)
+  reference_secs = time.perf_counter() - start
+  start = time.perf_counter()
+  for row in access_rows: format_row(row)
+  fast_secs = time.perf_counter() - start
+  print(f"  formatter:  {formatter_rows:,} access rows | csv_escape() {reference_secs:5.2f} secs | memoized {fast_secs:5.2f} secs | {reference_secs / fast_secs:.1f}x")
+  if fast_secs >= reference_secs: failures.append("Row formatter is not faster than csv_escape()")
+
+def main():
+  print("=" * 100)
+  print(f"START: Streaming CSV benchmark ({item_count:,} items, {item_count // broken_every:,} with broken inheritance, {group_size + 1} access rows each)")
+  print("=" * 100)
+  failures, results = [], {}
+  temp_folder = tempfile.mkdtemp(prefix="security_scan_streaming_benchmark_")
+  try:
+    for mode in ("collected", "streamed"):
+      output_folder = os.path.join(temp_folder, mode)
+      os.makedirs(output_folder)
+      completed = subprocess.run([sys.executable, __file__, "--child", mode, str(item_count), output_folder], capture_output=True, text=True)
+      if completed.returncode != 0:
+        failures.append(f"{mode}: scan failed -> {completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else completed.returncode}")
+        continue
+      results[mode] = json.loads(completed.stdout.strip().splitlines()[-1])
+      results[mode]["csvs"] = hash_csvs(output_folder)
+      csv_mb = sum(size for _, size in results[mode]["csvs"].values()) / 1024 / 1024
+      print(f"  {mode + ':':11} peak RSS +{results[mode]['peak_mb']:7.1f} MB | {results[mode]['elapsed']:6.2f} secs | {results[mode]['stats']['items_scanned']:,} items scanned, {results[mode]['stats']['items_with_individual_permissions']:,} broken | {csv_mb:.1f} MB CSV")
+      shutil.rmtree(output_folder, ignore_errors=True)
+    check_row_formatter(failures)
+  finally:
+    shutil.rmtree(temp_folder, ignore_errors=True)
+  if len(results) == 2:
+    if results["streamed"]["csvs"] != results["collected"]["csvs"]: failures.append("Streamed CSVs differ from the collected CSVs")
+    if results["streamed"]["stats"]["items_with_individual_permissions"] != item_count // broken_every: failures.append(f"{results['streamed']['stats']['items_with_individual_permissions']} broken items scanned, expected {item_count // broken_every}")
+    if results["streamed"]["peak_mb"] > max_streamed_peak_mb: failures.append(f"Streamed peak RSS +{results['streamed']['peak_mb']:.1f} MB exceeds {max_streamed_peak_mb} MB")
+    if results["streamed"]["peak_mb"] >= results["collected"]["peak_mb"]: failures.append("Streaming did not lower the peak RSS")
+  print("=" * 100)
+  for failure in failures: print(f"  FAIL: {failure}")
+  print(f"RESULT: {'FAILED' if failures else 'PASSED'}")
+  print("=" * 100)
+  sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+  if len(sys.argv) > 1 and sys.argv[1] == "--child": run_child(sys.argv[2], int(sys.argv[3]), sys.argv[4])
+  else: main()
+
+# ----------------------------------------- END: Benchmark -----------------------------------------------------------
@@ -0,0 +1,317 @@
+# Test script for common_sharepoint_client_v2.py
+#
+# Tests the async SharePoint REST client against in-process stand-in responses (httpx.MockTransport):
+# - download_file() with content-encoded (gzip) responses: decoded size, no Range offsets into the compressed body
+# - download_file() retry of a partial file that is already complete (416 response) and the total retry cap
+# - _parse_batch_response() / batch_get_json() with a SharePoint $batch response: failed part, 204 without body, odata.nextLink
+#
+# Run: python tests/test_common_sharepoint_client_v2.py
+#
+# No credentials or network access required.
+#
+# Output: Script-level logging per LOGGING-RULES-SCRIPT-LEVEL.md
+# - Section progress: [ x / n ] Section Name
+# - Test results: OK. / FAIL:
+# - Summary: OK: X, FAIL: Y
+# - Final: RESULT: PASSED or RESULT: FAILED
+
+import asyncio, gzip, logging, os, shutil, sys, tempfile
+from pathlib import Path
+
+import httpx
+
+# Project root is parent of tests/
+project_root = Path(__file__).parent.parent
+
+# Add src to path for imports
+sys.path.insert(0, str(project_root / 'src'))
+
+from routers_v2 import common_sharepoint_client_v2 as spc
+
+# httpx logs every request at INFO level
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# ----------------------------------------- START: Configuration -----------------------------------------------------
+
+site_url = "https://contoso.sharepoint.com/sites/a"
+batch_boundary = "batchresponse_5bd2c3a6-9d1b-4b7a-8d8e-3f0c1e2a4b6c"
+next_link = f"{site_url}/_api/web/lists(guid'0a1b2c3d-0000-0000-0000-000000000001')/items(3)/roleassignments?%24skiptoken=Paged%3dTRUE&%24top=2"
+# Compressible file content: the gzip body is much smaller than the file
+file_content = b"SharePoint file content line\n" * 4000
+
+# ----------------------------------------- END: Configuration -------------------------------------------------------
+
+
+# ----------------------------------------- START: Test Infrastructure -----------------------------------------------
+
+test_count = 0
+pass_count = 0
+fail_count = 0
+failed_tests = []
+section_num = 0
+total_sections = 5
+
+def test(name: str, condition: bool, details: str = ""):
+  global test_count, pass_count, fail_count
+  test_count += 1
+  if condition:
+    pass_count += 1
+    print(f"  OK. {name}")
+  else:
+    fail_count += 1
+    fail_msg = f"{name}" + (f" -> {details}" if details else "")
+    failed_tests.append(fail_msg)
+    print(f"  FAIL: {fail_msg}")
+
+def section(name: str):
+  global section_num
+  section_num += 1
+  print(f"[ {section_num} / {total_sections} ] {name}")
+
+async def token_provider() -> str:
+  return "test-token"
+
+def run_with_stand_in(handler, action):
+  """Run action(sp_client) with the shared HTTP client replaced by one that answers every request with handler(request)."""
+  async def run():
+    spc._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    spc._http_client_loop = asyncio.get_running_loop()
+    try:
+      return await action(spc.SharePointRestClient(site_url, token_provider))
+    finally:
+      await spc.close_sharepoint_http_client()
+  return asyncio.run(run())
+
+# ----------------------------------------- END: Test Infrastructure -------------------------------------------------
+
+
+# ----------------------------------------- START: Test Cases --------------------------------------------------------
+
+def test_download_gzip_encoded(temp_dir: str):
+  """download_file() with a server that compresses the body although Accept-Encoding: identity was requested."""
+  section("download_file() with gzip-encoded response")
+  compressed = gzip.compress(file_content)
+  requests = []
+
+  def handler(request: httpx.Request) -> httpx.Response:
+    requests.append(request)
+    return httpx.Response(200, headers={"Content-Encoding": "gzip", "Content-Length": str(len(compressed)), "ETag": '"{1},1"'}, content=compressed)
+
+  target_path = os.path.join(temp_dir, "gzip.txt")
+  try:
+    bytes_written = run_with_stand_in(handler, lambda sp_client: sp_client.download_file("/sites/a/f.txt", target_path))
+    error = None
+  except Exception as e:
+    bytes_written, error = 0, e
+  test("Download succeeds", error is None, str(error))
+  test("Bytes written = decoded file size", bytes_written == len(file_content), f"{bytes_written} != {len(file_content)}")
+  test("File content is the decoded content", os.path.exists(target_path) and Path(target_path).read_bytes() == file_content)
+  test("No .partial file left", not os.path.exists(target_path + spc.PARTIAL_FILE_SUFFIX))
+  test("Request asks for Accept-Encoding: identity", len(requests) == 1 and requests[0].headers.get("accept-encoding") == "identity", str([r.headers.get("accept-encoding") for r in requests]))
+
+  # expected_size is the decoded size (SharePointMapRow.file_size) and must match
+  target_path = os.path.join(temp_dir, "gzip_expected_size.txt")
+  try:
+    run_with_stand_in(handler, lambda sp_client: sp_client.download_file("/sites/a/f.txt", target_path, expected_size=len(file_content)))
+    error = None
+  except Exception as e:
+    error = e
+  test("Download with expected_size = decoded size succeeds", error is None, str(error))
+
+  # Content-Length / Content-Range of an encoded body are no file sizes
+  encoded = httpx.Response(200, headers={"Content-Encoding": "gzip", "Content-Length": "283"})
+  plain = httpx.Response(206, headers={"Content-Length": "100", "Content-Range": "bytes 100-199/200"})
+  test("_get_total_size() ignores Content-Length of encoded body", spc._get_total_size(encoded, 0) is None)
+  test("_get_total_size() reads Content-Range of plain body", spc._get_total_size(plain, 100) == 200)
+
+def test_download_gzip_encoded_retry(temp_dir: str):
+  """A dropped gzip-encoded download restarts from byte 0 instead of sending a Range for the decoded offset."""
+  section("download_file() retry of dropped gzip-encoded response")
+  compressed = gzip.compress(file_content)
+  requests = []
+
+  async def dropped_body():
+    yield compressed[:len(compressed) // 2]
+    raise httpx.ReadError("Connection dropped")
+
+  def handler(request: httpx.Request) -> httpx.Response:
+    requests.append(request)
+    headers = {"Content-Encoding": "gzip", "ETag": '"{1},1"'}
+    if len(requests) == 1: return httpx.Response(200, headers=headers, content=dropped_body())
+    return httpx.Response(200, headers={**headers, "Content-Length": str(len(compressed))}, content=compressed)
+
+  target_path = os.path.join(temp_dir, "gzip_retry.txt")
+  try:
+    bytes_written = run_with_stand_in(handler, lambda sp_client: sp_client.download_file("/sites/a/f.txt", target_path, expected_size=len(file_content), delay_seconds=0.01))
+    error = None
+  except Exception as e:
+    bytes_written, error = 0, e
+  test("Download succeeds after retry", error is None, str(error))
+  test("Two requests sent", len(requests) == 2, f"{len(requests)} requests")
+  test("Retry sends no Range header", len(requests) == 2 and "range" not in requests[1].headers, str(requests[-1].headers.get("range")))
+  test("File content is the decoded content", bytes_written == len(file_content) and Path(target_path).read_bytes() == file_content)
+
+def test_download_complete_partial_retry(temp_dir: str):
+  """Connection dropped after the last byte: the Range retry gets 416 with the full size and completes the download."""
+  section("download_file() retry of complete partial file (416)")
+  # One full download chunk: the chunk is written before the connection drops
+  content = (file_content * 10)[:spc.DOWNLOAD_CHUNK_SIZE]
+  requests = []
+
+  async def dropped_after_last_byte():
+    yield content
+    raise httpx.ReadError("Connection dropped")
+
+  def handler(request: httpx.Request) -> httpx.Response:
+    requests.append(request)
+    if len(requests) == 1: return httpx.Response(200, headers={"Content-Length": str(len(content)), "ETag": '"{1},1"'}, content=dropped_after_last_byte())
+    return httpx.Response(416, headers={"Content-Range": f"bytes */{len(content)}"})
+
+  target_path = os.path.join(temp_dir, "complete_partial.txt")
+  try:
+    bytes_written = run_with_stand_in(handler, lambda sp_client: sp_client.download_file("/sites/a/f.txt", target_path, delay_seconds=0.01))
+    error = None
+  except Exception as e:
+    bytes_written, error = 0, e
+  test("Download succeeds after 416", error is None, str(error))
+  test("Retry asks for the bytes after the partial file", len(requests) == 2 and requests[1].headers.get("range") == f"bytes={len(content)}-", str(requests[-1].headers.get("range")))
+  test("File content is complete", bytes_written == len(content) and Path(target_path).read_bytes() == content)
+  test("No .partial file left", not os.path.exists(target_path + spc.PARTIAL_FILE_SUFFIX))
+
+  # 416 for another size (file changed in between): restart from byte 0
+  requests.clear()
+  def changed_handler(request: httpx.Request) -> httpx.Response:
+    requests.append(request)
+    if len(requests) == 1: return httpx.Response(200, headers={"Content-Length": str(len(content)), "ETag": '"{1},1"'}, content=dropped_after_last_byte())
+    if len(requests) == 2: return httpx.Response(416, headers={"Content-Range": "bytes */100"})
+    return httpx.Response(200, headers={"Content-Length": "100", "ETag": '"{1},2"'}, content=content[:100])
+
+  target_path = os.path.join(temp_dir, "changed_partial.txt")
+  try:
+    bytes_written = run_with_stand_in(changed_handler, lambda sp_client: sp_client.download_file("/sites/a/f.txt", target_path, delay_seconds=0.01))
+    error = None
+  except Exception as e:
+    bytes_written, error = 0, e
+  test("Download succeeds after 416 for another size", error is None, str(error))
+  test("Third request restarts without Range", len(requests) == 3 and "range" not in requests[2].headers, str([r.headers.get("range") for r in requests]))
+  test("File content is the new content", bytes_written == 100 and Path(target_path).read_bytes() == content[:100])
+
+def test_download_total_retry_cap(temp_dir: str):
+  """A connection that drops after every chunk makes progress on each attempt but stops at max_total_retries."""
+  section("download_file() total retry cap with progress on every attempt")
+  content = bytes(10 * spc.DOWNLOAD_CHUNK_SIZE)
+  requests = []
+
+  def handler(request: httpx.Request) -> httpx.Response:
+    requests.append(request)
+    offset = int(request.headers["range"][len("bytes="):-1]) if "range" in request.headers else 0
+    async def one_chunk_then_drop():
+      yield content[offset:offset + spc.DOWNLOAD_CHUNK_SIZE]
+      raise httpx.ReadError("Connection dropped")
+    headers = {"Content-Range": f"bytes {offset}-{len(content) - 1}/{len(content)}", "ETag": '"{1},1"'}
+    return httpx.Response(206 if offset else 200, headers=headers, content=one_chunk_then_drop())
+
+  target_path = os.path.join(temp_dir, "retry_cap.txt")
+  try:
+    run_with_stand_in(handler, lambda sp_client: sp_client.download_file("/sites/a/f.txt", target_path, max_retries=2, delay_seconds=0.001, max_total_retries=5))
+    error = None
+  except Exception as e:
+    error = e
+  test("Download fails with the connection error", isinstance(error, httpx.ReadError), repr(error))
+  test("1 request + 5 retries sent", len(requests) == 6, f"{len(requests)} requests")
+  test("Every retry resumed after the received chunks", [r.headers.get("range") for r in requests[1:]] == [f"bytes={i * spc.DOWNLOAD_CHUNK_SIZE}-" for i in range(1, 6)], str([r.headers.get("range") for r in requests]))
+  test("No .partial file left", not os.path.exists(target_path + spc.PARTIAL_FILE_SUFFIX))
+
+def batch_response_part(status_line: str, body: str = "", content_type: str = "application/json;odata=nometadata;streaming=true;charset=utf-8") -> str:
+  """One part of a multipart/mixed $batch response as SharePoint sends it (CRLF line endings, uppercase CONTENT-TYPE)."""
+  headers = f"CONTENT-TYPE: {content_type}\r\n" if body else ""
+  return f"--{batch_boundary}\r\nContent-Type: application/http\r\nContent-Transfer-Encoding: binary\r\n\r\nHTTP/1.1 {status_line}\r\n{headers}\r\n{body}\r\n"
+
+def test_batch_response():
+  """_parse_batch_response() and batch_get_json() with a $batch response holding a success, a failure, a 204 and a paged part."""
+  section("$batch response with failed part, 204 without body and odata.nextLink")
+  error_body = '{"odata.error":{"code":"-2147024809, System.ArgumentException","message":{"lang":"en-US","value":"Item does not exist. It may have been deleted by another user."}}}'
+  paged_body = '{"value":[{"PrincipalId":3},{"PrincipalId":7}],"odata.nextLink":"' + next_link + '"}'
+  content = (batch_response_part("200 OK", '{"value":[{"PrincipalId":11}]}')
+    + batch_response_part("404 Not Found", error_body)
+    + batch_response_part("204 No Content")
+    + batch_response_part("200 OK", paged_body)
+    + f"--{batch_boundary}--\r\n").encode("utf-8")
+  batch_headers = {"Content-Type": f"multipart/mixed; boundary={batch_boundary}"}
+  requests = []
+
+  def handler(request: httpx.Request) -> httpx.Response:
+    requests.append(request)
+    if request.url.path.endswith("/_api/$batch"): return httpx.Response(200, headers=batch_headers, content=content)
+    return httpx.Response(200, json={"value": [{"PrincipalId": 9}]})
+
+  parts = spc._parse_batch_response(httpx.Response(200, headers=batch_headers, content=content, request=httpx.Request("POST", f"{site_url}/_api/$batch")))
+  test("Four parts parsed", len(parts) == 4, f"{len(parts)} parts")
+  test("Status codes and reason phrases", [(code, reason) for code, reason, _ in parts] == [(200, "OK"), (404, "Not Found"), (204, "No Content"), (200, "OK")], str([(code, reason) for code, reason, _ in parts]))
+  test("Failed part keeps its odata.error body", len(parts) == 4 and parts[1][2] == error_body.encode("utf-8"))
+  test("204 part has an empty body", len(parts) == 4 and parts[2][2] == b"", repr(parts[2][2]) if len(parts) == 4 else "")
+
+  async def action(sp_client):
+    results = await sp_client.batch_get_json([(f"/_api/web/lists/getbytitle('Documents')/items({i})/roleassignments", {"$expand": "Member"}) for i in range(4)])
+    # The caller follows odata.nextLink of a part outside the batch (get_role_assignments_batched)
+    rest = await sp_client.get_all(results[3]["odata.nextLink"]) if isinstance(results[3], dict) and results[3].get("odata.nextLink") else []
+    return results, rest
+  try:
+    (results, rest), error = run_with_stand_in(handler, action), None
+  except Exception as e:
+    results, rest, error = [], [], e
+  test("batch_get_json() succeeds", error is None, str(error))
+  test("One result per request", len(results) == 4, f"{len(results)} results")
+  if len(results) != 4: return
+  test("Successful part returns its JSON", results[0] == {"value": [{"PrincipalId": 11}]}, str(results[0]))
+  test("Failed part returns a SharePointRequestError with status code", isinstance(results[1], spc.SharePointRequestError) and results[1].status_code == 404, repr(results[1]))
+  test("Error message carries the odata.error message", "Item does not exist" in str(results[1]) and "items(1)/roleassignments" in str(results[1]), str(results[1]))
+  test("204 part returns an empty dict", results[2] == {}, repr(results[2]))
+  test("Paged part keeps odata.nextLink", isinstance(results[3], dict) and results[3].get("odata.nextLink") == next_link and len(results[3].get("value", [])) == 2, str(results[3]))
+  test("$batch sent as one POST with multipart body", requests[0].method == "POST" and requests[0].headers.get("content-type", "").startswith("multipart/mixed; boundary=") and requests[0].content.count(b"GET ") == 4)
+  test("odata.nextLink followed with a GET to the link", len(requests) == 2 and str(requests[1].url) == next_link and rest == [{"PrincipalId": 9}], str([str(r.url) for r in requests[1:]]))
+
+# ----------------------------------------- END: Test Cases ----------------------------------------------------------
+
+
+# ----------------------------------------- START: Main --------------------------------------------------------------
+
+def main():
+  print("=" * 100)
+  print("START: common_sharepoint_client_v2.py Test Suite".center(100))
+  print("=" * 100)
+  temp_dir = tempfile.mkdtemp(prefix="sharepoint_client_test_")
+  try:
+    test_download_gzip_encoded(temp_dir)
+    test_download_gzip_encoded_retry(temp_dir)
+    test_download_complete_partial_retry(temp_dir)
+    test_download_total_retry_cap(temp_dir)
+    test_batch_response()
+  finally:
+    shutil.rmtree(temp_dir, ignore_errors=True)
+
+  # Summary
+  print("\nTEST SUMMARY")
+  print(f"  Sections: {section_num} / {total_sections}")
+  print(f"  OK: {pass_count}, FAIL: {fail_count}")
+
+  if len(failed_tests) > 0:
+    print(f"\nFailed tests ({len(failed_tests)}):")
+    for ft in failed_tests:
+      print(f"  - {ft}")
+
+  print("=" * 100)
+
+  if fail_count > 0:
+    print("RESULT: FAILED")
+    print("=" * 100)
+    sys.exit(1)
+  else:
+    print("RESULT: PASSED")
+    print("=" * 100)
+    sys.exit(0)
+
+if __name__ == "__main__":
+  main()
+
+# ----------------------------------------- END: Main ----------------------------------------------------------------